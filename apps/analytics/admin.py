@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import BacktestRun, Trade
+
+
+@admin.register(BacktestRun)
+class BacktestRunAdmin(admin.ModelAdmin):
+    list_display = ("id", "symbol", "strategy_key", "timeframe", "trade_count", "owner", "created_at")
+    list_filter = ("strategy_key", "timeframe")
+    search_fields = ("symbol__code", "owner__username")
+    raw_id_fields = ("symbol", "strategy", "owner")
+
+
+@admin.register(Trade)
+class TradeAdmin(admin.ModelAdmin):
+    list_display = ("run", "direction", "entry_time", "entry_price", "exit_time", "exit_price", "return_pct")
+    list_filter = ("direction", "exit_reason")
+    raw_id_fields = ("run",)
@@ -0,0 +1,103 @@
+"""NumPy decimation helpers used to keep long series plottable."""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+LTTB = "lttb"
+MINMAX = "minmax"
+METHODS = (LTTB, MINMAX)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the points that best preserve the
+    visual shape of (x, y). First and last points are always kept.
+    """
+    n = x.shape[0]
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = x.astype(float, copy=False)
+    y = y.astype(float, copy=False)
+    # Interior buckets split the points between the fixed first and last samples.
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = hi, edges[bucket + 2] if bucket + 2 < edges.shape[0] else n
+        if next_hi <= next_lo:
+            next_hi = next_lo + 1
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        ax, ay = x[prev], y[prev]
+        area = np.abs((ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y - ay))
+        prev = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        selected[bucket + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Min/max envelope: the lowest and highest sample of each bucket, in time order."""
+    n = y.shape[0]
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    buckets = max(1, max_points // 2)
+    size = int(np.ceil(n / buckets))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    valid_rows = ~np.isnan(grid).all(axis=1)
+    offsets = np.arange(buckets)[valid_rows] * size
+    grid = grid[valid_rows]
+    lows = np.nanargmin(grid, axis=1) + offsets
+    highs = np.nanargmax(grid, axis=1) + offsets
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def decimate(x: np.ndarray, y: np.ndarray, max_points: int, method: str = LTTB) -> np.ndarray:
+    """Returns the indices to keep according to ``method``."""
+    if method == MINMAX:
+        return minmax_indices(y, max_points)
+    if method == LTTB:
+        return lttb_indices(x, y, max_points)
+    raise ValueError(f"Unsupported decimation method '{method}'.")
+
+
+def downsample_ohlcv(
+    timestamps: np.ndarray,
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    max_points: int,
+) -> Dict[str, np.ndarray]:
+    """Aggregates consecutive candles into at most ``max_points`` buckets (OHLC-preserving)."""
+    n = timestamps.shape[0]
+    if max_points >= n or max_points < 1:
+        return {
+            "timestamp": timestamps,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+        }
+    starts = np.unique(np.linspace(0, n, max_points, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], n)
+    return {
+        "timestamp": timestamps[starts],
+        "open": open_[starts],
+        "high": np.maximum.reduceat(high, starts),
+        "low": np.minimum.reduceat(low, starts),
+        "close": close[ends - 1],
+        "volume": np.add.reduceat(volume, starts),
+    }
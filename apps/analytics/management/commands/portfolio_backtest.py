@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.analytics.portfolio import PortfolioFrame, load_portfolio, portfolio_from_frames, run_portfolio_backtest
+from apps.datafeeds.models import Symbol
+from apps.datafeeds.synthetic import generate_frames
+from apps.risk.engine import RiskLimits
+from apps.risk.models import RiskProfile
+
+SYNTHETIC_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SYNTHETIC_TIMEFRAMES = ("5m", "1h", "4h")
+
+
+def synthetic_frame(symbols: int, days: int, seed: int = 7, period: int = 200) -> PortfolioFrame:
+    """Synthetic 5m/1h/4h candles (``apps.datafeeds.synthetic``) for ``symbols`` symbols."""
+    end = SYNTHETIC_START + timedelta(days=days)
+    frames = {
+        f"SYM{index:03d}": generate_frames(SYNTHETIC_START, end, SYNTHETIC_TIMEFRAMES, seed=seed, symbol_index=index)
+        for index in range(symbols)
+    }
+    return portfolio_from_frames(frames, period)
+
+
+class Command(BaseCommand):
+    help = "Runs Strategy 2 over many symbols at once with RiskProfile capital allocation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("symbols", nargs="*", help="Symbol codes (default: all active symbols).")
+        parser.add_argument("--start", help="ISO datetime")
+        parser.add_argument("--end", help="ISO datetime")
+        parser.add_argument("--period", type=int, default=200)
+        parser.add_argument("--owner", help="Username whose RiskProfile limits apply (default limits otherwise).")
+        parser.add_argument("--synthetic", type=int, help="Use N synthetic symbols instead of stored candles.")
+        parser.add_argument("--days", type=int, default=365, help="Length of the synthetic data.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        limits = RiskLimits()
+        if options["owner"]:
+            profile = RiskProfile.objects.filter(owner__username=options["owner"]).first()
+            if profile is None and not get_user_model().objects.filter(username=options["owner"]).exists():
+                raise CommandError(f"User '{options['owner']}' not found.")
+            if profile is not None:
+                limits = RiskLimits.from_profile(profile)
+
+        started = time.perf_counter()
+        if options["synthetic"]:
+            frame = synthetic_frame(options["synthetic"], options["days"], options["seed"], options["period"])
+        else:
+            queryset = Symbol.objects.filter(is_active=True)
+            if options["symbols"]:
+                queryset = Symbol.objects.filter(code__in=[code.upper() for code in options["symbols"]])
+            symbols = list(queryset)
+            if not symbols:
+                raise CommandError("No symbols to backtest.")
+            start = parse_datetime(options["start"]) if options["start"] else None
+            end = parse_datetime(options["end"]) if options["end"] else None
+            frame = load_portfolio(symbols, start=start, end=end, period=options["period"])
+        if frame.close.size == 0:
+            raise CommandError("No candles available for the requested range.")
+        loaded = time.perf_counter()
+
+        result = run_portfolio_backtest(frame, limits)
+        elapsed = time.perf_counter() - loaded
+
+        bars, columns = frame.shape
+        self.stdout.write(json.dumps(result.metrics(), indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{bars:,} bars x {columns} symbols: loaded in {loaded - started:.2f}s, backtest in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.suite import (
+    DEFAULT_SIZES,
+    DEFAULT_THRESHOLD,
+    build_report,
+    compare,
+    load_report,
+    registered_cases,
+    run_cases,
+    write_report,
+)
+
+BENCHMARKS_DIR = Path(settings.BASE_DIR) / "benchmarks"
+
+
+class Command(BaseCommand):
+    help = "Runs the benchmarks/ suite, writes timings and peak memory to JSON and checks them against a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=lambda value: [int(size) for size in value.split(",")],
+            default=list(DEFAULT_SIZES),
+            help="Comma-separated numbers of 5m bars (default: 10000,100000,1000000).",
+        )
+        parser.add_argument("--only", action="append", default=[], help="Run cases whose name contains this (repeatable).")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--output", default=str(BENCHMARKS_DIR / "results" / "latest.json"))
+        parser.add_argument("--baseline", default=str(BENCHMARKS_DIR / "baseline.json"))
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help="Relative growth in time or peak memory reported as a regression (0.25 = 25%%).",
+        )
+        parser.add_argument("--update-baseline", dest="update_baseline", action="store_true")
+
+    def handle(self, *args, **options):
+        cases = registered_cases(options["only"])
+        if not cases:
+            raise CommandError("No benchmark case matches --only.")
+
+        def report(key, result):
+            self.stdout.write(f"{key:<48} {result['seconds'] * 1000:>11.1f}ms {result['peak_mb']:>9.1f}MB")
+
+        memory_cases = [case for case in cases if not case.uses_db]
+        db_cases = [case for case in cases if case.uses_db]
+        results = run_cases(memory_cases, options["sizes"], options["repeat"], report)
+        if db_cases:
+            results.update(self._run_in_test_database(db_cases, options, report))
+
+        output = build_report(results, options["sizes"], options["repeat"])
+        write_report(Path(options["output"]), output)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"]:
+            write_report(baseline_path, output)
+            self.stdout.write(self.style.SUCCESS(f"Baseline updated: {baseline_path}"))
+            return
+
+        baseline = load_report(baseline_path)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}; run with --update-baseline to store one."))
+            return
+        regressions = compare(results, baseline.get("results", {}), options["threshold"])
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmark regression(s) above {options['threshold']:.0%}:\n"
+                + "\n".join(f"  {regression}" for regression in regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(f"No regressions above {options['threshold']:.0%} against {baseline_path}"))
+
+    def _run_in_test_database(self, cases, options, report):
+        """Database cases seed and write candles, so they never touch the configured database."""
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            return run_cases(cases, options["sizes"], options["repeat"], report)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
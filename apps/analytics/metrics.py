@@ -0,0 +1,186 @@
+"""Vectorized performance metrics computed from closed-trade arrays."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+@dataclass(frozen=True)
+class TradeArrays:
+    """Column-oriented view of closed trades (one element per trade)."""
+
+    entry_ts: np.ndarray  # epoch seconds (int64)
+    exit_ts: np.ndarray  # epoch seconds (int64)
+    direction: np.ndarray  # +1 long, -1 short
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.entry_ts.shape[0])
+
+    @classmethod
+    def empty(cls) -> "TradeArrays":
+        ints = np.empty(0, dtype=np.int64)
+        floats = np.empty(0, dtype=float)
+        return cls(ints, ints.copy(), floats.copy(), floats.copy(), floats.copy())
+
+
+def trade_returns(arrays: TradeArrays) -> np.ndarray:
+    """Fractional return of each trade, signed by direction."""
+    if len(arrays) == 0:
+        return np.empty(0, dtype=float)
+    return arrays.direction * (arrays.exit_price - arrays.entry_price) / arrays.entry_price
+
+
+def equity_curve(returns: np.ndarray, starting_capital: float) -> np.ndarray:
+    """Compounded equity after each trade, prefixed with the starting capital."""
+    curve = np.empty(returns.shape[0] + 1, dtype=float)
+    curve[0] = starting_capital
+    if returns.size:
+        curve[1:] = starting_capital * np.cumprod(1.0 + returns)
+    return curve
+
+
+def bar_equity_curve(
+    bar_ts: np.ndarray,
+    closes: np.ndarray,
+    arrays: TradeArrays,
+    starting_capital: float,
+) -> np.ndarray:
+    """
+    Mark-to-market equity at every bar close for sequential (non-overlapping) trades.
+
+    An open trade is valued against its entry price and the equity it started with,
+    so the last value matches the trade-level compounded equity exactly.
+    """
+    n = bar_ts.shape[0]
+    if n == 0 or len(arrays) == 0:
+        return np.full(n, float(starting_capital))
+
+    order = np.argsort(arrays.entry_ts, kind="stable")
+    direction = arrays.direction[order]
+    entry_price = arrays.entry_price[order]
+    entry_idx = np.clip(np.searchsorted(bar_ts, arrays.entry_ts[order], side="right") - 1, 0, n - 1)
+    exit_idx = np.clip(np.searchsorted(bar_ts, arrays.exit_ts[order], side="right") - 1, 0, n - 1)
+
+    factors = 1.0 + direction * (arrays.exit_price[order] - entry_price) / entry_price
+    equity_after = np.empty(factors.shape[0] + 1, dtype=float)
+    equity_after[0] = starting_capital
+    equity_after[1:] = starting_capital * np.cumprod(factors)
+
+    bars = np.arange(n)
+    closed = np.searchsorted(np.sort(exit_idx), bars, side="right")
+    equity = equity_after[closed]
+
+    # Trade opened strictly before each bar and not yet closed at it.
+    active = np.searchsorted(entry_idx, bars, side="left") - 1
+    has_active = active >= 0
+    active_safe = np.where(has_active, active, 0)
+    is_open = has_active & (exit_idx[active_safe] > bars)
+    k = active_safe[is_open]
+    equity[is_open] = equity_after[k] * (
+        1.0 + direction[k] * (closes[is_open] - entry_price[k]) / entry_price[k]
+    )
+    return equity
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Largest peak-to-trough decline of an equity series, as a positive fraction."""
+    if equity.size == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(equity)
+    drawdowns = np.where(peaks > 0, (peaks - equity) / peaks, 0.0)
+    return float(drawdowns.max())
+
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: float = 1.0) -> Optional[float]:
+    if returns.size < 2:
+        return None
+    std = returns.std(ddof=1)
+    if std == 0:
+        return None
+    return float(returns.mean() / std * math.sqrt(periods_per_year))
+
+
+def sortino_ratio(returns: np.ndarray, periods_per_year: float = 1.0) -> Optional[float]:
+    if returns.size < 2:
+        return None
+    downside = np.minimum(returns, 0.0)
+    downside_dev = math.sqrt(float(np.mean(downside**2)))
+    if downside_dev == 0:
+        return None
+    return float(returns.mean() / downside_dev * math.sqrt(periods_per_year))
+
+
+def win_rate(returns: np.ndarray) -> Optional[float]:
+    if returns.size == 0:
+        return None
+    return float(np.count_nonzero(returns > 0) / returns.size)
+
+
+def exposure(entry_ts: np.ndarray, exit_ts: np.ndarray, span_start: int, span_end: int) -> float:
+    """
+    Fraction of the [span_start, span_end] window spent in at least one trade.
+    Overlapping trades are merged so the result never exceeds 1.
+    """
+    span = span_end - span_start
+    if entry_ts.size == 0 or span <= 0:
+        return 0.0
+    order = np.argsort(entry_ts, kind="stable")
+    starts = entry_ts[order]
+    ends = np.maximum.accumulate(exit_ts[order])
+    # A new block begins whenever a trade opens after every previous one has closed.
+    new_block = np.empty(starts.size, dtype=bool)
+    new_block[0] = True
+    new_block[1:] = starts[1:] > ends[:-1]
+    block_last = np.append(new_block[1:], True)
+    block_starts = starts[new_block]
+    block_ends = ends[block_last]
+    covered = np.clip(block_ends, span_start, span_end) - np.clip(block_starts, span_start, span_end)
+    return float(min(covered.sum() / span, 1.0))
+
+
+def compute_metrics(
+    arrays: TradeArrays,
+    starting_capital: float,
+    span_start: Optional[int] = None,
+    span_end: Optional[int] = None,
+) -> Dict[str, Optional[float]]:
+    """
+    Aggregate KPIs for a set of closed trades.
+
+    Sharpe/Sortino are annualised using the observed trade frequency over the span.
+    """
+    returns = trade_returns(arrays)
+    curve = equity_curve(returns, starting_capital)
+
+    if span_start is None:
+        span_start = int(arrays.entry_ts.min()) if len(arrays) else 0
+    if span_end is None:
+        span_end = int(arrays.exit_ts.max()) if len(arrays) else 0
+    years = (span_end - span_start) / SECONDS_PER_YEAR
+    periods_per_year = returns.size / years if years > 0 else 1.0
+
+    final_equity = float(curve[-1])
+    metrics = {
+        "trade_count": int(returns.size),
+        "starting_capital": float(starting_capital),
+        "final_equity": final_equity,
+        "total_return_pct": (final_equity / starting_capital - 1.0) * 100 if starting_capital else 0.0,
+        "max_drawdown_pct": max_drawdown(curve) * 100,
+        "sharpe_ratio": sharpe_ratio(returns, periods_per_year),
+        "sortino_ratio": sortino_ratio(returns, periods_per_year),
+        "win_rate_pct": None,
+        "avg_trade_return_pct": float(returns.mean() * 100) if returns.size else None,
+        "exposure_pct": exposure(arrays.entry_ts, arrays.exit_ts, span_start, span_end) * 100,
+    }
+    rate = win_rate(returns)
+    if rate is not None:
+        metrics["win_rate_pct"] = rate * 100
+    return metrics
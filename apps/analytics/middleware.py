@@ -0,0 +1,129 @@
+"""
+Request timing middleware.
+
+Every request collects its spans (``apps.analytics.timing``) plus two measured here: ``db``,
+the summed time of all SQL queries (through ``connection.execute_wrapper``), and ``render``,
+the serialisation of DRF/template responses. The total is added last. The result goes into
+the ``Server-Timing`` header, which browsers show next to the request in the network panel.
+
+``?profile=1`` runs the request under a profiler for staff users. The response is then
+replaced by the report: pyinstrument's when it is installed, otherwise cProfile's top
+functions by cumulative time. DRF authenticates inside the view, so for token or basic auth
+the staff check happens after the profiled call. Anonymous requests without credentials are
+never profiled.
+
+The middleware is async-capable, so under ASGI async views are not adapted onto a thread.
+Spans recorded in ``sync_to_async`` calls still reach the request (they copy the context), and
+SQL is timed on the connection of the request's sync thread (``sync_thread_execute_wrapper``).
+Work handed to another thread or process, such as the strategy-run worker pool, is only
+visible through the spans its caller records around it (``run.compute``).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.http import HttpResponse
+
+from .querybudget import sync_thread_execute_wrapper
+from .timing import collect_spans, record, span
+
+PROFILE_PARAM = "profile"
+PROFILE_TOP_FUNCTIONS = 60
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect_spans() as collector, connection.execute_wrapper(self._time_query):
+            if self._profile_requested(request):
+                profiler = self._start_profiler()
+                response = self.get_response(request)
+                response = self._profile_response(profiler, request, response)
+            else:
+                response = self.get_response(request)
+            record("total", time.perf_counter() - started)
+        response["Server-Timing"] = collector.header()
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect_spans() as collector:
+            async with sync_thread_execute_wrapper(self._time_query):
+                if self._profile_requested(request):
+                    profiler = self._start_profiler()
+                    response = await self.get_response(request)
+                    response = self._profile_response(profiler, request, response)
+                else:
+                    response = await self.get_response(request)
+            record("total", time.perf_counter() - started)
+        response["Server-Timing"] = collector.header()
+        return response
+
+    def process_template_response(self, request, response):
+        # Rendering here (instead of in the handler) puts serialisation inside a span;
+        # the handler's own render() call is then a no-op.
+        with span("render"):
+            response.render()
+        return response
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record("db", time.perf_counter() - started)
+
+    @staticmethod
+    def _profile_requested(request) -> bool:
+        if request.GET.get(PROFILE_PARAM) not in {"1", "true", "yes"}:
+            return False
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        return "HTTP_AUTHORIZATION" in request.META
+
+    @staticmethod
+    def _start_profiler():
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = Profiler()
+            profiler.start()
+        return profiler
+
+    @staticmethod
+    def _profile_response(profiler, request, response):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            report = stream.getvalue()
+        else:
+            profiler.stop()
+            report = profiler.output_text(unicode=True, color=False)
+
+        user = getattr(request, "user", None)
+        if user is None or not user.is_staff:
+            return response
+        return HttpResponse(report, content_type="text/plain; charset=utf-8")
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('strategies', '0001_initial'),
+        ('datafeeds', '0002_divergence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BacktestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy_key', models.CharField(help_text='Strategy id used by the run view.', max_length=50)),
+                ('timeframe', models.CharField(max_length=5)),
+                ('start_at', models.DateTimeField(blank=True, null=True)),
+                ('end_at', models.DateTimeField(blank=True, null=True)),
+                ('starting_capital', models.DecimalField(decimal_places=2, default=10000, max_digits=16)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('metrics', models.JSONField(blank=True, default=dict)),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='backtest_runs', to=settings.AUTH_USER_MODEL)),
+                ('strategy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backtest_runs', to='strategies.strategy')),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backtest_runs', to='datafeeds.symbol')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Trade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('long', 'Long'), ('short', 'Short')], max_length=5)),
+                ('entry_time', models.DateTimeField()),
+                ('entry_price', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('exit_time', models.DateTimeField(blank=True, null=True)),
+                ('exit_price', models.DecimalField(blank=True, decimal_places=8, max_digits=20, null=True)),
+                ('exit_reason', models.CharField(blank=True, max_length=30)),
+                ('return_pct', models.FloatField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trades', to='analytics.backtestrun')),
+            ],
+            options={
+                'ordering': ('run', 'entry_time'),
+                'indexes': [models.Index(fields=['run', 'entry_time'], name='analytics_t_run_id_bded06_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='backtestrun',
+            index=models.Index(fields=['symbol', 'strategy_key', 'created_at'], name='analytics_b_symbol__496af2_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquityCurve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamps', models.BinaryField(help_text='Epoch seconds, little-endian int64.')),
+                ('values', models.BinaryField(help_text='Equity values, little-endian float64.')),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('previews', models.JSONField(blank=True, default=dict)),
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='equity_curve', to='analytics.backtestrun')),
+            ],
+        ),
+    ]
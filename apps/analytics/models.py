@@ -0,0 +1,97 @@
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+
+class BacktestRun(models.Model):
+    """A persisted strategy evaluation over a symbol/time range with precomputed KPIs."""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="backtest_runs",
+        null=True,
+        blank=True,
+    )
+    symbol = models.ForeignKey(
+        "datafeeds.Symbol",
+        on_delete=models.CASCADE,
+        related_name="backtest_runs",
+    )
+    strategy = models.ForeignKey(
+        "strategies.Strategy",
+        on_delete=models.SET_NULL,
+        related_name="backtest_runs",
+        null=True,
+        blank=True,
+    )
+    strategy_key = models.CharField(max_length=50, help_text="Strategy id used by the run view.")
+    timeframe = models.CharField(max_length=5)
+    start_at = models.DateTimeField(null=True, blank=True)
+    end_at = models.DateTimeField(null=True, blank=True)
+    starting_capital = models.DecimalField(max_digits=16, decimal_places=2, default=10000)
+    params = models.JSONField(default=dict, blank=True)
+    metrics = models.JSONField(default=dict, blank=True)
+    trade_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["symbol", "strategy_key", "created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Backtest {self.pk} {self.symbol.code} strategy {self.strategy_key}"
+
+
+class Trade(models.Model):
+    """A single round trip produced by a backtest run."""
+
+    class Direction(models.TextChoices):
+        LONG = "long", "Long"
+        SHORT = "short", "Short"
+
+    run = models.ForeignKey(BacktestRun, related_name="trades", on_delete=models.CASCADE)
+    direction = models.CharField(max_length=5, choices=Direction.choices)
+    entry_time = models.DateTimeField()
+    entry_price = models.DecimalField(max_digits=20, decimal_places=8)
+    exit_time = models.DateTimeField(null=True, blank=True)
+    exit_price = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
+    exit_reason = models.CharField(max_length=30, blank=True)
+    return_pct = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("run", "entry_time")
+        indexes = [
+            models.Index(fields=["run", "entry_time"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.direction} @ {self.entry_time.isoformat()} (run {self.run_id})"
+
+    @property
+    def is_open(self) -> bool:
+        return self.exit_time is None
+
+
+class EquityCurve(models.Model):
+    """
+    Bar-level equity of a run stored as packed int64/float64 arrays, plus decimated
+    previews for the resolutions the dashboard requests most often.
+    """
+
+    run = models.OneToOneField(BacktestRun, related_name="equity_curve", on_delete=models.CASCADE)
+    timestamps = models.BinaryField(help_text="Epoch seconds, little-endian int64.")
+    values = models.BinaryField(help_text="Equity values, little-endian float64.")
+    point_count = models.PositiveIntegerField(default=0)
+    previews = models.JSONField(default=dict, blank=True)
+
+    def __str__(self) -> str:
+        return f"Equity curve for run {self.run_id} ({self.point_count} points)"
+
+    def as_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        return (
+            np.frombuffer(bytes(self.timestamps), dtype="<i8"),
+            np.frombuffer(bytes(self.values), dtype="<f8"),
+        )
@@ -0,0 +1,307 @@
+"""
+Cross-symbol portfolio backtests on a shared time index.
+
+Every symbol is loaded the way the strategy run view loads it: its 5m candles plus the
+stored 1h/4h candles through ``load_frames``, with Strategy 2's registered indicators
+computed per timeframe and as-of merged onto the 5m frame by the run view itself. The merged
+frames are then aligned onto one time index as ``time x symbol`` arrays.
+
+Entry and exit events (crossovers and body breaks) are evaluated for every symbol at once
+with column-wise NumPy operations. A short walk over each symbol's trades then applies the
+stop-loss and take-profit levels of ``apps.strategies.config``, like the run view does
+without intrabar data, which yields a target side per bar and symbol. Capital allocation
+runs in a single sequential pass through ``apps.risk.engine.apply_portfolio_limits``, so the
+``RiskProfile`` limits (concurrent positions, size per position, daily loss, drawdown)
+apply across the whole portfolio.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from apps.datafeeds.models import Symbol
+from apps.risk.engine import RiskLimits, apply_portfolio_limits
+from apps.strategies.config import (
+    STOP_LOSS_ENABLED,
+    STOP_LOSS_PERCENT,
+    TAKE_PROFIT_ENABLED,
+    TAKE_PROFIT_PERCENT,
+)
+from apps.strategies.frames import FrameWindow, load_frames
+from apps.strategies.graph import IndicatorGraph
+from apps.strategies.registry import BASE_TIMEFRAME, StrategySpec, get_strategy
+from apps.strategies.views import HMASMAStrategyRunView
+
+from .metrics import SECONDS_PER_YEAR, max_drawdown
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 3600
+STRATEGY_KEY = "2"
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+
+@dataclass
+class PortfolioFrame:
+    timestamps: np.ndarray  # (time,) epoch seconds, int64
+    symbols: List[str]
+    close: np.ndarray  # (time, symbol) float64, NaN where a symbol has no bar
+    open: Optional[np.ndarray] = None
+    high: Optional[np.ndarray] = None
+    low: Optional[np.ndarray] = None
+    indicators: Dict[str, np.ndarray] = field(default_factory=dict)  # merged column -> (time, symbol)
+    period: int = 200
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.close.shape
+
+
+@dataclass
+class PortfolioResult:
+    frame: PortfolioFrame
+    desired: np.ndarray  # strategy side per bar/symbol (+1, -1, 0)
+    weights: np.ndarray  # signed fraction of equity held after each bar
+    equity: np.ndarray  # multiple of starting capital
+    halted: np.ndarray  # new entries blocked by a risk limit
+
+    def metrics(self, starting_capital: float = 10000.0) -> Dict[str, float]:
+        timestamps = self.frame.timestamps
+        span = float(timestamps[-1] - timestamps[0]) if timestamps.size > 1 else 0.0
+        final = float(self.equity[-1]) if self.equity.size else 1.0
+        held = np.sign(self.weights)
+        previous = np.vstack([np.zeros((1, held.shape[1])), held[:-1]]) if held.size else held
+        return {
+            "starting_capital": starting_capital,
+            "final_equity": starting_capital * final,
+            "total_return_pct": (final - 1) * 100,
+            "annualized_return_pct": (final ** (SECONDS_PER_YEAR / span) - 1) * 100 if span and final > 0 else 0.0,
+            "max_drawdown_pct": max_drawdown(self.equity) * 100,
+            "entries": int(((held != 0) & (held != previous)).sum()),
+            "average_open_positions": float((held != 0).sum(axis=1).mean()) if held.size else 0.0,
+            "halted_bars": int(self.halted.sum()),
+        }
+
+
+def strategy_spec(period: int = 200) -> StrategySpec:
+    """The registered Strategy 2 with every indicator at ``period``."""
+    spec = get_strategy(STRATEGY_KEY)
+    return replace(spec, indicators=tuple(replace(indicator, period=period) for indicator in spec.indicators))
+
+
+def merge_frames(frames: Mapping[str, pd.DataFrame], spec: StrategySpec) -> pd.DataFrame:
+    """The 5m frame of one symbol with the strategy's indicators merged on, as in the run view."""
+    graph = IndicatorGraph(frames)
+    return HMASMAStrategyRunView()._merge_indicator_frames(frames[BASE_TIMEFRAME], graph, spec)
+
+
+def align_frames(merged: Mapping[str, pd.DataFrame], spec: StrategySpec) -> PortfolioFrame:
+    """Aligns per-symbol merged frames onto the union of their timestamps."""
+    symbols = list(merged)
+    period = spec.indicators[0].period if spec.indicators else 200
+    if not symbols:
+        empty = np.empty((0, 0))
+        return PortfolioFrame(np.empty(0, dtype=np.int64), [], empty, empty, empty, empty, period=period)
+    times = {
+        code: frame["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64) for code, frame in merged.items()
+    }
+    timestamps = np.unique(np.concatenate(list(times.values())))
+    rows = {code: np.searchsorted(timestamps, values) for code, values in times.items()}
+
+    def column(name: str) -> np.ndarray:
+        values = np.full((timestamps.shape[0], len(symbols)), np.nan)
+        for index, code in enumerate(symbols):
+            values[rows[code], index] = merged[code][name].to_numpy(dtype=float, na_value=np.nan)
+        return values
+
+    prices = {name: column(name) for name in PRICE_COLUMNS}
+    indicators = {indicator.column: column(indicator.column) for indicator in spec.indicators}
+    return PortfolioFrame(timestamps, symbols, indicators=indicators, period=period, **prices)
+
+
+def portfolio_from_frames(
+    frames: Mapping[str, Mapping[str, pd.DataFrame]],
+    period: int = 200,
+) -> PortfolioFrame:
+    """``frames`` maps each symbol to its candle frames by timeframe (``load_frames`` layout)."""
+    spec = strategy_spec(period)
+    merged = {code: merge_frames(by_timeframe, spec) for code, by_timeframe in frames.items()}
+    return align_frames(merged, spec)
+
+
+def load_portfolio(
+    symbols: Sequence[Symbol],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    period: int = 200,
+) -> PortfolioFrame:
+    """Loads every symbol with the run view's windows (one query per symbol) and aligns them."""
+    spec = strategy_spec(period)
+    windows = {BASE_TIMEFRAME: FrameWindow(BASE_TIMEFRAME, warmup=spec.warmup(BASE_TIMEFRAME) if start else 0)}
+    for timeframe in spec.timeframes[1:]:
+        windows[timeframe] = FrameWindow(timeframe, warmup=spec.warmup(timeframe), anchor=BASE_TIMEFRAME)
+    merged: Dict[str, pd.DataFrame] = {}
+    for symbol in symbols:
+        frames = load_frames(symbol, windows, start, end)
+        if frames[BASE_TIMEFRAME].empty:
+            logger.info("No %s candles for %s; left out of the portfolio", BASE_TIMEFRAME, symbol.code)
+            continue
+        merged[symbol.code] = merge_frames(frames, spec)
+    return align_frames(merged, spec)
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Carries the last valid value of each column forward (leading NaNs stay NaN)."""
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = np.take_along_axis(values, index, axis=0)
+    return filled
+
+
+def _previous(values: np.ndarray, has_bar: np.ndarray) -> np.ndarray:
+    """Value on each symbol's previous bar (rows where a symbol has no bar are skipped)."""
+    rows = np.arange(values.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(has_bar, rows, -1), axis=0)
+    previous_row = np.full_like(last, -1)
+    previous_row[1:] = last[:-1]
+    previous = np.take_along_axis(values, np.clip(previous_row, 0, None), axis=0)
+    previous[previous_row < 0] = np.nan
+    return previous
+
+
+def strategy_events(frame: PortfolioFrame) -> Dict[str, np.ndarray]:
+    """
+    Strategy 2's signal events for every symbol at once: enter when the 5m SMA crosses the 4h
+    HMA; exit a long (short) when it crosses below (above) the 1h or 4h HMA, or when a candle
+    body opens and closes below (above) both. Comparisons with NaN are False, so bars without
+    indicator history never produce an event.
+    """
+    columns = {indicator.timeframe: indicator.column for indicator in strategy_spec(frame.period).indicators}
+    sma = frame.indicators[columns[BASE_TIMEFRAME]]
+    trend_one = frame.indicators[columns["1h"]]
+    trend_two = frame.indicators[columns["4h"]]
+    has_bar = ~np.isnan(frame.close)
+    prev_sma, prev_one, prev_two = (_previous(values, has_bar) for values in (sma, trend_one, trend_two))
+
+    enter_long = (prev_sma <= prev_two) & (sma > trend_two)
+    enter_short = (prev_sma >= prev_two) & (sma < trend_two)
+    body_low = np.minimum(frame.open, frame.close)
+    body_high = np.maximum(frame.open, frame.close)
+    return {
+        "enter_long": enter_long,
+        "enter_short": enter_short,
+        "exit_long": (
+            ((prev_sma >= prev_one) & (sma < trend_one)) | enter_short | (body_high < np.minimum(trend_one, trend_two))
+        ),
+        "exit_short": (
+            ((prev_sma <= prev_one) & (sma > trend_one)) | enter_long | (body_low > np.maximum(trend_one, trend_two))
+        ),
+    }
+
+
+def strategy_positions(frame: PortfolioFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Target side per bar and symbol, plus the exit price on bars closed by a stop-loss or
+    take-profit level (NaN elsewhere; other exits fill at the close).
+    """
+    events = strategy_events(frame)
+    loss = STOP_LOSS_PERCENT / 100 if STOP_LOSS_ENABLED and STOP_LOSS_PERCENT > 0 else None
+    profit = TAKE_PROFIT_PERCENT / 100 if TAKE_PROFIT_ENABLED and TAKE_PROFIT_PERCENT > 0 else None
+    desired = np.zeros(frame.shape, dtype=np.int8)
+    exit_price = np.full(frame.shape, np.nan)
+    for index in range(frame.shape[1]):
+        _walk_trades(
+            [prices[:, index] for prices in (frame.open, frame.high, frame.low, frame.close)],
+            {name: values[:, index] for name, values in events.items()},
+            loss,
+            profit,
+            desired[:, index],
+            exit_price[:, index],
+        )
+    return desired, exit_price
+
+
+def _walk_trades(prices, events, loss, profit, desired, exit_price) -> None:
+    """
+    Fills one symbol's ``desired``/``exit_price`` columns trade by trade, in the run view's
+    order: exits before entries on a bar (so a position can flip on the bar that closes it),
+    new entries only when flat, and the stop winning when both levels fall inside one bar.
+    """
+    open_, high, low, close = prices
+    bars = close.shape[0]
+    entries = np.flatnonzero(events["enter_long"] | events["enter_short"])
+    signal_exits = {1: np.flatnonzero(events["exit_long"]), -1: np.flatnonzero(events["exit_short"])}
+    start = 0
+    while True:
+        position = np.searchsorted(entries, start)
+        if position == entries.size:
+            return
+        entry = int(entries[position])
+        side = 1 if events["enter_long"][entry] else -1
+        exits = signal_exits[side]
+        following = np.searchsorted(exits, entry, side="right")
+        exit_bar = int(exits[following]) if following < exits.size else bars
+
+        held = slice(entry + 1, min(exit_bar + 1, bars))
+        stop = close[entry] * (1 - side * loss) if loss is not None else None
+        take = close[entry] * (1 + side * profit) if profit is not None else None
+        stop_bar = _first_touch(open_[held], low[held] if side > 0 else high[held], stop, side > 0, entry + 1)
+        take_bar = _first_touch(open_[held], high[held] if side > 0 else low[held], take, side < 0, entry + 1)
+        if stop_bar is not None and (take_bar is None or stop_bar <= take_bar):
+            exit_bar = stop_bar
+            exit_price[exit_bar] = stop
+        elif take_bar is not None:
+            exit_bar = take_bar
+            exit_price[exit_bar] = take
+
+        desired[entry:exit_bar] = side
+        if exit_bar >= bars:
+            return
+        start = exit_bar
+
+
+def _first_touch(opens: np.ndarray, extremes: np.ndarray, level: Optional[float], falling: bool, offset: int):
+    """Index (``offset`` + position) of the first bar whose open or extreme reaches ``level`` from above/below."""
+    if level is None or not extremes.size:
+        return None
+    if falling:
+        hits = (extremes <= level) | (opens <= level)
+    else:
+        hits = (extremes >= level) | (opens >= level)
+    first = int(np.argmax(hits))
+    return offset + first if hits[first] else None
+
+
+def bar_returns(close: np.ndarray, exit_price: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Simple return of every column from the previous bar (0 where either close is missing).
+    Bars with an ``exit_price`` return to that price instead of the close.
+    """
+    filled = forward_fill(close)
+    returns = np.zeros_like(filled)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = filled[1:] / filled[:-1] - 1.0
+        if exit_price is not None:
+            levels = ~np.isnan(exit_price[1:])
+            returns[1:][levels] = exit_price[1:][levels] / filled[:-1][levels] - 1.0
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+def run_portfolio_backtest(frame: PortfolioFrame, limits: Optional[RiskLimits] = None) -> PortfolioResult:
+    """Evaluates Strategy 2 column-wise, then allocates capital across symbols in one pass."""
+    limits = limits or RiskLimits()
+    desired, exit_price = strategy_positions(frame)
+    returns = bar_returns(frame.close, exit_price)
+    weights, equity, halted = apply_portfolio_limits(
+        desired, returns, frame.timestamps // SECONDS_PER_DAY, limits
+    )
+    logger.debug("Portfolio backtest over %s bars x %s symbols", *frame.shape)
+    return PortfolioResult(frame=frame, desired=desired, weights=weights, equity=equity, halted=halted)
@@ -0,0 +1,210 @@
+"""
+Query budgets per request and N+1 detection.
+
+``capture_queries()`` wraps the database connection and records every statement's SQL and
+duration in a ``QueryLog``. ``QueryBudgetMiddleware`` captures each request this way.
+It logs a warning when the request runs more queries than its budget, or when the same SQL
+(different parameters, the N+1 signature) repeats ``QUERY_REPEAT_THRESHOLD`` times. The
+budget is the view's ``query_budget`` attribute, or ``QUERY_BUDGET_DEFAULT`` when the view
+has none. Totals per endpoint (the URL name) are kept in memory and appended to
+``/api/analytics/metrics/``.
+
+Tests pin query counts with ``QueryBudgetAssertions.assertQueries``. It checks the exact
+count and, unlike ``assertNumQueries``, also fails on repeated statements.
+
+The middleware is async-capable, so under ASGI an async view runs without a thread. Database
+connections are per thread, and a request's sync code (sync views, ``sync_to_async`` calls) runs
+in its thread-sensitive thread rather than on the event loop. ``sync_thread_execute_wrapper``
+therefore installs the capture from that thread. Queries made in any other thread or process
+(e.g. the strategy-run worker pool) are not counted.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+REPEAT_REPORT_LIMIT = 3  # statements shown in logs and assertion messages
+
+
+@dataclass
+class QueryLog:
+    queries: List[Tuple[str, float]] = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeats(self) -> Dict[str, int]:
+        """SQL executed more than once, with its execution count."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    @property
+    def duplicates(self) -> int:
+        """Executions beyond the first of every repeated statement."""
+        return sum(count - 1 for count in self.repeats().values())
+
+    def summary(self) -> str:
+        lines = [f"{self.count} queries in {self.seconds * 1000:.1f}ms"]
+        worst = sorted(self.repeats().items(), key=lambda item: -item[1])[:REPEAT_REPORT_LIMIT]
+        lines.extend(f"  {count}x {sql[:200]}" for sql, count in worst)
+        return "\n".join(lines)
+
+
+@contextmanager
+def capture_queries(using: str = "default") -> Iterator[QueryLog]:
+    log = QueryLog()
+    with connections[using].execute_wrapper(log):
+        yield log
+
+
+@asynccontextmanager
+async def sync_thread_execute_wrapper(wrapper: Callable, using: str = "default") -> AsyncIterator[None]:
+    """``execute_wrapper`` for async requests, installed on the connection of the request's sync thread."""
+    stack = ExitStack()
+    await sync_to_async(lambda: stack.enter_context(connections[using].execute_wrapper(wrapper)))()
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    queries: int = 0
+    max_queries: int = 0
+    seconds: float = 0.0
+    duplicates: int = 0
+    over_budget: int = 0
+
+
+_stats: Dict[str, EndpointStats] = {}
+_stats_lock = threading.Lock()
+
+
+def record_request(endpoint: str, log: QueryLog, budget: int) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, EndpointStats())
+        stats.requests += 1
+        stats.queries += log.count
+        stats.max_queries = max(stats.max_queries, log.count)
+        stats.seconds += log.seconds
+        stats.duplicates += log.duplicates
+        stats.over_budget += log.count > budget
+
+
+def endpoint_stats() -> Dict[str, EndpointStats]:
+    with _stats_lock:
+        return {endpoint: EndpointStats(**vars(stats)) for endpoint, stats in _stats.items()}
+
+
+def reset_endpoint_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+# (attribute, metric name, type, help)
+PROMETHEUS_METRICS = (
+    ("requests", "endpoint_requests_total", "counter", "Requests served."),
+    ("queries", "endpoint_db_queries_total", "counter", "SQL queries executed."),
+    ("max_queries", "endpoint_db_queries_max", "gauge", "Most queries run by a single request."),
+    ("seconds", "endpoint_db_seconds_total", "counter", "Time spent in SQL."),
+    ("duplicates", "endpoint_db_duplicate_queries_total", "counter", "Repeated executions of identical SQL."),
+    ("over_budget", "endpoint_over_query_budget_total", "counter", "Requests that exceeded their query budget."),
+)
+
+
+def prometheus_text() -> str:
+    stats = sorted(endpoint_stats().items())
+    lines = []
+    for attribute, name, kind, description in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {description} Per endpoint, since process start.")
+        lines.append(f"# TYPE {name} {kind}")
+        for endpoint, values in stats:
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {getattr(values, attribute):g}')
+    return "\n".join(lines) + "\n"
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.default_budget = getattr(settings, "QUERY_BUDGET_DEFAULT", 20)
+        self.repeat_threshold = getattr(settings, "QUERY_REPEAT_THRESHOLD", 10)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with capture_queries() as log:
+            response = self.get_response(request)
+        self._report(request, log)
+        return response
+
+    async def __acall__(self, request):
+        log = QueryLog()
+        async with sync_thread_execute_wrapper(log):
+            response = await self.get_response(request)
+        self._report(request, log)
+        return response
+
+    def _report(self, request, log: QueryLog) -> None:
+        match = getattr(request, "resolver_match", None)
+        endpoint = (match.view_name if match else None) or "unresolved"
+        budget = self._budget(match)
+        record_request(endpoint, log, budget)
+        if log.count > budget:
+            logger.warning(
+                "Query budget exceeded on %s %s (%s, budget %s): %s",
+                request.method, request.path, endpoint, budget, log.summary(),
+            )
+        worst = max(log.repeats().values(), default=0)
+        if worst >= self.repeat_threshold:
+            logger.warning("Possible N+1 on %s %s (%s): %s", request.method, request.path, endpoint, log.summary())
+
+    def _budget(self, match) -> int:
+        if match is None:
+            return self.default_budget
+        view = getattr(match.func, "view_class", None) or getattr(match.func, "cls", None)
+        budget = getattr(view, "query_budget", None)
+        return self.default_budget if budget is None else budget
+
+
+class QueryBudgetAssertions:
+    """TestCase mixin: ``with self.assertQueries(2): ...`` pins the count and forbids repeats."""
+
+    @contextmanager
+    def assertQueries(self, count: int, max_repeats: int = 1):
+        with capture_queries() as log:
+            yield log
+        self.assertEqual(log.count, count, log.summary())
+        worst = max(log.repeats().values(), default=1)
+        self.assertLessEqual(worst, max_repeats, f"Repeated SQL (N+1?): {log.summary()}")
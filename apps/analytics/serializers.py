@@ -0,0 +1,41 @@
+from rest_framework import serializers
+
+from .models import BacktestRun, Trade
+
+
+class TradeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Trade
+        fields = [
+            "id",
+            "direction",
+            "entry_time",
+            "entry_price",
+            "exit_time",
+            "exit_price",
+            "exit_reason",
+            "return_pct",
+        ]
+        read_only_fields = fields
+
+
+class BacktestRunSerializer(serializers.ModelSerializer):
+    symbol = serializers.CharField(source="symbol.code", read_only=True)
+
+    class Meta:
+        model = BacktestRun
+        fields = [
+            "id",
+            "symbol",
+            "strategy",
+            "strategy_key",
+            "timeframe",
+            "start_at",
+            "end_at",
+            "starting_capital",
+            "params",
+            "metrics",
+            "trade_count",
+            "created_at",
+        ]
+        read_only_fields = fields
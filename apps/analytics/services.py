@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from django.db import transaction
+
+from .decimation import LTTB, decimate
+from .metrics import TradeArrays, bar_equity_curve, compute_metrics, equity_curve, max_drawdown, trade_returns
+from .models import BacktestRun, EquityCurve, Trade
+
+logger = logging.getLogger(__name__)
+
+TRADE_BATCH_SIZE = 5000
+# Decimated equity previews stored with every run (points per series).
+PRECOMPUTED_RESOLUTIONS = (500, 1000, 2000)
+
+
+@dataclass
+class TradeRecord:
+    direction: str
+    entry_time: datetime
+    entry_price: float
+    exit_time: Optional[datetime] = None
+    exit_price: Optional[float] = None
+    exit_reason: str = ""
+
+    @property
+    def return_pct(self) -> Optional[float]:
+        if self.exit_price is None or not self.entry_price:
+            return None
+        sign = 1.0 if self.direction == Trade.Direction.LONG else -1.0
+        return sign * (self.exit_price - self.entry_price) / self.entry_price * 100
+
+
+def pair_entries(entries: Iterable[Dict[str, Any]]) -> List[TradeRecord]:
+    """
+    Turns the entry/exit markers produced by the strategy evaluators into round trips.
+    A trade left open at the end of the range is kept with no exit.
+    """
+
+    trades: List[TradeRecord] = []
+    open_trades: Dict[str, TradeRecord] = {}
+    for entry in entries:
+        direction = entry["direction"]
+        if direction in (Trade.Direction.LONG, Trade.Direction.SHORT):
+            if direction in open_trades or entry.get("price") is None:
+                continue
+            record = TradeRecord(
+                direction=direction,
+                entry_time=entry["timestamp"],
+                entry_price=float(entry["price"]),
+            )
+            open_trades[direction] = record
+            trades.append(record)
+        elif direction.endswith("_exit"):
+            record = open_trades.pop(direction[: -len("_exit")], None)
+            if record is None or entry.get("price") is None:
+                continue
+            record.exit_time = entry["timestamp"]
+            record.exit_price = float(entry["price"])
+            record.exit_reason = entry.get("reason") or ""
+    return trades
+
+
+def bulk_write_trades(run: BacktestRun, trades: Iterable[TradeRecord], batch_size: int = TRADE_BATCH_SIZE) -> int:
+    objs = [
+        Trade(
+            run=run,
+            direction=trade.direction,
+            entry_time=trade.entry_time,
+            entry_price=Decimal(str(trade.entry_price)),
+            exit_time=trade.exit_time,
+            exit_price=Decimal(str(trade.exit_price)) if trade.exit_price is not None else None,
+            exit_reason=trade.exit_reason,
+            return_pct=trade.return_pct,
+        )
+        for trade in trades
+    ]
+    if not objs:
+        return 0
+    Trade.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
+
+
+def trade_arrays_from_records(trades: Iterable[TradeRecord]) -> TradeArrays:
+    closed = [t for t in trades if t.exit_time is not None]
+    if not closed:
+        return TradeArrays.empty()
+    return TradeArrays(
+        entry_ts=np.fromiter((t.entry_time.timestamp() for t in closed), dtype=np.int64, count=len(closed)),
+        exit_ts=np.fromiter((t.exit_time.timestamp() for t in closed), dtype=np.int64, count=len(closed)),
+        direction=np.fromiter(
+            (1.0 if t.direction == Trade.Direction.LONG else -1.0 for t in closed), dtype=float, count=len(closed)
+        ),
+        entry_price=np.fromiter((t.entry_price for t in closed), dtype=float, count=len(closed)),
+        exit_price=np.fromiter((t.exit_price for t in closed), dtype=float, count=len(closed)),
+    )
+
+
+def load_trade_arrays(run: BacktestRun) -> TradeArrays:
+    rows = list(
+        run.trades.filter(exit_time__isnull=False)
+        .order_by("exit_time")
+        .values_list("entry_time", "exit_time", "direction", "entry_price", "exit_price")
+    )
+    if not rows:
+        return TradeArrays.empty()
+    entry_time, exit_time, direction, entry_price, exit_price = zip(*rows)
+    return TradeArrays(
+        entry_ts=np.array([t.timestamp() for t in entry_time], dtype=np.int64),
+        exit_ts=np.array([t.timestamp() for t in exit_time], dtype=np.int64),
+        direction=np.where(np.array(direction) == Trade.Direction.LONG, 1.0, -1.0),
+        entry_price=np.array(entry_price, dtype=float),
+        exit_price=np.array(exit_price, dtype=float),
+    )
+
+
+def record_backtest_run(
+    *,
+    symbol,
+    strategy_key: str,
+    timeframe: str,
+    entries: Iterable[Dict[str, Any]],
+    owner=None,
+    strategy=None,
+    start_at: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+    starting_capital: float = 10000.0,
+    params: Optional[Dict[str, Any]] = None,
+    bar_timestamps: Optional[np.ndarray] = None,
+    bar_closes: Optional[np.ndarray] = None,
+) -> BacktestRun:
+    """
+    Persists a run, its trades (in batches) and the precomputed metrics.
+    When bar timestamps (epoch seconds) and closes are given, a mark-to-market
+    equity curve is stored too and used for the drawdown figure.
+    """
+
+    trades = pair_entries(entries)
+    arrays = trade_arrays_from_records(trades)
+    span_start = int(start_at.timestamp()) if start_at else None
+    span_end = int(end_at.timestamp()) if end_at else None
+    metrics = compute_metrics(arrays, starting_capital, span_start, span_end)
+    metrics["open_positions"] = sum(1 for t in trades if t.exit_time is None)
+
+    bar_equity = None
+    if bar_timestamps is not None and bar_closes is not None and len(bar_timestamps):
+        bar_equity = bar_equity_curve(bar_timestamps, bar_closes, arrays, starting_capital)
+        metrics["max_drawdown_pct"] = max_drawdown(bar_equity) * 100
+    metrics = _json_safe(metrics)
+
+    with transaction.atomic():
+        run = BacktestRun.objects.create(
+            owner=owner,
+            symbol=symbol,
+            strategy=strategy,
+            strategy_key=strategy_key,
+            timeframe=timeframe,
+            start_at=start_at,
+            end_at=end_at,
+            starting_capital=Decimal(str(starting_capital)),
+            params=params or {},
+            metrics=metrics,
+            trade_count=len(trades),
+        )
+        bulk_write_trades(run, trades)
+        if bar_equity is not None:
+            store_equity_curve(run, bar_timestamps, bar_equity)
+    logger.info("Stored backtest run %s with %s trades for %s", run.pk, len(trades), symbol.code)
+    return run
+
+
+def store_equity_curve(run: BacktestRun, timestamps: np.ndarray, values: np.ndarray) -> EquityCurve:
+    timestamps = np.ascontiguousarray(timestamps, dtype="<i8")
+    values = np.ascontiguousarray(values, dtype="<f8")
+    previews = {
+        str(points): _points(timestamps, values, decimate(timestamps, values, points, LTTB))
+        for points in PRECOMPUTED_RESOLUTIONS
+        if points < timestamps.shape[0]
+    }
+    return EquityCurve.objects.create(
+        run=run,
+        timestamps=timestamps.tobytes(),
+        values=values.tobytes(),
+        point_count=int(timestamps.shape[0]),
+        previews=previews,
+    )
+
+
+def equity_curve_points(run: BacktestRun, max_points: Optional[int] = None, method: str = LTTB) -> Dict[str, Any]:
+    """
+    Equity series for a run, decimated to ``max_points`` when requested.
+    Uses the stored bar-level curve (and its cached previews) when available,
+    falling back to the trade-by-trade curve otherwise.
+    """
+
+    stored = EquityCurve.objects.filter(run=run).first()
+    if stored is not None:
+        resolution = "bar"
+        if max_points and method == LTTB and str(max_points) in stored.previews:
+            return {"resolution": resolution, "point_count": stored.point_count, "points": stored.previews[str(max_points)]}
+        timestamps, values = stored.as_arrays()
+    else:
+        resolution = "trade"
+        arrays = load_trade_arrays(run)
+        values = equity_curve(trade_returns(arrays), float(run.starting_capital))
+        if run.start_at is not None:
+            first_ts = int(run.start_at.timestamp())
+        elif len(arrays):
+            first_ts = int(arrays.entry_ts[0])
+        else:
+            first_ts = int(run.created_at.timestamp())
+        timestamps = np.concatenate([[first_ts], arrays.exit_ts]).astype(np.int64)
+
+    if max_points:
+        indices = decimate(timestamps, values, max_points, method)
+    else:
+        indices = np.arange(timestamps.shape[0])
+    return {
+        "resolution": resolution,
+        "point_count": int(timestamps.shape[0]),
+        "points": _points(timestamps, values, indices),
+    }
+
+
+def _points(timestamps: np.ndarray, values: np.ndarray, indices: np.ndarray) -> List[List[float]]:
+    return [[int(ts), float(value)] for ts, value in zip(timestamps[indices], values[indices])]
+
+
+def _json_safe(values: Dict[str, Any]) -> Dict[str, Any]:
+    cleaned: Dict[str, Any] = {}
+    for key, value in values.items():
+        if isinstance(value, float) and not np.isfinite(value):
+            value = None
+        cleaned[key] = value
+    return cleaned
@@ -1,7 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.handlers.base import BaseHandler
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from apps.datafeeds.models import Candle, Symbol
+from apps.datafeeds.services import store_candles
+from apps.datafeeds.synthetic import generate_frames, to_payloads
+from apps.risk.engine import RiskLimits
+from apps.strategies import async_run
+from apps.strategies.views import HMASMAStrategyRunView
+from benchmarks.suite import Case, compare, run_cases
+
+from .decimation import downsample_ohlcv, lttb_indices, minmax_indices
+from .metrics import TradeArrays, bar_equity_curve, compute_metrics, equity_curve, exposure, max_drawdown
+from .models import BacktestRun, EquityCurve, Trade
+from .portfolio import (
+    align_frames,
+    bar_returns,
+    load_portfolio,
+    portfolio_from_frames,
+    run_portfolio_backtest,
+    strategy_positions,
+    strategy_spec,
+)
+from .services import PRECOMPUTED_RESOLUTIONS, pair_entries, record_backtest_run
+from .querybudget import capture_queries, endpoint_stats, reset_endpoint_stats
+from .timing import RollingHistograms, histograms, prometheus_text, span
+
 
 class AnalyticsAPITests(APITestCase):
     def test_equity_curve(self):
@@ -16,3 +49,424 @@ class AnalyticsAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
         self.assertIn("total_return_pct", data)
+
+
+class BacktestRunAPITests(APITestCase):
+    def setUp(self):
+        self.symbol = Symbol.objects.create(code="BTCUSDT", base_asset="BTC", quote_asset="USDT")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        entries = [
+            {"timestamp": start, "direction": "long", "price": 100.0},
+            {"timestamp": start + timedelta(hours=1), "direction": "long_exit", "price": 110.0},
+            {"timestamp": start + timedelta(hours=2), "direction": "short", "price": 110.0},
+            {"timestamp": start + timedelta(hours=3), "direction": "short_exit", "price": 121.0, "reason": "stop_loss"},
+            {"timestamp": start + timedelta(hours=4), "direction": "long", "price": 120.0},
+        ]
+        self.run = record_backtest_run(
+            symbol=self.symbol,
+            strategy_key="1",
+            timeframe="5m",
+            entries=entries,
+            start_at=start,
+            end_at=start + timedelta(hours=5),
+        )
+
+    def test_record_backtest_run_persists_trades_and_metrics(self):
+        self.assertEqual(self.run.trade_count, 3)
+        self.assertEqual(Trade.objects.filter(run=self.run, exit_time__isnull=True).count(), 1)
+        self.assertEqual(self.run.metrics["trade_count"], 2)
+        self.assertEqual(self.run.metrics["open_positions"], 1)
+        self.assertAlmostEqual(self.run.metrics["total_return_pct"], (1.1 * 0.9 - 1) * 100)
+        self.assertAlmostEqual(self.run.metrics["win_rate_pct"], 50.0)
+        self.assertAlmostEqual(self.run.metrics["exposure_pct"], 40.0)
+
+    def test_equity_curve_served_from_run(self):
+        response = self.client.get(reverse("equity-curve"), {"run": self.run.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        curve = [point["equity"] for point in response.json()["equity_curve"]]
+        np.testing.assert_allclose(curve, [10000.0, 11000.0, 9900.0])
+
+    def test_summary_uses_precomputed_metrics(self):
+        response = self.client.get(reverse("performance-summary"))
+        data = response.json()
+        self.assertEqual(data["run"], self.run.pk)
+        self.assertAlmostEqual(data["max_drawdown_pct"], 10.0)
+
+    def test_private_runs_hidden_from_anonymous_users(self):
+        BacktestRun.objects.filter(pk=self.run.pk).update(owner=self._make_user())
+        response = self.client.get(reverse("equity-curve"), {"run": self.run.pk})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def _make_user(self):
+        from django.contrib.auth import get_user_model
+
+        return get_user_model().objects.create_user(username="analyst", password="secret123")
+
+
+class EquityCurveDecimationAPITests(APITestCase):
+    def setUp(self):
+        symbol = Symbol.objects.create(code="ETHUSDT", base_asset="ETH", quote_asset="USDT")
+        n = 5000
+        bar_ts = 1_704_067_200 + np.arange(n, dtype=np.int64) * 300
+        closes = 100 + np.cumsum(np.random.default_rng(3).normal(0, 0.2, size=n))
+        start = datetime.fromtimestamp(int(bar_ts[10]), tz=timezone.utc)
+        end = datetime.fromtimestamp(int(bar_ts[4000]), tz=timezone.utc)
+        self.run = record_backtest_run(
+            symbol=symbol,
+            strategy_key="2",
+            timeframe="5m",
+            entries=[
+                {"timestamp": start, "direction": "long", "price": float(closes[10])},
+                {"timestamp": end, "direction": "long_exit", "price": float(closes[4000])},
+            ],
+            bar_timestamps=bar_ts,
+            bar_closes=closes,
+        )
+
+    def test_bar_curve_stored_with_previews(self):
+        stored = EquityCurve.objects.get(run=self.run)
+        self.assertEqual(stored.point_count, 5000)
+        self.assertEqual(sorted(stored.previews, key=int), [str(p) for p in PRECOMPUTED_RESOLUTIONS])
+        _, values = stored.as_arrays()
+        self.assertAlmostEqual(values[-1], self.run.metrics["final_equity"], places=6)
+
+    def test_max_points_serves_decimated_series(self):
+        url = reverse("equity-curve")
+        cached = self.client.get(url, {"run": self.run.pk, "max_points": 500}).json()
+        self.assertEqual(cached["resolution"], "bar")
+        self.assertEqual(cached["point_count"], 5000)
+        self.assertEqual(len(cached["equity_curve"]), 500)
+
+        envelope = self.client.get(url, {"run": self.run.pk, "max_points": 300, "method": "minmax"}).json()
+        self.assertLessEqual(len(envelope["equity_curve"]), 300)
+
+        full = self.client.get(url, {"run": self.run.pk}).json()
+        self.assertEqual(len(full["equity_curve"]), 5000)
+
+    def test_invalid_max_points_rejected(self):
+        response = self.client.get(reverse("equity-curve"), {"max_points": "many"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DecimationTests(SimpleTestCase):
+    def test_lttb_keeps_endpoints_and_spike(self):
+        x = np.arange(10_000, dtype=float)
+        y = np.zeros(10_000)
+        y[4321] = 50.0
+        idx = lttb_indices(x, y, 200)
+        self.assertEqual(len(idx), 200)
+        self.assertEqual(idx[0], 0)
+        self.assertEqual(idx[-1], 9999)
+        self.assertIn(4321, idx)
+        self.assertTrue(np.all(np.diff(idx) > 0))
+
+    def test_minmax_envelope_contains_extremes(self):
+        y = np.sin(np.linspace(0, 20, 1001))
+        idx = minmax_indices(y, 100)
+        self.assertLessEqual(len(idx), 100)
+        self.assertIn(int(np.argmax(y)), idx)
+        self.assertIn(int(np.argmin(y)), idx)
+
+    def test_downsample_ohlcv_preserves_range(self):
+        n = 1000
+        ts = np.arange(n)
+        close = np.linspace(1, 2, n)
+        out = downsample_ohlcv(ts, close, close + 1, close - 1, close, np.ones(n), 10)
+        self.assertEqual(len(out["timestamp"]), 10)
+        self.assertEqual(out["high"].max(), (close + 1).max())
+        self.assertEqual(out["low"].min(), (close - 1).min())
+        self.assertEqual(out["volume"].sum(), n)
+        self.assertEqual(out["close"][-1], close[-1])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_bar_equity_curve_matches_trade_compounding(self):
+        bar_ts = np.arange(10, dtype=np.int64) * 60
+        closes = np.array([100, 101, 103, 102, 104, 108, 107, 105, 106, 110], dtype=float)
+        arrays = TradeArrays(
+            entry_ts=np.array([60, 300, 480], dtype=np.int64),
+            exit_ts=np.array([180, 420, 480], dtype=np.int64),
+            direction=np.array([1.0, -1.0, 1.0]),
+            entry_price=np.array([101.0, 108.0, 106.0]),
+            exit_price=np.array([102.0, 105.0, 107.0]),
+        )
+        curve = bar_equity_curve(bar_ts, closes, arrays, 1000.0)
+        expected_final = equity_curve(
+            arrays.direction * (arrays.exit_price - arrays.entry_price) / arrays.entry_price, 1000.0
+        )[-1]
+        self.assertAlmostEqual(curve[-1], expected_final)
+        self.assertAlmostEqual(curve[2], 1000.0 * 103 / 101)
+        self.assertEqual(curve[1], 1000.0)
+
+    def test_pair_entries_skips_orphan_exits(self):
+        ts = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        trades = pair_entries(
+            [
+                {"timestamp": ts, "direction": "short_exit", "price": 1.0},
+                {"timestamp": ts, "direction": "long", "price": 2.0},
+                {"timestamp": ts, "direction": "long", "price": 3.0},
+                {"timestamp": ts, "direction": "long_exit", "price": 4.0},
+            ]
+        )
+        self.assertEqual(len(trades), 1)
+        self.assertEqual(trades[0].entry_price, 2.0)
+        self.assertEqual(trades[0].return_pct, 100.0)
+
+    def test_max_drawdown(self):
+        self.assertAlmostEqual(max_drawdown(np.array([100.0, 120.0, 90.0, 130.0, 117.0])), 0.25)
+
+    def test_exposure_merges_overlapping_trades(self):
+        entry = np.array([0, 5, 20], dtype=np.int64)
+        exit_ = np.array([10, 15, 30], dtype=np.int64)
+        self.assertAlmostEqual(exposure(entry, exit_, 0, 100), 0.25)
+
+    def test_compute_metrics_vectorized_matches_loop(self):
+        rng = np.random.default_rng(7)
+        n = 10_000
+        entry_ts = np.arange(n, dtype=np.int64) * 3600
+        arrays = TradeArrays(
+            entry_ts=entry_ts,
+            exit_ts=entry_ts + 1800,
+            direction=rng.choice([-1.0, 1.0], size=n),
+            entry_price=np.full(n, 100.0),
+            exit_price=100.0 + rng.normal(0, 0.5, size=n),
+        )
+        metrics = compute_metrics(arrays, 1000.0)
+
+        equity = 1000.0
+        for d, ep, xp in zip(arrays.direction, arrays.entry_price, arrays.exit_price):
+            equity *= 1 + d * (xp - ep) / ep
+        self.assertAlmostEqual(metrics["final_equity"], equity, places=6)
+        self.assertEqual(metrics["trade_count"], n)
+        self.assertAlmostEqual(metrics["exposure_pct"], 1800 / (n * 3600 - 1800) * n * 100, places=6)
+        self.assertEqual(equity_curve(np.empty(0), 5.0).tolist(), [5.0])
+
+
+class PortfolioBacktestTests(TestCase):
+    def _frame(self, symbols, days, seed=3, period=50):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        frames = {
+            f"S{index}": generate_frames(start, start + timedelta(days=days), ["5m", "1h", "4h"], seed=seed, symbol_index=index)
+            for index in range(symbols)
+        }
+        return portfolio_from_frames(frames, period)
+
+    def test_trades_match_the_run_view_on_stored_candles(self):
+        symbol = Symbol.objects.create(code="PORTUSDT", base_asset="PORT", quote_asset="USDT")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for timeframe, frame in generate_frames(start, start + timedelta(days=60), ["5m", "1h", "4h"], seed=5).items():
+            store_candles(symbol, timeframe, to_payloads(frame))
+
+        # Tight levels so stop-loss and take-profit exits both occur.
+        levels = {"STOP_LOSS_PERCENT": 1.0, "TAKE_PROFIT_ENABLED": True, "TAKE_PROFIT_PERCENT": 1.5}
+        with mock.patch.multiple("apps.strategies.views", **levels), mock.patch.multiple(
+            "apps.analytics.portfolio", **levels
+        ):
+            _, context = HMASMAStrategyRunView()._run_strategy({"symbol": "PORTUSDT", "strategy": "2", "start": start.isoformat()})
+            frame = load_portfolio([symbol], start=start)
+            desired, exit_price = strategy_positions(frame)
+
+        expected = [(entry["timestamp"], entry["direction"], round(entry["price"], 6)) for entry in context["entries"]]
+        self.assertIn("stop_loss", {entry.get("reason") for entry in context["entries"]})
+        self.assertIn("take_profit", {entry.get("reason") for entry in context["entries"]})
+
+        trades = []
+        side = desired[:, 0]
+        for row in np.flatnonzero(np.diff(side, prepend=0)):
+            timestamp = datetime.fromtimestamp(int(frame.timestamps[row]), tz=timezone.utc)
+            previous = side[row - 1] if row else 0
+            if previous:
+                price = exit_price[row, 0] if not np.isnan(exit_price[row, 0]) else frame.close[row, 0]
+                trades.append((timestamp, "long_exit" if previous > 0 else "short_exit", round(float(price), 6)))
+            if side[row]:
+                trades.append((timestamp, "long" if side[row] > 0 else "short", round(float(frame.close[row, 0]), 6)))
+        self.assertGreaterEqual(len(trades), 8)
+        self.assertEqual(trades, expected)
+
+        # A stop or take-profit bar returns to its level, not to the close.
+        returns = bar_returns(frame.close, exit_price)
+        row = int(np.flatnonzero(~np.isnan(exit_price[:, 0]))[0])
+        self.assertAlmostEqual(returns[row, 0], exit_price[row, 0] / frame.close[row - 1, 0] - 1)
+
+    def test_load_portfolio_aligns_symbols_with_one_query_each(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        btc = Symbol.objects.create(code="BTCUSDT", base_asset="BTC", quote_asset="USDT")
+        eth = Symbol.objects.create(code="ETHUSDT", base_asset="ETH", quote_asset="USDT")
+        for symbol, offsets in ((btc, (0, 1, 2)), (eth, (1, 3))):
+            for offset in offsets:
+                Candle.objects.create(
+                    symbol=symbol,
+                    timeframe="5m",
+                    timestamp=start + timedelta(minutes=5 * offset),
+                    open=1,
+                    high=1,
+                    low=1,
+                    close=100 + offset,
+                    volume=1,
+                )
+        with self.assertNumQueries(2):
+            frame = load_portfolio([btc, eth])
+        self.assertEqual(frame.symbols, ["BTCUSDT", "ETHUSDT"])
+        self.assertEqual((frame.timestamps - frame.timestamps[0]).tolist(), [0, 300, 600, 900])
+        np.testing.assert_array_equal(
+            frame.close, [[100, np.nan], [101, 101], [102, np.nan], [np.nan, 103]]
+        )
+        self.assertEqual(sorted(frame.indicators), ["hma200_1h", "hma200_4h", "sma200"])
+        self.assertTrue(np.isnan(frame.indicators["hma200_4h"]).all())
+
+    def test_allocation_respects_risk_limits_across_symbols(self):
+        frame = self._frame(40, 30)
+        limits = RiskLimits(max_concurrent_positions=3, max_position_fraction=0.2, daily_loss_fraction=0)
+        result = run_portfolio_backtest(frame, limits)
+
+        open_positions = (result.weights != 0).sum(axis=1)
+        self.assertLessEqual(open_positions.max(), 3)
+        self.assertTrue(np.all(np.abs(result.weights[result.weights != 0]) == 0.2))
+        # Allocation only follows the strategy's side.
+        held = result.weights != 0
+        self.assertTrue(np.all(np.sign(result.weights[held]) == result.desired[held]))
+        self.assertGreater(result.metrics()["entries"], 0)
+
+    def test_align_frames_handles_unsorted_union(self):
+        def merged(minutes, closes):
+            timestamps = [datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=m) for m in minutes]
+            columns = {name: closes for name in ("open", "high", "low", "close", "sma200", "hma200_1h", "hma200_4h")}
+            return pd.DataFrame({"timestamp": pd.to_datetime(timestamps, utc=True), **columns})
+
+        frame = align_frames({"A": merged([10, 0], [2.0, 1.0]), "B": merged([5], [5.0])}, strategy_spec())
+        self.assertEqual((frame.timestamps - frame.timestamps[0]).tolist(), [0, 300, 600])
+        np.testing.assert_array_equal(frame.close, [[1.0, np.nan], [np.nan, 5.0], [2.0, np.nan]])
+        np.testing.assert_array_equal(frame.indicators["sma200"], frame.close)
+
+
+class BenchmarkSuiteTests(SimpleTestCase):
+    def test_compare_flags_growth_above_threshold_and_ignores_noise(self):
+        baseline = {
+            "a@10": {"seconds": 1.0, "peak_mb": 10.0},
+            "b@10": {"seconds": 0.001, "peak_mb": 0.1},
+            "c@10": {"seconds": 1.0, "peak_mb": 10.0},
+        }
+        results = {
+            "a@10": {"seconds": 1.2, "peak_mb": 20.0},
+            "b@10": {"seconds": 0.003, "peak_mb": 0.5},  # below the noise floors
+            "new@10": {"seconds": 9.0, "peak_mb": 90.0},  # not in the baseline
+        }
+        regressions = compare(results, baseline, threshold=0.25)
+        self.assertEqual([(r.key, r.metric) for r in regressions], [("a@10", "peak_mb")])
+        self.assertAlmostEqual(regressions[0].ratio, 2.0)
+
+    def test_run_cases_skips_sizes_above_case_limit(self):
+        calls = []
+        case = Case(name="demo", setup=lambda size: (lambda: calls.append(size)), max_size=100)
+        results = run_cases([case], [10, 1000], repeat=2)
+        self.assertEqual(list(results), ["demo@10"])
+        self.assertEqual(calls, [10, 10, 10])  # two timed runs and one traced run
+        self.assertGreaterEqual(results["demo@10"]["peak_mb"], 0)
+
+
+class TimingTests(SimpleTestCase):
+    def test_rolling_histograms_drop_observations_outside_the_window(self):
+        rolling = RollingHistograms(window=60, slots=6, buckets=(0.01, 0.1))
+        rolling.observe("load", 0.005, now=0)
+        rolling.observe("load", 0.05, now=15)
+        rolling.observe("load", 5.0, now=55)
+        self.assertEqual(rolling.snapshot(now=59)["load"], [1, 1, 1, 5.055])
+        # The first two slots have left the window.
+        self.assertEqual(rolling.snapshot(now=70)["load"], [0, 0, 1, 5.0])
+        self.assertEqual(rolling.snapshot(now=200), {})
+
+
+class ServerTimingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.symbol = Symbol.objects.create(code="TIMEUSDT", base_asset="TIME", quote_asset="USDT")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        frames = generate_frames(start, start + timedelta(days=40), ["5m", "1h", "4h", "1d"], seed=2)
+        for timeframe, frame in frames.items():
+            store_candles(cls.symbol, timeframe, to_payloads(frame))
+
+    def setUp(self):
+        histograms.clear()
+
+    def _run(self, **params):
+        return self.client.get(reverse("hma-sma-run"), {"symbol": "TIMEUSDT", "limit": 200, **params})
+
+    def test_run_reports_stage_spans_in_server_timing_and_metrics(self):
+        response = self._run()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        for name in ("db", "run.load", "run.indicators", "run.merge", "run.evaluate", "run.plots", "render", "total"):
+            self.assertIn(name, names)
+        self.assertEqual(names[-1], "total")
+
+        metrics = self.client.get(reverse("analytics-metrics"))
+        self.assertTrue(metrics["Content-Type"].startswith("text/plain"))
+        text = metrics.content.decode()
+        self.assertIn('hotpath_span_seconds_count{span="run.evaluate"} 1', text)
+        self.assertIn('hotpath_span_seconds_bucket{span="run.load",le="+Inf"} 1', text)
+
+    def test_profile_report_is_staff_only(self):
+        user = get_user_model().objects.create_user("viewer", password="x")
+        self.client.force_login(user)
+        response = self._run(profile=1)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        user.is_staff = True
+        user.save()
+        response = self._run(profile=1)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn("_run_strategy", response.content.decode())
+
+    def test_async_middleware_chain_is_not_adapted(self):
+        # With DEBUG, Django logs "Asynchronous handler adapted for middleware ..." for every sync-only middleware.
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            BaseHandler().load_middleware(is_async=True)
+
+    async def test_async_run_reports_spans_and_queries(self):
+        reset_endpoint_stats()
+        with ThreadPoolExecutor(1) as pool, mock.patch.object(async_run, "get_executor", return_value=pool):
+            response = await self.async_client.get(reverse("hma-sma-run-async"), {"symbol": "TIMEUSDT", "limit": 200})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        for name in ("db", "run.load", "run.queue", "run.compute", "total"):
+            self.assertIn(name, names)
+        self.assertGreater(endpoint_stats()["hma-sma-run-async"].queries, 0)
+
+    def test_spans_outside_requests_only_feed_the_histograms(self):
+        with span("job.step"):
+            pass
+        self.assertIn('span="job.step"', prometheus_text())
+
+
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        reset_endpoint_stats()
+        self.symbol = Symbol.objects.create(code="QBUSDT", base_asset="QB", quote_asset="USDT")
+
+    def test_capture_reports_repeated_statements(self):
+        with capture_queries() as log:
+            for _ in range(3):
+                Symbol.objects.get(code="QBUSDT")
+            Symbol.objects.count()
+        self.assertEqual(log.count, 4)
+        self.assertEqual(log.duplicates, 2)
+        self.assertEqual(list(log.repeats().values()), [3])
+
+    def test_middleware_aggregates_per_endpoint_and_logs_violations(self):
+        url = reverse("datafeed-candle-list")
+        self.client.get(url, {"symbol": "QBUSDT"})
+        stats = endpoint_stats()["datafeed-candle-list"]
+        self.assertEqual((stats.requests, stats.queries, stats.over_budget), (1, 1, 0))
+
+        from apps.datafeeds.views import CandleViewSet
+
+        with mock.patch.object(CandleViewSet, "query_budget", 0), self.assertLogs(
+            "apps.analytics.querybudget", "WARNING"
+        ) as logs:
+            self.client.get(url, {"symbol": "QBUSDT"})
+        self.assertIn("Query budget exceeded", logs.output[0])
+        self.assertEqual(endpoint_stats()["datafeed-candle-list"].over_budget, 1)
+
+        text = self.client.get(reverse("analytics-metrics")).content.decode()
+        self.assertIn('endpoint_requests_total{endpoint="datafeed-candle-list"} 2', text)
+        self.assertIn('endpoint_over_query_budget_total{endpoint="datafeed-candle-list"} 1', text)
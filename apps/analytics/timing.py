@@ -0,0 +1,149 @@
+"""
+Hot-path timing spans.
+
+``span("run.load")`` times a block. Inside a request (see ``ServerTimingMiddleware``) the
+duration is collected for the response's ``Server-Timing`` header. Every span, in requests,
+tasks and commands alike, is also recorded into a per-process rolling histogram that
+``/api/analytics/metrics/`` exposes in the Prometheus text format.
+
+The histogram window is ``METRICS_WINDOW_SECONDS`` split into ``WINDOW_SLOTS`` slots. Old
+slots are dropped as time moves on, so counts describe recent traffic rather than growing
+forever. Recording a span costs two ``perf_counter`` calls plus a lock and a bisect, which
+is cheap enough to leave enabled.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+# Upper bounds in seconds (Prometheus ``le`` buckets; +Inf is implicit).
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WINDOW_SLOTS = 10
+METRIC_NAME = "hotpath_span_seconds"
+
+_collector: ContextVar[Optional["SpanCollector"]] = ContextVar("timing_span_collector", default=None)
+
+
+class SpanCollector:
+    """Span durations of one request, summed per name in first-seen order."""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] += 1
+
+    def header(self) -> str:
+        """``Server-Timing`` value, durations in milliseconds."""
+        entries = []
+        for name, seconds in self.durations.items():
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if self.counts[name] > 1:
+                entry += f';desc="{self.counts[name]}x"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+class RollingHistograms:
+    """Per-name bucket counts over the last ``window`` seconds (thread-safe)."""
+
+    def __init__(self, window: float, slots: int = WINDOW_SLOTS, buckets: Tuple[float, ...] = BUCKETS):
+        self.slot_seconds = window / slots
+        self.slots = slots
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # slot index -> name -> [bucket counts..., +Inf count, sum]
+        self._data: Dict[int, Dict[str, List[float]]] = {}
+
+    def observe(self, name: str, seconds: float, now: Optional[float] = None) -> None:
+        slot = self._slot(now)
+        with self._lock:
+            series = self._data.setdefault(slot, {})
+            values = series.get(name)
+            if values is None:
+                values = series[name] = [0.0] * (len(self.buckets) + 2)
+            values[bisect_left(self.buckets, seconds)] += 1
+            values[-1] += seconds
+            if len(self._data) > self.slots:
+                self._expire(slot)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, List[float]]:
+        """Non-cumulative bucket counts (last bucket = +Inf) and the sum, per name, within the window."""
+        slot = self._slot(now)
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            self._expire(slot)
+            for series in self._data.values():
+                for name, values in series.items():
+                    total = totals.setdefault(name, [0.0] * len(values))
+                    for index, value in enumerate(values):
+                        total[index] += value
+        return totals
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _slot(self, now: Optional[float]) -> int:
+        return int((time.monotonic() if now is None else now) // self.slot_seconds)
+
+    def _expire(self, current: int) -> None:
+        for slot in [slot for slot in self._data if slot <= current - self.slots]:
+            del self._data[slot]
+
+
+histograms = RollingHistograms(getattr(settings, "METRICS_WINDOW_SECONDS", 300.0))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def record(name: str, seconds: float) -> None:
+    histograms.observe(name, seconds)
+    collector = _collector.get()
+    if collector is not None:
+        collector.add(name, seconds)
+
+
+@contextmanager
+def collect_spans() -> Iterator[SpanCollector]:
+    """Collects the spans recorded in this context (a request) into a fresh ``SpanCollector``."""
+    collector = SpanCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def prometheus_text(now: Optional[float] = None) -> str:
+    window = histograms.slot_seconds * histograms.slots
+    lines = [
+        f"# HELP {METRIC_NAME} Duration of instrumented hot-path stages over the last {window:g}s (per process).",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for name, values in sorted(histograms.snapshot(now).items()):
+        cumulative = 0.0
+        for bound, count in zip((*histograms.buckets, float("inf")), values[:-1]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{METRIC_NAME}_bucket{{span="{name}",le="{le}"}} {cumulative:g}')
+        lines.append(f'{METRIC_NAME}_sum{{span="{name}"}} {values[-1]:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{span="{name}"}} {cumulative:g}')
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,15 @@
 from django.urls import path
+from rest_framework.routers import DefaultRouter
 
-from .views import EquityCurveView, PerformanceSummaryView
+from .views import BacktestRunViewSet, EquityCurveView, MetricsView, PerformanceSummaryView
+
+router = DefaultRouter()
+router.register(r"backtests", BacktestRunViewSet, basename="backtest-run")
 
 urlpatterns = [
     path("equity-curve/", EquityCurveView.as_view(), name="equity-curve"),
     path("summary/", PerformanceSummaryView.as_view(), name="performance-summary"),
+    path("metrics/", MetricsView.as_view(), name="analytics-metrics"),
 ]
+
+urlpatterns += router.urls
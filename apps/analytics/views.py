@@ -1,34 +1,134 @@
-from datetime import timedelta
+from datetime import datetime, timezone as dt_timezone
 
+from django.db.models import Q
+from django.http import HttpResponse
 from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .decimation import LTTB, METHODS
+from .models import BacktestRun
+from .serializers import BacktestRunSerializer
+from .services import equity_curve_points
+from . import querybudget, timing
+
+
+def visible_runs(request):
+    qs = BacktestRun.objects.select_related("symbol")
+    user = request.user
+    if user.is_authenticated and user.is_superuser:
+        return qs
+    if user.is_authenticated:
+        return qs.filter(Q(owner=user) | Q(owner__isnull=True))
+    return qs.filter(owner__isnull=True)
+
+
+def resolve_run(request):
+    """Returns the run selected by ?run=<id>, or the most recent visible run."""
+
+    qs = visible_runs(request)
+    run_param = request.query_params.get("run")
+    if run_param:
+        try:
+            return qs.get(pk=int(run_param))
+        except ValueError as exc:
+            raise ValidationError({"run": "Run must be an integer id."}) from exc
+        except BacktestRun.DoesNotExist as exc:
+            raise NotFound(f"Backtest run '{run_param}' not found.") from exc
+    return qs.first()
+
+
+class BacktestRunViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = BacktestRunSerializer
+
+    def get_queryset(self):
+        qs = visible_runs(self.request)
+        symbol_code = self.request.query_params.get("symbol")
+        strategy_key = self.request.query_params.get("strategy")
+        if symbol_code:
+            qs = qs.filter(symbol__code__iexact=symbol_code)
+        if strategy_key:
+            qs = qs.filter(strategy_key=strategy_key)
+        return qs
+
 
 class EquityCurveView(APIView):
-    """Returns a lightweight equity curve for dashboard previews."""
+    """
+    Returns the equity curve of a backtest run.
+    ``max_points`` decimates the series (``method`` = lttb | minmax).
+    """
+
+    MAX_POINTS_LIMIT = 20000
 
     def get(self, request):
-        now = timezone.now()
+        max_points = self._parse_max_points(request.query_params.get("max_points"))
+        method = request.query_params.get("method", LTTB)
+        if method not in METHODS:
+            raise ValidationError({"method": f"Unsupported method '{method}'."})
+
+        run = resolve_run(request)
+        if run is None:
+            return Response({"run": None, "equity_curve": []})
+
+        series = equity_curve_points(run, max_points, method)
         data = [
             {
-                "timestamp": (now - timedelta(hours=i)).isoformat(),
-                "equity": 10000 + i * 25,
+                "timestamp": datetime.fromtimestamp(ts, tz=dt_timezone.utc).isoformat(),
+                "equity": value,
             }
-            for i in range(24, -1, -1)
+            for ts, value in series["points"]
         ]
-        return Response({"equity_curve": data})
+        return Response(
+            {
+                "run": run.pk,
+                "resolution": series["resolution"],
+                "point_count": series["point_count"],
+                "equity_curve": data,
+            }
+        )
+
+    def _parse_max_points(self, value):
+        if not value:
+            return None
+        try:
+            max_points = int(value)
+        except ValueError as exc:
+            raise ValidationError({"max_points": "max_points must be an integer."}) from exc
+        if max_points < 3 or max_points > self.MAX_POINTS_LIMIT:
+            raise ValidationError({"max_points": f"max_points must be between 3 and {self.MAX_POINTS_LIMIT}."})
+        return max_points
 
 
 class PerformanceSummaryView(APIView):
-    """Aggregate KPIs for the monitored bots."""
+    """Aggregate KPIs precomputed when a backtest run is stored."""
 
     def get(self, request):
-        summary = {
-            "total_return_pct": 12.5,
-            "max_drawdown_pct": 4.2,
-            "sharpe_ratio": 1.8,
-            "open_positions": 3,
-            "closed_positions_today": 12,
-        }
+        run = resolve_run(request)
+        if run is None:
+            return Response(
+                {
+                    "run": None,
+                    "total_return_pct": 0.0,
+                    "max_drawdown_pct": 0.0,
+                    "sharpe_ratio": None,
+                    "open_positions": 0,
+                    "closed_positions_today": 0,
+                }
+            )
+
+        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        summary = dict(run.metrics)
+        summary["run"] = run.pk
+        summary.setdefault("open_positions", 0)
+        summary["closed_positions_today"] = run.trades.filter(exit_time__gte=today_start).count()
         return Response(summary)
+
+
+class MetricsView(APIView):
+    """Hot-path span histograms and per-endpoint query totals of this process, in the Prometheus text format."""
+
+    def get(self, request, *args, **kwargs):
+        body = timing.prometheus_text() + querybudget.prometheus_text()
+        return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,40 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import Candle
+from .services import market_group_name
+
+
+class MarketDataConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes candle deltas for one symbol/timeframe: ``{"type": "candle", "closed", "candle",
+    "indicators", "signals"}`` whenever ingestion stores a new or updated bar.
+    """
+
+    async def connect(self):
+        kwargs = self.scope["url_route"]["kwargs"]
+        self.symbol = kwargs["symbol"].upper()
+        self.timeframe = kwargs["timeframe"]
+        if self.timeframe not in Candle.Timeframe.values:
+            await self.close(code=4400)
+            return
+        self.group_name = market_group_name(self.symbol, self.timeframe)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def candle_closed(self, event):
+        await self._send_delta(event, closed=True)
+
+    async def candle_updated(self, event):
+        await self._send_delta(event, closed=False)
+
+    async def _send_delta(self, event, closed: bool):
+        delta = {"type": "candle", "closed": closed, "candle": event["candle"]}
+        if event.get("indicators"):
+            delta["indicators"] = event["indicators"]
+        if event.get("signals"):
+            delta["signals"] = event["signals"]
+        await self.send_json(delta)
@@ -9,6 +9,7 @@ import numpy as np
 import pandas as pd
 from django.utils import timezone
 
+from apps.analytics.timing import span
 from apps.datafeeds.models import Candle, Divergence, Symbol
 from apps.strategies.indicators import macd, rsi
 
@@ -37,18 +38,21 @@ class DivergenceDetector:
             List of detected divergences
         """
         # Get candle data
-        candles = self._get_candle_data(symbol, timeframe)
+        with span("divergences.load"):
+            candles = self._get_candle_data(symbol, timeframe)
         if len(candles) < self.lookback_periods:
             return []
         
         divergences = []
         
         # Detect MACD divergences
-        macd_divergences = self._detect_macd_divergences(candles, symbol, timeframe)
+        with span("divergences.macd"):
+            macd_divergences = self._detect_macd_divergences(candles, symbol, timeframe)
         divergences.extend(macd_divergences)
         
         # Detect RSI divergences
-        rsi_divergences = self._detect_rsi_divergences(candles, symbol, timeframe)
+        with span("divergences.rsi"):
+            rsi_divergences = self._detect_rsi_divergences(candles, symbol, timeframe)
         divergences.extend(rsi_divergences)
         
         return divergences
@@ -0,0 +1,250 @@
+"""
+Bulk exports of candles, divergences and backtest trades as streamed CSV or Parquet.
+
+Rows are read with ``values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)``, which uses
+a server-side cursor on PostgreSQL. Each chunk is encoded and yielded before the next one
+is fetched, so memory stays constant whatever the range. CSV chunks are plain
+``csv.writer`` output. Parquet output writes one row group per chunk through
+``pyarrow.parquet.ParquetWriter`` into a byte sink that is drained after every group, so a
+Parquet export streams too (pyarrow is optional). The Parquet schema is fixed up front from
+the model fields behind each column, not inferred from the first chunk: a nullable column
+that happens to be all ``None`` there would otherwise be typed ``null`` and reject later
+chunks mid-download.
+
+The endpoint (``/api/datafeeds/export/``) and ``manage.py export_data`` share ``export()``.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from django.db.models import QuerySet
+from django.db.models.constants import LOOKUP_SEP
+
+from .models import Candle, Divergence
+
+EXPORT_CHUNK_SIZE = 20_000
+FORMATS = ("csv", "parquet")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    columns: Tuple[str, ...]  # header names
+    fields: Tuple[str, ...]  # values_list lookups, same order
+    time_field: str
+    symbol_field: str
+    ordering: Tuple[str, ...]  # follows an index, so the cursor streams without a sort
+    queryset: Callable[[], QuerySet]
+    timeframe_field: Optional[str] = None
+
+    def field_types(self) -> Tuple[str, ...]:
+        """Internal type (``get_internal_type()``) of the model field behind each column."""
+        root, types = self.queryset().model, []
+        for lookup in self.fields:
+            model = root
+            for name in lookup.split(LOOKUP_SEP):
+                field = model._meta.get_field(name)
+                if field.is_relation:
+                    model = field.related_model
+            if field.is_relation:  # ``run_id``: the key's own type
+                field = field.target_field
+            types.append(field.get_internal_type())
+        return tuple(types)
+
+
+def _trades() -> QuerySet:
+    from apps.analytics.models import Trade
+
+    return Trade.objects.all()
+
+
+DATASETS: Dict[str, Dataset] = {
+    dataset.name: dataset
+    for dataset in (
+        Dataset(
+            name="candles",
+            columns=("symbol", "timeframe", "timestamp", "open", "high", "low", "close", "volume"),
+            fields=("symbol__code", "timeframe", "timestamp", "open", "high", "low", "close", "volume"),
+            time_field="timestamp",
+            symbol_field="symbol__code",
+            timeframe_field="timeframe",
+            ordering=("symbol_id", "timeframe", "timestamp"),
+            queryset=Candle.objects.all,
+        ),
+        Dataset(
+            name="divergences",
+            columns=(
+                "symbol", "timeframe", "divergence_type", "start_timestamp", "start_price", "start_indicator_value",
+                "end_timestamp", "end_price", "end_indicator_value",
+            ),
+            fields=(
+                "symbol__code", "timeframe", "divergence_type", "start_timestamp", "start_price", "start_indicator_value",
+                "end_timestamp", "end_price", "end_indicator_value",
+            ),
+            time_field="start_timestamp",
+            symbol_field="symbol__code",
+            timeframe_field="timeframe",
+            ordering=("symbol_id", "timeframe", "start_timestamp", "id"),
+            queryset=Divergence.objects.all,
+        ),
+        Dataset(
+            name="trades",
+            columns=(
+                "run_id", "symbol", "strategy_key", "timeframe", "direction", "entry_time", "entry_price",
+                "exit_time", "exit_price", "exit_reason", "return_pct",
+            ),
+            fields=(
+                "run_id", "run__symbol__code", "run__strategy_key", "run__timeframe", "direction", "entry_time",
+                "entry_price", "exit_time", "exit_price", "exit_reason", "return_pct",
+            ),
+            time_field="entry_time",
+            symbol_field="run__symbol__code",
+            timeframe_field="run__timeframe",
+            ordering=("run_id", "entry_time", "id"),
+            queryset=_trades,
+        ),
+    )
+}
+
+
+def export_rows(
+    dataset: Dataset,
+    symbols: Sequence[str] = (),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timeframe: Optional[str] = None,
+    queryset: Optional[QuerySet] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[tuple]:
+    """Rows of ``dataset`` as tuples in ``dataset.columns`` order, read in chunks."""
+    qs = dataset.queryset() if queryset is None else queryset
+    if symbols:
+        qs = qs.filter(**{f"{dataset.symbol_field}__in": [code.upper() for code in symbols]})
+    if start is not None:
+        qs = qs.filter(**{f"{dataset.time_field}__gte": start})
+    if end is not None:
+        qs = qs.filter(**{f"{dataset.time_field}__lte": end})
+    if timeframe and dataset.timeframe_field:
+        qs = qs.filter(**{dataset.timeframe_field: timeframe})
+    qs = qs.order_by(*dataset.ordering)
+    return qs.values_list(*dataset.fields).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(columns: Sequence[str], rows: Iterable[tuple], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only stream that hands out what was written since the last ``drain``."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def stream_parquet(
+    columns: Sequence[str],
+    rows: Iterable[tuple],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    field_types: Optional[Sequence[str]] = None,
+) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = field_types or ("CharField",) * len(columns)
+    schema = pa.schema([(name, _arrow_type(field_type)) for name, field_type in zip(columns, types)])
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for chunk in _chunks(rows, chunk_size):
+        arrays = [_arrow_column(values, field.type) for values, field in zip(zip(*chunk), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _arrow_type(field_type: str):
+    import pyarrow as pa
+
+    if field_type == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    # Prices and volumes are Decimals; research tools expect float columns.
+    if field_type in ("DecimalField", "FloatField"):
+        return pa.float64()
+    if field_type.endswith("IntegerField") or field_type.endswith("AutoField"):
+        return pa.int64()
+    if field_type == "BooleanField":
+        return pa.bool_()
+    return pa.string()
+
+
+def _arrow_column(values: Sequence, arrow_type):
+    import pyarrow as pa
+
+    if any(isinstance(value, Decimal) for value in values):
+        values = [None if value is None else float(value) for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+def export(
+    dataset_name: str,
+    file_format: str = "csv",
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    **filters,
+) -> Iterator[bytes]:
+    """Encoded export of ``dataset_name`` (see ``export_rows`` for ``filters``)."""
+    if dataset_name not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset_name}'. Choose from: {', '.join(DATASETS)}.")
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format '{file_format}'. Choose from: {', '.join(FORMATS)}.")
+    dataset = DATASETS[dataset_name]
+    rows = export_rows(dataset, chunk_size=chunk_size, **filters)
+    if file_format == "parquet":
+        return stream_parquet(dataset.columns, rows, chunk_size, dataset.field_types())
+    return stream_csv(dataset.columns, rows, chunk_size)
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
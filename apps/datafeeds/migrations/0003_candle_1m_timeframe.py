@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafeeds', '0002_divergence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candle',
+            name='timeframe',
+            field=models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('30m', '30 Minutes'), ('1h', '1 Hour'), ('4h', '4 Hours'), ('1d', '1 Day')], max_length=5),
+        ),
+        migrations.AlterField(
+            model_name='divergence',
+            name='timeframe',
+            field=models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('30m', '30 Minutes'), ('1h', '1 Hour'), ('4h', '4 Hours'), ('1d', '1 Day')], max_length=5),
+        ),
+    ]
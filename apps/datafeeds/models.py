@@ -34,6 +34,7 @@ class Symbol(models.Model):
 
 class Candle(models.Model):
     class Timeframe(models.TextChoices):
+        M1 = "1m", "1 Minute"
         M5 = "5m", "5 Minutes"
         M30 = "30m", "30 Minutes"
         H1 = "1h", "1 Hour"
@@ -64,6 +65,16 @@ class Candle(models.Model):
         return Decimal(str(value))
 
 
+TIMEFRAME_SECONDS = {
+    Candle.Timeframe.M1: 60,
+    Candle.Timeframe.M5: 5 * 60,
+    Candle.Timeframe.M30: 30 * 60,
+    Candle.Timeframe.H1: 60 * 60,
+    Candle.Timeframe.H4: 4 * 60 * 60,
+    Candle.Timeframe.D1: 24 * 60 * 60,
+}
+
+
 class Divergence(models.Model):
     """Stores precomputed divergences between price and indicators."""
     
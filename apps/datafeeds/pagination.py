@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for the candle and divergence endpoints.
+
+A page is ``WHERE (ts, id) > (last_ts, last_id) ORDER BY ts, id LIMIT n``. The cursor is
+written as ``ts >= last_ts AND (ts > last_ts OR id > last_id)``, so the database can seek
+on the leading timestamp column of the ``(symbol, timeframe, timestamp)`` index.
+Every page then costs the same, however deep it is. OFFSET pagination instead has to walk
+past all earlier rows, and needs a COUNT for the page links.
+
+Cursors are opaque base64 tokens holding the boundary row and the direction, as in DRF's
+``CursorPagination``. DRF's version keys on a single field plus an offset for ties, but
+candles of different symbols share timestamps, so the id tiebreak is needed here.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Position = Tuple[datetime, int]
+
+
+class KeysetPagination(BasePagination):
+    ordering: Tuple[str, str] = ("timestamp", "id")
+    page_size = 500
+    max_page_size = 5000
+    page_size_query_params = ("page_size", "limit")  # ``limit`` kept for existing clients
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        field, tiebreak = self.ordering
+
+        if position is not None:
+            value, pk = position
+            seek, strict = ("lte", "lt") if reverse else ("gte", "gt")
+            after = Q(**{f"{field}__{strict}": value}) | Q(**{f"{tiebreak}__{strict}": pk})
+            queryset = queryset.filter(after, **{f"{field}__{seek}": value})
+        prefix = "-" if reverse else ""
+        rows = list(queryset.order_by(f"{prefix}{field}", f"{prefix}{tiebreak}")[: self.page_size + 1])
+
+        more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+        # Arriving through a cursor means there are rows on the side it came from.
+        self.has_next = more if not reverse else position is not None
+        self.has_previous = more if reverse else position is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        for param in self.page_size_query_params:
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                size = int(value)
+            except ValueError as exc:
+                raise ValidationError({param: "Page size must be an integer."}) from exc
+            return max(1, min(size, self.max_page_size))
+        return self.page_size
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, row, reverse: bool) -> str:
+        field, tiebreak = self.ordering
+        value = getattr(row, field)
+        token = json.dumps({"p": [value.isoformat(), getattr(row, tiebreak)], "r": int(reverse)}, separators=(",", ":"))
+        encoded = base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "limit")
+        url = replace_query_param(url, "page_size", self.page_size)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request) -> Tuple[Optional[Position], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            raw_value, pk = token["p"]
+            value = parse_datetime(raw_value)
+            if value is None:
+                raise ValueError(raw_value)
+            return (value, int(pk)), bool(token.get("r"))
+        except (TypeError, ValueError, KeyError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+
+class CandlePagination(KeysetPagination):
+    ordering = ("timestamp", "id")
+
+
+class DivergencePagination(KeysetPagination):
+    ordering = ("start_timestamp", "id")
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import MarketDataConsumer
+
+websocket_urlpatterns = [
+    path("ws/market/<str:symbol>/<str:timeframe>/", MarketDataConsumer.as_asgi()),
+]
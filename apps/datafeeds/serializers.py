@@ -60,3 +60,11 @@ class DivergenceSerializer(serializers.ModelSerializer):
             "is_macd",
         ]
         read_only_fields = fields
+
+
+class CompactCandleSerializer(CandleSerializer):
+    symbol = serializers.CharField(source="symbol.code", read_only=True)
+
+
+class CompactDivergenceSerializer(DivergenceSerializer):
+    symbol = serializers.CharField(source="symbol.code", read_only=True)
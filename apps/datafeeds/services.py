@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import logging
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Iterable, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import ccxt
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Max
 
-from .models import Candle, Symbol
+from apps.analytics.timing import span
+
+from .models import TIMEFRAME_SECONDS, Candle, Symbol
+from .streaming import SIGNAL_TIMEFRAME, indicator_deltas, signal_event
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +39,8 @@ def fetch_ohlcv(symbol: Symbol, timeframe: str, limit: int = 500, since: int | N
 
     pair = symbol.ccxt_pair
     logger.info("Fetching %s %s candles (limit=%s, since=%s)", pair, timeframe, limit, since)
-    raw = exchange.fetch_ohlcv(pair, timeframe=timeframe, limit=limit, since=since)
+    with span("ingest.fetch"):
+        raw = exchange.fetch_ohlcv(pair, timeframe=timeframe, limit=limit, since=since)
     payloads: List[CandlePayload] = []
     for ts, o, h, l, c, v in raw:
         payloads.append(
@@ -48,7 +56,25 @@ def fetch_ohlcv(symbol: Symbol, timeframe: str, limit: int = 500, since: int | N
     return payloads
 
 
-def store_candles(symbol: Symbol, timeframe: str, candles: Iterable[CandlePayload], source: str = "ccxt") -> int:
+def store_candles(
+    symbol: Symbol,
+    timeframe: str,
+    candles: Iterable[CandlePayload],
+    source: str = "ccxt",
+    publish: bool = False,
+) -> int:
+    """
+    Bulk-inserts candles, ignoring ones already stored.
+    With ``publish`` (live ingestion) the last stored bar is refreshed, since it may have
+    been saved while still forming, and every candle from that bar onwards is pushed to
+    the market-data channel group so live consumers can react.
+    """
+    candles = list(candles)
+    latest_before = None
+    if publish:
+        latest_before = Candle.objects.filter(symbol=symbol, timeframe=timeframe).aggregate(
+            latest=Max("timestamp")
+        )["latest"]
     objs = []
     for candle in candles:
         objs.append(
@@ -66,6 +92,95 @@ def store_candles(symbol: Symbol, timeframe: str, candles: Iterable[CandlePayloa
         )
     if not objs:
         return 0
-    inserted = Candle.objects.bulk_create(objs, ignore_conflicts=True)
+    with span("ingest.store"):
+        inserted = Candle.objects.bulk_create(objs, ignore_conflicts=True)
     logger.info("Inserted %s candles for %s %s", len(inserted), symbol.code, timeframe)
+    if publish:
+        fresh = [c for c in candles if latest_before is None or c.timestamp >= latest_before]
+        _refresh_last_bar(symbol, timeframe, latest_before, fresh)
+        publish_candles(symbol, timeframe, fresh)
     return len(inserted)
+
+
+def _refresh_last_bar(
+    symbol: Symbol, timeframe: str, latest_before: Optional[datetime], candles: Iterable[CandlePayload]
+) -> None:
+    """
+    Overwrites the last stored bar with its polled values. Polling usually stores that bar while
+    it is still forming, and ``bulk_create(ignore_conflicts=True)`` keeps the stale row, so without
+    this its final values would never be stored and its close never reach the live runtime.
+    """
+    for candle in candles:
+        if candle.timestamp == latest_before:
+            Candle.objects.filter(symbol=symbol, timeframe=timeframe, timestamp=latest_before).update(
+                open=candle.open, high=candle.high, low=candle.low, close=candle.close, volume=candle.volume
+            )
+            return
+
+
+def market_group_name(symbol_code: str, timeframe: str) -> str:
+    return f"market.{symbol_code.upper()}.{timeframe}"
+
+
+def candle_event(symbol_code: str, timeframe: str, candle: CandlePayload, closed: bool = True) -> Dict[str, Any]:
+    """``candle.closed`` for finished bars, ``candle.updated`` for the bar still forming."""
+    return {
+        "type": "candle.closed" if closed else "candle.updated",
+        "symbol": symbol_code.upper(),
+        "timeframe": timeframe,
+        "candle": {
+            "time": int(candle.timestamp.timestamp()),
+            "open": float(candle.open),
+            "high": float(candle.high),
+            "low": float(candle.low),
+            "close": float(candle.close),
+            "volume": float(candle.volume),
+        },
+        "published_at": time.time(),
+    }
+
+
+def publish_candles(symbol: Symbol, timeframe: str, candles: Iterable[CandlePayload]) -> int:
+    """
+    Sends one event per candle to ``market.<SYMBOL>.<timeframe>``, enriched with the
+    bar's indicator values and, for closed trigger candles, any new strategy signal.
+    """
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.warning("Channel layer not configured; skipping candle publication.")
+        return 0
+
+    candles = sorted(candles, key=lambda c: c.timestamp)
+    if not candles:
+        return 0
+
+    duration = TIMEFRAME_SECONDS.get(timeframe, 0)
+    now = time.time()
+    with span("ingest.indicators"):
+        indicators = indicator_deltas(symbol, timeframe, [candle.timestamp for candle in candles])
+    events = []
+    for candle in candles:
+        event = candle_event(symbol.code, timeframe, candle, closed=candle.timestamp.timestamp() + duration <= now)
+        event["indicators"] = indicators.get(event["candle"]["time"], {})
+        events.append(event)
+
+    last_closed = next((event for event in reversed(events) if event["type"] == "candle.closed"), None)
+    if timeframe == SIGNAL_TIMEFRAME and last_closed is not None:
+        # Only the newest closed bar can produce a live signal; older ones are backfill.
+        signal = signal_event(symbol, datetime.fromtimestamp(last_closed["candle"]["time"], tz=timezone.utc))
+        last_closed["signals"] = [signal] if signal else []
+
+    group_name = market_group_name(symbol.code, timeframe)
+
+    async def _send_all():
+        for event in events:
+            await channel_layer.group_send(group_name, event)
+
+    try:
+        with span("ingest.publish"):
+            async_to_sync(_send_all)()
+    except Exception as exc:
+        logger.exception("Failed to publish candles for %s %s: %s", symbol.code, timeframe, exc)
+        return 0
+    return len(events)
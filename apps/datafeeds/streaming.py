@@ -0,0 +1,134 @@
+"""
+Market-data deltas pushed to ``ws/market/<symbol>/<timeframe>/``.
+
+Ingestion enriches every published candle with the indicator values of that bar and
+any new strategy signal, computed once here so websocket clients only receive small
+deltas instead of re-downloading the whole strategy payload.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from django.core.cache import cache
+
+from apps.strategies.config import STRATEGY_INDICATORS
+from apps.strategies.indicators import hull_moving_average, simple_moving_average
+from apps.strategies.signals import DEFAULT_PERIOD, evaluate_long_signal, evaluate_short_signal
+
+from .models import Candle, Symbol
+
+logger = logging.getLogger(__name__)
+
+STREAM_INDICATOR_PERIOD = DEFAULT_PERIOD
+# Strategy 1 triggers on the 5m close with 1h/4h HMA trend filters.
+SIGNAL_TIMEFRAME = "5m"
+SIGNAL_TREND_TIMEFRAMES = ("1h", "4h")
+SIGNAL_CACHE_PREFIX = "market:signal:"
+SIGNAL_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+_INDICATOR_FUNCTIONS = {"sma": simple_moving_average, "hma": hull_moving_average}
+
+
+def streamed_indicators(timeframe: str) -> List[str]:
+    """Indicator types the backend calculates for ``timeframe`` (see ``STRATEGY_INDICATORS``)."""
+    enabled = []
+    for indicator_type, timeframe_map in STRATEGY_INDICATORS.items():
+        cfg = timeframe_map.get(timeframe)
+        calc = bool(cfg.get("calc", False)) if isinstance(cfg, dict) else bool(cfg)
+        if calc and indicator_type in _INDICATOR_FUNCTIONS:
+            enabled.append(indicator_type)
+    return enabled
+
+
+def _warmup_bars(period: int) -> int:
+    # HMA needs the full WMA window plus the sqrt(period) smoothing window.
+    return period + max(1, int(math.sqrt(period))) - 1
+
+
+def _recent_closes(symbol: Symbol, timeframe: str, until: datetime, count: int) -> pd.Series:
+    rows = list(
+        Candle.objects.filter(symbol=symbol, timeframe=timeframe, timestamp__lte=until)
+        .order_by("-timestamp")
+        .values_list("timestamp", "close")[:count]
+    )
+    rows.reverse()
+    return pd.Series(
+        [float(close) for _, close in rows],
+        index=pd.DatetimeIndex([timestamp for timestamp, _ in rows]),
+        dtype=float,
+    )
+
+
+def _clean(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def indicator_deltas(
+    symbol: Symbol,
+    timeframe: str,
+    timestamps: Iterable[datetime],
+    period: int = STREAM_INDICATOR_PERIOD,
+) -> Dict[int, Dict[str, Optional[float]]]:
+    """
+    Indicator values at each of ``timestamps`` (epoch seconds -> {type: value}), from a
+    single query over the trailing warmup window.
+    """
+
+    timestamps = sorted(timestamps)
+    indicator_types = streamed_indicators(timeframe)
+    if not timestamps or not indicator_types:
+        return {}
+
+    closes = _recent_closes(symbol, timeframe, timestamps[-1], _warmup_bars(period) + len(timestamps))
+    computed = {}
+    for indicator_type in indicator_types:
+        if len(closes) >= period:
+            computed[indicator_type] = _INDICATOR_FUNCTIONS[indicator_type](closes, period)
+
+    deltas = {}
+    for timestamp in timestamps:
+        values = {}
+        for indicator_type in indicator_types:
+            series = computed.get(indicator_type)
+            values[indicator_type] = (
+                _clean(series.get(pd.Timestamp(timestamp), math.nan)) if series is not None else None
+            )
+        deltas[int(timestamp.timestamp())] = values
+    return deltas
+
+
+def signal_event(symbol: Symbol, candle_time: datetime, period: int = DEFAULT_PERIOD) -> Optional[Dict]:
+    """
+    Strategy 1 signal on the 5m candle closing at ``candle_time``, reported only when the
+    direction differs from the previously published one.
+    """
+
+    closes = {SIGNAL_TIMEFRAME: _recent_closes(symbol, SIGNAL_TIMEFRAME, candle_time, period)}
+    for timeframe in SIGNAL_TREND_TIMEFRAMES:
+        closes[timeframe] = _recent_closes(symbol, timeframe, candle_time, _warmup_bars(period))
+    try:
+        long_result = evaluate_long_signal(closes, period, period)
+        short_result = evaluate_short_signal(closes, period, period)
+    except (ValueError, IndexError):
+        return None  # Not enough history yet.
+    if any(math.isnan(item.indicator_value) for item in long_result.breakdown.values()):
+        return None
+
+    direction = long_result.direction or short_result.direction
+    key = f"{SIGNAL_CACHE_PREFIX}{symbol.code.upper()}"
+    previous = cache.get(key)
+    cache.set(key, direction or "", timeout=SIGNAL_CACHE_TTL_SECONDS)
+    if direction is None or direction == previous:
+        return None
+    return {
+        "strategy": "1",
+        "direction": direction,
+        "time": int(candle_time.timestamp()),
+        "price": float(closes[SIGNAL_TIMEFRAME].iloc[-1]),
+    }
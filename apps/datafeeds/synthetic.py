@@ -0,0 +1,190 @@
+"""
+Deterministic synthetic OHLCV for load and scale testing.
+
+Prices follow a geometric Brownian motion whose drift and volatility switch between
+``Regime``s as a Markov chain. On top of that come occasional opening gaps (the open jumps
+away from the previous close), wick spikes and, optionally, missing bars. Only the finest
+requested timeframe is simulated. Every coarser timeframe is aggregated from it, so all
+timeframes of a symbol agree with each other the way exchange data does.
+
+Generation runs in chunks of ``CHUNK_DAYS`` whole UTC days. Each chunk draws from its own
+generator seeded with ``(seed, symbol_index, chunk_index)`` and carries the last close and
+regime forward, so memory stays bounded at any range. The output depends only on the
+seed, the start day and the model: extending ``end`` never changes bars that already exist.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import TIMEFRAME_SECONDS
+from .services import CandlePayload
+
+CHUNK_DAYS = 30
+DAY_SECONDS = 24 * 60 * 60
+YEAR_SECONDS = 365 * DAY_SECONDS
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+@dataclass(frozen=True)
+class Regime:
+    drift: float  # annualised log drift
+    volatility: float  # annualised
+
+
+@dataclass(frozen=True)
+class MarketModel:
+    initial_price: float = 100.0
+    regimes: Tuple[Regime, ...] = (Regime(0.2, 0.5), Regime(-0.6, 1.1), Regime(0.8, 0.8), Regime(0.0, 0.25))
+    switch_probability: float = 1 / 3000  # per simulated bar
+    gap_probability: float = 0.0005
+    gap_scale: float = 0.02  # std of the log jump
+    spike_probability: float = 0.0005
+    spike_scale: float = 0.03  # mean extra wick, as a log fraction
+    missing_probability: float = 0.0
+    volume: float = 100.0  # mean base-bar volume
+
+
+def generate(
+    start: datetime,
+    end: datetime,
+    timeframes: Sequence[str],
+    model: MarketModel = MarketModel(),
+    seed: int = 0,
+    symbol_index: int = 0,
+) -> Iterator[Dict[str, pd.DataFrame]]:
+    """Yields ``{timeframe: frame}`` chunks covering ``[start, end)`` for one symbol."""
+    unknown = [timeframe for timeframe in timeframes if timeframe not in TIMEFRAME_SECONDS]
+    if unknown:
+        raise ValueError(f"Unsupported timeframes: {', '.join(unknown)}")
+    if not timeframes:
+        return
+    base_seconds = min(TIMEFRAME_SECONDS[timeframe] for timeframe in timeframes)
+    day = _floor_day(start)
+    start_s, end_s = int(start.timestamp()), int(end.timestamp())
+
+    log_close = np.log(model.initial_price)
+    regime = 0
+    chunk = 0
+    while int(day.timestamp()) < end_s:
+        chunk_start = int(day.timestamp())
+        chunk_end = chunk_start + CHUNK_DAYS * DAY_SECONDS
+        rng = np.random.default_rng([seed, symbol_index, chunk])
+        timestamps = np.arange(chunk_start, chunk_end, base_seconds, dtype=np.int64)
+        bars, log_close, regime = _simulate(rng, model, len(timestamps), base_seconds, log_close, regime)
+        keep = (timestamps >= start_s) & (timestamps < end_s)
+        if model.missing_probability:
+            keep &= rng.random(len(timestamps)) >= model.missing_probability
+        timestamps = timestamps[keep]
+        bars = {column: values[keep] for column, values in bars.items()}
+        if len(timestamps):
+            yield {timeframe: _aggregate(timestamps, bars, TIMEFRAME_SECONDS[timeframe]) for timeframe in timeframes}
+        day += timedelta(days=CHUNK_DAYS)
+        chunk += 1
+
+
+def generate_frames(
+    start: datetime,
+    end: datetime,
+    timeframes: Sequence[str],
+    model: MarketModel = MarketModel(),
+    seed: int = 0,
+    symbol_index: int = 0,
+) -> Dict[str, pd.DataFrame]:
+    """The whole range at once; convenient for tests and in-memory benchmarks."""
+    parts: Dict[str, List[pd.DataFrame]] = {timeframe: [] for timeframe in timeframes}
+    for frames in generate(start, end, timeframes, model, seed, symbol_index):
+        for timeframe, frame in frames.items():
+            parts[timeframe].append(frame)
+    return {
+        timeframe: pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=COLUMNS)
+        for timeframe, chunks in parts.items()
+    }
+
+
+def to_payloads(frame: pd.DataFrame) -> List[CandlePayload]:
+    """Frame rows as ``CandlePayload``s for ``store_candles``."""
+    columns = [np.round(frame[column].to_numpy(), 8).tolist() for column in COLUMNS[1:]]
+    timestamps = pd.DatetimeIndex(frame["timestamp"]).to_pydatetime()
+    return [
+        CandlePayload(
+            timestamp=timestamp,
+            open=Decimal(repr(open_)),
+            high=Decimal(repr(high)),
+            low=Decimal(repr(low)),
+            close=Decimal(repr(close)),
+            volume=Decimal(repr(volume)),
+        )
+        for timestamp, open_, high, low, close, volume in zip(timestamps, *columns)
+    ]
+
+
+def _floor_day(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _simulate(rng: np.random.Generator, model: MarketModel, size: int, bar_seconds: int, log_close: float, regime: int):
+    """``size`` bars continuing from ``log_close`` in ``regime``; returns the bars and the final state."""
+    count = len(model.regimes)
+    switches = rng.random(size) < model.switch_probability
+    if count > 1:
+        # A switch always moves to a different regime.
+        steps = np.where(switches, rng.integers(1, count, size), 0)
+        regimes = (regime + np.cumsum(steps)) % count
+    else:
+        regimes = np.zeros(size, dtype=np.int64)
+
+    dt = bar_seconds / YEAR_SECONDS
+    drift = np.array([r.drift for r in model.regimes])[regimes]
+    volatility = np.array([r.volatility for r in model.regimes])[regimes]
+    sigma = volatility * np.sqrt(dt)
+    returns = (drift - 0.5 * volatility**2) * dt + sigma * rng.standard_normal(size)
+    gaps = np.where(rng.random(size) < model.gap_probability, rng.normal(0, model.gap_scale, size), 0.0)
+
+    closes = log_close + np.cumsum(gaps + returns)
+    opens = closes - returns
+    upper = np.maximum(opens, closes) + np.abs(rng.standard_normal(size)) * sigma * 0.5
+    lower = np.minimum(opens, closes) - np.abs(rng.standard_normal(size)) * sigma * 0.5
+    spikes = rng.random(size) < model.spike_probability
+    spike_size = rng.exponential(model.spike_scale, size)
+    spike_up = rng.random(size) < 0.5
+    upper += np.where(spikes & spike_up, spike_size, 0.0)
+    lower -= np.where(spikes & ~spike_up, spike_size, 0.0)
+
+    # Volume rises with the size of the move and with the regime's volatility.
+    mean_volatility = np.mean([r.volatility for r in model.regimes])
+    activity = (1 + np.abs(returns) / sigma) * (volatility / mean_volatility)
+    volume = model.volume * rng.lognormal(-0.125, 0.5, size) * activity / 1.8
+
+    bars = {
+        "open": np.exp(opens),
+        "high": np.exp(upper),
+        "low": np.exp(lower),
+        "close": np.exp(closes),
+        "volume": volume,
+    }
+    return bars, float(closes[-1]), int(regimes[-1])
+
+
+def _aggregate(timestamps: np.ndarray, bars: Dict[str, np.ndarray], seconds: int) -> pd.DataFrame:
+    """OHLCV of ``seconds``-long buckets from sorted finer bars (empty buckets are skipped)."""
+    buckets = timestamps - timestamps % seconds
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(timestamps)])) - 1
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(buckets[starts], unit="s", utc=True),
+            "open": bars["open"][starts],
+            "high": np.maximum.reduceat(bars["high"], starts),
+            "low": np.minimum.reduceat(bars["low"], starts),
+            "close": bars["close"][ends],
+            "volume": np.add.reduceat(bars["volume"], starts),
+        }
+    )
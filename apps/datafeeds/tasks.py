@@ -26,5 +26,5 @@ def fetch_ohlcv_task(symbol_code: str, timeframe: str, limit: int = 500, since:
         except ValueError:
             logger.warning("Invalid since datetime '%s'; ignoring", since)
     payloads = fetch_ohlcv(symbol, timeframe=timeframe, limit=limit, since=since_ms)
-    count = store_candles(symbol, timeframe=timeframe, candles=payloads)
+    count = store_candles(symbol, timeframe=timeframe, candles=payloads, publish=True)
     return count
@@ -1,13 +1,38 @@
-from datetime import datetime, timezone
+import asyncio
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import Candle, Symbol
+from apps.strategies.indicators import hull_moving_average, simple_moving_average
+
+from apps.analytics.querybudget import QueryBudgetAssertions
 
+from .consumers import MarketDataConsumer
+from .export import DATASETS, export, parquet_available
+from .models import Candle, Divergence, Symbol
+from .pagination import CandlePagination
+from .services import CandlePayload, candle_event, market_group_name, store_candles
+from .streaming import signal_event
+from .synthetic import MarketModel, generate_frames
 
-class DatafeedAPITests(APITestCase):
+
+class DatafeedAPITests(QueryBudgetAssertions, APITestCase):
     def setUp(self):
         self.symbol = Symbol.objects.create(
             code="ETHUSDT",
@@ -26,6 +51,43 @@ class DatafeedAPITests(APITestCase):
             volume=10,
         )
 
+    def test_endpoint_query_counts(self):
+        for hour in range(1, 6):
+            Candle.objects.create(
+                symbol=self.symbol,
+                timeframe=Candle.Timeframe.H1,
+                timestamp=datetime(2024, 1, 1, hour, tzinfo=timezone.utc),
+                open=1,
+                high=1,
+                low=1,
+                close=1,
+                volume=1,
+            )
+        for offset in range(3):
+            Divergence.objects.create(
+                symbol=self.symbol,
+                timeframe="1h",
+                divergence_type=Divergence.DivergenceType.RSI_BULLISH,
+                start_timestamp=datetime(2024, 1, 1, offset, tzinfo=timezone.utc),
+                start_price=1,
+                start_indicator_value=1,
+                end_timestamp=datetime(2024, 1, 1, offset + 1, tzinfo=timezone.utc),
+                end_price=1,
+                end_indicator_value=1,
+            )
+        candle = Candle.objects.first()
+        # Nested symbols come from the joined row, not one query per object.
+        cases = [
+            (reverse("datafeed-symbol-list"), {}),
+            (reverse("datafeed-symbol-detail", args=[self.symbol.pk]), {}),
+            (reverse("datafeed-candle-list"), {"symbol": "ETHUSDT", "timeframe": "1h"}),
+            (reverse("datafeed-candle-detail", args=[candle.pk]), {}),
+            (reverse("datafeed-divergence-list"), {"symbol": "ETHUSDT", "timeframe": "1h"}),
+        ]
+        for url, params in cases:
+            with self.subTest(url=url), self.assertQueries(1):
+                self.assertEqual(self.client.get(url, params).status_code, status.HTTP_200_OK)
+
     def test_symbol_list(self):
         url = reverse("datafeed-symbol-list")
         response = self.client.get(url)
@@ -37,4 +99,369 @@ class DatafeedAPITests(APITestCase):
         response = self.client.get(url, {"symbol": "ETHUSDT", "timeframe": "1h"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(data[0]["close"], "1050.00000000")
+        self.assertEqual(data["results"][0]["close"], "1050.00000000")
+
+    def _shared_timestamp_candles(self):
+        other = Symbol.objects.create(code="SOLUSDT", base_asset="SOL", quote_asset="USDT")
+        for hour in range(1, 7):
+            for symbol in (self.symbol, other):
+                Candle.objects.create(
+                    symbol=symbol,
+                    timeframe=Candle.Timeframe.H1,
+                    timestamp=datetime(2024, 1, 1, hour, tzinfo=timezone.utc),
+                    open=1,
+                    high=1,
+                    low=1,
+                    close=hour,
+                    volume=1,
+                )
+        return list(Candle.objects.order_by("timestamp", "id").values_list("id", flat=True))
+
+    def test_candle_cursor_pages_walk_forward_and_back(self):
+        expected = self._shared_timestamp_candles()
+        url = reverse("datafeed-candle-list") + "?page_size=5"
+        pages, last = [], None
+        while url:
+            # Every page, however deep, is a single keyset query.
+            with self.assertQueries(1):
+                last = self.client.get(url).json()
+            pages.append([row["id"] for row in last["results"]])
+            url = last["next"]
+        self.assertEqual([len(page) for page in pages], [5, 5, 3])
+        self.assertEqual(sum(pages, []), expected)
+
+        previous = self.client.get(last["previous"]).json()
+        self.assertEqual([row["id"] for row in previous["results"]], pages[1])
+        first = self.client.get(previous["previous"]).json()
+        self.assertEqual([row["id"] for row in first["results"]], pages[0])
+        self.assertIsNone(first["previous"])
+
+    def test_page_size_is_capped_and_limit_still_accepted(self):
+        self._shared_timestamp_candles()
+        url = reverse("datafeed-candle-list")
+        with mock.patch.object(CandlePagination, "max_page_size", 4):
+            self.assertEqual(len(self.client.get(url, {"page_size": 100}).json()["results"]), 4)
+        data = self.client.get(url, {"limit": 3}).json()
+        self.assertEqual(len(data["results"]), 3)
+        self.assertIn("page_size=3", data["next"])
+        self.assertEqual(self.client.get(url, {"cursor": "bm90LWpzb24"}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_compact_mode_returns_symbols_once(self):
+        self._shared_timestamp_candles()
+        data = self.client.get(reverse("datafeed-candle-list"), {"compact": 1, "symbol": "ETHUSDT"}).json()
+        self.assertEqual({row["symbol"] for row in data["results"]}, {"ETHUSDT"})
+        self.assertEqual(list(data["symbols"]), ["ETHUSDT"])
+        self.assertEqual(data["symbols"]["ETHUSDT"]["base_asset"], "ETH")
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _candles(start, step, count):
+    return [
+        CandlePayload(timestamp=start + step * i, open=100 + i, high=101 + i, low=99 + i, close=100 + i, volume=3)
+        for i in range(count)
+    ]
+
+
+def _drain(layer, channel):
+    messages = []
+
+    async def receive_all():
+        while True:
+            try:
+                messages.append(await asyncio.wait_for(layer.receive(channel), timeout=0.01))
+            except asyncio.TimeoutError:
+                return
+
+    async_to_sync(receive_all)()
+    return messages
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CandlePublishTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.symbol = Symbol.objects.create(code="BTCUSDT", base_asset="BTC", quote_asset="USDT")
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+
+    def tearDown(self):
+        async_to_sync(self.layer.flush)()
+
+    def _listen(self, timeframe):
+        async_to_sync(self.layer.group_add)(market_group_name("BTCUSDT", timeframe), self.channel)
+
+    def test_store_candles_republishes_last_bar_and_new_ones(self):
+        self._listen("1h")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        candles = _candles(start, timedelta(hours=1), 3)
+        forming = CandlePayload(candles[1].timestamp, 1, 1, 1, 1, 1)
+        store_candles(self.symbol, "1h", [candles[0], forming])
+        store_candles(self.symbol, "1h", candles, publish=True)
+
+        messages = _drain(self.layer, self.channel)
+        self.assertEqual([m["type"] for m in messages], ["candle.closed", "candle.closed"])
+        self.assertEqual(messages[0]["candle"]["time"], int(candles[1].timestamp.timestamp()))
+        self.assertEqual(messages[1]["candle"]["time"], int(candles[2].timestamp.timestamp()))
+        refreshed = Candle.objects.get(symbol=self.symbol, timeframe="1h", timestamp=candles[1].timestamp)
+        self.assertEqual(float(refreshed.close), 101.0)
+
+    def test_polled_forming_bar_is_published_closed_on_the_next_poll(self):
+        self._listen("1h")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        closed, forming_then_closed, forming = _candles(start, timedelta(hours=1), 3)
+        partial = CandlePayload(forming_then_closed.timestamp, 101, 101, 101, 101, 1)
+        bar_start = forming_then_closed.timestamp.timestamp()
+
+        # Only the services module's clock moves; the channel layer expires messages by the real one.
+        with mock.patch("apps.datafeeds.services.time") as clock:
+            clock.time.return_value = bar_start + 60
+            store_candles(self.symbol, "1h", [closed, partial], publish=True)
+            clock.time.return_value = bar_start + 3600 + 60
+            store_candles(self.symbol, "1h", [forming_then_closed, forming], publish=True)
+
+        messages = _drain(self.layer, self.channel)
+        events = [(m["type"], m["candle"]["time"]) for m in messages]
+        bar_time = int(bar_start)
+        self.assertEqual(
+            events,
+            [
+                ("candle.closed", int(closed.timestamp.timestamp())),
+                ("candle.updated", bar_time),
+                ("candle.closed", bar_time),
+                ("candle.updated", int(forming.timestamp.timestamp())),
+            ],
+        )
+        self.assertEqual(messages[2]["candle"]["high"], float(forming_then_closed.high))
+        stored = Candle.objects.get(symbol=self.symbol, timeframe="1h", timestamp=forming_then_closed.timestamp)
+        self.assertEqual((float(stored.high), float(stored.volume)), (102.0, 3.0))
+
+    def test_forming_candle_published_as_update_with_indicators(self):
+        self._listen("1h")
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        candles = _candles(now - timedelta(hours=249), timedelta(hours=1), 250)
+        store_candles(self.symbol, "1h", candles[:-2])
+        store_candles(self.symbol, "1h", candles, publish=True)
+
+        messages = _drain(self.layer, self.channel)
+        self.assertEqual(messages[-1]["type"], "candle.updated")
+        closes = pd.Series([float(c.close) for c in candles])
+        expected_sma = simple_moving_average(closes, 200).iloc[-1]
+        expected_hma = hull_moving_average(closes, 200).iloc[-1]
+        self.assertAlmostEqual(messages[-1]["indicators"]["sma"], expected_sma)
+        self.assertAlmostEqual(messages[-1]["indicators"]["hma"], expected_hma)
+
+    def test_signal_event_reported_once_per_direction_change(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for timeframe, step in (("5m", timedelta(minutes=5)), ("1h", timedelta(hours=1)), ("4h", timedelta(hours=4))):
+            store_candles(self.symbol, timeframe, _candles(start, step, 260))
+
+        evaluated_at = start + timedelta(hours=4 * 260)
+        event = signal_event(self.symbol, evaluated_at)
+        self.assertEqual(event["direction"], "long")
+        self.assertIsNone(signal_event(self.symbol, evaluated_at))
+
+
+class MarketDataConsumerTests(APITestCase):
+    def _communicator(self, symbol, timeframe):
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/market/{symbol}/{timeframe}/",
+            "headers": [],
+            "subprotocols": [],
+            "url_route": {"kwargs": {"symbol": symbol, "timeframe": timeframe}},
+        }
+        return ApplicationCommunicator(MarketDataConsumer.as_asgi(), scope)
+
+    def test_consumer_pushes_candle_deltas(self):
+        async def scenario():
+            communicator = self._communicator("btcusdt", "5m")
+            await communicator.send_input({"type": "websocket.connect"})
+            accepted = await communicator.receive_output(timeout=1)
+            event = candle_event(
+                "BTCUSDT", "5m", CandlePayload(datetime(2024, 1, 1, tzinfo=timezone.utc), 1, 2, 0.5, 1.5, 10)
+            )
+            event["indicators"] = {"sma": 1.25}
+            event["signals"] = [{"strategy": "1", "direction": "long", "time": event["candle"]["time"]}]
+            await get_channel_layer().group_send(market_group_name("BTCUSDT", "5m"), event)
+            frame = json.loads((await communicator.receive_output(timeout=1))["text"])
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=1)
+            return accepted, frame
+
+        accepted, frame = asyncio.run(scenario())
+        self.assertEqual(accepted["type"], "websocket.accept")
+        self.assertTrue(frame["closed"])
+        self.assertEqual(frame["candle"]["close"], 1.5)
+        self.assertEqual(frame["indicators"], {"sma": 1.25})
+        self.assertEqual(frame["signals"][0]["direction"], "long")
+
+    def test_unknown_timeframe_rejected(self):
+        async def scenario():
+            communicator = self._communicator("BTCUSDT", "7m")
+            await communicator.send_input({"type": "websocket.connect"})
+            return await communicator.receive_output(timeout=1)
+
+        self.assertEqual(asyncio.run(scenario()), {"type": "websocket.close", "code": 4400})
+
+
+class SyntheticDataTests(SimpleTestCase):
+    START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_seeded_output_is_deterministic_and_prefix_stable(self):
+        end = self.START + timedelta(days=70)
+        first = generate_frames(self.START, end, ["5m"], seed=3)["5m"]
+        again = generate_frames(self.START, end, ["5m"], seed=3)["5m"]
+        shorter = generate_frames(self.START, self.START + timedelta(days=40), ["5m"], seed=3)["5m"]
+        other = generate_frames(self.START, end, ["5m"], seed=3, symbol_index=1)["5m"]
+
+        self.assertEqual(len(first), 70 * 288)
+        pd.testing.assert_frame_equal(first, again)
+        pd.testing.assert_frame_equal(shorter, first.iloc[: len(shorter)])
+        self.assertFalse(np.allclose(first["close"], other["close"]))
+
+    def test_bars_are_consistent_across_timeframes(self):
+        model = MarketModel(gap_probability=0.01, spike_probability=0.01)
+        frames = generate_frames(self.START, self.START + timedelta(days=35), ["5m", "1h", "1d"], model, seed=1)
+        base = frames["5m"]
+        self.assertTrue((base["high"] >= base[["open", "close"]].max(axis=1)).all())
+        self.assertTrue((base["low"] <= base[["open", "close"]].min(axis=1)).all())
+        self.assertTrue((base["low"] > 0).all())
+        # Gaps: some opens jump away from the previous close.
+        self.assertTrue((base["open"].iloc[1:].to_numpy() != base["close"].iloc[:-1].to_numpy()).any())
+
+        hourly = base.set_index("timestamp").resample("1h").agg(
+            {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+        )
+        np.testing.assert_allclose(frames["1h"][["open", "high", "low", "close", "volume"]], hourly.to_numpy())
+        self.assertEqual(len(frames["1d"]), 35)
+
+    def test_missing_bars_are_dropped(self):
+        model = MarketModel(missing_probability=0.1)
+        base = generate_frames(self.START, self.START + timedelta(days=2), ["5m"], model)["5m"]
+        self.assertLess(len(base), 2 * 288)
+        self.assertGreater(len(base), 2 * 288 * 0.8)
+        self.assertTrue(base["timestamp"].is_monotonic_increasing)
+
+
+class GenerateCandlesCommandTests(TestCase):
+    def test_command_stores_every_timeframe_for_each_symbol(self):
+        call_command(
+            "generate_candles", symbols=2, start="2024-01-01", days=3, timeframes="5m,1h", seed=5, stdout=io.StringIO()
+        )
+        self.assertEqual(
+            list(Symbol.objects.filter(code__startswith="SYN").values_list("code", flat=True)), ["SYN000", "SYN001"]
+        )
+        candles = Candle.objects.filter(symbol__code="SYN001", source="synthetic")
+        self.assertEqual(candles.filter(timeframe="5m").count(), 3 * 288)
+        self.assertEqual(candles.filter(timeframe="1h").count(), 3 * 24)
+
+        # Re-running is idempotent: existing bars are skipped by the ingestion path.
+        call_command("generate_candles", symbols=2, start="2024-01-01", days=3, timeframes="5m,1h", stdout=io.StringIO())
+        self.assertEqual(Candle.objects.filter(symbol__code="SYN001").count(), 3 * (288 + 24))
+
+
+class ExportTests(APITestCase):
+    START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("exporter", password="x")
+        self.eth = Symbol.objects.create(code="ETHUSDT", ccxt_symbol="ETH/USDT", base_asset="ETH", quote_asset="USDT")
+        self.btc = Symbol.objects.create(code="BTCUSDT", ccxt_symbol="BTC/USDT", base_asset="BTC", quote_asset="USDT")
+        for symbol in (self.eth, self.btc):
+            Candle.objects.bulk_create(
+                Candle(
+                    symbol=symbol, timeframe="1h", timestamp=self.START + timedelta(hours=hour),
+                    open=hour, high=hour + 1, low=hour, close="%d.5" % hour, volume=10,
+                )
+                for hour in range(5)
+            )
+
+    def _body(self, response) -> str:
+        return b"".join(response.streaming_content).decode()
+
+    def test_streams_filtered_candles_as_csv(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            reverse("datafeed-export"),
+            {"dataset": "candles", "symbols": "ethusdt", "start": (self.START + timedelta(hours=1)).isoformat()},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="candles.csv"')
+        lines = self._body(response).splitlines()
+        self.assertEqual(lines[0], "symbol,timeframe,timestamp,open,high,low,close,volume")
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[1].split(",")[:3], ["ETHUSDT", "1h", "2024-01-01T01:00:00+00:00"])
+        self.assertEqual(float(lines[1].split(",")[6]), 1.5)
+
+    def test_export_is_yielded_chunk_by_chunk(self):
+        parts = list(export("candles", chunk_size=3))
+        self.assertEqual(len(parts), 4)  # 10 rows in chunks of 3
+        self.assertEqual("".join(part.decode() for part in parts).count("\n"), 11)
+
+    def test_requires_authentication_and_valid_parameters(self):
+        url = reverse("datafeed-export")
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url, {"dataset": "orders"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"file_format": "xlsx"}).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValueError):
+            export("orders")
+
+    def test_trades_only_include_visible_runs(self):
+        from apps.analytics.models import BacktestRun, Trade
+
+        other = get_user_model().objects.create_user("other", password="x")
+        for owner in (self.user, other):
+            run = BacktestRun.objects.create(owner=owner, symbol=self.eth, strategy_key="hma-sma", timeframe="1h")
+            Trade.objects.create(run=run, direction="long", entry_time=self.START, entry_price=1, return_pct=0.5)
+        self.client.force_authenticate(self.user)
+        lines = self._body(self.client.get(reverse("datafeed-export"), {"dataset": "trades"})).splitlines()
+        self.assertEqual(lines[0], ",".join(DATASETS["trades"].columns))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1].split(",")[1:3], ["ETHUSDT", "hma-sma"])
+
+    def test_parquet_round_trip(self):
+        if not parquet_available():
+            self.skipTest("pyarrow is not installed")
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(b"".join(export("candles", "parquet", chunk_size=4))))
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.column_names, list(DATASETS["candles"].columns))
+
+    def test_parquet_schema_comes_from_model_fields(self):
+        types = dict(zip(DATASETS["trades"].columns, DATASETS["trades"].field_types()))
+        self.assertEqual(types["run_id"], "BigAutoField")
+        self.assertEqual(types["symbol"], "CharField")
+        self.assertEqual((types["exit_time"], types["exit_price"]), ("DateTimeField", "DecimalField"))
+        if not parquet_available():
+            self.skipTest("pyarrow is not installed")
+        import pyarrow.parquet as pq
+
+        from apps.analytics.models import BacktestRun, Trade
+
+        run = BacktestRun.objects.create(owner=self.user, symbol=self.eth, strategy_key="hma-sma", timeframe="1h")
+        # The first chunk has only an open trade, so its exit columns are all None.
+        Trade.objects.create(run=run, direction="long", entry_time=self.START, entry_price=1)
+        Trade.objects.create(
+            run=run, direction="short", entry_time=self.START + timedelta(hours=1), entry_price=2,
+            exit_time=self.START + timedelta(hours=2), exit_price=1, exit_reason="take_profit", return_pct=0.5,
+        )
+        table = pq.read_table(io.BytesIO(b"".join(export("trades", "parquet", chunk_size=1))))
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(str(table.schema.field("exit_time").type), "timestamp[us, tz=UTC]")
+        self.assertEqual(table.column("exit_price").to_pylist(), [None, 1.0])
+
+    def test_command_writes_file(self):
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as directory:
+            target = Path(directory) / "candles.csv"
+            call_command("export_data", "candles", symbols="BTCUSDT", output=str(target), stderr=io.StringIO())
+            lines = target.read_text().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all(line.startswith("BTCUSDT,") for line in lines[1:]))
@@ -1,10 +1,15 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import CandleViewSet, SymbolViewSet, DivergenceViewSet
+from .views import CandleViewSet, DivergenceViewSet, ExportView, SymbolViewSet
 
 router = DefaultRouter()
 router.register(r"symbols", SymbolViewSet, basename="datafeed-symbol")
 router.register(r"candles", CandleViewSet, basename="datafeed-candle")
 router.register(r"divergences", DivergenceViewSet, basename="datafeed-divergence")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("export/", ExportView.as_view(), name="datafeed-export"),
+]
+
+urlpatterns += router.urls
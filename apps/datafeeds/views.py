@@ -1,24 +1,63 @@
 from datetime import datetime
 
+from django.http import StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
 from rest_framework import permissions, viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .export import DATASETS, FORMATS, export, parquet_available
 
 from .models import Candle, Symbol, Divergence
-from .serializers import CandleSerializer, SymbolSerializer, DivergenceSerializer
+from .pagination import CandlePagination, DivergencePagination
+from .serializers import (
+    CandleSerializer,
+    CompactCandleSerializer,
+    CompactDivergenceSerializer,
+    DivergenceSerializer,
+    SymbolSerializer,
+)
+
+
+class SymbolEnvelopeMixin:
+    """
+    ``?compact=1`` replaces the nested symbol of every row by its code and returns each
+    symbol of the page once, under ``symbols`` in the envelope.
+    """
+
+    compact_serializer_class = None
+
+    def is_compact(self) -> bool:
+        return self.request.query_params.get("compact", "").lower() in {"1", "true", "yes"}
+
+    def get_serializer_class(self):
+        if self.action == "list" and self.is_compact():
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.is_compact():
+            symbols = {row.symbol.code: row.symbol for row in self.paginator.page}
+            response.data["symbols"] = {code: SymbolSerializer(symbol).data for code, symbol in symbols.items()}
+        return response
 
 
 class SymbolViewSet(viewsets.ModelViewSet):
     queryset = Symbol.objects.all()
     serializer_class = SymbolSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = 3
 
 
-class CandleViewSet(viewsets.ReadOnlyModelViewSet):
+class CandleViewSet(SymbolEnvelopeMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Candle.objects.select_related("symbol").all()
     serializer_class = CandleSerializer
+    compact_serializer_class = CompactCandleSerializer
+    pagination_class = CandlePagination
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -26,7 +65,6 @@ class CandleViewSet(viewsets.ReadOnlyModelViewSet):
         timeframe = self.request.query_params.get("timeframe")
         start = self.request.query_params.get("start")
         end = self.request.query_params.get("end")
-        limit = self.request.query_params.get("limit")
 
         if symbol_code:
             qs = qs.filter(symbol__code__iexact=symbol_code)
@@ -38,14 +76,8 @@ class CandleViewSet(viewsets.ReadOnlyModelViewSet):
         if end:
             end_dt = self._parse_dt(end)
             qs = qs.filter(timestamp__lte=end_dt)
-        qs = qs.order_by("timestamp")
-        if limit:
-            try:
-                limit_value = int(limit)
-            except ValueError as exc:
-                raise ValidationError("limit must be an integer") from exc
-            qs = qs[:limit_value]
-        return qs
+        # Ordering and the page size (``page_size``/``limit``) are applied by CandlePagination.
+        return qs.order_by("timestamp", "id")
 
     @staticmethod
     def _parse_dt(value: str) -> datetime:
@@ -55,12 +87,15 @@ class CandleViewSet(viewsets.ReadOnlyModelViewSet):
         return parsed
 
 
-class DivergenceViewSet(viewsets.ReadOnlyModelViewSet):
+class DivergenceViewSet(SymbolEnvelopeMixin, viewsets.ReadOnlyModelViewSet):
     """API endpoint for retrieving divergences."""
     
     queryset = Divergence.objects.select_related("symbol").all()
     serializer_class = DivergenceSerializer
+    compact_serializer_class = CompactDivergenceSerializer
+    pagination_class = DivergencePagination
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -99,7 +134,7 @@ class DivergenceViewSet(viewsets.ReadOnlyModelViewSet):
                 end_timestamp__lte=end_dt
             )
         
-        return qs.order_by("start_timestamp")
+        return qs.order_by("start_timestamp", "id")
 
     @staticmethod
     def _parse_dt(value: str) -> datetime:
@@ -107,3 +142,42 @@ class DivergenceViewSet(viewsets.ReadOnlyModelViewSet):
         if parsed is None:
             raise ValidationError(f"Invalid datetime format: {value}")
         return parsed
+
+
+class ExportView(APIView):
+    """
+    Streams ``dataset`` (candles | divergences | trades) as CSV or Parquet.
+    Filters: ``symbols`` (comma-separated codes), ``start``, ``end``, ``timeframe``.
+    The encoding is ``file_format`` (csv | parquet); DRF reserves ``format`` for renderers.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3  # rows are read while streaming, after the middleware has returned
+    CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        dataset = params.get("dataset", "candles")
+        if dataset not in DATASETS:
+            raise ValidationError({"dataset": f"Choose one of: {', '.join(DATASETS)}."})
+        file_format = params.get("file_format", "csv")
+        if file_format not in FORMATS:
+            raise ValidationError({"file_format": f"Choose one of: {', '.join(FORMATS)}."})
+        if file_format == "parquet" and not parquet_available():
+            raise ValidationError({"file_format": "Parquet export needs pyarrow on the server."})
+
+        filters = {
+            "symbols": [code for code in params.get("symbols", "").split(",") if code],
+            "start": CandleViewSet._parse_dt(params["start"]) if params.get("start") else None,
+            "end": CandleViewSet._parse_dt(params["end"]) if params.get("end") else None,
+            "timeframe": params.get("timeframe") or None,
+        }
+        if dataset == "trades":
+            from apps.analytics.models import Trade
+            from apps.analytics.views import visible_runs
+
+            filters["queryset"] = Trade.objects.filter(run__in=visible_runs(request))
+
+        response = StreamingHttpResponse(export(dataset, file_format, **filters), content_type=self.CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.{file_format}"'
+        return response
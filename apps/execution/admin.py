@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Bot
+from .models import Bot, Fill, Order, Position
 
 
 @admin.register(Bot)
@@ -15,3 +15,24 @@ class BotAdmin(admin.ModelAdmin):
     )
     list_filter = ("status", "base_currency")
     search_fields = ("name", "strategy__name", "exchange_account__name")
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "symbol", "side", "order_type", "quantity", "price", "status", "placed_at")
+    list_filter = ("status", "side", "order_type")
+    search_fields = ("symbol__code", "tag", "oco_group")
+    raw_id_fields = ("bot", "run")
+
+
+@admin.register(Fill)
+class FillAdmin(admin.ModelAdmin):
+    list_display = ("order", "price", "quantity", "fee", "filled_at")
+    raw_id_fields = ("order",)
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ("symbol", "bot", "run", "quantity", "average_price", "realized_pnl", "updated_at")
+    search_fields = ("symbol__code",)
+    raw_id_fields = ("bot", "run")
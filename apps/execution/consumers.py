@@ -1,19 +1,101 @@
+import asyncio
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.exceptions import ValidationError
+
+from .models import Bot
+from .services import bot_group
+
+MAX_SUBSCRIPTIONS = 500
 
 
 class BotStatusConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams bot updates. ``ws/bots/<bot_id>/status/`` follows a single bot and receives
+    its changes as flat payloads (one per symbol for per-symbol decisions);
+    ``ws/bots/status/`` multiplexes many bots over one socket: the client sends
+    ``{"action": "subscribe", "bots": [...]}`` (or ``unsubscribe``) and receives
+    ``{"type": "bot.updates", "updates": {bot_id: changes}}`` per bot and batch, with
+    per-symbol changes nested under ``changes["symbols"][code]``. The socket joins the
+    ``bot_group`` of every bot it follows, so it only receives those bots' messages.
+    """
+
     async def connect(self):
-        self.bot_id = self.scope["url_route"]["kwargs"]["bot_id"]
-        self.group_name = f"bot_{self.bot_id}"
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        bot_id = self.scope["url_route"]["kwargs"].get("bot_id")
+        self.multiplexed = bot_id is None
+        self.subscriptions = set()
+        if bot_id is not None:
+            await self._join({str(bot_id)})
         await self.accept()
 
     async def disconnect(self, code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self._leave(set(self.subscriptions))
 
     async def receive_json(self, content, **kwargs):
-        # No inbound messages expected yet, but we log them for debugging.
-        await self.send_json({"type": "echo", "payload": content})
+        action = content.get("action") if isinstance(content, dict) else None
+        if not self.multiplexed or action not in {"subscribe", "unsubscribe"}:
+            # No other inbound messages expected yet, but we echo them for debugging.
+            await self.send_json({"type": "echo", "payload": content})
+            return
+
+        bots = _bot_ids(content.get("bots") or [])
+        if action == "unsubscribe":
+            await self._leave(bots & self.subscriptions)
+            await self.send_json({"type": "subscriptions", "bots": sorted(self.subscriptions)})
+            return
+
+        added = bots - self.subscriptions
+        if len(self.subscriptions) + len(added) > MAX_SUBSCRIPTIONS:
+            await self.send_json({"type": "error", "detail": f"At most {MAX_SUBSCRIPTIONS} bots per connection."})
+            return
+        await self._join(added)
+        await self.send_json({"type": "subscriptions", "bots": sorted(self.subscriptions)})
+        # Updates are deltas, so new subscribers start from the stored state.
+        snapshot = await self._snapshot(added)
+        if snapshot:
+            await self.send_json({"type": "bot.snapshot", "bots": snapshot})
+
+    async def bot_batch(self, event):
+        updates = event["updates"]
+        if self.multiplexed:
+            await self.send_json({"type": "bot.updates", "updates": updates})
+        else:
+            for changes in updates.values():
+                bot_wide = {key: value for key, value in changes.items() if key != "symbols"}
+                if bot_wide:
+                    await self.send_json(bot_wide)
+                for symbol, symbol_changes in changes.get("symbols", {}).items():
+                    await self.send_json({"symbol": symbol, **symbol_changes})
+
+    async def _join(self, bot_ids):
+        await asyncio.gather(*(self.channel_layer.group_add(bot_group(bot_id), self.channel_name) for bot_id in bot_ids))
+        self.subscriptions |= bot_ids
+
+    async def _leave(self, bot_ids):
+        self.subscriptions -= bot_ids
+        await asyncio.gather(
+            *(self.channel_layer.group_discard(bot_group(bot_id), self.channel_name) for bot_id in bot_ids)
+        )
+
+    @database_sync_to_async
+    def _snapshot(self, bot_ids):
+        rows = Bot.objects.filter(id__in=bot_ids).values("id", "status", "last_heartbeat_at")
+        return {
+            str(row["id"]): {
+                "status": row["status"],
+                "last_heartbeat_at": row["last_heartbeat_at"].isoformat() if row["last_heartbeat_at"] else None,
+            }
+            for row in rows
+        }
+
 
-    async def bot_update(self, event):
-        await self.send_json(event["payload"])
+def _bot_ids(values):
+    """Canonical ids of the valid bot ids in ``values``; anything else could not name a group."""
+    ids = set()
+    for value in values:
+        try:
+            ids.add(str(Bot._meta.pk.to_python(value)))
+        except ValidationError:
+            continue
+    return ids
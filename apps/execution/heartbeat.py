@@ -0,0 +1,139 @@
+"""
+Bot heartbeats and state checkpoints.
+
+The runtime writes heartbeats (plus its in-memory positions/indicator state) to the
+shared cache at high frequency with one ``set_many`` per interval. Periodic tasks then
+checkpoint them to the database in batched ``bulk_update`` calls and flag bots whose
+heartbeat went stale, so the write rate on PostgreSQL does not grow with tick rate.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone as django_timezone
+
+from .models import Bot
+from .services import notify_bot_update, notify_runtime
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_KEY_PREFIX = "bot:heartbeat:"
+# Entries outlive several stale windows so a crashed runtime is still detectable.
+HEARTBEAT_TTL_SECONDS = 24 * 3600
+FLUSH_BATCH_SIZE = 500
+
+
+def heartbeat_key(bot_id: str) -> str:
+    return f"{HEARTBEAT_KEY_PREFIX}{bot_id}"
+
+
+def record_heartbeats(states: Mapping[str, Optional[Dict[str, Any]]], at: Optional[float] = None) -> None:
+    """
+    Stores one heartbeat per bot in a single cache round trip.
+    A ``None`` state only refreshes the heartbeat and keeps the last checkpointed state.
+    """
+
+    if not states:
+        return
+    at = time.time() if at is None else at
+    cache.set_many(
+        {heartbeat_key(bot_id): {"at": at, "state": state} for bot_id, state in states.items()},
+        timeout=HEARTBEAT_TTL_SECONDS,
+    )
+
+
+def record_heartbeat(bot_id: str, state: Optional[Dict[str, Any]] = None, at: Optional[float] = None) -> None:
+    record_heartbeats({str(bot_id): state}, at=at)
+
+
+def read_heartbeats(bot_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    keys = {heartbeat_key(bot_id): str(bot_id) for bot_id in bot_ids}
+    if not keys:
+        return {}
+    return {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+
+def _as_datetime(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def flush_bot_state(bot_ids: Optional[Iterable[str]] = None, batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """
+    Checkpoints cached heartbeats/state of running bots (or ``bot_ids``) to the database.
+    Only bots whose cached heartbeat is newer than the stored one are written.
+    """
+
+    queryset = Bot.objects.only("id", "last_heartbeat_at", "state")
+    if bot_ids is None:
+        queryset = queryset.filter(status=Bot.Status.RUNNING)
+    else:
+        queryset = queryset.filter(id__in=list(bot_ids))
+    bots = list(queryset)
+    heartbeats = read_heartbeats(str(bot.id) for bot in bots)
+
+    dirty = []
+    for bot in bots:
+        entry = heartbeats.get(str(bot.id))
+        if entry is None:
+            continue
+        beat_at = _as_datetime(entry["at"])
+        if bot.last_heartbeat_at is not None and beat_at <= bot.last_heartbeat_at:
+            continue
+        bot.last_heartbeat_at = beat_at
+        if entry.get("state") is not None:
+            bot.state = entry["state"]
+        dirty.append(bot)
+
+    if dirty:
+        Bot.objects.bulk_update(dirty, ["last_heartbeat_at", "state"], batch_size=batch_size)
+    logger.debug("Flushed state for %s of %s bots", len(dirty), len(bots))
+    return len(dirty)
+
+
+def mark_stale_bots(stale_after: Optional[float] = None, now: Optional[float] = None) -> List[str]:
+    """
+    Marks running bots whose latest heartbeat (cached or stored) is older than
+    ``stale_after`` seconds as ``ERROR`` and returns their ids.
+    """
+
+    stale_after = settings.BOT_HEARTBEAT_STALE_SECONDS if stale_after is None else stale_after
+    now = time.time() if now is None else now
+    cutoff = now - stale_after
+
+    running = list(Bot.objects.filter(status=Bot.Status.RUNNING).values_list("id", "last_heartbeat_at"))
+    heartbeats = read_heartbeats(str(bot_id) for bot_id, _ in running)
+
+    stale = []
+    for bot_id, stored_at in running:
+        latest = stored_at.timestamp() if stored_at is not None else None
+        entry = heartbeats.get(str(bot_id))
+        if entry is not None and (latest is None or entry["at"] > latest):
+            latest = entry["at"]
+        if latest is None or latest < cutoff:
+            stale.append(str(bot_id))
+
+    if not stale:
+        return []
+
+    Bot.objects.filter(id__in=stale, status=Bot.Status.RUNNING).update(
+        status=Bot.Status.ERROR, updated_at=django_timezone.now()
+    )
+    logger.warning("Marking %s bots with stale heartbeats as error: %s", len(stale), ", ".join(stale[:20]))
+    for bot_id in stale:
+        entry = heartbeats.get(bot_id)
+        notify_bot_update(
+            bot_id,
+            {
+                "status": Bot.Status.ERROR,
+                "last_heartbeat_at": _as_datetime(entry["at"]).isoformat() if entry else None,
+                "reason": "heartbeat_stale",
+            },
+        )
+        notify_runtime("runtime.bot_stopped", bot_id)
+    return stale
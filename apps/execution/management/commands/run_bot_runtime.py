@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.execution.runtime import BotRuntime
+from apps.strategies.signals import DEFAULT_PERIOD
+
+
+class Command(BaseCommand):
+    help = "Run the long-lived bot runtime that evaluates running bots on every closed candle."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sma-period", dest="sma_period", type=int, default=DEFAULT_PERIOD)
+        parser.add_argument("--hma-period", dest="hma_period", type=int, default=DEFAULT_PERIOD)
+
+    def handle(self, *args, **options):
+        runtime = BotRuntime(sma_period=options["sma_period"], hma_period=options["hma_period"])
+        asyncio.run(self._serve(runtime))
+        self.stdout.write(self.style.SUCCESS(f"Bot runtime stopped. Latency: {runtime.latency.summary()}"))
+
+    async def _serve(self, runtime: BotRuntime) -> None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:  # pragma: no cover - Windows event loops
+                pass
+        self.stdout.write("Bot runtime listening for closed candles...")
+        await runtime.run(stop_event)
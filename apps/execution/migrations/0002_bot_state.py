@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execution', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bot',
+            name='state',
+            field=models.JSONField(blank=True, default=dict, help_text='Last checkpoint of the runtime state (positions, indicator values).'),
+        ),
+    ]
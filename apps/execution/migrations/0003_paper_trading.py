@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_equitycurve'),
+        ('datafeeds', '0002_divergence'),
+        ('execution', '0002_bot_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('side', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('order_type', models.CharField(choices=[('market', 'Market'), ('limit', 'Limit'), ('stop', 'Stop')], max_length=10)),
+                ('quantity', models.FloatField()),
+                ('price', models.FloatField(blank=True, help_text='Limit price or stop trigger.', null=True)),
+                ('oco_group', models.CharField(blank=True, help_text='Orders cancelled when a sibling fills.', max_length=64)),
+                ('tag', models.CharField(blank=True, help_text='Purpose, e.g. entry, stop_loss, take_profit.', max_length=40)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('filled', 'Filled'), ('cancelled', 'Cancelled')], default='open', max_length=10)),
+                ('placed_at', models.DateTimeField()),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('bot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='execution.bot')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='analytics.backtestrun')),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paper_orders', to='datafeeds.symbol')),
+            ],
+            options={
+                'ordering': ('-placed_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Fill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.FloatField()),
+                ('quantity', models.FloatField()),
+                ('fee', models.FloatField(default=0)),
+                ('filled_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fills', to='execution.order')),
+            ],
+            options={
+                'ordering': ('filled_at', 'id'),
+            },
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.FloatField(default=0)),
+                ('average_price', models.FloatField(default=0)),
+                ('realized_pnl', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='execution.bot')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='analytics.backtestrun')),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paper_positions', to='datafeeds.symbol')),
+            ],
+            options={
+                'ordering': ('symbol',),
+                'indexes': [models.Index(fields=['bot', 'symbol'], name='execution_p_bot_id_5adf3d_idx'), models.Index(fields=['run', 'symbol'], name='execution_p_run_id_b86995_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['bot', 'placed_at'], name='execution_o_bot_id_44b147_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['run', 'placed_at'], name='execution_o_run_id_994f14_idx'),
+        ),
+    ]
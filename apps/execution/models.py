@@ -31,6 +31,11 @@ class Bot(models.Model):
         default=Status.IDLE,
     )
     last_heartbeat_at = models.DateTimeField(null=True, blank=True)
+    state = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Last checkpoint of the runtime state (positions, indicator values).",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -39,3 +44,90 @@ class Bot(models.Model):
 
     def __str__(self) -> str:
         return f"{self.name} ({self.strategy})"
+
+
+class Order(models.Model):
+    """Paper-trading order placed by a live bot or by a historical replay (backtest run)."""
+
+    class Side(models.TextChoices):
+        BUY = "buy", "Buy"
+        SELL = "sell", "Sell"
+
+    class Type(models.TextChoices):
+        MARKET = "market", "Market"
+        LIMIT = "limit", "Limit"
+        STOP = "stop", "Stop"
+
+    class Status(models.TextChoices):
+        OPEN = "open", "Open"
+        FILLED = "filled", "Filled"
+        CANCELLED = "cancelled", "Cancelled"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    bot = models.ForeignKey(Bot, null=True, blank=True, on_delete=models.CASCADE, related_name="orders")
+    run = models.ForeignKey(
+        "analytics.BacktestRun",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="orders",
+    )
+    symbol = models.ForeignKey("datafeeds.Symbol", on_delete=models.CASCADE, related_name="paper_orders")
+    side = models.CharField(max_length=4, choices=Side.choices)
+    order_type = models.CharField(max_length=10, choices=Type.choices)
+    quantity = models.FloatField()
+    price = models.FloatField(null=True, blank=True, help_text="Limit price or stop trigger.")
+    oco_group = models.CharField(max_length=64, blank=True, help_text="Orders cancelled when a sibling fills.")
+    tag = models.CharField(max_length=40, blank=True, help_text="Purpose, e.g. entry, stop_loss, take_profit.")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    placed_at = models.DateTimeField()
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-placed_at",)
+        indexes = [
+            models.Index(fields=["bot", "placed_at"]),
+            models.Index(fields=["run", "placed_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.side} {self.quantity} {self.symbol_id} ({self.order_type}, {self.status})"
+
+
+class Fill(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="fills")
+    price = models.FloatField()
+    quantity = models.FloatField()
+    fee = models.FloatField(default=0)
+    filled_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("filled_at", "id")
+
+    def __str__(self) -> str:
+        return f"{self.quantity} @ {self.price} ({self.order_id})"
+
+
+class Position(models.Model):
+    """Net paper position per bot (or replay run) and symbol; quantity is signed."""
+
+    bot = models.ForeignKey(Bot, null=True, blank=True, on_delete=models.CASCADE, related_name="positions")
+    run = models.ForeignKey(
+        "analytics.BacktestRun",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="positions",
+    )
+    symbol = models.ForeignKey("datafeeds.Symbol", on_delete=models.CASCADE, related_name="paper_positions")
+    quantity = models.FloatField(default=0)
+    average_price = models.FloatField(default=0)
+    realized_pnl = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("symbol",)
+        indexes = [models.Index(fields=["bot", "symbol"]), models.Index(fields=["run", "symbol"])]
+
+    def __str__(self) -> str:
+        return f"{self.quantity} {self.symbol_id} @ {self.average_price}"
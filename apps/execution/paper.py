@@ -0,0 +1,555 @@
+"""
+Event-driven paper-trading engine.
+
+``MatchingEngine`` keeps pending stop/limit orders per symbol in price-ordered heaps, so
+each candle or tick only inspects the top of four heaps: O(1) when nothing triggers and
+O(log n) per fill. Market orders fill at the next event's open. Fills update in-memory
+positions and are handed to an optional sink (``FillRecorder`` persists them in batches).
+
+The same engine serves live bots (``BotRuntime``) and historical replays (``replay_bars``):
+persisted backtest runs replay their strategy's decisions through it (``replay_decisions``).
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Protocol, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+from apps.datafeeds.models import Symbol
+
+from .models import Fill, Order, Position
+
+logger = logging.getLogger(__name__)
+
+BUY = 1
+SELL = -1
+MARKET = "market"
+LIMIT = "limit"
+STOP = "stop"
+OPEN = "open"
+FILLED = "filled"
+CANCELLED = "cancelled"
+
+
+@dataclass(slots=True, eq=False)
+class SimOrder:
+    id: str
+    account: str
+    symbol: str
+    side: int
+    order_type: str
+    quantity: float
+    price: Optional[float]
+    placed_at: int
+    oco: Optional[str] = None
+    tag: str = ""
+    status: str = OPEN
+    closed_at: Optional[int] = None
+
+
+@dataclass(slots=True)
+class SimFill:
+    order: SimOrder
+    price: float
+    quantity: float
+    fee: float
+    timestamp: int
+    # The account's position in the symbol right after this fill.
+    position_quantity: float = 0.0
+    position_average_price: float = 0.0
+    position_realized_pnl: float = 0.0
+
+
+@dataclass(slots=True)
+class PositionState:
+    quantity: float = 0.0
+    average_price: float = 0.0
+    realized_pnl: float = 0.0
+
+    def apply(self, side: int, quantity: float, price: float, fee: float) -> None:
+        delta = side * quantity
+        current = self.quantity
+        if current == 0 or (current > 0) == (delta > 0):
+            total = current + delta
+            self.average_price = (current * self.average_price + delta * price) / total
+            self.quantity = total
+        else:
+            closing = min(abs(delta), abs(current))
+            self.realized_pnl += closing * (price - self.average_price) * (1 if current > 0 else -1)
+            self.quantity = current + delta
+            if abs(self.quantity) < 1e-12:
+                self.quantity = 0.0
+                self.average_price = 0.0
+            elif (self.quantity > 0) != (current > 0):
+                # Flipped through zero: the remainder opens at the fill price.
+                self.average_price = price
+        self.realized_pnl -= fee
+
+
+class FillSink(Protocol):
+    def order_placed(self, order: SimOrder) -> None: ...
+
+    def order_closed(self, order: SimOrder) -> None: ...
+
+    def fill(self, fill: SimFill, position: PositionState) -> None: ...
+
+
+class _Book:
+    __slots__ = ("market", "buy_stops", "sell_stops", "buy_limits", "sell_limits")
+
+    def __init__(self):
+        self.market: List[SimOrder] = []
+        # Heap keys put the first order to trigger on top:
+        # buy stops lowest trigger, sell stops highest, buy limits highest, sell limits lowest.
+        self.buy_stops: List[Tuple[float, int, SimOrder]] = []
+        self.sell_stops: List[Tuple[float, int, SimOrder]] = []
+        self.buy_limits: List[Tuple[float, int, SimOrder]] = []
+        self.sell_limits: List[Tuple[float, int, SimOrder]] = []
+
+
+class MatchingEngine:
+    """
+    In-memory matching core. Within one bar orders are processed as: market orders at the
+    open, then stops, then limits, so when a stop and a take-profit of the same OCO group
+    both trigger the stop wins (pessimistic, like the backtests).
+    """
+
+    def __init__(self, slippage_bps: float = 0.0, fee_bps: float = 0.0, sink: Optional[FillSink] = None):
+        self.slippage = slippage_bps / 10_000
+        self.fee_rate = fee_bps / 10_000
+        self.sink = sink
+        self.events = 0
+        self.fills = 0
+        self.positions: Dict[Tuple[str, str], PositionState] = {}
+        self._books: Dict[str, _Book] = {}
+        self._orders: Dict[str, SimOrder] = {}
+        self._oco: Dict[str, List[SimOrder]] = {}
+        self._seq = itertools.count()
+        self._clock = 0
+
+    # ------------------------------------------------------------------ orders
+    def submit(
+        self,
+        account: str,
+        symbol: str,
+        side: int,
+        quantity: float,
+        order_type: str = MARKET,
+        price: Optional[float] = None,
+        oco: Optional[str] = None,
+        tag: str = "",
+        timestamp: Optional[int] = None,
+    ) -> SimOrder:
+        if side not in (BUY, SELL):
+            raise ValueError("Side must be BUY (1) or SELL (-1).")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive.")
+        if order_type != MARKET and price is None:
+            raise ValueError(f"A {order_type} order requires a price.")
+        order = SimOrder(
+            id=str(uuid4()),
+            account=account,
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            quantity=quantity,
+            price=price,
+            placed_at=self._clock if timestamp is None else timestamp,
+            oco=oco,
+            tag=tag,
+        )
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _Book()
+        seq = next(self._seq)
+        if order_type == MARKET:
+            book.market.append(order)
+        elif order_type == STOP:
+            if side == BUY:
+                heapq.heappush(book.buy_stops, (price, seq, order))
+            else:
+                heapq.heappush(book.sell_stops, (-price, seq, order))
+        elif order_type == LIMIT:
+            if side == BUY:
+                heapq.heappush(book.buy_limits, (-price, seq, order))
+            else:
+                heapq.heappush(book.sell_limits, (price, seq, order))
+        else:
+            raise ValueError(f"Unknown order type '{order_type}'.")
+        self._orders[order.id] = order
+        if oco:
+            self._oco.setdefault(oco, []).append(order)
+        if self.sink is not None:
+            self.sink.order_placed(order)
+        return order
+
+    def cancel(self, order_id: str, timestamp: Optional[int] = None) -> bool:
+        """Cancels an open order; it is dropped lazily when it reaches the top of its heap."""
+        order = self._orders.pop(order_id, None)
+        if order is None or order.status != OPEN:
+            return False
+        order.status = CANCELLED
+        order.closed_at = self._clock if timestamp is None else timestamp
+        if self.sink is not None:
+            self.sink.order_closed(order)
+        return True
+
+    def open_orders(self, account: Optional[str] = None, symbol: Optional[str] = None) -> List[SimOrder]:
+        return [
+            order
+            for order in self._orders.values()
+            if (account is None or order.account == account) and (symbol is None or order.symbol == symbol)
+        ]
+
+    def position(self, account: str, symbol: str) -> PositionState:
+        state = self.positions.get((account, symbol))
+        if state is None:
+            state = self.positions[(account, symbol)] = PositionState()
+        return state
+
+    # ------------------------------------------------------------------ events
+    def on_bar(self, symbol: str, timestamp: int, open_: float, high: float, low: float, close: float) -> List[SimFill]:
+        self.events += 1
+        self._clock = timestamp
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+
+        fills: List[SimFill] = []
+        if book.market:
+            pending, book.market = book.market, []
+            for order in pending:
+                if order.status == OPEN:
+                    fills.append(self._fill(order, open_ * (1 + order.side * self.slippage), timestamp))
+
+        heap = book.buy_stops
+        while heap and heap[0][0] <= high:
+            order = heapq.heappop(heap)[2]
+            if order.status == OPEN:
+                price = order.price if order.price > open_ else open_  # Gapped through: fill at the open.
+                fills.append(self._fill(order, price * (1 + self.slippage), timestamp))
+        heap = book.sell_stops
+        while heap and -heap[0][0] >= low:
+            order = heapq.heappop(heap)[2]
+            if order.status == OPEN:
+                price = order.price if order.price < open_ else open_
+                fills.append(self._fill(order, price * (1 - self.slippage), timestamp))
+        heap = book.buy_limits
+        while heap and -heap[0][0] >= low:
+            order = heapq.heappop(heap)[2]
+            if order.status == OPEN:
+                fills.append(self._fill(order, order.price if order.price < open_ else open_, timestamp))
+        heap = book.sell_limits
+        while heap and heap[0][0] <= high:
+            order = heapq.heappop(heap)[2]
+            if order.status == OPEN:
+                fills.append(self._fill(order, order.price if order.price > open_ else open_, timestamp))
+        return fills
+
+    def on_tick(self, symbol: str, timestamp: int, price: float) -> List[SimFill]:
+        return self.on_bar(symbol, timestamp, price, price, price, price)
+
+    def _fill(self, order: SimOrder, price: float, timestamp: int) -> SimFill:
+        order.status = FILLED
+        order.closed_at = timestamp
+        self._orders.pop(order.id, None)
+        fee = price * order.quantity * self.fee_rate
+        position = self.position(order.account, order.symbol)
+        position.apply(order.side, order.quantity, price, fee)
+        fill = SimFill(
+            order=order,
+            price=price,
+            quantity=order.quantity,
+            fee=fee,
+            timestamp=timestamp,
+            position_quantity=position.quantity,
+            position_average_price=position.average_price,
+            position_realized_pnl=position.realized_pnl,
+        )
+        self.fills += 1
+        if self.sink is not None:
+            self.sink.fill(fill, position)
+        if order.oco:
+            for sibling in self._oco.pop(order.oco, ()):
+                if sibling is not order and sibling.status == OPEN:
+                    self.cancel(sibling.id, timestamp)
+        return fill
+
+
+BarCallback = Callable[[MatchingEngine, str, int, float, float, float, float, List[SimFill]], None]
+
+
+REPLAY_CHUNK = 4096
+
+
+def replay_bars(
+    engine: MatchingEngine,
+    timestamps: np.ndarray,
+    bars: Mapping[str, Sequence[np.ndarray]],
+    on_bar: Optional[BarCallback] = None,
+) -> int:
+    """
+    Replays aligned OHLC arrays (``bars[symbol] = (open, high, low, close)``, one value per
+    timestamp, NaN for missing bars) through ``engine`` in time order, symbol by symbol.
+    ``on_bar`` runs after each bar's fills and may submit orders for the next bar.
+    Returns the number of events processed.
+    """
+
+    symbols = list(bars)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    process = engine.on_bar
+    events = 0
+    # Arrays are converted to Python floats chunk by chunk: element access on lists is far
+    # cheaper than on NumPy scalars, and chunking keeps memory flat for long replays.
+    for start in range(0, timestamps.shape[0], REPLAY_CHUNK):
+        end = start + REPLAY_CHUNK
+        columns = [
+            [np.asarray(column[start:end], dtype=float).tolist() for column in bars[symbol]]
+            for symbol in symbols
+        ]
+        for i, timestamp in enumerate(timestamps[start:end].tolist()):
+            for symbol, (opens, highs, lows, closes) in zip(symbols, columns):
+                close = closes[i]
+                if close != close:  # NaN: no bar for this symbol at this time.
+                    continue
+                fills = process(symbol, timestamp, opens[i], highs[i], lows[i], close)
+                events += 1
+                if on_bar is not None:
+                    on_bar(engine, symbol, timestamp, opens[i], highs[i], lows[i], close, fills)
+    return events
+
+
+def replay_decisions(
+    engine: MatchingEngine,
+    account: str,
+    symbol: str,
+    timestamps: np.ndarray,
+    bars: Sequence[np.ndarray],
+    decisions: Iterable[Mapping[str, Any]],
+    notional: float,
+) -> List[Dict[str, Any]]:
+    """
+    Replays a strategy's entry/exit markers (the run view's ``entries``) for one symbol
+    through ``engine``. A marker on bar ``t`` becomes a market order filled at the open of
+    ``t + 1``; an entry's ``stop_loss``/``take_profit`` become an OCO bracket, so those exits
+    fill where the engine's bar matching puts them. Returns the fills as markers in the same
+    format (fill time and price, exits with their reason), ready for ``pair_entries``.
+    """
+
+    pending: Dict[int, List[Mapping[str, Any]]] = {}
+    for decision in decisions:
+        pending.setdefault(int(decision["timestamp"].timestamp()), []).append(decision)
+    markers: List[Dict[str, Any]] = []
+    meta: Dict[str, Tuple[str, str]] = {}  # order id -> (marker direction, exit reason)
+    held: Optional[str] = None  # Side of the position opened or being opened.
+
+    def on_bar(engine, code, timestamp, open_, high, low, close, fills):
+        nonlocal held
+        for fill in fills:
+            direction, reason = meta.pop(fill.order.id, (None, ""))
+            if direction is None:
+                continue
+            marker = {"timestamp": _as_datetime(fill.timestamp), "direction": direction, "price": fill.price}
+            if direction.endswith("_exit"):
+                marker["reason"] = reason
+                if held == direction[: -len("_exit")]:
+                    held = None
+            markers.append(marker)
+        # Exits come before entries in each bar's markers, so a reversal closes, then opens.
+        for decision in pending.pop(timestamp, ()):
+            direction = decision["direction"]
+            if direction.endswith("_exit"):
+                side = direction[: -len("_exit")]
+                quantity = engine.position(account, code).quantity
+                if held != side or quantity == 0:
+                    continue  # Already closed by the bracket.
+                for order in engine.open_orders(account, code):
+                    engine.cancel(order.id, timestamp)
+                    meta.pop(order.id, None)
+                order = engine.submit(account, code, SELL if quantity > 0 else BUY, abs(quantity), tag=direction)
+                meta[order.id] = (direction, decision.get("reason") or "")
+                held = None
+            elif direction in ("long", "short") and held is None:
+                side = BUY if direction == "long" else SELL
+                order = engine.submit(account, code, side, notional / close, tag=direction)
+                meta[order.id] = (direction, "")
+                held = direction
+                bracket = order.id
+                for order_type, price, reason in (
+                    (STOP, decision.get("stop_loss"), "stop_loss"),
+                    (LIMIT, decision.get("take_profit"), "take_profit"),
+                ):
+                    if price is not None:
+                        leg = engine.submit(
+                            account, code, -side, notional / close, order_type, float(price), oco=bracket, tag=reason
+                        )
+                        meta[leg.id] = (f"{direction}_exit", reason)
+
+    replay_bars(engine, timestamps, {symbol: bars}, on_bar)
+    return markers
+
+
+def _as_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+@dataclass
+class RecordedBatch:
+    """Snapshot of buffered engine activity, written by ``FillRecorder.write``."""
+
+    new_orders: List[SimOrder]
+    closed_orders: List[SimOrder]
+    fills: List[SimFill]
+    positions: Dict[Tuple[str, str], Tuple[float, float, float]]
+
+    def __bool__(self) -> bool:
+        return bool(self.new_orders or self.closed_orders or self.fills or self.positions)
+
+
+class FillRecorder:
+    """
+    ``FillSink`` that buffers orders, fills and positions and writes them with
+    ``bulk_create``/``bulk_update`` every ``batch_size`` fills (and on ``flush``).
+    Orders belong to ``run`` when given, otherwise the engine account is the bot id.
+
+    Async callers pass ``batch_size=None`` and call ``drain()`` inside the event loop,
+    then ``write()`` in a worker thread, so buffers are never shared across threads.
+    """
+
+    def __init__(self, run=None, batch_size: Optional[int] = 5000):
+        self.run_id = run.pk if run is not None else None
+        self.batch_size = batch_size
+        self._symbols: Dict[str, int] = {}
+        self._new_orders: Dict[str, SimOrder] = {}
+        self._closed_orders: Dict[str, SimOrder] = {}
+        self._fills: List[SimFill] = []
+        self._positions: Dict[Tuple[str, str], PositionState] = {}
+
+    def order_placed(self, order: SimOrder) -> None:
+        self._new_orders[order.id] = order
+
+    def order_closed(self, order: SimOrder) -> None:
+        if order.id not in self._new_orders:
+            self._closed_orders[order.id] = order
+
+    def fill(self, fill: SimFill, position: PositionState) -> None:
+        self.order_closed(fill.order)
+        self._fills.append(fill)
+        self._positions[(fill.order.account, fill.order.symbol)] = position
+        if self.batch_size is not None and len(self._fills) >= self.batch_size:
+            self.flush()
+
+    def drain(self) -> RecordedBatch:
+        batch = RecordedBatch(
+            new_orders=[self._copy(order) for order in self._new_orders.values()],
+            closed_orders=[self._copy(order) for order in self._closed_orders.values()],
+            fills=self._fills,
+            positions={
+                key: (state.quantity, state.average_price, state.realized_pnl)
+                for key, state in self._positions.items()
+            },
+        )
+        self._new_orders = {}
+        self._closed_orders = {}
+        self._fills = []
+        self._positions = {}
+        return batch
+
+    def flush(self) -> int:
+        return self.write(self.drain())
+
+    def write(self, batch: RecordedBatch) -> int:
+        """Persists ``batch`` in one transaction; returns the number of fills written."""
+        if not batch:
+            return 0
+        self._resolve_symbols({order.symbol for order in batch.new_orders} | {key[1] for key in batch.positions})
+        size = self.batch_size or 5000
+        with transaction.atomic():
+            Order.objects.bulk_create([self._order_row(order) for order in batch.new_orders], batch_size=size)
+            if batch.closed_orders:
+                rows = [
+                    Order(id=order.id, status=order.status, closed_at=_as_datetime(order.closed_at))
+                    for order in batch.closed_orders
+                ]
+                Order.objects.bulk_update(rows, ["status", "closed_at"], batch_size=size)
+            Fill.objects.bulk_create(
+                [
+                    Fill(
+                        order_id=fill.order.id,
+                        price=fill.price,
+                        quantity=fill.quantity,
+                        fee=fill.fee,
+                        filled_at=_as_datetime(fill.timestamp),
+                    )
+                    for fill in batch.fills
+                ],
+                batch_size=size,
+            )
+            self._write_positions(batch.positions)
+        return len(batch.fills)
+
+    @staticmethod
+    def _copy(order: SimOrder) -> SimOrder:
+        # Status may still change in the engine after the snapshot is taken.
+        return SimOrder(**{name: getattr(order, name) for name in SimOrder.__slots__})
+
+    def _order_row(self, order: SimOrder) -> Order:
+        return Order(
+            id=order.id,
+            bot_id=None if self.run_id else order.account,
+            run_id=self.run_id,
+            symbol_id=self._symbols[order.symbol],
+            side=Order.Side.BUY if order.side == BUY else Order.Side.SELL,
+            order_type=order.order_type,
+            quantity=order.quantity,
+            price=order.price,
+            oco_group=order.oco or "",
+            tag=order.tag,
+            status=order.status,
+            placed_at=_as_datetime(order.placed_at),
+            closed_at=_as_datetime(order.closed_at) if order.closed_at is not None else None,
+        )
+
+    def _write_positions(self, positions: Dict[Tuple[str, str], Tuple[float, float, float]]) -> None:
+        if not positions:
+            return
+        owner_field = "run_id" if self.run_id else "bot_id"
+        owners = {self.run_id} if self.run_id else {account for account, _ in positions}
+        existing = {
+            (str(getattr(row, owner_field)), row.symbol_id): row
+            for row in Position.objects.filter(**{f"{owner_field}__in": owners})
+        }
+        now = django_timezone.now()
+        to_create, to_update = [], []
+        for (account, symbol), (quantity, average_price, realized_pnl) in positions.items():
+            owner = self.run_id or account
+            row = existing.get((str(owner), self._symbols[symbol]))
+            if row is None:
+                row = Position(symbol_id=self._symbols[symbol], **{owner_field: owner})
+                to_create.append(row)
+            else:
+                to_update.append(row)
+            row.quantity = quantity
+            row.average_price = average_price
+            row.realized_pnl = realized_pnl
+            row.updated_at = now
+        Position.objects.bulk_create(to_create)
+        Position.objects.bulk_update(to_update, ["quantity", "average_price", "realized_pnl", "updated_at"])
+
+    def _resolve_symbols(self, codes: Iterable[str]) -> None:
+        missing = {code for code in codes if code not in self._symbols}
+        if missing:
+            for pk, code in Symbol.objects.filter(code__in=missing).values_list("pk", "code"):
+                self._symbols[code] = pk
+        unknown = missing - set(self._symbols)
+        if unknown:
+            raise ValueError(f"Unknown symbols: {', '.join(sorted(unknown))}")
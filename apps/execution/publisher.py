@@ -0,0 +1,99 @@
+"""
+Coalescing publisher for high-frequency bot updates.
+
+Updates are merged per bot during a short window (latest value wins per key) and only
+the keys that changed since the previous batch are sent, as one ``group_send`` per bot to
+that bot's group (``bot_group``). A bot ticking a hundred times per window therefore costs
+one message, and it reaches only the sockets subscribed to that bot.
+
+Payloads that carry a ``symbol`` (the runtime's decisions) are merged per ``(bot, symbol)``
+instead. All symbols close on the same 5m boundary, so a bot's decisions for BTCUSDT and
+ETHUSDT land in the same window and must not overwrite each other. They are sent under
+``"symbols"``: ``{bot_id: {<bot-wide changes>, "symbols": {code: changes}}}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .services import bot_batch_event, bot_group
+
+logger = logging.getLogger(__name__)
+
+
+class BotUpdatePublisher:
+    def __init__(self, channel_layer=None, window: Optional[float] = None):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.window = settings.BOT_UPDATE_WINDOW_SECONDS if window is None else window
+        self.published = 0
+        self.batches_sent = 0
+        self.messages_sent = 0
+        # Keyed by (bot_id, symbol); bot-wide updates use symbol None.
+        self._pending: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._last_sent: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._timer: Optional[asyncio.Task] = None
+
+    async def publish(self, bot_id: str, payload: Dict[str, Any]) -> None:
+        """Queues ``payload`` for ``bot_id``; it goes out with the next batch."""
+        self._pending.setdefault((str(bot_id), payload.get("symbol")), {}).update(payload)
+        self.published += 1
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def flush(self) -> int:
+        """Sends the pending deltas now. Returns the number of bots included."""
+        pending, self._pending = self._pending, {}
+        updates: Dict[str, Dict[str, Any]] = {}
+        for (bot_id, symbol), state in pending.items():
+            previous = self._last_sent.setdefault((bot_id, symbol), {})
+            delta = {key: value for key, value in state.items() if key not in previous or previous[key] != value}
+            if not delta:
+                continue
+            previous.update(delta)
+            changes = updates.setdefault(bot_id, {})
+            if symbol is None:
+                changes.update(delta)
+            else:
+                changes.setdefault("symbols", {})[symbol] = delta
+        if not updates or self.channel_layer is None:
+            return 0
+        results = await asyncio.gather(
+            *(
+                self.channel_layer.group_send(bot_group(bot_id), bot_batch_event({bot_id: changes}))
+                for bot_id, changes in updates.items()
+            ),
+            return_exceptions=True,
+        )
+        sent = 0
+        for bot_id, result in zip(updates, results):
+            if isinstance(result, BaseException):
+                logger.error("Failed to publish updates for bot %s", bot_id, exc_info=result)
+            else:
+                sent += 1
+        self.messages_sent += sent
+        if sent:
+            self.batches_sent += 1
+        return sent
+
+    def forget(self, bot_id: str) -> None:
+        """Drops delta tracking for a bot so its next update is sent in full."""
+        bot_id = str(bot_id)
+        self._pending = {key: state for key, state in self._pending.items() if key[0] != bot_id}
+        self._last_sent = {key: state for key, state in self._last_sent.items() if key[0] != bot_id}
+
+    async def close(self) -> None:
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
+        await self.flush()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        # Updates published while this batch is in flight schedule the next one.
+        self._timer = None
+        await self.flush()
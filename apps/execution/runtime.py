@@ -0,0 +1,546 @@
+"""
+Long-running bot runtime.
+
+A single asyncio service subscribes to ``candle.closed`` events for every symbol in
+the ``quote_universe`` of the running bots, keeps streaming indicator state per symbol
+(O(1) per candle) and pushes a decision for each bot on every closed trigger candle.
+
+That streaming state covers strategy 1 (SMA 5m against HMA 1h/4h) only. Bots whose
+strategy asks for anything else are refused (``live_strategy_error``) rather than
+trading on strategy 1's signals.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from apps.datafeeds.models import Candle, Symbol
+from apps.datafeeds.services import market_group_name
+from apps.risk.engine import RiskEngine, load_risk_settings, persist_risk_states
+from apps.strategies.incremental import RollingHMA, RollingSMA
+from apps.strategies.registry import DEFAULT_STRATEGY
+from apps.strategies.rules import has_rules
+from apps.strategies.signals import DEFAULT_PERIOD, SignalResult, evaluate_signal_from_values
+
+from .heartbeat import record_heartbeats
+from .models import Bot
+from .paper import BUY, SELL, FillRecorder, MatchingEngine, SimFill
+from .publisher import BotUpdatePublisher
+from .services import RUNTIME_GROUP
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_TIMEFRAME = "5m"
+TREND_TIMEFRAMES = ("1h", "4h")
+LATENCY_TARGET_MS = 50.0
+# Strategies ``_decide`` implements.
+LIVE_STRATEGIES = (DEFAULT_STRATEGY,)
+
+Notifier = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def normalize_symbol_code(value: str) -> str:
+    """Bots list pairs as ``BTC/USDT``; candles are keyed by ``BTCUSDT``."""
+    return value.replace("/", "").replace("-", "").upper()
+
+
+def bot_strategy_key(slug: str, config: Optional[Dict[str, Any]]) -> str:
+    """Strategy a bot trades: its rule set (by slug) or the registered key in ``config["strategy"]``."""
+    config = config or {}
+    return slug if has_rules(config) else str(config.get("strategy", DEFAULT_STRATEGY))
+
+
+def live_strategy_error(slug: str, config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Why a bot with this strategy cannot run live, or None when it can."""
+    key = bot_strategy_key(slug, config)
+    if key in LIVE_STRATEGIES:
+        return None
+    return f"Strategy '{key}' cannot run live; bots only trade strategy {', '.join(LIVE_STRATEGIES)}."
+
+
+class LatencyTracker:
+    """Rolling window of candle-to-decision latencies (milliseconds)."""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, value_ms: float) -> None:
+        self._samples.append(value_ms)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self._samples:
+            return {"count": 0, "p50": None, "p95": None, "max": None}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "count": len(ordered),
+            "p50": ordered[int(last * 0.50)],
+            "p95": ordered[int(last * 0.95)],
+            "max": ordered[-1],
+        }
+
+
+class SymbolState:
+    """Streaming SMA (5m) and HMA (1h/4h) state for one symbol."""
+
+    def __init__(self, code: str, sma_period: int = DEFAULT_PERIOD, hma_period: int = DEFAULT_PERIOD):
+        self.code = code
+        self.sma_period = sma_period
+        self.hma_period = hma_period
+        self.sma_5m = RollingSMA(sma_period)
+        self.hma = {timeframe: RollingHMA(hma_period) for timeframe in TREND_TIMEFRAMES}
+        self.last_close: Dict[str, float] = {}
+        self.last_time: Dict[str, int] = {}
+        self.last_open_5m: Optional[float] = None
+
+    def warmup_length(self, timeframe: str) -> int:
+        if timeframe == TRIGGER_TIMEFRAME:
+            return self.sma_period
+        return self.hma[timeframe].warmup
+
+    def update(self, timeframe: str, candle: Dict[str, Any]) -> bool:
+        """Feeds one closed candle; stale or duplicate candles are ignored."""
+        candle_time = int(candle["time"])
+        if candle_time <= self.last_time.get(timeframe, -1):
+            return False
+        close = float(candle["close"])
+        if timeframe == TRIGGER_TIMEFRAME:
+            self.sma_5m.update(close)
+            self.last_open_5m = float(candle["open"])
+        elif timeframe in self.hma:
+            self.hma[timeframe].update(close)
+        else:
+            return False
+        self.last_close[timeframe] = close
+        self.last_time[timeframe] = candle_time
+        return True
+
+    @property
+    def ready(self) -> bool:
+        return self.sma_5m.ready and all(hma.ready for hma in self.hma.values())
+
+    def indicator_values(self) -> Dict[str, float]:
+        values = {TRIGGER_TIMEFRAME: self.sma_5m.value}
+        values.update({timeframe: hma.value for timeframe, hma in self.hma.items()})
+        return values
+
+    def evaluate(self) -> Optional[tuple[SignalResult, SignalResult]]:
+        if not self.ready:
+            return None
+        prices = dict(self.last_close)
+        values = self.indicator_values()
+        return (
+            evaluate_signal_from_values(prices, values, "long", self.sma_period, self.hma_period),
+            evaluate_signal_from_values(prices, values, "short", self.sma_period, self.hma_period),
+        )
+
+
+@dataclass
+class BotState:
+    bot_id: str
+    symbols: Set[str]
+    positions: Dict[str, Optional[str]] = field(default_factory=dict)
+    capital: float = 0.0
+    owner: Optional[int] = None
+
+
+class BotRuntime:
+    """Event loop service driving every running bot from closed-candle events."""
+
+    def __init__(
+        self,
+        channel_layer=None,
+        notifier: Optional[Notifier] = None,
+        sma_period: int = DEFAULT_PERIOD,
+        hma_period: int = DEFAULT_PERIOD,
+        heartbeat_interval: Optional[float] = None,
+    ):
+        self.channel_layer = channel_layer or get_channel_layer()
+        # Decisions go through the coalescing publisher unless a notifier is injected.
+        self.publisher = BotUpdatePublisher(self.channel_layer)
+        self.notifier = notifier or self.publisher.publish
+        self.sma_period = sma_period
+        self.hma_period = hma_period
+        self.heartbeat_interval = (
+            settings.BOT_HEARTBEAT_INTERVAL_SECONDS if heartbeat_interval is None else heartbeat_interval
+        )
+        self.bots: Dict[str, BotState] = {}
+        self.symbols: Dict[str, SymbolState] = {}
+        self.latency = LatencyTracker()
+        # Paper execution: decisions become orders; fills are persisted with the heartbeats.
+        self.recorder = FillRecorder(batch_size=None)
+        self.engine = MatchingEngine(
+            slippage_bps=settings.PAPER_SLIPPAGE_BPS, fee_bps=settings.PAPER_FEE_BPS, sink=self.recorder
+        )
+        # Owner-level RiskProfile limits, checked before every entry order.
+        self.risk = RiskEngine()
+        self.channel_name: Optional[str] = None
+        self._subscribed: Set[str] = set()
+
+    # ------------------------------------------------------------------ lifecycle
+    async def run(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        if self.channel_layer is None:
+            raise RuntimeError("A channel layer is required to run the bot runtime.")
+        stop_event = stop_event or asyncio.Event()
+        self.channel_name = await self.channel_layer.new_channel("bot-runtime.")
+        # Groups registered before the channel existed (bots added ahead of run()).
+        for group in self._subscribed:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self._subscribe(RUNTIME_GROUP)
+        await self.load_running_bots()
+        logger.info("Bot runtime started with %s bots on %s symbols", len(self.bots), len(self.symbols))
+        heartbeats = asyncio.ensure_future(self._heartbeat_loop(stop_event))
+
+        while not stop_event.is_set():
+            receive = asyncio.ensure_future(self.channel_layer.receive(self.channel_name))
+            stopper = asyncio.ensure_future(stop_event.wait())
+            done, _ = await asyncio.wait({receive, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if receive not in done:
+                receive.cancel()
+                break
+            stopper.cancel()
+            try:
+                await self.handle_message(receive.result())
+            except Exception:
+                logger.exception("Bot runtime failed to handle message")
+
+        heartbeats.cancel()
+        await self.publisher.close()
+        for group in list(self._subscribed):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self._subscribed.clear()
+        logger.info("Bot runtime stopped; latency summary %s", self.latency.summary())
+
+    async def load_running_bots(self) -> None:
+        running = await sync_to_async(self._fetch_running_bots)()
+        for bot_id, universe, state, capital, owner in running:
+            await self.add_bot(bot_id, universe, state, capital, owner)
+
+    async def add_bot(
+        self,
+        bot_id: str,
+        universe: Iterable[str],
+        checkpoint: Optional[Dict[str, Any]] = None,
+        capital: float = 0.0,
+        owner: Optional[int] = None,
+    ) -> None:
+        codes = {normalize_symbol_code(code) for code in universe}
+        new_codes = [code for code in codes if code not in self.symbols]
+        if new_codes:
+            await sync_to_async(self._warm_up)(new_codes)
+        positions = {
+            code: side for code, side in ((checkpoint or {}).get("positions") or {}).items() if code in codes
+        }
+        self.bots[bot_id] = BotState(bot_id=bot_id, symbols=codes, positions=positions, capital=capital, owner=owner)
+        if owner is not None:
+            if owner in self.risk.books:
+                self.risk.adjust_capital(owner, capital)
+            else:
+                limits, risk_state = (await sync_to_async(load_risk_settings)([owner]))[owner]
+                self.risk.register(owner, limits, capital, risk_state)
+        for code in codes:
+            for timeframe in (TRIGGER_TIMEFRAME, *TREND_TIMEFRAMES):
+                await self._subscribe(market_group_name(code, timeframe))
+
+    async def remove_bot(self, bot_id: str) -> None:
+        state = self.bots.pop(bot_id, None)
+        if state is None:
+            return
+        self.publisher.forget(bot_id)
+        # Pending orders would fill for a bot that is gone; their risk updates would be skipped,
+        # so an entry's reserved slot would never come back.
+        for order in self.engine.open_orders(bot_id):
+            self.engine.cancel(order.id)
+            if state.owner is not None and order.tag in ("enter_long", "enter_short"):
+                self.risk.release(state.owner)
+        if state.owner is not None:
+            self.risk.adjust_capital(state.owner, -state.capital)
+        still_used = set().union(*(bot.symbols for bot in self.bots.values())) if self.bots else set()
+        for code in state.symbols - still_used:
+            self.symbols.pop(code, None)
+            for timeframe in (TRIGGER_TIMEFRAME, *TREND_TIMEFRAMES):
+                await self._unsubscribe(market_group_name(code, timeframe))
+
+    # ------------------------------------------------------------------ messages
+    async def handle_message(self, message: Dict[str, Any]) -> None:
+        message_type = message.get("type")
+        if message_type == "candle.closed":
+            await self.on_candle(message)
+        elif message_type == "runtime.bot_started":
+            bot_id = str(message["bot_id"])
+            bot = await sync_to_async(self._fetch_bot)(bot_id)
+            if bot is not None:
+                await self.add_bot(bot_id, *bot)
+        elif message_type == "runtime.bot_stopped":
+            await self.remove_bot(str(message["bot_id"]))
+
+    async def on_candle(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        code = normalize_symbol_code(message["symbol"])
+        timeframe = message["timeframe"]
+        state = self.symbols.get(code)
+        candle = message["candle"]
+        if state is None or not state.update(timeframe, candle):
+            return []
+        if timeframe != TRIGGER_TIMEFRAME:
+            return []
+
+        candle_time = int(candle["time"])
+        close = float(candle["close"])
+        fills = self.engine.on_bar(
+            code,
+            candle_time,
+            float(candle["open"]),
+            float(candle.get("high", close)),
+            float(candle.get("low", close)),
+            close,
+        )
+        self._update_risk(code, fills, candle_time, close)
+
+        evaluation = state.evaluate()
+        if evaluation is None:
+            return []
+        long_result, short_result = evaluation
+
+        compute_ms = (time.perf_counter() - started) * 1000
+        published_at = message.get("published_at")
+        latency_ms = (time.time() - published_at) * 1000 if published_at else compute_ms
+        self.latency.record(latency_ms)
+        if latency_ms > LATENCY_TARGET_MS:
+            logger.warning("Decision for %s took %.1fms (target %.0fms)", code, latency_ms, LATENCY_TARGET_MS)
+
+        decisions = []
+        for bot in self.bots.values():
+            if code not in bot.symbols:
+                continue
+            payload = self._decide(bot, state, long_result, short_result)
+            payload["orders"] = self._submit_orders(bot, state, payload["actions"])
+            payload["fills"] = [self._fill_payload(fill) for fill in fills if fill.order.account == bot.bot_id]
+            payload["latency_ms"] = round(latency_ms, 3)
+            payload["compute_ms"] = round(compute_ms, 3)
+            decisions.append(payload)
+            await self.notifier(bot.bot_id, payload)
+        return decisions
+
+    # ------------------------------------------------------------------ heartbeats
+    def snapshot(self, bot: BotState) -> Dict[str, Any]:
+        """In-memory state checkpointed with every heartbeat."""
+        indicators = {}
+        last_candle = None
+        for code in sorted(bot.symbols):
+            state = self.symbols.get(code)
+            if state is None:
+                continue
+            indicators[code] = state.indicator_values()
+            candle_time = state.last_time.get(TRIGGER_TIMEFRAME)
+            if candle_time is not None and (last_candle is None or candle_time > last_candle):
+                last_candle = candle_time
+        return {"positions": dict(bot.positions), "indicators": indicators, "last_candle_time": last_candle}
+
+    async def heartbeat(self) -> None:
+        """Writes a heartbeat for every managed bot in one cache round trip and persists paper fills and risk."""
+        states = {bot_id: self.snapshot(bot) for bot_id, bot in self.bots.items()}
+        await sync_to_async(record_heartbeats)(states)
+        batch = self.recorder.drain()
+        if batch:
+            await sync_to_async(self.recorder.write)(batch)
+        risk_states = self.risk.drain()
+        if risk_states:
+            await sync_to_async(persist_risk_states)(risk_states)
+
+    async def _heartbeat_loop(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception("Bot runtime failed to write heartbeats")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # ------------------------------------------------------------------ internals
+    def _decide(
+        self,
+        bot: BotState,
+        state: SymbolState,
+        long_result: SignalResult,
+        short_result: SignalResult,
+    ) -> Dict[str, Any]:
+        """Strategy 1 position rules: exit on a full body across the 5m SMA, enter when flat."""
+        position = bot.positions.get(state.code)
+        close = state.last_close[TRIGGER_TIMEFRAME]
+        open_ = state.last_open_5m
+        sma = state.sma_5m.value
+        actions = []
+
+        if position == "long" and open_ < sma and close < sma:
+            actions.append("exit_long")
+            position = None
+        elif position == "short" and open_ > sma and close > sma:
+            actions.append("exit_short")
+            position = None
+
+        if position is None and long_result.should_enter:
+            actions.append("enter_long")
+            position = "long"
+        elif position is None and short_result.should_enter:
+            actions.append("enter_short")
+            position = "short"
+
+        bot.positions[state.code] = position
+        return {
+            "type": "decision",
+            "symbol": state.code,
+            "timeframe": TRIGGER_TIMEFRAME,
+            "candle_time": datetime.fromtimestamp(state.last_time[TRIGGER_TIMEFRAME], tz=timezone.utc).isoformat(),
+            "price": close,
+            "actions": actions or ["hold"],
+            "position": position,
+            "signal": {"long": long_result.should_enter, "short": short_result.should_enter},
+            "breakdown": {
+                timeframe: {
+                    "price": item.price,
+                    "indicator": item.indicator_value,
+                    "indicator_name": item.indicator_name,
+                    "condition_long": item.condition_met,
+                    "condition_short": short_result.breakdown[timeframe].condition_met,
+                }
+                for timeframe, item in long_result.breakdown.items()
+            },
+        }
+
+    def _submit_orders(self, bot: BotState, state: SymbolState, actions: List[str]) -> List[Dict[str, Any]]:
+        """Turns decision actions into paper market orders, filled at the next candle's open."""
+        orders = []
+        price = state.last_close[TRIGGER_TIMEFRAME]
+        for action in actions:
+            held = self.engine.position(bot.bot_id, state.code).quantity
+            if action in ("exit_long", "exit_short"):
+                if held == 0:
+                    continue
+                side, quantity = (SELL, held) if held > 0 else (BUY, -held)
+            elif action in ("enter_long", "enter_short"):
+                notional = bot.capital if bot.capital > 0 else settings.PAPER_DEFAULT_NOTIONAL
+                if bot.owner is not None:
+                    decision = self.risk.check_order(bot.owner, notional, state.last_time.get(TRIGGER_TIMEFRAME))
+                    if not decision.allowed:
+                        orders.append({"tag": action, "rejected": decision.reason})
+                        continue
+                    notional = decision.notional
+                side, quantity = (BUY if action == "enter_long" else SELL), notional / price
+            else:
+                continue
+            order = self.engine.submit(bot.bot_id, state.code, side, quantity, tag=action)
+            orders.append(
+                {"id": order.id, "side": "buy" if side == BUY else "sell", "quantity": quantity, "tag": action}
+            )
+        return orders
+
+    def _update_risk(self, code: str, fills: List[SimFill], timestamp: int, close: float) -> None:
+        """Feeds fills and the closing mark of ``code`` to the owners' risk books."""
+        for fill in fills:
+            bot = self.bots.get(fill.order.account)
+            if bot is None or bot.owner is None:
+                continue
+            # Each fill carries the position it left behind. On a reversal the exit and the new entry
+            # fill on the same open, and the book must see the flat position in between to close one
+            # position and open (and un-reserve) the other.
+            self.risk.on_fill(
+                bot.owner,
+                (bot.bot_id, code),
+                fill.position_quantity,
+                fill.position_average_price,
+                fill.position_realized_pnl,
+                fill.price,
+                timestamp,
+            )
+        for bot in self.bots.values():
+            if bot.owner is not None and code in bot.symbols:
+                self.risk.on_mark(bot.owner, (bot.bot_id, code), close, timestamp)
+
+    @staticmethod
+    def _fill_payload(fill: SimFill) -> Dict[str, Any]:
+        return {
+            "order": fill.order.id,
+            "side": "buy" if fill.order.side == BUY else "sell",
+            "price": fill.price,
+            "quantity": fill.quantity,
+            "fee": fill.fee,
+            "tag": fill.order.tag,
+        }
+
+    async def _subscribe(self, group: str) -> None:
+        if group in self._subscribed:
+            return
+        self._subscribed.add(group)
+        if self.channel_name is not None:
+            await self.channel_layer.group_add(group, self.channel_name)
+
+    async def _unsubscribe(self, group: str) -> None:
+        if group not in self._subscribed:
+            return
+        self._subscribed.discard(group)
+        if self.channel_name is not None:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    @staticmethod
+    def _fetch_running_bots() -> List[tuple[str, List[str], Dict[str, Any], float, int]]:
+        rows = Bot.objects.filter(status=Bot.Status.RUNNING).values_list(
+            "id", "quote_universe", "state", "starting_capital", "exchange_account__owner_id",
+            "strategy__slug", "strategy__config",
+        )
+        return [
+            (str(bot_id), universe or [], state or {}, float(capital), owner)
+            for bot_id, universe, state, capital, owner, slug, config in rows
+            if BotRuntime._supported(bot_id, slug, config)
+        ]
+
+    @staticmethod
+    def _fetch_bot(bot_id: str) -> Optional[tuple[List[str], Dict[str, Any], float, int]]:
+        row = (
+            Bot.objects.filter(id=bot_id)
+            .values_list(
+                "quote_universe", "state", "starting_capital", "exchange_account__owner_id",
+                "strategy__slug", "strategy__config",
+            )
+            .first()
+        )
+        if row is None or not BotRuntime._supported(bot_id, row[4], row[5]):
+            return None
+        return row[0] or [], row[1] or {}, float(row[2]), row[3]
+
+    @staticmethod
+    def _supported(bot_id, slug: str, config: Optional[Dict[str, Any]]) -> bool:
+        error = live_strategy_error(slug, config)
+        if error is not None:
+            logger.error("Bot runtime: not running bot %s. %s", bot_id, error)
+        return error is None
+
+    def _warm_up(self, codes: Iterable[str]) -> None:
+        """Seeds streaming indicators from the most recent stored candles."""
+        for code in codes:
+            state = SymbolState(code, self.sma_period, self.hma_period)
+            self.symbols[code] = state
+            symbol = Symbol.objects.filter(code__iexact=code).first()
+            if symbol is None:
+                logger.warning("Bot runtime: symbol %s has no stored candles yet", code)
+                continue
+            for timeframe in (TRIGGER_TIMEFRAME, *TREND_TIMEFRAMES):
+                rows = list(
+                    Candle.objects.filter(symbol=symbol, timeframe=timeframe)
+                    .order_by("-timestamp")
+                    .values_list("timestamp", "open", "close")[: state.warmup_length(timeframe)]
+                )
+                for timestamp, open_, close in reversed(rows):
+                    state.update(timeframe, {"time": int(timestamp.timestamp()), "open": open_, "close": close})
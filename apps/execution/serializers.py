@@ -16,7 +16,8 @@ class BotSerializer(serializers.ModelSerializer):
             "starting_capital",
             "status",
             "last_heartbeat_at",
+            "state",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ("id", "status", "last_heartbeat_at", "created_at", "updated_at")
+        read_only_fields = ("id", "status", "last_heartbeat_at", "state", "created_at", "updated_at")
@@ -6,11 +6,25 @@ from channels.layers import get_channel_layer
 
 logger = logging.getLogger(__name__)
 
+# Channel group the bot runtime listens on for start/stop requests.
+RUNTIME_GROUP = "bot_runtime"
+
+
+def bot_group(bot_id: str) -> str:
+    """Channel group of a bot's status consumers; multiplexed sockets join one per subscribed bot."""
+    return f"bot_{bot_id}"
+
+
+def bot_batch_event(updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Channel message carrying state changes for one or more bots, keyed by bot id."""
+    return {"type": "bot.batch", "updates": updates}
+
 
 def notify_bot_update(bot_id: str, payload: Dict[str, Any]) -> None:
     """
     Pushes a bot state payload to any subscribed websocket consumers.
-    Can be called from synchronous contexts (Celery tasks, Django signals).
+    Can be called from synchronous contexts (Celery tasks, Django signals); meant for
+    infrequent lifecycle changes. High-frequency producers use ``BotUpdatePublisher``.
     """
 
     channel_layer = get_channel_layer()
@@ -18,11 +32,35 @@ def notify_bot_update(bot_id: str, payload: Dict[str, Any]) -> None:
         logger.warning("Channel layer not configured; skipping websocket push.")
         return
 
-    group_name = f"bot_{bot_id}"
+    try:
+        async_to_sync(channel_layer.group_send)(bot_group(bot_id), bot_batch_event({str(bot_id): payload}))
+    except Exception as exc:
+        logger.exception("Failed to publish websocket update for bot %s: %s", bot_id, exc)
+
+
+async def anotify_bot_update(bot_id: str, payload: Dict[str, Any]) -> None:
+    """Async counterpart of ``notify_bot_update`` for code already running in an event loop."""
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.warning("Channel layer not configured; skipping websocket push.")
+        return
 
     try:
-        async_to_sync(channel_layer.group_send)(
-            group_name, {"type": "bot_update", "payload": payload}
-        )
+        await channel_layer.group_send(bot_group(bot_id), bot_batch_event({str(bot_id): payload}))
     except Exception as exc:
         logger.exception("Failed to publish websocket update for bot %s: %s", bot_id, exc)
+
+
+def notify_runtime(event_type: str, bot_id: str) -> None:
+    """Tells the running bot runtime(s) that a bot was started or stopped."""
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.warning("Channel layer not configured; bot runtime will pick changes up on restart.")
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(RUNTIME_GROUP, {"type": event_type, "bot_id": bot_id})
+    except Exception as exc:
+        logger.exception("Failed to notify bot runtime about %s for bot %s: %s", event_type, bot_id, exc)
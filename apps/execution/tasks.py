@@ -4,8 +4,9 @@ from datetime import datetime
 from celery import shared_task
 from django.utils import timezone
 
+from .heartbeat import flush_bot_state, mark_stale_bots, record_heartbeat
 from .models import Bot
-from .services import notify_bot_update
+from .services import notify_bot_update, notify_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ def start_bot_task(bot_id: str) -> None:
     bot.status = Bot.Status.RUNNING
     bot.last_heartbeat_at = timezone.now()
     bot.save(update_fields=["status", "last_heartbeat_at"])
+    record_heartbeat(str(bot.id), at=bot.last_heartbeat_at.timestamp())
     logger.info("Bot %s marked as running at %s", bot.id, datetime.utcnow())
     notify_bot_update(
         str(bot.id),
@@ -29,7 +31,8 @@ def start_bot_task(bot_id: str) -> None:
             "last_heartbeat_at": bot.last_heartbeat_at.isoformat(),
         },
     )
-    # TODO: Kick off real trading loop here.
+    # The bot runtime (``manage.py run_bot_runtime``) starts evaluating the bot's symbols.
+    notify_runtime("runtime.bot_started", str(bot.id))
 
 
 @shared_task(name="execution.stop_bot")
@@ -40,6 +43,9 @@ def stop_bot_task(bot_id: str) -> None:
         logger.error("Bot %s not found when attempting stop.", bot_id)
         return
 
+    # Keep the last runtime checkpoint before the bot leaves the running set.
+    flush_bot_state([str(bot.id)])
+    bot.refresh_from_db(fields=["last_heartbeat_at", "state"])
     bot.status = Bot.Status.STOPPED
     bot.save(update_fields=["status"])
     logger.info("Bot %s marked as stopped", bot.id)
@@ -52,4 +58,14 @@ def stop_bot_task(bot_id: str) -> None:
             else None,
         },
     )
-    # TODO: Gracefully stop trading loop and cleanup resources.
+    notify_runtime("runtime.bot_stopped", str(bot.id))
+
+
+@shared_task(name="execution.flush_bot_state")
+def flush_bot_state_task() -> int:
+    return flush_bot_state()
+
+
+@shared_task(name="execution.monitor_heartbeats")
+def monitor_heartbeats_task() -> list:
+    return mark_stale_bots()
@@ -1,14 +1,36 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 from unittest import mock
 
+import numpy as np
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from apps.analytics.models import BacktestRun
+from apps.datafeeds.models import Symbol
 from apps.exchanges.models import ExchangeAccount
+from apps.risk.engine import RiskLimits
 from apps.strategies.models import Strategy
 
-from .models import Bot
+from .consumers import BotStatusConsumer
+from .heartbeat import flush_bot_state, mark_stale_bots, read_heartbeats, record_heartbeat, record_heartbeats
+from .models import Bot, Fill, Order, Position
+from .paper import BUY, LIMIT, SELL, STOP, FillRecorder, MatchingEngine, PositionState, replay_bars, replay_decisions
+from .publisher import BotUpdatePublisher
+from .runtime import BotRuntime, SymbolState
+from .services import bot_group
 
 
 class BotAPITests(APITestCase):
@@ -45,3 +67,559 @@ class BotAPITests(APITestCase):
             response = self.client.post(url)
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         mocked.assert_called_once_with(str(self.bot.id))
+
+    def test_start_refuses_strategies_the_runtime_cannot_trade(self):
+        url = reverse("bot-start", args=[self.bot.id])
+        for config in ({"strategy": "2"}, {"rules": {"entry": {"long": []}}}):
+            with self.subTest(config=config):
+                Strategy.objects.filter(pk=self.strategy.pk).update(config=config)
+                with mock.patch("apps.execution.views.start_bot_task.delay") as mocked:
+                    response = self.client.post(url)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("cannot run live", response.json()["strategy"])
+                mocked.assert_not_called()
+
+    def test_runtime_skips_bots_with_unsupported_strategies(self):
+        self.bot.status = Bot.Status.RUNNING
+        self.bot.save(update_fields=["status"])
+        self.assertEqual([row[0] for row in BotRuntime._fetch_running_bots()], [str(self.bot.id)])
+
+        Strategy.objects.filter(pk=self.strategy.pk).update(config={"strategy": "4"})
+        with self.assertLogs("apps.execution.runtime", "ERROR"):
+            self.assertEqual(BotRuntime._fetch_running_bots(), [])
+        with self.assertLogs("apps.execution.runtime", "ERROR"):
+            self.assertIsNone(BotRuntime._fetch_bot(str(self.bot.id)))
+
+
+class BotRuntimeTests(APITestCase):
+    def setUp(self):
+        self.published = []
+
+        async def notifier(bot_id, payload):
+            self.published.append((bot_id, payload))
+
+        self.runtime = BotRuntime(channel_layer=object(), notifier=notifier, sma_period=5, hma_period=4)
+
+    def _feed(self, state, timeframe, closes, start=0, step=300):
+        for i, close in enumerate(closes):
+            state.update(timeframe, {"time": start + i * step, "open": close, "close": close})
+
+    def _ready_state(self):
+        state = SymbolState("BTCUSDT", sma_period=5, hma_period=4)
+        self._feed(state, "1h", [100 + i for i in range(9)] + [120], step=3600)
+        self._feed(state, "4h", [100 + i for i in range(9)] + [120], step=14400)
+        self._feed(state, "5m", [100.0] * 5)
+        return state
+
+    def test_symbol_state_ignores_stale_candles(self):
+        state = self._ready_state()
+        self.assertTrue(state.ready)
+        self.assertFalse(state.update("5m", {"time": 0, "open": 1.0, "close": 1.0}))
+        self.assertEqual(state.sma_5m.value, 100.0)
+
+    def test_closed_candle_produces_entry_decision(self):
+        self.runtime.symbols["BTCUSDT"] = self._ready_state()
+        asyncio.run(self.runtime.add_bot("bot-1", ["BTC/USDT"]))
+        message = {
+            "type": "candle.closed",
+            "symbol": "BTCUSDT",
+            "timeframe": "5m",
+            "candle": {"time": 3000, "open": 101.0, "high": 112.0, "low": 101.0, "close": 110.0, "volume": 1.0},
+        }
+        decisions = asyncio.run(self.runtime.on_candle(message))
+
+        self.assertEqual(len(decisions), 1)
+        self.assertEqual(decisions[0]["actions"], ["enter_long"])
+        self.assertEqual(self.published[0][0], "bot-1")
+        self.assertEqual(self.runtime.bots["bot-1"].positions["BTCUSDT"], "long")
+        self.assertEqual(self.runtime.latency.summary()["count"], 1)
+
+        exit_message = dict(message, candle={"time": 3300, "open": 90.0, "close": 80.0})
+        decisions = asyncio.run(self.runtime.on_candle(exit_message))
+        self.assertIn("exit_long", decisions[0]["actions"])
+
+    def test_entry_orders_sized_and_vetoed_by_owner_risk_profile(self):
+        owner = 7
+        # Already loaded book (load_risk_settings builds the same limits from the owner's RiskProfile).
+        self.runtime.risk.register(owner, RiskLimits(max_concurrent_positions=1, max_position_fraction=0.1), 0.0)
+        self.runtime.symbols["BTCUSDT"] = self._ready_state()
+        asyncio.run(self.runtime.add_bot("bot-1", ["BTC/USDT"], capital=1100.0, owner=owner))
+        asyncio.run(self.runtime.add_bot("bot-2", ["BTC/USDT"], capital=1100.0, owner=owner))
+        candle = {"time": 3000, "open": 101.0, "high": 112.0, "low": 101.0, "close": 110.0, "volume": 1.0}
+        message = {"type": "candle.closed", "symbol": "BTCUSDT", "timeframe": "5m", "candle": candle}
+        first, second = asyncio.run(self.runtime.on_candle(message))
+
+        # 10% of the owner's 2200 equity, and only one concurrent position.
+        self.assertAlmostEqual(first["orders"][0]["quantity"], 2.0)
+        self.assertEqual(second["orders"], [{"tag": "enter_long", "rejected": "max_positions"}])
+
+        asyncio.run(self.runtime.on_candle(dict(message, candle=dict(candle, time=3300, open=110.0))))
+        book = self.runtime.risk.books[owner]
+        self.assertEqual((book.open_positions, book.reserved), (1, 0))
+        self.assertAlmostEqual(book.exposure, 2.0 * 110.0)
+
+    def test_reversal_on_one_open_returns_the_reserved_slot(self):
+        owner = 7
+        self.runtime.risk.register(owner, RiskLimits(max_concurrent_positions=2, max_position_fraction=0.5), 0.0)
+        asyncio.run(self.runtime.add_bot("bot-1", ["BTC/USDT"], capital=1000.0, owner=owner))
+        engine, risk = self.runtime.engine, self.runtime.risk
+        engine.on_bar("BTCUSDT", 0, 100, 100, 100, 100)
+
+        self.assertTrue(risk.check_order(owner, 100.0).allowed)
+        engine.submit("bot-1", "BTCUSDT", BUY, 1.0, tag="enter_long")
+        self.runtime._update_risk("BTCUSDT", engine.on_bar("BTCUSDT", 300, 100, 100, 100, 100), 300, 100.0)
+
+        # exit_long and enter_short fill on the same open.
+        self.assertTrue(risk.check_order(owner, 100.0).allowed)
+        engine.submit("bot-1", "BTCUSDT", SELL, 1.0, tag="exit_long")
+        engine.submit("bot-1", "BTCUSDT", SELL, 1.0, tag="enter_short")
+        self.runtime._update_risk("BTCUSDT", engine.on_bar("BTCUSDT", 600, 100, 100, 100, 100), 600, 100.0)
+
+        book = risk.books[owner]
+        self.assertEqual((book.open_positions, book.reserved), (1, 0))
+        self.assertTrue(risk.check_order(owner, 100.0).allowed)
+
+    def test_removing_a_bot_with_a_pending_entry_returns_the_slot(self):
+        owner = 7
+        self.runtime.risk.register(owner, RiskLimits(max_concurrent_positions=1, max_position_fraction=0.5), 0.0)
+        self.runtime.symbols["BTCUSDT"] = self._ready_state()
+        asyncio.run(self.runtime.add_bot("bot-1", ["BTC/USDT"], capital=1000.0, owner=owner))
+        candle = {"time": 3000, "open": 101.0, "high": 112.0, "low": 101.0, "close": 110.0, "volume": 1.0}
+        message = {"type": "candle.closed", "symbol": "BTCUSDT", "timeframe": "5m", "candle": candle}
+        decision = asyncio.run(self.runtime.on_candle(message))[0]
+        self.assertEqual(decision["orders"][0]["tag"], "enter_long")
+        self.assertEqual(self.runtime.risk.books[owner].reserved, 1)
+
+        asyncio.run(self.runtime.remove_bot("bot-1"))
+        self.assertEqual(self.runtime.engine.open_orders("bot-1"), [])
+        self.assertEqual(self.runtime.risk.books[owner].reserved, 0)
+        asyncio.run(self.runtime.add_bot("bot-2", ["BTC/USDT"], capital=1000.0, owner=owner))
+        # Withdrawing the last bot's capital is not a loss and must not trip the breakers.
+        self.assertEqual(self.runtime.risk.books[owner].halted, "")
+        self.assertTrue(self.runtime.risk.check_order(owner, 100.0).allowed)
+
+    def test_decisions_become_paper_orders_filled_at_next_open(self):
+        self.runtime.symbols["BTCUSDT"] = self._ready_state()
+        asyncio.run(self.runtime.add_bot("bot-1", ["BTC/USDT"], capital=1100.0))
+        candle = {"time": 3000, "open": 101.0, "high": 112.0, "low": 101.0, "close": 110.0, "volume": 1.0}
+        message = {"type": "candle.closed", "symbol": "BTCUSDT", "timeframe": "5m", "candle": candle}
+        decision = asyncio.run(self.runtime.on_candle(message))[0]
+        self.assertEqual(decision["orders"][0]["side"], "buy")
+        self.assertAlmostEqual(decision["orders"][0]["quantity"], 10.0)
+        self.assertEqual(decision["fills"], [])
+
+        next_candle = dict(candle, time=3300, open=111.0)
+        decision = asyncio.run(self.runtime.on_candle(dict(message, candle=next_candle)))[0]
+        self.assertEqual(len(decision["fills"]), 1)
+        self.assertGreaterEqual(decision["fills"][0]["price"], 111.0)
+        self.assertAlmostEqual(self.runtime.engine.position("bot-1", "BTCUSDT").quantity, 10.0)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BotHeartbeatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username="hb", password="secret123")
+        exchange = ExchangeAccount.objects.create(
+            owner=user, name="Binance", exchange_id="binance", api_key="demo", api_secret="demo"
+        )
+        strategy = Strategy.objects.create(owner=user, name="hb", slug="hb", version="0.1.0")
+        started = timezone.now() - timedelta(minutes=10)
+        Bot.objects.bulk_create(
+            Bot(
+                name=f"bot-{i:03d}",
+                strategy=strategy,
+                exchange_account=exchange,
+                quote_universe=["BTC/USDT"],
+                status=Bot.Status.RUNNING,
+                last_heartbeat_at=started,
+            )
+            for i in range(300)
+        )
+        self.bot_ids = [str(pk) for pk in Bot.objects.values_list("id", flat=True)]
+
+    def test_flush_writes_hundreds_of_bots_in_one_batch(self):
+        for tick in range(20):
+            record_heartbeats(
+                {bot_id: {"positions": {"BTCUSDT": "long"}, "tick": tick} for bot_id in self.bot_ids}
+            )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_bot_state(), 300)
+        # One select plus batched updates (SQLite caps the parameters per statement).
+        self.assertLessEqual(len(queries), 3)
+        bot = Bot.objects.get(id=self.bot_ids[0])
+        self.assertEqual(bot.state["tick"], 19)
+        self.assertGreater(bot.last_heartbeat_at, timezone.now() - timedelta(minutes=1))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_bot_state(), 0)
+
+    def test_heartbeat_without_state_keeps_checkpoint(self):
+        bot_id = self.bot_ids[0]
+        record_heartbeat(bot_id, {"positions": {"BTCUSDT": "short"}}, at=time.time() - 5)
+        flush_bot_state([bot_id])
+        record_heartbeat(bot_id)
+        flush_bot_state([bot_id])
+        self.assertEqual(Bot.objects.get(id=bot_id).state, {"positions": {"BTCUSDT": "short"}})
+
+    def test_monitor_marks_only_stale_bots(self):
+        fresh = self.bot_ids[:5]
+        record_heartbeats({bot_id: None for bot_id in fresh})
+        with mock.patch("apps.execution.heartbeat.notify_bot_update") as notified, mock.patch(
+            "apps.execution.heartbeat.notify_runtime"
+        ):
+            stale = mark_stale_bots(stale_after=60)
+        self.assertEqual(len(stale), 295)
+        self.assertEqual(notified.call_count, 295)
+        running = {str(pk) for pk in Bot.objects.filter(status=Bot.Status.RUNNING).values_list("id", flat=True)}
+        self.assertEqual(running, set(fresh))
+
+    def test_runtime_heartbeat_checkpoints_positions(self):
+        runtime = BotRuntime(channel_layer=object(), notifier=mock.AsyncMock(), sma_period=5, hma_period=4)
+        runtime.symbols["BTCUSDT"] = SymbolState("BTCUSDT", sma_period=5, hma_period=4)
+        bot_id = self.bot_ids[0]
+        asyncio.run(runtime.add_bot(bot_id, ["BTC/USDT"], {"positions": {"BTCUSDT": "long", "ETHUSDT": "short"}}))
+        self.assertEqual(runtime.bots[bot_id].positions, {"BTCUSDT": "long"})
+
+        asyncio.run(runtime.heartbeat())
+        entry = read_heartbeats([bot_id])[bot_id]
+        self.assertEqual(entry["state"]["positions"], {"BTCUSDT": "long"})
+        self.assertIn("BTCUSDT", entry["state"]["indicators"])
+
+
+class BotUpdatePublisherTests(TestCase):
+    def test_coalesces_fast_updates_into_few_batches(self):
+        async def scenario():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            bots = [f"bot-{i}" for i in range(100)]
+            for bot_id in bots:
+                await layer.group_add(bot_group(bot_id), channel)
+            publisher = BotUpdatePublisher(layer, window=0.05)
+
+            started = time.perf_counter()
+            for tick in range(100):
+                for bot_id in bots:
+                    await publisher.publish(bot_id, {"status": "running", "tick": tick})
+            elapsed = time.perf_counter() - started
+            await publisher.close()
+
+            messages = []
+            while True:
+                try:
+                    messages.append(await asyncio.wait_for(layer.receive(channel), timeout=0.01))
+                except asyncio.TimeoutError:
+                    break
+            await layer.flush()
+            return publisher, messages, elapsed
+
+        publisher, messages, elapsed = asyncio.run(scenario())
+        self.assertEqual(publisher.published, 10_000)
+        self.assertLessEqual(publisher.batches_sent, 3)
+        self.assertEqual(publisher.messages_sent, len(messages))
+        self.assertLessEqual(len(messages), 300)
+        self.assertTrue(all(len(message["updates"]) == 1 for message in messages))
+        merged = {}
+        for message in messages:
+            for bot_id, changes in message["updates"].items():
+                merged.setdefault(bot_id, {}).update(changes)
+        self.assertEqual(len(merged), 100)
+        self.assertTrue(all(state == {"status": "running", "tick": 99} for state in merged.values()))
+        self.assertLess(elapsed, 1.0)
+
+    def test_only_changed_keys_are_sent(self):
+        async def scenario():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(bot_group("a"), channel)
+            await layer.group_add(bot_group("b"), channel)
+            publisher = BotUpdatePublisher(layer, window=10)
+            await publisher.publish("a", {"status": "running", "price": 1})
+            await publisher.flush()
+            await publisher.publish("a", {"status": "running", "price": 2})
+            await publisher.publish("b", {"status": "running"})
+            await publisher.flush()
+            await publisher.publish("a", {"price": 2})
+            sent = await publisher.flush()
+            await publisher.close()
+            messages = [await layer.receive(channel) for _ in range(3)]
+            await layer.flush()
+            return messages, sent
+
+        messages, sent = asyncio.run(scenario())
+        self.assertEqual(messages[0]["updates"], {"a": {"status": "running", "price": 1}})
+        self.assertCountEqual(
+            [message["updates"] for message in messages[1:]], [{"a": {"price": 2}}, {"b": {"status": "running"}}]
+        )
+        self.assertEqual(sent, 0)
+
+    def test_decisions_for_several_symbols_in_one_window_are_all_sent(self):
+        async def scenario():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(bot_group("bot1"), channel)
+            publisher = BotUpdatePublisher(layer, window=10)
+            await publisher.publish("bot1", {"status": "running"})
+            await publisher.publish(
+                "bot1", {"type": "decision", "symbol": "BTCUSDT", "actions": ["enter_long"], "orders": [{"id": 1}]}
+            )
+            await publisher.publish(
+                "bot1", {"type": "decision", "symbol": "ETHUSDT", "actions": ["hold"], "orders": []}
+            )
+            await publisher.flush()
+            await publisher.publish(
+                "bot1", {"type": "decision", "symbol": "BTCUSDT", "actions": ["hold"], "orders": []}
+            )
+            await publisher.close()
+            first = await layer.receive(channel)
+            second = await layer.receive(channel)
+            await layer.flush()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(
+            first["updates"],
+            {
+                "bot1": {
+                    "status": "running",
+                    "symbols": {
+                        "BTCUSDT": {
+                            "type": "decision",
+                            "symbol": "BTCUSDT",
+                            "actions": ["enter_long"],
+                            "orders": [{"id": 1}],
+                        },
+                        "ETHUSDT": {"type": "decision", "symbol": "ETHUSDT", "actions": ["hold"], "orders": []},
+                    },
+                }
+            },
+        )
+        self.assertEqual(second["updates"], {"bot1": {"symbols": {"BTCUSDT": {"actions": ["hold"], "orders": []}}}})
+
+
+class BotStatusConsumerTests(TransactionTestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="ws", password="secret123")
+        exchange = ExchangeAccount.objects.create(
+            owner=user, name="Binance", exchange_id="binance", api_key="demo", api_secret="demo"
+        )
+        strategy = Strategy.objects.create(owner=user, name="ws", slug="ws", version="0.1.0")
+        self.bots = [
+            str(Bot.objects.create(name=f"ws-{i}", strategy=strategy, exchange_account=exchange).id)
+            for i in range(3)
+        ]
+
+    def _communicator(self, path, kwargs):
+        scope = {"type": "websocket", "path": path, "headers": [], "subprotocols": [], "url_route": {"kwargs": kwargs}}
+        return ApplicationCommunicator(BotStatusConsumer.as_asgi(), scope)
+
+    async def _receive_json(self, communicator):
+        message = await communicator.receive_output(timeout=1)
+        return json.loads(message["text"])
+
+    def test_multiplexed_socket_receives_only_subscribed_bots(self):
+        async def scenario():
+            communicator = self._communicator("/ws/bots/status/", {})
+            await communicator.send_input({"type": "websocket.connect"})
+            self.assertEqual((await communicator.receive_output(timeout=1))["type"], "websocket.accept")
+            await communicator.send_input(
+                {"type": "websocket.receive", "text": json.dumps({"action": "subscribe", "bots": self.bots[:2]})}
+            )
+            subscriptions = await self._receive_json(communicator)
+            snapshot = await self._receive_json(communicator)
+
+            publisher = BotUpdatePublisher(get_channel_layer(), window=0.01)
+            for tick in range(50):
+                for bot_id in self.bots:
+                    await publisher.publish(bot_id, {"tick": tick})
+            await publisher.close()
+            frames = [await self._receive_json(communicator) for _ in range(2)]
+            nothing_else = await communicator.receive_nothing(timeout=0.05)
+
+            # Dropped bots leave the socket's groups, so their updates never reach it.
+            await communicator.send_input(
+                {"type": "websocket.receive", "text": json.dumps({"action": "unsubscribe", "bots": self.bots[:1]})}
+            )
+            remaining = await self._receive_json(communicator)
+            await publisher.publish(self.bots[0], {"tick": 50})
+            await publisher.publish(self.bots[1], {"tick": 50})
+            await publisher.close()
+            after_unsubscribe = await self._receive_json(communicator)
+            nothing_after = await communicator.receive_nothing(timeout=0.05)
+
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=1)
+            return subscriptions, snapshot, frames, nothing_else, remaining, after_unsubscribe, nothing_after
+
+        subscriptions, snapshot, frames, nothing_else, remaining, after_unsubscribe, nothing_after = asyncio.run(
+            scenario()
+        )
+        self.assertEqual(subscriptions["bots"], sorted(self.bots[:2]))
+        self.assertEqual(set(snapshot["bots"]), set(self.bots[:2]))
+        self.assertEqual(snapshot["bots"][self.bots[0]]["status"], Bot.Status.IDLE)
+        self.assertTrue(all(frame["type"] == "bot.updates" for frame in frames))
+        self.assertCountEqual(
+            [frame["updates"] for frame in frames], [{self.bots[0]: {"tick": 49}}, {self.bots[1]: {"tick": 49}}]
+        )
+        self.assertTrue(nothing_else)
+        self.assertEqual(remaining["bots"], [self.bots[1]])
+        self.assertEqual(after_unsubscribe["updates"], {self.bots[1]: {"tick": 50}})
+        self.assertTrue(nothing_after)
+
+    def test_single_bot_socket_keeps_plain_payloads(self):
+        async def scenario():
+            communicator = self._communicator(f"/ws/bots/{self.bots[0]}/status/", {"bot_id": self.bots[0]})
+            await communicator.send_input({"type": "websocket.connect"})
+            await communicator.receive_output(timeout=1)
+            await get_channel_layer().group_send(
+                bot_group(self.bots[0]), {"type": "bot.batch", "updates": {self.bots[0]: {"status": "running"}}}
+            )
+            payload = await self._receive_json(communicator)
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=1)
+            return payload
+
+        self.assertEqual(asyncio.run(scenario()), {"status": "running"})
+
+    def test_single_bot_socket_sends_one_payload_per_symbol(self):
+        async def scenario():
+            communicator = self._communicator(f"/ws/bots/{self.bots[0]}/status/", {"bot_id": self.bots[0]})
+            await communicator.send_input({"type": "websocket.connect"})
+            await communicator.receive_output(timeout=1)
+            publisher = BotUpdatePublisher(get_channel_layer(), window=0.01)
+            await publisher.publish(self.bots[0], {"symbol": "BTCUSDT", "actions": ["enter_long"]})
+            await publisher.publish(self.bots[0], {"symbol": "ETHUSDT", "actions": ["hold"]})
+            await publisher.close()
+            payloads = [await self._receive_json(communicator), await self._receive_json(communicator)]
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=1)
+            return payloads
+
+        self.assertEqual(
+            asyncio.run(scenario()),
+            [{"symbol": "BTCUSDT", "actions": ["enter_long"]}, {"symbol": "ETHUSDT", "actions": ["hold"]}],
+        )
+
+
+class MatchingEngineTests(TestCase):
+    def test_market_order_fills_at_next_open_with_slippage(self):
+        engine = MatchingEngine(slippage_bps=10, fee_bps=10)
+        engine.on_bar("BTC", 0, 100, 101, 99, 100)
+        engine.submit("acct", "BTC", BUY, 2.0)
+        fills = engine.on_bar("BTC", 300, 102, 103, 101, 102)
+        self.assertEqual(len(fills), 1)
+        self.assertAlmostEqual(fills[0].price, 102 * 1.001)
+        self.assertAlmostEqual(fills[0].fee, fills[0].price * 2 * 0.001)
+        self.assertEqual(engine.position("acct", "BTC").quantity, 2.0)
+
+    def test_stops_and_limits_trigger_in_price_order(self):
+        engine = MatchingEngine()
+        far = engine.submit("acct", "BTC", SELL, 1, STOP, 90.0)
+        near = engine.submit("acct", "BTC", SELL, 1, STOP, 95.0)
+        limit = engine.submit("acct", "BTC", BUY, 1, LIMIT, 97.0)
+        self.assertEqual(engine.on_bar("BTC", 0, 100, 101, 98, 99), [])
+
+        fills = engine.on_bar("BTC", 300, 96, 97, 94, 95)
+        self.assertEqual([fill.order for fill in fills], [near, limit])
+        # Gapped below the stop: filled at the open, not at the trigger.
+        fills = engine.on_bar("BTC", 600, 85, 86, 84, 85)
+        self.assertEqual(fills[0].order, far)
+        self.assertEqual(fills[0].price, 85)
+
+    def test_oco_stop_wins_when_both_legs_trigger(self):
+        engine = MatchingEngine()
+        engine.submit("acct", "BTC", BUY, 1, LIMIT, 100.0)
+        engine.on_bar("BTC", 0, 100, 100, 100, 100)
+        stop = engine.submit("acct", "BTC", SELL, 1, STOP, 95.0, oco="bracket")
+        target = engine.submit("acct", "BTC", SELL, 1, LIMIT, 110.0, oco="bracket")
+        fills = engine.on_bar("BTC", 300, 100, 111, 94, 100)
+        self.assertEqual([fill.order for fill in fills], [stop])
+        self.assertEqual(target.status, "cancelled")
+        self.assertEqual(engine.open_orders(), [])
+        self.assertAlmostEqual(engine.position("acct", "BTC").realized_pnl, -5.0)
+
+    def test_position_flip_realizes_pnl_and_reprices(self):
+        position = PositionState()
+        position.apply(BUY, 2, 100, 0)
+        position.apply(SELL, 3, 110, 0)
+        self.assertEqual(position.quantity, -1)
+        self.assertEqual(position.average_price, 110)
+        self.assertAlmostEqual(position.realized_pnl, 20)
+
+    def test_replay_throughput(self):
+        bars = 20_000
+        rng = np.random.default_rng(1)
+        timestamps = np.arange(bars, dtype=np.int64) * 300
+        data = {}
+        for code in ("AAA", "BBB", "CCC"):
+            closes = 100 + np.cumsum(rng.normal(0, 0.1, size=bars))
+            data[code] = (closes, closes + 0.2, closes - 0.2, closes)
+        data["CCC"][3][::2] = np.nan  # Missing bars are skipped.
+
+        def strategy(engine, symbol, timestamp, open_, high, low, close, fills):
+            if not engine.open_orders(symbol=symbol) and timestamp % 3000 == 0:
+                engine.submit("acct", symbol, BUY, 1, LIMIT, close - 0.5)
+
+        engine = MatchingEngine()
+        started = time.perf_counter()
+        events = replay_bars(engine, timestamps, data, strategy)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(events, bars * 2 + bars // 2)
+        self.assertGreater(engine.fills, 0)
+        self.assertGreater(events / elapsed, 20_000)
+
+
+    def test_replayed_decisions_fill_at_next_open_and_through_brackets(self):
+        timestamps = np.arange(5, dtype=np.int64) * 300
+        opens = np.array([100.0, 101.0, 102.0, 96.0, 97.0])
+        bars = (opens, opens + 1, np.array([99.0, 100.0, 101.0, 89.0, 96.0]), opens)
+        at = [datetime.fromtimestamp(int(ts), tz=dt_timezone.utc) for ts in timestamps]
+        decisions = [
+            {"timestamp": at[0], "direction": "long", "price": 100.0, "stop_loss": 90.0, "take_profit": 120.0},
+            # The evaluator's own stop exit is already covered by the bracket.
+            {"timestamp": at[3], "direction": "long_exit", "price": 90.0, "reason": "stop_loss"},
+            {"timestamp": at[3], "direction": "short", "price": 96.0, "stop_loss": 110.0, "take_profit": None},
+        ]
+        engine = MatchingEngine(slippage_bps=10)
+        markers = replay_decisions(engine, "run", "BTC", timestamps, bars, decisions, notional=1000.0)
+
+        self.assertEqual([marker["direction"] for marker in markers], ["long", "long_exit", "short"])
+        self.assertEqual([marker["timestamp"] for marker in markers], [at[1], at[3], at[4]])
+        self.assertAlmostEqual(markers[0]["price"], 101.0 * 1.001)
+        self.assertEqual(markers[1]["reason"], "stop_loss")
+        self.assertAlmostEqual(markers[1]["price"], 90.0 * 0.999)
+        self.assertAlmostEqual(markers[2]["price"], 97.0 * 0.999)
+        self.assertEqual([order.tag for order in engine.open_orders("run")], ["stop_loss"])
+
+
+class FillRecorderTests(TestCase):
+    def setUp(self):
+        self.symbol = Symbol.objects.create(code="BTCUSDT", base_asset="BTC", quote_asset="USDT")
+        self.run = BacktestRun.objects.create(symbol=self.symbol, strategy_key="paper", timeframe="5m")
+
+    def test_fills_written_in_batches(self):
+        recorder = FillRecorder(run=self.run, batch_size=100_000)
+        engine = MatchingEngine(sink=recorder)
+        for i in range(500):
+            engine.submit("run", "BTCUSDT", BUY if i % 2 == 0 else SELL, 1.0)
+            engine.on_bar("BTCUSDT", i * 300, 100 + i, 101 + i, 99 + i, 100 + i)
+        engine.submit("run", "BTCUSDT", BUY, 1.0, STOP, 10_000.0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(recorder.flush(), 500)
+        # Bulk writes: the query count depends on the database batch limits, not the fills.
+        self.assertLess(len(queries), 30)
+        self.assertEqual(Order.objects.filter(run=self.run).count(), 501)
+        self.assertEqual(Order.objects.filter(run=self.run, status=Order.Status.OPEN).count(), 1)
+        self.assertEqual(Fill.objects.filter(order__run=self.run).count(), 500)
+        position = Position.objects.get(run=self.run, symbol=self.symbol)
+        self.assertEqual(position.quantity, 0)
+        self.assertAlmostEqual(position.realized_pnl, engine.position("run", "BTCUSDT").realized_pnl)
+
+        stop = engine.open_orders()[0]
+        engine.cancel(stop.id)
+        recorder.flush()
+        self.assertEqual(Order.objects.get(id=stop.id).status, Order.Status.CANCELLED)
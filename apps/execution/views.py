@@ -1,9 +1,10 @@
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
 from .models import Bot
+from .runtime import live_strategy_error
 from .serializers import BotSerializer
 from .tasks import start_bot_task, stop_bot_task
 
@@ -31,6 +32,9 @@ class BotViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"])
     def start(self, request, pk=None):
         bot = self.get_object()
+        error = live_strategy_error(bot.strategy.slug, bot.strategy.config)
+        if error is not None:
+            raise ValidationError({"strategy": error})
         start_bot_task.delay(str(bot.id))
         return Response({"detail": "Bot start requested."}, status=status.HTTP_202_ACCEPTED)
 
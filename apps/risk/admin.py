@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import RiskProfile
+from .models import RiskProfile, RiskState
 
 
 @admin.register(RiskProfile)
@@ -14,3 +14,10 @@ class RiskProfileAdmin(admin.ModelAdmin):
         "updated_at",
     )
     search_fields = ("owner__username", "owner__email")
+
+
+@admin.register(RiskState)
+class RiskStateAdmin(admin.ModelAdmin):
+    list_display = ("owner", "equity", "peak_equity", "exposure", "open_positions", "halted_reason", "updated_at")
+    list_filter = ("halted_reason",)
+    search_fields = ("owner__username", "owner__email")
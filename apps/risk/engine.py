@@ -0,0 +1,398 @@
+"""
+Portfolio risk engine enforcing ``RiskProfile`` limits.
+
+``RiskEngine`` keeps one ``RiskBook`` per owner with running exposure, open position
+count, realized/unrealized PnL, the equity at the start of the day and the peak equity.
+Every fill or mark adjusts those totals by the change of a single position, so checking
+or updating an owner costs O(1) regardless of how many positions it holds. Books touched
+since the last drain are persisted in batches (``persist_risk_states``).
+
+``apply_portfolio_limits`` applies the same rules to a backtest given as time x symbol
+arrays, vectorized across symbols.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+
+import numpy as np
+from django.utils import timezone as django_timezone
+
+from .models import RiskProfile, RiskState
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 3600
+
+DRAWDOWN = "drawdown"
+DAILY_LOSS = "daily_loss"
+MAX_POSITIONS = "max_positions"
+NO_EQUITY = "no_equity"
+RESIZED = "resized"
+
+
+@dataclass(frozen=True)
+class RiskLimits:
+    max_concurrent_positions: int = 5
+    max_position_fraction: float = 0.10
+    daily_loss_fraction: float = 0.03
+    max_drawdown_fraction: float = 0.25
+
+    @classmethod
+    def from_profile(cls, profile: RiskProfile) -> "RiskLimits":
+        return cls(
+            max_concurrent_positions=int(profile.max_concurrent_positions),
+            max_position_fraction=float(profile.max_capital_per_position_pct) / 100,
+            daily_loss_fraction=float(profile.daily_loss_limit_pct) / 100,
+            max_drawdown_fraction=float(profile.max_total_drawdown_pct) / 100,
+        )
+
+
+@dataclass(frozen=True)
+class RiskDecision:
+    allowed: bool
+    notional: float
+    reason: str = ""
+
+
+@dataclass(slots=True)
+class _Exposure:
+    quantity: float = 0.0
+    average_price: float = 0.0
+    realized: float = 0.0
+    unrealized: float = 0.0
+    notional: float = 0.0
+
+
+@dataclass(slots=True)
+class RiskBook:
+    limits: RiskLimits
+    capital: float
+    realized: float = 0.0
+    unrealized: float = 0.0
+    exposure: float = 0.0
+    open_positions: int = 0
+    reserved: int = 0
+    peak_equity: float = 0.0
+    day: Optional[int] = None
+    day_start_equity: float = 0.0
+    halted: str = ""
+    positions: Dict[Hashable, _Exposure] = field(default_factory=dict)
+
+    @property
+    def equity(self) -> float:
+        return self.capital + self.realized + self.unrealized
+
+
+class RiskEngine:
+    """In-memory risk books keyed by owner; positions inside a book use any hashable key."""
+
+    def __init__(self):
+        self.books: Dict[Any, RiskBook] = {}
+        self._dirty: Set[Any] = set()
+
+    def register(
+        self,
+        owner: Any,
+        limits: RiskLimits,
+        capital: float,
+        state: Optional[Mapping[str, Any]] = None,
+    ) -> RiskBook:
+        """Adds ``capital`` to the owner's book, creating it (and restoring halts from ``state``)."""
+        book = self.books.get(owner)
+        if book is not None:
+            self.adjust_capital(owner, capital)
+            return book
+        book = self.books[owner] = RiskBook(limits=limits, capital=capital, peak_equity=capital)
+        if state:
+            # The drawdown breaker stays tripped until an operator resets it; the daily one only for its day.
+            if state.get("halted_reason") == DRAWDOWN:
+                book.halted = DRAWDOWN
+            elif state.get("halted_reason") == DAILY_LOSS and _is_today(state.get("day")):
+                book.halted = DAILY_LOSS
+                book.day = int(django_timezone.now().timestamp()) // SECONDS_PER_DAY
+                book.day_start_equity = capital
+        return book
+
+    def adjust_capital(self, owner: Any, delta: float) -> None:
+        """Adds (or with a negative ``delta`` withdraws) allocated capital without counting it as PnL."""
+        book = self.books.get(owner)
+        if book is None:
+            return
+        book.capital += delta
+        book.peak_equity = max(book.peak_equity + delta, book.equity)
+        book.day_start_equity += delta
+        self._update(owner, book)
+
+    def check_order(self, owner: Any, notional: float, timestamp: Optional[int] = None) -> RiskDecision:
+        """Vetoes or resizes an order opening a new position of ``notional``."""
+        book = self.books.get(owner)
+        if book is None:
+            return RiskDecision(True, notional)
+        if timestamp is not None:
+            self._roll_day(owner, book, timestamp)
+        if book.halted:
+            return RiskDecision(False, 0.0, book.halted)
+        limits = book.limits
+        if book.open_positions + book.reserved >= limits.max_concurrent_positions:
+            return RiskDecision(False, 0.0, MAX_POSITIONS)
+        cap = book.equity * limits.max_position_fraction
+        if cap <= 0:
+            return RiskDecision(False, 0.0, NO_EQUITY)
+        # Reserve the slot until the order fills so concurrent entries cannot overshoot.
+        book.reserved += 1
+        if notional > cap:
+            return RiskDecision(True, cap, RESIZED)
+        return RiskDecision(True, notional)
+
+    def release(self, owner: Any) -> None:
+        """Frees a slot reserved by ``check_order`` for an order that will not fill."""
+        book = self.books.get(owner)
+        if book is not None and book.reserved:
+            book.reserved -= 1
+
+    def on_fill(
+        self,
+        owner: Any,
+        key: Hashable,
+        quantity: float,
+        average_price: float,
+        realized_pnl: float,
+        price: float,
+        timestamp: Optional[int] = None,
+    ) -> None:
+        """Applies the position state after a fill (cumulative ``realized_pnl`` for ``key``)."""
+        book = self.books.get(owner)
+        if book is None:
+            return
+        if timestamp is not None:
+            self._roll_day(owner, book, timestamp)
+        position = book.positions.get(key)
+        if position is None:
+            position = book.positions[key] = _Exposure()
+        was_open = position.quantity != 0
+        unrealized = quantity * (price - average_price)
+        notional = abs(quantity) * price
+
+        book.realized += realized_pnl - position.realized
+        book.unrealized += unrealized - position.unrealized
+        book.exposure += notional - position.notional
+        position.quantity = quantity
+        position.average_price = average_price
+        position.realized = realized_pnl
+        position.unrealized = unrealized
+        position.notional = notional
+
+        if quantity != 0 and not was_open:
+            book.open_positions += 1
+            if book.reserved:
+                book.reserved -= 1
+        elif quantity == 0 and was_open:
+            book.open_positions -= 1
+        self._update(owner, book)
+
+    def on_mark(self, owner: Any, key: Hashable, price: float, timestamp: Optional[int] = None) -> None:
+        """Revalues one open position at ``price``."""
+        book = self.books.get(owner)
+        if book is None:
+            return
+        if timestamp is not None:
+            self._roll_day(owner, book, timestamp)
+        position = book.positions.get(key)
+        if position is None or position.quantity == 0:
+            return
+        unrealized = position.quantity * (price - position.average_price)
+        notional = abs(position.quantity) * price
+        book.unrealized += unrealized - position.unrealized
+        book.exposure += notional - position.notional
+        position.unrealized = unrealized
+        position.notional = notional
+        self._update(owner, book)
+
+    def drain(self) -> Dict[Any, Dict[str, Any]]:
+        """Snapshots of the books changed since the previous drain, for ``persist_risk_states``."""
+        snapshots = {owner: self.snapshot(owner) for owner in self._dirty if owner in self.books}
+        self._dirty = set()
+        return snapshots
+
+    def snapshot(self, owner: Any) -> Dict[str, Any]:
+        book = self.books[owner]
+        return {
+            "equity": book.equity,
+            "peak_equity": book.peak_equity,
+            "day": _as_date(book.day),
+            "day_start_equity": book.day_start_equity,
+            "exposure": book.exposure,
+            "open_positions": book.open_positions,
+            "halted_reason": book.halted,
+        }
+
+    def _roll_day(self, owner: Any, book: RiskBook, timestamp: int) -> None:
+        day = int(timestamp) // SECONDS_PER_DAY
+        if day == book.day:
+            return
+        book.day = day
+        book.day_start_equity = book.equity
+        if book.halted == DAILY_LOSS:
+            book.halted = ""
+        self._dirty.add(owner)
+
+    def _update(self, owner: Any, book: RiskBook) -> None:
+        equity = book.equity
+        if equity > book.peak_equity:
+            book.peak_equity = equity
+        limits = book.limits
+        if book.halted != DRAWDOWN and limits.max_drawdown_fraction > 0:
+            if book.peak_equity > 0 and equity <= book.peak_equity * (1 - limits.max_drawdown_fraction):
+                book.halted = DRAWDOWN
+                logger.warning("Risk: owner %s hit the %.1f%% drawdown limit", owner, limits.max_drawdown_fraction * 100)
+        if not book.halted and book.day is not None and limits.daily_loss_fraction > 0:
+            if book.day_start_equity > 0 and (
+                equity - book.day_start_equity <= -book.day_start_equity * limits.daily_loss_fraction
+            ):
+                book.halted = DAILY_LOSS
+                logger.warning("Risk: owner %s hit the daily loss limit", owner)
+        self._dirty.add(owner)
+
+
+def _is_today(value) -> bool:
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value is not None and value == django_timezone.now().astimezone(timezone.utc).date()
+
+
+def _as_date(day: Optional[int]) -> Optional[date]:
+    if day is None:
+        return None
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc).date()
+
+
+def load_risk_settings(owner_ids: Iterable[Any]) -> Dict[Any, Tuple[RiskLimits, Optional[Dict[str, Any]]]]:
+    """Limits and last persisted state per owner, in two queries. Owners without a profile get defaults."""
+    owner_ids = list(owner_ids)
+    profiles = {profile.owner_id: profile for profile in RiskProfile.objects.filter(owner_id__in=owner_ids)}
+    states = {
+        row["owner_id"]: row
+        for row in RiskState.objects.filter(owner_id__in=owner_ids).values("owner_id", "day", "halted_reason")
+    }
+    return {
+        owner_id: (
+            RiskLimits.from_profile(profiles[owner_id]) if owner_id in profiles else RiskLimits(),
+            states.get(owner_id),
+        )
+        for owner_id in owner_ids
+    }
+
+
+def persist_risk_states(snapshots: Mapping[Any, Dict[str, Any]], batch_size: int = 500) -> int:
+    """Upserts drained snapshots with one select plus bulk create/update. Returns rows written."""
+    if not snapshots:
+        return 0
+    existing = {state.owner_id: state for state in RiskState.objects.filter(owner_id__in=list(snapshots))}
+    to_create, to_update = [], []
+    for owner_id, values in snapshots.items():
+        state = existing.get(owner_id)
+        if state is None:
+            state = RiskState(owner_id=owner_id)
+            to_create.append(state)
+        else:
+            to_update.append(state)
+        for name, value in values.items():
+            setattr(state, name, value)
+    RiskState.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        # ``auto_now`` is not applied by bulk_update.
+        now = django_timezone.now()
+        for state in to_update:
+            state.updated_at = now
+        RiskState.objects.bulk_update(
+            to_update,
+            [
+                "equity",
+                "peak_equity",
+                "day",
+                "day_start_equity",
+                "exposure",
+                "open_positions",
+                "halted_reason",
+                "updated_at",
+            ],
+            batch_size=batch_size,
+        )
+    return len(to_create) + len(to_update)
+
+
+def apply_portfolio_limits(
+    desired: np.ndarray,
+    returns: np.ndarray,
+    day_index: np.ndarray,
+    limits: RiskLimits,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized risk limits for a portfolio backtest.
+
+    ``desired`` (time x symbol) holds the strategy's target side per bar (+1, -1, 0), decided
+    on that bar's close; ``returns`` holds each symbol's simple return from the previous bar
+    to this one (NaN treated as 0); ``day_index`` numbers the trading day of every bar.
+
+    Each open position gets ``max_position_fraction`` of equity. New positions are admitted
+    in column order while fewer than ``max_concurrent_positions`` are open; existing ones are
+    kept while the desired side is unchanged. Breaching the daily loss limit flattens the
+    book until the next day, breaching the drawdown limit flattens it for good.
+
+    Returns ``(weights, equity, halted)``: signed weights held after each bar, equity as a
+    multiple of starting capital, and whether new entries were blocked on that bar.
+    """
+
+    desired = np.sign(np.nan_to_num(np.asarray(desired, dtype=float)))
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+    day_index = np.asarray(day_index)
+    bars, symbols = desired.shape
+    weights = np.zeros((bars, symbols), dtype=float)
+    equity = np.ones(bars, dtype=float)
+    halted = np.zeros(bars, dtype=bool)
+
+    size = limits.max_position_fraction
+    max_open = limits.max_concurrent_positions
+    current = np.zeros(symbols, dtype=float)
+    value = 1.0
+    peak = 1.0
+    day_start = 1.0
+    day = None
+    drawdown_hit = False
+    daily_hit = False
+
+    for t in range(bars):
+        if t:
+            value *= 1.0 + float(current @ returns[t])
+        if day_index[t] != day:
+            day = day_index[t]
+            day_start = value
+            daily_hit = False
+        peak = max(peak, value)
+        if not drawdown_hit and limits.max_drawdown_fraction > 0:
+            drawdown_hit = value <= peak * (1 - limits.max_drawdown_fraction)
+        if not daily_hit and limits.daily_loss_fraction > 0:
+            daily_hit = value - day_start <= -day_start * limits.daily_loss_fraction
+        equity[t] = value
+
+        if drawdown_hit or daily_hit:
+            halted[t] = True
+            current = np.zeros(symbols, dtype=float)
+            continue
+
+        target = desired[t]
+        side = np.sign(current)
+        kept = (side != 0) & (side == target)
+        candidates = np.flatnonzero((target != 0) & ~kept)
+        slots = max_open - int(kept.sum())
+        nxt = np.where(kept, current, 0.0)
+        if slots > 0 and candidates.size:
+            admitted = candidates[:slots]
+            nxt[admitted] = target[admitted] * size
+        current = nxt
+        weights[t] = current
+    return weights, equity, halted
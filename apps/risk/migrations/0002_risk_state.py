@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('risk', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equity', models.FloatField(default=0)),
+                ('peak_equity', models.FloatField(default=0)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('day_start_equity', models.FloatField(default=0)),
+                ('exposure', models.FloatField(default=0, help_text='Gross notional of open positions.')),
+                ('open_positions', models.PositiveIntegerField(default=0)),
+                ('halted_reason', models.CharField(blank=True, max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risk_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
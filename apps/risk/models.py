@@ -31,3 +31,24 @@ class RiskProfile(models.Model):
 
     def __str__(self) -> str:
         return f"Risk profile for {self.owner}"
+
+
+class RiskState(models.Model):
+    """Last checkpoint of the in-memory risk book of an owner (see ``apps.risk.engine``)."""
+
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="risk_state",
+    )
+    equity = models.FloatField(default=0)
+    peak_equity = models.FloatField(default=0)
+    day = models.DateField(null=True, blank=True)
+    day_start_equity = models.FloatField(default=0)
+    exposure = models.FloatField(default=0, help_text="Gross notional of open positions.")
+    open_positions = models.PositiveIntegerField(default=0)
+    halted_reason = models.CharField(max_length=40, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Risk state for {self.owner}"
@@ -1,9 +1,24 @@
+import numpy as np
 from django.contrib.auth import get_user_model
+from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import RiskProfile
+from .engine import (
+    DAILY_LOSS,
+    DRAWDOWN,
+    MAX_POSITIONS,
+    RESIZED,
+    SECONDS_PER_DAY,
+    RiskDecision,
+    RiskEngine,
+    RiskLimits,
+    apply_portfolio_limits,
+    load_risk_settings,
+    persist_risk_states,
+)
+from .models import RiskProfile, RiskState
 
 
 class RiskProfileAPITests(APITestCase):
@@ -19,3 +34,96 @@ class RiskProfileAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(RiskProfile.objects.filter(owner=self.user).count(), 1)
 
+
+
+class RiskEngineTests(TestCase):
+    def setUp(self):
+        self.limits = RiskLimits(
+            max_concurrent_positions=2,
+            max_position_fraction=0.10,
+            daily_loss_fraction=0.03,
+            max_drawdown_fraction=0.25,
+        )
+        self.engine = RiskEngine()
+        self.engine.register("owner", self.limits, 10_000.0)
+
+    def test_orders_resized_and_capped_by_concurrent_positions(self):
+        decision = self.engine.check_order("owner", 5_000.0, timestamp=0)
+        self.assertEqual(decision, RiskDecision(True, 1_000.0, RESIZED))
+        self.assertTrue(self.engine.check_order("owner", 500.0, timestamp=0).allowed)
+        # Both slots are reserved by pending orders.
+        self.assertEqual(self.engine.check_order("owner", 500.0, timestamp=0).reason, MAX_POSITIONS)
+
+        self.engine.on_fill("owner", "BTC", 10.0, 100.0, 0.0, 100.0, timestamp=60)
+        self.engine.release("owner")
+        book = self.engine.books["owner"]
+        self.assertEqual((book.open_positions, book.reserved), (1, 0))
+        self.assertTrue(self.engine.check_order("owner", 500.0, timestamp=60).allowed)
+
+        self.engine.on_fill("owner", "BTC", 0.0, 0.0, 50.0, 105.0, timestamp=120)
+        self.assertEqual(book.open_positions, 0)
+        self.assertAlmostEqual(book.equity, 10_050.0)
+        self.assertAlmostEqual(book.exposure, 0.0)
+
+    def test_daily_loss_blocks_entries_until_next_day(self):
+        self.engine.on_fill("owner", "BTC", 10.0, 100.0, 0.0, 100.0, timestamp=0)
+        self.engine.on_mark("owner", "BTC", 70.0, timestamp=600)
+        self.assertEqual(self.engine.check_order("owner", 100.0, timestamp=900).reason, DAILY_LOSS)
+        self.assertTrue(self.engine.check_order("owner", 100.0, timestamp=SECONDS_PER_DAY).allowed)
+
+    def test_drawdown_halts_permanently(self):
+        self.engine.on_fill("owner", "BTC", 100.0, 100.0, 0.0, 100.0, timestamp=0)
+        self.engine.on_mark("owner", "BTC", 120.0, timestamp=SECONDS_PER_DAY)  # Peak 12,000.
+        self.engine.on_mark("owner", "BTC", 89.0, timestamp=2 * SECONDS_PER_DAY)
+        self.assertEqual(self.engine.books["owner"].halted, DRAWDOWN)
+        self.assertEqual(self.engine.check_order("owner", 100.0, timestamp=5 * SECONDS_PER_DAY).reason, DRAWDOWN)
+
+    def test_states_persisted_in_batches_and_restored(self):
+        users = [get_user_model().objects.create_user(username=f"owner{i}", password="x") for i in range(50)]
+        engine = RiskEngine()
+        for user in users:
+            engine.register(user.pk, self.limits, 1_000.0)
+            engine.on_fill(user.pk, "BTC", 5.0, 100.0, 0.0, 100.0, timestamp=0)
+        engine.on_mark(users[0].pk, "BTC", 40.0, timestamp=60)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(persist_risk_states(engine.drain()), 50)
+        self.assertEqual(engine.drain(), {})
+        state = RiskState.objects.get(owner=users[0])
+        self.assertEqual(state.halted_reason, DRAWDOWN)
+        self.assertAlmostEqual(state.equity, 700.0)
+
+        RiskProfile.objects.create(owner=users[1], max_concurrent_positions=7)
+        settings = load_risk_settings([users[0].pk, users[1].pk])
+        self.assertEqual(settings[users[1].pk][0].max_concurrent_positions, 7)
+        restored = RiskEngine()
+        limits, state = settings[users[0].pk]
+        restored.register(users[0].pk, limits, 1_000.0, state)
+        self.assertFalse(restored.check_order(users[0].pk, 10.0).allowed)
+
+
+class PortfolioLimitTests(TestCase):
+    def test_vectorized_limits_cap_positions_and_stop_on_daily_loss(self):
+        limits = RiskLimits(max_concurrent_positions=2, max_position_fraction=0.5, daily_loss_fraction=0.03)
+        bars = 6
+        desired = np.ones((bars, 3))
+        returns = np.zeros((bars, 3))
+        returns[2] = [-0.05, -0.05, 0.0]  # Two held positions lose 5% of half the equity each.
+        day_index = np.array([0, 0, 0, 0, 1, 1])
+
+        weights, equity, halted = apply_portfolio_limits(desired, returns, day_index, limits)
+
+        np.testing.assert_allclose(weights[0], [0.5, 0.5, 0.0])
+        self.assertAlmostEqual(equity[2], 0.95)
+        np.testing.assert_array_equal(halted, [False, False, True, True, False, False])
+        np.testing.assert_allclose(weights[3], [0.0, 0.0, 0.0])
+        np.testing.assert_allclose(weights[4], [0.5, 0.5, 0.0])
+
+    def test_drawdown_breaker_flattens_for_good(self):
+        limits = RiskLimits(max_concurrent_positions=1, max_position_fraction=1.0, daily_loss_fraction=0)
+        desired = np.ones((5, 1))
+        returns = np.array([[0.0], [0.2], [-0.4], [0.5], [0.5]])
+        weights, equity, halted = apply_portfolio_limits(desired, returns, np.arange(5), limits)
+        self.assertTrue(halted[2:].all())
+        self.assertAlmostEqual(equity[-1], 1.2 * 0.6)
+        self.assertFalse(weights[2:].any())
@@ -0,0 +1,214 @@
+"""
+Async variant of the strategy run endpoint (``/api/strategies/hma-sma/run/async/``).
+
+Under ASGI the synchronous run view holds a worker thread for the whole pandas computation.
+This view only awaits. The database reads (``HMASMAStrategyRunView._load_run``: symbol,
+strategy and the one batched candle query) run through ``sync_to_async``. The
+indicator/evaluation/payload phase (``_compute_run``) is sent to a bounded
+``ProcessPoolExecutor`` of ``STRATEGY_RUN_WORKERS`` processes, so the event loop keeps
+serving other requests and the work is not limited by the GIL. With ``STRATEGY_RUN_WORKERS=0``
+the compute phase runs in a thread instead, for development and tests.
+
+Admission control: at most one run per worker computes at a time. Up to
+``STRATEGY_RUN_MAX_QUEUED`` more wait for a slot, for at most ``STRATEGY_RUN_QUEUE_TIMEOUT``
+seconds. Beyond that the view answers 503 with ``Retry-After`` instead of piling work onto the
+box.
+
+If the client disconnects (``DisconnectWatchMiddleware`` in ``config/asgi.py`` reports it), a
+queued run is cancelled. A run already executing in a worker cannot be interrupted: its result
+is dropped, and it keeps its slot until it finishes, so admission still reflects the real load.
+
+Only GET is served. Persisting runs (POST) stays on the synchronous view. DRF does not run
+async views, so errors are returned as plain JSON and the user comes from the session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+from apps.analytics.timing import span
+
+from .views import HMASMAStrategyRunView
+from .worker import compute_run, init_worker
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CLOSED_REQUEST = 499  # nginx's status for requests abandoned by the client
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Executor:
+    """The shared compute pool, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, "STRATEGY_RUN_WORKERS", 2)
+            if workers > 0:
+                # ``spawn``: forking an ASGI server with live threads and DB connections is unsafe.
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy-run")
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Admission:
+    """At most ``limit`` holders at once, ``max_queued`` waiters, each waiting ``timeout`` seconds at most."""
+
+    def __init__(self, limit: int, max_queued: int, timeout: float):
+        self.limit = max(1, limit)
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.waiting = 0
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # One loop per server process; tests may run each request on a new one.
+            self._loop, self._semaphore, self.waiting = loop, asyncio.Semaphore(self.limit), 0
+        semaphore = self._semaphore
+        if semaphore.locked() and self.waiting >= self.max_queued:
+            raise Overloaded("Too many strategy runs queued.")
+        self.waiting += 1
+        try:
+            with span("run.queue"):
+                await asyncio.wait_for(semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError as exc:
+            raise Overloaded("Timed out waiting for a strategy run slot.") from exc
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+admission = Admission(
+    limit=getattr(settings, "STRATEGY_RUN_WORKERS", 2),
+    max_queued=getattr(settings, "STRATEGY_RUN_MAX_QUEUED", 16),
+    timeout=getattr(settings, "STRATEGY_RUN_QUEUE_TIMEOUT", 30),
+)
+
+
+class DisconnectWatchMiddleware:
+    """
+    ASGI middleware that sets ``scope["disconnected"]`` (an ``asyncio.Event``) when the client
+    goes away. Django 4.2 stops reading ``receive`` once the body is in, so after that a
+    listener task reads it and waits for ``http.disconnect``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        disconnected = asyncio.Event()
+        body_read = asyncio.Event()
+
+        async def watched_receive():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def listen():
+            await body_read.wait()
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        listener = asyncio.create_task(listen())
+        try:
+            await self.app(dict(scope, disconnected=disconnected), watched_receive, send)
+        finally:
+            listener.cancel()
+
+
+class AsyncStrategyRunView(View):
+    http_method_names = ["get", "options"]
+    retry_after = 5  # seconds suggested to clients turned away by admission control
+
+    async def get(self, request, *args, **kwargs):
+        view = HMASMAStrategyRunView()
+        view.request = request
+        try:
+            run = await sync_to_async(view._load_run)(request.GET)
+        except APIException as exc:
+            return JsonResponse(exc.detail, status=exc.status_code, safe=False)
+
+        try:
+            async with admission.slot():
+                payload = await self._compute(run, request.scope.get("disconnected"))
+        except Overloaded as exc:
+            response = JsonResponse({"detail": str(exc)}, status=503)
+            response["Retry-After"] = str(self.retry_after)
+            return response
+        if payload is None:
+            return HttpResponse(status=CLIENT_CLOSED_REQUEST)
+        # Same renderer as the synchronous view, so both endpoints return identical bytes.
+        return HttpResponse(JSONRenderer().render(payload), content_type="application/json")
+
+    @staticmethod
+    async def _compute(run, disconnected: Optional[asyncio.Event]):
+        """The run's payload, or None when the client disconnected first."""
+        future: Future = get_executor().submit(compute_run, run)
+        work = asyncio.wrap_future(future)
+        if disconnected is None:
+            with span("run.compute"):
+                return await work
+
+        gone = asyncio.ensure_future(disconnected.wait())
+        try:
+            with span("run.compute"):
+                await asyncio.wait({work, gone}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            gone.cancel()
+        if work.done():
+            return work.result()
+
+        if not future.cancel():
+            # Already executing: wait it out so the admission slot is only freed with the CPU.
+            logger.info("Client left during a strategy run for %s; discarding the result", run.symbol.code)
+            await asyncio.wait({work})
+        return None
@@ -0,0 +1,146 @@
+"""
+Batched candle loading for the strategy run view.
+
+A run needs several candle frames of one symbol: the visible timeframe, the 5m base frame
+the strategy is evaluated on, the higher-timeframe trend frames and the frames that are only
+plotted. Each consumer describes its needs with a ``FrameWindow`` (newest ``limit`` bars of
+the range, ``warmup`` bars before its first visible one, or a range that starts where another
+window starts). ``load_frames`` turns every window into a lower bound computed by the
+database itself (index seeks on ``(symbol, timeframe, timestamp)``), fetches all of them with
+a single ``timeframe IN (...)`` query and splits the sorted result per timeframe with NumPy.
+Each window is then cut out of its timeframe with the same rules, so windows sharing a
+timeframe stay independent.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+from django.db.models import DateTimeField, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from apps.datafeeds.models import Candle, Symbol
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+@dataclass(frozen=True)
+class FrameWindow:
+    timeframe: str
+    limit: Optional[int] = None  # newest bars kept from the requested range
+    warmup: int = 0  # bars loaded before the first visible one
+    anchor: Optional[str] = None  # window whose first loaded bar starts this one's visible range
+
+
+def load_frames(
+    symbol: Symbol,
+    windows: Mapping[str, FrameWindow],
+    start_dt: Optional[datetime] = None,
+    end_dt: Optional[datetime] = None,
+) -> Dict[str, pd.DataFrame]:
+    """One query for every window; returns a frame per window name (empty when no candles)."""
+    lower_bounds: Dict[str, object] = {}
+    condition = Q()
+    for name in _resolution_order(windows):
+        window = windows[name]
+        lower = _lower_bound(symbol, window, lower_bounds, start_dt, end_dt)
+        lower_bounds[name] = lower
+        part = Q(timeframe=window.timeframe)
+        if lower is not None:
+            part &= Q(timestamp__gte=lower)
+        condition |= part
+
+    qs = Candle.objects.filter(condition, symbol=symbol)
+    if end_dt:
+        qs = qs.filter(timestamp__lte=end_dt)
+    rows = list(qs.order_by("timeframe", "timestamp").values_list("timeframe", *COLUMNS))
+    by_timeframe = _split(rows)
+
+    frames: Dict[str, pd.DataFrame] = {}
+    for name in _resolution_order(windows):
+        window = windows[name]
+        frame = by_timeframe.get(window.timeframe)
+        if frame is None:
+            frames[name] = pd.DataFrame()
+            continue
+        anchor = frames.get(window.anchor) if window.anchor else None
+        frames[name] = _cut(frame, window, anchor, start_dt)
+    return frames
+
+
+def _resolution_order(windows: Mapping[str, FrameWindow]):
+    """Window names with every anchor before the windows that depend on it."""
+    ordered = []
+    while len(ordered) < len(windows):
+        progressed = False
+        for name, window in windows.items():
+            if name not in ordered and (window.anchor is None or window.anchor in ordered):
+                ordered.append(name)
+                progressed = True
+        if not progressed:
+            raise ValueError("Frame windows have a missing or circular anchor.")
+    return ordered
+
+
+def _nth_newest(symbol: Symbol, timeframe: str, n: int, before=None, until=None):
+    """Timestamp of the ``n``-th newest candle (before ``before`` / up to ``until``), as SQL."""
+    qs = Candle.objects.filter(symbol=symbol, timeframe=timeframe)
+    if before is not None:
+        qs = qs.filter(timestamp__lt=before)
+    if until is not None:
+        qs = qs.filter(timestamp__lte=until)
+    # Shorter histories have no n-th candle: everything they hold is loaded.
+    return Coalesce(
+        Subquery(qs.order_by("-timestamp").values("timestamp")[n - 1 : n]),
+        Value(EPOCH, output_field=DateTimeField()),
+    )
+
+
+def _lower_bound(symbol: Symbol, window: FrameWindow, bounds, start_dt, end_dt):
+    if window.anchor:
+        visible = bounds[window.anchor]
+    else:
+        visible = Value(start_dt, output_field=DateTimeField()) if start_dt else None
+        if window.limit:
+            newest = _nth_newest(symbol, window.timeframe, window.limit, until=end_dt)
+            visible = Greatest(visible, newest) if visible is not None else newest
+    if visible is None or not window.warmup:
+        return visible
+    return _nth_newest(symbol, window.timeframe, window.warmup, before=visible)
+
+
+def _split(rows) -> Dict[str, pd.DataFrame]:
+    """Splits rows sorted by timeframe into one float frame per timeframe."""
+    if not rows:
+        return {}
+    frame = pd.DataFrame(rows, columns=["timeframe", *COLUMNS])
+    for column in COLUMNS[1:]:
+        frame[column] = frame[column].astype(float)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True)
+    timeframes = frame["timeframe"].to_numpy()
+    edges = np.concatenate(([0], np.flatnonzero(timeframes[1:] != timeframes[:-1]) + 1, [len(frame)]))
+    values = frame[COLUMNS]
+    return {
+        timeframes[begin]: values.iloc[begin:end].reset_index(drop=True)
+        for begin, end in zip(edges[:-1], edges[1:])
+    }
+
+
+def _cut(frame: pd.DataFrame, window: FrameWindow, anchor: Optional[pd.DataFrame], start_dt) -> pd.DataFrame:
+    """Mirrors ``_lower_bound`` on an already loaded timeframe frame."""
+    timestamps = frame["timestamp"]
+    if window.anchor:
+        first = int(timestamps.searchsorted(anchor["timestamp"].iloc[0])) if anchor is not None and not anchor.empty else 0
+    else:
+        first = int(timestamps.searchsorted(pd.Timestamp(start_dt))) if start_dt else 0
+        if window.limit:
+            first = max(first, len(frame) - window.limit)
+    begin = max(0, first - window.warmup)
+    if begin == 0:
+        return frame.copy()
+    return frame.iloc[begin:].reset_index(drop=True)
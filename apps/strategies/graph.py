@@ -0,0 +1,66 @@
+"""
+Request-scoped indicator graph.
+
+A run reads the same indicator series in two places. The strategy merges its declared
+indicators onto the base timeframe, and the plotting payload draws the configured SMA/HMA
+overlays. Both often want the same series, e.g. SMA200 on 5m or HMA200 on 1h.
+``IndicatorGraph`` holds the run's candle frames and memoises every series by
+``(timeframe, kind, period)``. Each one is computed once, and later readers get the same
+``pd.Series`` object, indexed like its frame. Frames are never copied or written to.
+
+The graph lives for one request. Series are shared, so readers must not modify them.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from .registry import INDICATOR_FUNCTIONS, IndicatorSpec
+
+IndicatorKey = Tuple[str, str, int]  # (timeframe, kind, period)
+
+
+class IndicatorGraph:
+    def __init__(self, frames: Mapping[str, pd.DataFrame]):
+        self._frames: Dict[str, pd.DataFrame] = dict(frames)
+        self._series: Dict[IndicatorKey, pd.Series] = {}
+        self.hits = 0
+
+    def __contains__(self, timeframe: str) -> bool:
+        return timeframe in self._frames
+
+    def frame(self, timeframe: str) -> Optional[pd.DataFrame]:
+        return self._frames.get(timeframe)
+
+    def add_frame(self, timeframe: str, frame: pd.DataFrame) -> None:
+        if timeframe in self._frames:
+            raise ValueError(f"Timeframe '{timeframe}' is already in the graph.")
+        self._frames[timeframe] = frame
+        # Drop the empty series memoised while the frame was missing.
+        self._series = {key: series for key, series in self._series.items() if key[0] != timeframe}
+
+    def series(self, timeframe: str, kind: str, period: int) -> pd.Series:
+        """``kind``/``period`` over the closes of ``timeframe`` (empty when there are no candles)."""
+        key = (timeframe, kind, period)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = self._compute(key)
+        else:
+            self.hits += 1
+        return series
+
+    def indicator(self, indicator: IndicatorSpec) -> pd.Series:
+        return self.series(indicator.timeframe, indicator.kind, indicator.period)
+
+    @property
+    def computed(self) -> Tuple[IndicatorKey, ...]:
+        return tuple(self._series)
+
+    def _compute(self, key: IndicatorKey) -> pd.Series:
+        timeframe, kind, period = key
+        frame = self._frames.get(timeframe)
+        if frame is None or frame.empty:
+            return pd.Series(dtype=float)
+        return INDICATOR_FUNCTIONS[kind](frame["close"], period)
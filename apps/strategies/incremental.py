@@ -0,0 +1,127 @@
+"""Streaming (O(1) per update) versions of the moving averages in ``indicators``."""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Iterable, Optional
+
+# Running sums are rebuilt from the window this often to cancel floating-point drift.
+RESYNC_EVERY = 10_000
+
+
+class RollingSMA:
+    """Simple moving average matching ``simple_moving_average`` on the latest bar."""
+
+    def __init__(self, period: int):
+        if period <= 0:
+            raise ValueError("Period must be a positive integer.")
+        self.period = period
+        self._window: deque[float] = deque(maxlen=period)
+        self._sum = 0.0
+        self._updates = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) == self.period
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._sum / self.period if self.ready else None
+
+    def update(self, value: float) -> Optional[float]:
+        if self.ready:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._sum = math.fsum(self._window)
+        return self.value
+
+    def seed(self, values: Iterable[float]) -> Optional[float]:
+        for value in values:
+            self.update(value)
+        return self.value
+
+
+class RollingWMA:
+    """Linear-weight (1..period) moving average matching ``weighted_moving_average``."""
+
+    def __init__(self, period: int):
+        if period <= 0:
+            raise ValueError("Period must be a positive integer.")
+        self.period = period
+        self._window: deque[float] = deque(maxlen=period)
+        self._sum = 0.0
+        self._weighted = 0.0
+        self._denominator = period * (period + 1) / 2
+        self._updates = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) == self.period
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._weighted / self._denominator if self.ready else None
+
+    def update(self, value: float) -> Optional[float]:
+        if self.ready:
+            # Every weight drops by one (the oldest falls to zero) and the new value gets `period`.
+            self._weighted += self.period * value - self._sum
+            self._sum += value - self._window[0]
+        else:
+            self._weighted += (len(self._window) + 1) * value
+            self._sum += value
+        self._window.append(value)
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._resync()
+        return self.value
+
+    def seed(self, values: Iterable[float]) -> Optional[float]:
+        for value in values:
+            self.update(value)
+        return self.value
+
+    def _resync(self) -> None:
+        self._sum = math.fsum(self._window)
+        self._weighted = math.fsum((i + 1) * v for i, v in enumerate(self._window))
+
+
+class RollingHMA:
+    """Hull moving average built from three rolling WMAs, as in ``hull_moving_average``."""
+
+    def __init__(self, period: int):
+        if period <= 0:
+            raise ValueError("Period must be a positive integer.")
+        self.period = period
+        self._half = RollingWMA(max(1, period // 2))
+        self._full = RollingWMA(period)
+        self._smooth = RollingWMA(max(1, int(math.sqrt(period))))
+
+    @property
+    def warmup(self) -> int:
+        """Bars needed before the first value is produced."""
+        return self.period + self._smooth.period - 1
+
+    @property
+    def ready(self) -> bool:
+        return self._smooth.ready
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._smooth.value
+
+    def update(self, value: float) -> Optional[float]:
+        half = self._half.update(value)
+        full = self._full.update(value)
+        if half is None or full is None:
+            return None
+        return self._smooth.update(2 * half - full)
+
+    def seed(self, values: Iterable[float]) -> Optional[float]:
+        for value in values:
+            self.update(value)
+        return self.value
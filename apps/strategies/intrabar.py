@@ -0,0 +1,147 @@
+"""
+Intrabar stop-loss / take-profit resolution.
+
+When both protective levels of an open position fall inside one 5m bar, the bar alone
+cannot tell which was touched first and the backtests pessimistically pick the stop.
+``IntrabarResolver`` replays the lower-timeframe candles of such a bar instead. Those
+candles are loaded lazily, one chunk (a day by default) per query, and only for chunks
+that actually contain an ambiguous bar; closed chunks are also kept in the shared cache
+so repeated runs over the same range do not query again.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone as django_timezone
+
+from apps.datafeeds.models import TIMEFRAME_SECONDS, Candle, Symbol
+
+logger = logging.getLogger(__name__)
+
+STOP_LOSS = "stop_loss"
+TAKE_PROFIT = "take_profit"
+
+INTRABAR_TIMEFRAME = "1m"
+CHUNK_SECONDS = 24 * 3600
+CACHE_PREFIX = "intrabar:"
+CACHE_TTL_SECONDS = 24 * 3600
+
+# (epoch seconds, open, high, low) of the lower-timeframe candles in a chunk.
+_Chunk = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class IntrabarResolver:
+    """Decides which of two levels a position touched first inside a base-timeframe bar."""
+
+    def __init__(
+        self,
+        symbol: Symbol,
+        base_timeframe: str = "5m",
+        timeframe: str = INTRABAR_TIMEFRAME,
+        chunk_seconds: int = CHUNK_SECONDS,
+    ):
+        if timeframe not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Unsupported intrabar timeframe '{timeframe}'.")
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.bar_seconds = TIMEFRAME_SECONDS[base_timeframe]
+        self.chunk_seconds = chunk_seconds
+        self.resolved = 0
+        self.unresolved = 0
+        self.queries = 0
+        self._chunks: Dict[int, _Chunk] = {}
+
+    def first_hit(
+        self,
+        bar_time: datetime,
+        direction: str,
+        stop_price: float,
+        take_price: float,
+    ) -> str:
+        """
+        Returns ``STOP_LOSS`` or ``TAKE_PROFIT`` for a ``"long"``/``"short"`` position whose
+        levels both triggered in the bar opening at ``bar_time``. Falls back to the stop
+        when lower-timeframe data is missing or both levels share one lower bar.
+        """
+
+        start = int(bar_time.timestamp())
+        times, opens, highs, lows = self._window(start, start + self.bar_seconds)
+        outcome = None
+        for i in range(times.shape[0]):
+            if direction == "long":
+                stop_hit = lows[i] <= stop_price
+                take_hit = highs[i] >= take_price
+                gapped_to_take = opens[i] >= take_price
+            else:
+                stop_hit = highs[i] >= stop_price
+                take_hit = lows[i] <= take_price
+                gapped_to_take = opens[i] <= take_price
+            if stop_hit and take_hit:
+                outcome = TAKE_PROFIT if gapped_to_take else STOP_LOSS
+            elif stop_hit:
+                outcome = STOP_LOSS
+            elif take_hit:
+                outcome = TAKE_PROFIT
+            if outcome is not None:
+                break
+
+        if outcome is None:
+            self.unresolved += 1
+            return STOP_LOSS
+        self.resolved += 1
+        return outcome
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "timeframe": self.timeframe,
+            "resolved": self.resolved,
+            "unresolved": self.unresolved,
+            "queries": self.queries,
+        }
+
+    def _window(self, start: int, end: int) -> _Chunk:
+        chunk = self._chunk(start - start % self.chunk_seconds)
+        times = chunk[0]
+        lo, hi = np.searchsorted(times, [start, end], side="left")
+        return times[lo:hi], chunk[1][lo:hi], chunk[2][lo:hi], chunk[3][lo:hi]
+
+    def _chunk(self, chunk_start: int) -> _Chunk:
+        chunk = self._chunks.get(chunk_start)
+        if chunk is not None:
+            return chunk
+        key = f"{CACHE_PREFIX}{self.symbol.pk}:{self.timeframe}:{chunk_start}"
+        chunk = cache.get(key)
+        if chunk is None:
+            chunk = self._load(chunk_start)
+            chunk_end = chunk_start + self.chunk_seconds
+            # Only chunks that can no longer receive candles are shared across requests.
+            if chunk_end <= django_timezone.now().timestamp():
+                cache.set(key, chunk, timeout=CACHE_TTL_SECONDS)
+        self._chunks[chunk_start] = chunk
+        return chunk
+
+    def _load(self, chunk_start: int) -> _Chunk:
+        since = datetime.fromtimestamp(chunk_start, tz=timezone.utc)
+        rows = list(
+            Candle.objects.filter(
+                symbol=self.symbol,
+                timeframe=self.timeframe,
+                timestamp__gte=since,
+                timestamp__lt=since + timedelta(seconds=self.chunk_seconds),
+            )
+            .order_by("timestamp")
+            .values_list("timestamp", "open", "high", "low")
+        )
+        self.queries += 1
+        logger.debug("Loaded %s %s candles for %s intrabar chunk %s", len(rows), self.timeframe, self.symbol.code, since)
+        return (
+            np.array([int(row[0].timestamp()) for row in rows], dtype=np.int64),
+            np.array([float(row[1]) for row in rows], dtype=float),
+            np.array([float(row[2]) for row in rows], dtype=float),
+            np.array([float(row[3]) for row in rows], dtype=float),
+        )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from apps.strategies.views import HMASMAStrategyRunView
+
+TIMEFRAME_DELTAS = {"30m": timedelta(minutes=30), "1h": timedelta(hours=1), "4h": timedelta(hours=4), "1d": timedelta(days=1)}
+
+
+def linear_scan(entries, timestamps, delta):
+    """The previous alignment: scan every view candle for each entry (used for the reference timing)."""
+    window_end = timestamps[1:] + [timestamps[-1] + delta]
+    aligned = 0
+    for entry in entries:
+        entry_ts = pd.Timestamp(entry["timestamp"]).tz_convert("UTC")
+        for start_ts, end_ts in zip(timestamps, window_end):
+            if start_ts <= entry_ts < end_ts:
+                aligned += 1
+                break
+        else:
+            aligned += entry_ts >= timestamps[-1]
+    return aligned
+
+
+class Command(BaseCommand):
+    help = "Times _align_entries on synthetic entries spread over synthetic view candles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=10_000)
+        parser.add_argument("--candles", type=int, default=100_000)
+        parser.add_argument("--timeframe", default="1h", choices=sorted(TIMEFRAME_DELTAS))
+        parser.add_argument(
+            "--reference-sample",
+            dest="reference_sample",
+            type=int,
+            default=20,
+            help="Entries timed with the old linear scan (extrapolated to all entries); 0 skips it.",
+        )
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        delta = TIMEFRAME_DELTAS[options["timeframe"]]
+        start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        view_df = pd.DataFrame({"timestamp": pd.date_range(start, periods=options["candles"], freq=delta, tz="UTC")})
+        rng = np.random.default_rng(options["seed"])
+        span = int((delta * options["candles"]).total_seconds() // 300)
+        offsets = np.sort(rng.integers(0, span, size=options["entries"]))
+        entries = [
+            {"timestamp": start + timedelta(minutes=5 * int(offset)), "direction": "long", "price": 1.0}
+            for offset in offsets
+        ]
+
+        view = HMASMAStrategyRunView()
+        started = time.perf_counter()
+        aligned = view._align_entries(entries, view_df, options["timeframe"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(entries):,} entries over {len(view_df):,} {options['timeframe']} candles: "
+                f"{len(aligned):,} aligned in {elapsed * 1000:.1f}ms"
+            )
+        )
+
+        sample = options["reference_sample"]
+        if sample:
+            timestamps = list(view_df["timestamp"])
+            chosen = entries[-sample:]  # late entries are the worst case for the scan
+            started = time.perf_counter()
+            linear_scan(chosen, timestamps, delta)
+            per_entry = (time.perf_counter() - started) / len(chosen)
+            self.stdout.write(
+                f"Linear scan reference: {per_entry * 1000:.1f}ms per late entry, "
+                f"~{per_entry * len(entries):.0f}s upper bound for all entries"
+            )
@@ -1,12 +1,17 @@
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.text import slugify
 
+from .rules import RULES_KEY, RuleError, compile_rules, has_rules
+
 
 class Strategy(models.Model):
     """
     Stores metadata and parameters for a trading strategy definition.
     Config can include indicator parameters, universe filters, and risk settings.
+    ``config["rules"]``, when present, holds a rule DSL definition (see ``rules.py``)
+    that the run view can execute; it is validated on save.
     """
 
     owner = models.ForeignKey(
@@ -30,7 +35,16 @@ class Strategy(models.Model):
     def __str__(self) -> str:
         return f"{self.name} v{self.version}"
 
+    def clean(self):
+        super().clean()
+        if has_rules(self.config):
+            try:
+                compile_rules(self.config[RULES_KEY])
+            except RuleError as exc:
+                raise ValidationError({"config": str(exc)}) from exc
+
     def save(self, *args, **kwargs):
+        self.clean()
         if not self.slug:
             self.slug = slugify(f"{self.owner_id}-{self.name}-{self.version}")
         super().save(*args, **kwargs)
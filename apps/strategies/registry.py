@@ -0,0 +1,112 @@
+"""
+Strategy registry used by the run view.
+
+Every strategy declares the indicators it reads (kind, timeframe and period) and the
+function that evaluates it. The run view derives from that declaration which candle
+timeframes to load, how much warmup history each one needs and which indicator columns
+to compute, so a request never pays for data a strategy does not use.
+
+New strategies register a ``StrategySpec`` with ``register_strategy``; the evaluator is
+called as ``evaluate(view, merged, intrabar)`` and returns ``(evaluations, entries)``.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .indicators import hull_moving_average, simple_moving_average, weighted_moving_average
+
+BASE_TIMEFRAME = "5m"
+DEFAULT_STRATEGY = "1"
+
+INDICATOR_FUNCTIONS: Dict[str, Callable[[pd.Series, int], pd.Series]] = {
+    "sma": simple_moving_average,
+    "hma": hull_moving_average,
+    "wma": weighted_moving_average,
+}
+
+Evaluator = Callable[..., Tuple[List[Dict], List[Dict]]]
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    kind: str  # key of INDICATOR_FUNCTIONS
+    timeframe: str
+    period: int = 200
+
+    def __post_init__(self):
+        if self.kind not in INDICATOR_FUNCTIONS:
+            raise ValueError(f"Unknown indicator '{self.kind}'.")
+        if self.period <= 0:
+            raise ValueError("Period must be a positive integer.")
+
+    @property
+    def name(self) -> str:
+        """Column holding the series on its own timeframe frame, e.g. ``hma200_1h``."""
+        return f"{self.kind}{self.period}_{self.timeframe}"
+
+    @property
+    def column(self) -> str:
+        """Column in the merged base-timeframe frame (base indicators drop the suffix)."""
+        if self.timeframe == BASE_TIMEFRAME:
+            return f"{self.kind}{self.period}"
+        return self.name
+
+    @property
+    def warmup(self) -> int:
+        """Bars needed before the first value is defined."""
+        if self.kind == "hma":
+            return self.period + max(1, int(math.sqrt(self.period))) - 1
+        return self.period
+
+    def compute(self, close: pd.Series) -> pd.Series:
+        return INDICATOR_FUNCTIONS[self.kind](close, self.period)
+
+
+@dataclass(frozen=True)
+class StrategySpec:
+    key: str
+    label: str
+    indicators: Tuple[IndicatorSpec, ...]
+    evaluate: Evaluator
+    # Extra base-timeframe columns derived after merging (e.g. ATR for strategy 3).
+    prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None
+    options: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def timeframes(self) -> Tuple[str, ...]:
+        """Base timeframe first, then every other timeframe an indicator reads."""
+        ordered = [BASE_TIMEFRAME]
+        for indicator in self.indicators:
+            if indicator.timeframe not in ordered:
+                ordered.append(indicator.timeframe)
+        return tuple(ordered)
+
+    def warmup(self, timeframe: str) -> int:
+        """Longest warmup (in bars of ``timeframe``) among the indicators on that timeframe."""
+        return max((ind.warmup for ind in self.indicators if ind.timeframe == timeframe), default=0)
+
+
+_REGISTRY: Dict[str, StrategySpec] = {}
+
+
+def register_strategy(spec: StrategySpec) -> StrategySpec:
+    _REGISTRY[spec.key] = spec
+    return spec
+
+
+def is_registered(key: Optional[str]) -> bool:
+    return str(key) in _REGISTRY
+
+
+def get_strategy(key: Optional[str]) -> StrategySpec:
+    """Registered strategy for ``key``; unknown keys fall back to the default strategy."""
+    return _REGISTRY.get(str(key)) or _REGISTRY[DEFAULT_STRATEGY]
+
+
+def registered_strategies() -> List[StrategySpec]:
+    return list(_REGISTRY.values())
@@ -0,0 +1,422 @@
+"""
+Rule DSL for strategies defined in ``Strategy.config["rules"]``.
+
+A rule set names the indicators it reads, lists the conditions that open a long or short
+position (``entry`` plus optional regime ``filters``, all of which must hold) and the
+conditions that close it (``exit``, any of which closes), and optionally sets stop-loss /
+take-profit percentages under ``risk``::
+
+    {
+        "indicators": {
+            "fast": {"type": "sma", "period": 50},
+            "trend": {"type": "hma", "period": 200, "timeframe": "1h"}
+        },
+        "entry": {"long": [{"op": "cross_above", "left": "fast", "right": "trend"}]},
+        "filters": {"long": [{"op": "gt", "left": "close", "right": "trend"}]},
+        "exit": {"long": [{"op": "cross_below", "left": "fast", "right": "trend"}]},
+        "risk": {"stop_loss_pct": 1.5, "take_profit_pct": 3}
+    }
+
+Operands are indicator names, candle fields (``open``, ``high``, ``low``, ``close``,
+``volume``) or numbers; ``{"all": [...]}`` and ``{"any": [...]}`` nest conditions.
+
+``compile_rules`` validates a rule set and turns every condition into a closure over NumPy
+arrays, so the signals of a whole range come from a handful of vectorized comparisons.
+Positions are then walked from signal to signal (not bar by bar): stop/take levels are
+searched with array scans between an entry and its next rule exit. Compiled rule sets are
+cached per strategy id, version and rule content.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .intrabar import TAKE_PROFIT
+from .registry import BASE_TIMEFRAME, INDICATOR_FUNCTIONS, IndicatorSpec, StrategySpec
+
+RULES_KEY = "rules"
+SIDES = ("long", "short")
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+RULE_TIMEFRAMES = (BASE_TIMEFRAME, "30m", "1h", "4h", "1d")
+MAX_PERIOD = 1000
+COMPARISONS = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+}
+CROSSES = ("cross_above", "cross_below")
+RISK_KEYS = ("stop_loss_pct", "take_profit_pct")
+COMPILED_CACHE_SIZE = 128
+# First window (in bars) scanned for a stop/take hit; doubled until a hit or the rule exit.
+SCAN_WINDOW = 64
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+Columns = Mapping[str, np.ndarray]
+Condition = Callable[[Columns], np.ndarray]
+Operand = Callable[[Columns], np.ndarray]
+
+
+class RuleError(ValueError):
+    """Raised when a rule set does not follow the DSL; the message names the offending path."""
+
+
+@dataclass(frozen=True)
+class RuleSignals:
+    enter_long: np.ndarray
+    enter_short: np.ndarray
+    exit_long: np.ndarray
+    exit_short: np.ndarray
+
+
+@dataclass(frozen=True)
+class RuleEvent:
+    index: int
+    direction: str  # "long", "short", "long_exit", "short_exit"
+    price: float
+    reason: Optional[str] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledRules:
+    indicators: Dict[str, IndicatorSpec]  # rule name -> indicator
+    entry: Dict[str, Optional[Condition]]  # side -> entry AND filters, None when the side never enters
+    exits: Dict[str, Optional[Condition]]
+    stop_loss_pct: Optional[float] = None
+    take_profit_pct: Optional[float] = None
+
+    def columns(self, merged: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Float arrays for every operand name, read from the merged base-timeframe frame."""
+        columns = {field: merged[field].to_numpy(dtype=float) for field in PRICE_FIELDS}
+        for name, indicator in self.indicators.items():
+            columns[name] = pd.to_numeric(merged[indicator.column], errors="coerce").to_numpy(dtype=float)
+        return columns
+
+    def signals(self, columns: Columns) -> RuleSignals:
+        size = columns["close"].shape[0]
+
+        def evaluate(condition: Optional[Condition]) -> np.ndarray:
+            return condition(columns) if condition is not None else np.zeros(size, dtype=bool)
+
+        return RuleSignals(
+            enter_long=evaluate(self.entry["long"]),
+            enter_short=evaluate(self.entry["short"]),
+            exit_long=evaluate(self.exits["long"]),
+            exit_short=evaluate(self.exits["short"]),
+        )
+
+    def walk(
+        self,
+        signals: RuleSignals,
+        columns: Columns,
+        first_hit: Optional[Callable[[int, str, float, float], str]] = None,
+    ) -> List[RuleEvent]:
+        """
+        Entry/exit events for one position at a time. Exits are checked before entries on the
+        same bar (so a position can flip), the stop wins when both levels fall inside one bar
+        unless ``first_hit(index, side, stop, take)`` says the take-profit came first.
+        """
+
+        close = columns["close"]
+        entries = np.flatnonzero(signals.enter_long | signals.enter_short)
+        rule_exits = {"long": np.flatnonzero(signals.exit_long), "short": np.flatnonzero(signals.exit_short)}
+        events: List[RuleEvent] = []
+        start = 0
+        while True:
+            position = np.searchsorted(entries, start)
+            if position == entries.shape[0]:
+                break
+            index = int(entries[position])
+            side = "long" if signals.enter_long[index] else "short"
+            price = float(close[index])
+            stop, take = self._levels(side, price)
+            events.append(RuleEvent(index, side, price, stop_loss=stop, take_profit=take))
+
+            exit_event = self._find_exit(index, side, stop, take, rule_exits[side], columns, first_hit)
+            if exit_event is None:
+                break
+            events.append(exit_event)
+            start = exit_event.index
+        return events
+
+    def evaluate(self, view, merged: pd.DataFrame, intrabar=None) -> Tuple[List[Dict], List[Dict]]:
+        """Registry evaluator: per-bar evaluations and entry markers in the run view format."""
+        columns = self.columns(merged)
+        signals = self.signals(columns)
+        timestamps = merged["timestamp"]
+        first_hit = None
+        if intrabar is not None:
+            def _first_hit(index, side, stop, take):
+                return intrabar.first_hit(timestamps.iloc[index].to_pydatetime(), side, stop, take)
+
+            first_hit = _first_hit
+
+        events = self.walk(signals, columns, first_hit)
+        exit_reasons: Dict[str, Dict[int, str]] = {"long": {}, "short": {}}
+        entries: List[Dict] = []
+        for event in events:
+            marker = {
+                "timestamp": timestamps.iloc[event.index].to_pydatetime(),
+                "direction": event.direction,
+                "price": event.price,
+            }
+            if event.reason is not None:
+                marker["reason"] = event.reason
+                exit_reasons[event.direction[: -len("_exit")]][event.index] = event.reason
+            else:
+                marker.update(
+                    stop_loss=event.stop_loss,
+                    take_profit=event.take_profit,
+                    stop_loss_percent=self.stop_loss_pct,
+                    take_profit_percent=self.take_profit_pct,
+                )
+            entries.append(marker)
+
+        # Timestamps are UTC; formatting them in one call matches ``Timestamp.isoformat()``.
+        times = np.datetime_as_string(timestamps.to_numpy(dtype="datetime64[s]"), unit="s")
+        evaluations = [
+            {
+                "time": f"{time}+00:00",
+                "should_enter": long_signal,
+                "should_enter_long": long_signal,
+                "should_enter_short": short_signal,
+                "should_exit_long": index in exit_reasons["long"],
+                "should_exit_short": index in exit_reasons["short"],
+                "exit_reason_long": exit_reasons["long"].get(index),
+                "exit_reason_short": exit_reasons["short"].get(index),
+            }
+            for index, (time, long_signal, short_signal) in enumerate(
+                zip(times.tolist(), signals.enter_long.tolist(), signals.enter_short.tolist())
+            )
+        ]
+        return evaluations, entries
+
+    def _levels(self, side: str, price: float) -> Tuple[Optional[float], Optional[float]]:
+        direction = 1 if side == "long" else -1
+        stop = price * (1 - direction * self.stop_loss_pct / 100) if self.stop_loss_pct else None
+        take = price * (1 + direction * self.take_profit_pct / 100) if self.take_profit_pct else None
+        return stop, take
+
+    def _find_exit(
+        self,
+        index: int,
+        side: str,
+        stop: Optional[float],
+        take: Optional[float],
+        rule_exits: np.ndarray,
+        columns: Columns,
+        first_hit,
+    ) -> Optional[RuleEvent]:
+        exit_direction = f"{side}_exit"
+        position = np.searchsorted(rule_exits, index, side="right")
+        rule_exit = int(rule_exits[position]) if position < rule_exits.shape[0] else None
+
+        if stop is not None or take is not None:
+            adverse, favourable = (columns["low"], columns["high"]) if side == "long" else (columns["high"], columns["low"])
+            sign = 1 if side == "long" else -1
+            begin = index + 1
+            limit = rule_exit + 1 if rule_exit is not None else adverse.shape[0]
+            window = SCAN_WINDOW
+            while begin < limit:
+                end = min(limit, begin + window)
+                stop_hit = sign * adverse[begin:end] <= sign * stop if stop is not None else np.zeros(end - begin, dtype=bool)
+                take_hit = sign * favourable[begin:end] >= sign * take if take is not None else np.zeros(end - begin, dtype=bool)
+                hits = stop_hit | take_hit
+                if hits.any():
+                    offset = int(np.argmax(hits))
+                    bar = begin + offset
+                    if stop_hit[offset] and take_hit[offset]:
+                        take_first = first_hit is not None and first_hit(bar, side, stop, take) == TAKE_PROFIT
+                    else:
+                        take_first = bool(take_hit[offset])
+                    if take_first:
+                        return RuleEvent(bar, exit_direction, float(take), reason="take_profit")
+                    return RuleEvent(bar, exit_direction, float(stop), reason="stop_loss")
+                begin = end
+                window *= 2
+
+        if rule_exit is None:
+            return None
+        return RuleEvent(rule_exit, exit_direction, float(columns["close"][rule_exit]), reason="rule")
+
+
+def has_rules(config) -> bool:
+    return isinstance(config, dict) and RULES_KEY in config
+
+
+def compile_rules(rules) -> CompiledRules:
+    """Validates a rule set and compiles it; raises ``RuleError`` on the first problem found."""
+    if not isinstance(rules, dict):
+        raise RuleError("rules: must be an object.")
+    unknown = set(rules) - {"indicators", "entry", "filters", "exit", "risk"}
+    if unknown:
+        raise RuleError(f"rules: unknown keys {sorted(unknown)}.")
+
+    indicators = _compile_indicators(rules.get("indicators", {}))
+    names = set(indicators) | set(PRICE_FIELDS)
+    entry_lists = _side_lists(rules.get("entry", {}), "entry")
+    filter_lists = _side_lists(rules.get("filters", {}), "filters")
+    exit_lists = _side_lists(rules.get("exit", {}), "exit")
+    if not any(entry_lists.values()):
+        raise RuleError("entry: at least one side needs entry conditions.")
+
+    entry: Dict[str, Optional[Condition]] = {}
+    exits: Dict[str, Optional[Condition]] = {}
+    for side in SIDES:
+        if entry_lists[side]:
+            nodes = [(node, f"entry.{side}[{i}]") for i, node in enumerate(entry_lists[side])]
+            nodes += [(node, f"filters.{side}[{i}]") for i, node in enumerate(filter_lists[side])]
+            entry[side] = _combine([_compile_condition(node, names, path) for node, path in nodes], np.logical_and)
+        elif filter_lists[side]:
+            raise RuleError(f"filters.{side}: filters need entry conditions on the same side.")
+        else:
+            entry[side] = None
+        conditions = [_compile_condition(node, names, f"exit.{side}[{i}]") for i, node in enumerate(exit_lists[side])]
+        exits[side] = _combine(conditions, np.logical_or) if conditions else None
+
+    stop_loss, take_profit = _compile_risk(rules.get("risk", {}))
+    return CompiledRules(
+        indicators=indicators,
+        entry=entry,
+        exits=exits,
+        stop_loss_pct=stop_loss,
+        take_profit_pct=take_profit,
+    )
+
+
+def rule_strategy_spec(strategy) -> StrategySpec:
+    """Registry spec for a ``Strategy`` whose config holds rules, compiled once per version."""
+    text = json.dumps(strategy.config[RULES_KEY], sort_keys=True)
+    return _cached_spec(strategy.pk, strategy.version, strategy.slug, strategy.name, text)
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _cached_spec(strategy_id: int, version: str, slug: str, name: str, text: str) -> StrategySpec:
+    compiled = compile_rules(json.loads(text))
+    indicators = tuple(dict.fromkeys(compiled.indicators.values()))
+    return StrategySpec(
+        key=slug,
+        label=name,
+        indicators=indicators,
+        evaluate=compiled.evaluate,
+        options={"strategy_id": strategy_id, "version": version},
+    )
+
+
+def _compile_indicators(definitions) -> Dict[str, IndicatorSpec]:
+    if not isinstance(definitions, dict):
+        raise RuleError("indicators: must be an object mapping names to definitions.")
+    indicators: Dict[str, IndicatorSpec] = {}
+    for name, definition in definitions.items():
+        path = f"indicators.{name}"
+        if not _NAME_PATTERN.match(name) or name in PRICE_FIELDS:
+            raise RuleError(f"{path}: invalid indicator name.")
+        if not isinstance(definition, dict):
+            raise RuleError(f"{path}: must be an object.")
+        kind = definition.get("type")
+        if kind not in INDICATOR_FUNCTIONS:
+            raise RuleError(f"{path}.type: expected one of {sorted(INDICATOR_FUNCTIONS)}.")
+        timeframe = definition.get("timeframe", BASE_TIMEFRAME)
+        if timeframe not in RULE_TIMEFRAMES:
+            raise RuleError(f"{path}.timeframe: expected one of {list(RULE_TIMEFRAMES)}.")
+        period = definition.get("period", 200)
+        if not isinstance(period, int) or isinstance(period, bool) or not 1 <= period <= MAX_PERIOD:
+            raise RuleError(f"{path}.period: expected an integer between 1 and {MAX_PERIOD}.")
+        indicators[name] = IndicatorSpec(kind, timeframe, period)
+    return indicators
+
+
+def _side_lists(value, path: str) -> Dict[str, list]:
+    if not isinstance(value, dict) or set(value) - set(SIDES):
+        raise RuleError(f"{path}: must be an object with 'long' and/or 'short' lists.")
+    lists = {}
+    for side in SIDES:
+        conditions = value.get(side, [])
+        if not isinstance(conditions, list):
+            raise RuleError(f"{path}.{side}: must be a list of conditions.")
+        lists[side] = conditions
+    return lists
+
+
+def _compile_risk(risk) -> Tuple[Optional[float], Optional[float]]:
+    if not isinstance(risk, dict) or set(risk) - set(RISK_KEYS):
+        raise RuleError(f"risk: only {list(RISK_KEYS)} are supported.")
+    values = []
+    for key in RISK_KEYS:
+        value = risk.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value < 100):
+            raise RuleError(f"risk.{key}: expected a percentage between 0 and 100.")
+        values.append(float(value) if value is not None else None)
+    return values[0], values[1]
+
+
+def _compile_condition(node, names, path: str) -> Condition:
+    if not isinstance(node, dict):
+        raise RuleError(f"{path}: must be an object.")
+    for group, combine in (("all", np.logical_and), ("any", np.logical_or)):
+        if group in node:
+            children = node[group]
+            if len(node) != 1 or not isinstance(children, list) or not children:
+                raise RuleError(f"{path}.{group}: must be the only key and hold a non-empty list.")
+            return _combine(
+                [_compile_condition(child, names, f"{path}.{group}[{i}]") for i, child in enumerate(children)],
+                combine,
+            )
+
+    if set(node) != {"op", "left", "right"}:
+        raise RuleError(f"{path}: expected 'op', 'left' and 'right' (or 'all'/'any').")
+    op = node["op"]
+    left = _compile_operand(node["left"], names, f"{path}.left")
+    right = _compile_operand(node["right"], names, f"{path}.right")
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        return lambda columns: compare(left(columns), right(columns))
+    if op in CROSSES:
+        above = op == "cross_above"
+
+        def crossed(columns: Columns) -> np.ndarray:
+            a, b = left(columns), right(columns)
+            result = np.zeros(a.shape[0], dtype=bool)
+            # NaN comparisons are False, so bars without history never produce a crossover.
+            if above:
+                result[1:] = (a[:-1] <= b[:-1]) & (a[1:] > b[1:])
+            else:
+                result[1:] = (a[:-1] >= b[:-1]) & (a[1:] < b[1:])
+            return result
+
+        return crossed
+    raise RuleError(f"{path}.op: expected one of {sorted(COMPARISONS) + list(CROSSES)}.")
+
+
+def _compile_operand(value, names, path: str) -> Operand:
+    if isinstance(value, str):
+        if value not in names:
+            raise RuleError(f"{path}: unknown operand '{value}'.")
+        return lambda columns: columns[value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        constant = float(value)
+        return lambda columns: np.full(columns["close"].shape[0], constant)
+    raise RuleError(f"{path}: expected an indicator name, a candle field or a number.")
+
+
+def _combine(conditions: List[Condition], combine) -> Condition:
+    if len(conditions) == 1:
+        return conditions[0]
+
+    def combined(columns: Columns) -> np.ndarray:
+        result = conditions[0](columns)
+        for condition in conditions[1:]:
+            result = combine(result, condition(columns))
+        return result
+
+    return combined
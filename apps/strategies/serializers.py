@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import Strategy
+from .rules import RULES_KEY, RuleError, compile_rules, has_rules
 
 
 class StrategySerializer(serializers.ModelSerializer):
@@ -19,3 +20,11 @@ class StrategySerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ("id", "slug", "created_at", "updated_at", "owner")
+
+    def validate_config(self, value):
+        if has_rules(value):
+            try:
+                compile_rules(value[RULES_KEY])
+            except RuleError as exc:
+                raise serializers.ValidationError(str(exc)) from exc
+        return value
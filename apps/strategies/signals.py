@@ -86,20 +86,58 @@ def _evaluate_signal(
     if missing:
         raise KeyError(f"Missing timeframes for evaluation: {', '.join(sorted(missing))}")
 
-    hma_1h = hull_moving_average(closes_by_timeframe["1h"], hma_period).iloc[-1]
-    hma_4h = hull_moving_average(closes_by_timeframe["4h"], hma_period).iloc[-1]
-    sma_5m = simple_moving_average(closes_by_timeframe["5m"], sma_period).iloc[-1]
-
     price_map = {
         "1h": closes_by_timeframe["1h"].iloc[-1],
         "4h": closes_by_timeframe["4h"].iloc[-1],
         "5m": closes_by_timeframe["5m"].iloc[-1],
     }
+    indicator_values = {
+        "1h": hull_moving_average(closes_by_timeframe["1h"], hma_period).iloc[-1],
+        "4h": hull_moving_average(closes_by_timeframe["4h"], hma_period).iloc[-1],
+        "5m": simple_moving_average(closes_by_timeframe["5m"], sma_period).iloc[-1],
+    }
+    return _build_signal_result(
+        price_map, indicator_values, comparator, comparator_label, direction, sma_period, hma_period
+    )
+
+
+def evaluate_signal_from_values(
+    prices: Mapping[str, float],
+    indicator_values: Mapping[str, float],
+    direction: str,
+    sma_period: int = DEFAULT_PERIOD,
+    hma_period: int = DEFAULT_PERIOD,
+) -> SignalResult:
+    """
+    Same rules as ``evaluate_long_signal``/``evaluate_short_signal`` but from already
+    computed latest values (e.g. streaming indicators), keyed by timeframe:
+    5m -> SMA, 1h/4h -> HMA.
+    """
+
+    if direction == "long":
+        comparator, comparator_label = gt, ">"
+    elif direction == "short":
+        comparator, comparator_label = lt, "<"
+    else:
+        raise ValueError(f"Unknown direction '{direction}'.")
+    return _build_signal_result(
+        prices, indicator_values, comparator, comparator_label, direction, sma_period, hma_period
+    )
 
+
+def _build_signal_result(
+    price_map: Mapping[str, float],
+    indicator_values: Mapping[str, float],
+    comparator: Callable[[float, float], bool],
+    comparator_label: str,
+    direction: str,
+    sma_period: int,
+    hma_period: int,
+) -> SignalResult:
     indicator_map = {
-        "1h": ("HMA", hma_1h),
-        "4h": ("HMA", hma_4h),
-        "5m": ("SMA", sma_5m),
+        "1h": ("HMA", indicator_values["1h"]),
+        "4h": ("HMA", indicator_values["4h"]),
+        "5m": ("SMA", indicator_values["5m"]),
     }
 
     breakdown = {}
@@ -109,7 +147,7 @@ def _evaluate_signal(
             timeframe=timeframe,
             price=float(price_value),
             indicator_value=float(indicator_value),
-            condition_met=comparator(price_value, indicator_value),
+            condition_met=bool(comparator(price_value, indicator_value)),
             indicator_name=f"{indicator_name}{hma_period if indicator_name == 'HMA' else sma_period}",
             comparator=comparator_label,
         )
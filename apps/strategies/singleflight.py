@@ -0,0 +1,147 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once per key at a time. Callers that arrive while
+it runs wait for that call and get its result (or its exception) instead of computing again.
+
+Inside a process, waiting callers block on a ``concurrent.futures.Future`` kept in a map by
+key. Across worker processes, the leader also holds a lock in the default cache
+(``cache.add`` is atomic on Redis, and locmem gives the same behaviour within one process).
+The lock holds a random token. A process that finds the lock taken marks that flight as
+awaited, polls until the lock is released, and then reads the result the leader left in the
+cache. If there is no result (the leader failed), it competes for the lock again. If the
+wait exceeds ``timeout``, it computes on its own.
+
+The lock expires after ``timeout``, so a crashed leader cannot block a key for longer than
+that. A leader that outlives it only deletes the lock while it still holds its own token, so
+it cannot free the lock of the next leader. On Redis the check and delete are one atomic
+script.
+
+Only awaited flights publish their result, and it is kept for ``result_ttl`` seconds (a few
+seconds by default). A request nobody else is waiting for writes nothing to the shared cache.
+
+Results are shared, not copied: callers must treat them as read-only.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Mapping, TypeVar
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+from apps.analytics.timing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+_MISSING = object()
+
+# Deletes KEYS[1] only while it holds ARGV[1].
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def flight_key(params: Mapping[str, object]) -> str:
+    """Stable digest of normalised request parameters (order and ``None`` values ignored)."""
+    normalised = {key: str(value) for key, value in params.items() if value not in (None, "")}
+    return hashlib.sha1(json.dumps(normalised, sort_keys=True).encode()).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, namespace: str, timeout: float = None, result_ttl: float = None, poll_interval: float = 0.05):
+        self.namespace = namespace
+        self.timeout = timeout if timeout is not None else getattr(settings, "SINGLE_FLIGHT_TIMEOUT", 30)
+        self.result_ttl = result_ttl if result_ttl is not None else getattr(settings, "SINGLE_FLIGHT_RESULT_TTL", 5)
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "shared": 0, "remote": 0}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            try:
+                with span("singleflight.wait"):
+                    return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                logger.warning("Single-flight wait for %s:%s timed out; computing independently", self.namespace, key)
+                return fn()
+
+        try:
+            result = self._across_processes(key, fn)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _across_processes(self, key: str, fn: Callable[[], T]) -> T:
+        lock_key = f"singleflight:{self.namespace}:lock:{key}"
+        result_key = f"singleflight:{self.namespace}:result:{key}"
+        deadline = time.monotonic() + self.timeout
+        while True:
+            # An int token: Django's Redis serializer stores ints as plain strings, which the release script compares.
+            token = random.getrandbits(62)
+            if cache.add(lock_key, token, timeout=self.timeout):
+                try:
+                    result = fn()
+                    if cache.get(self._awaited_key(token)) is not None:
+                        cache.set(result_key, result, timeout=self.result_ttl)
+                    return result
+                finally:
+                    self._release(lock_key, token)
+
+            # Another process is computing this key; its result is only read once it finishes.
+            leader = cache.get(lock_key)
+            if leader is not None:
+                cache.set(self._awaited_key(leader), 1, timeout=self.timeout)
+            with span("singleflight.wait"):
+                while cache.get(lock_key) is not None and time.monotonic() < deadline:
+                    time.sleep(self.poll_interval)
+            result = cache.get(result_key, _MISSING)
+            if result is not _MISSING:
+                with self._lock:
+                    self.stats["remote"] += 1
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning("Single-flight lock for %s:%s held too long; computing independently", self.namespace, key)
+                return fn()
+
+    def _awaited_key(self, token: int) -> str:
+        return f"singleflight:{self.namespace}:awaited:{token}"
+
+    @staticmethod
+    def _release(lock_key: str, token: int) -> None:
+        """Deletes the lock only while it still holds ``token``."""
+        backend = caches[DEFAULT_CACHE_ALIAS]
+        if isinstance(backend, RedisCache):
+            full_key = backend.make_and_validate_key(lock_key)
+            client = backend._cache.get_client(full_key, write=True)
+            client.eval(_RELEASE_SCRIPT, 1, full_key, token)
+        elif cache.get(lock_key) == token:
+            cache.delete(lock_key)
@@ -1,20 +1,56 @@
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 import numpy as np
 import pandas as pd
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 
+from apps.analytics.models import BacktestRun
+from apps.analytics.querybudget import QueryBudgetAssertions
 from apps.datafeeds.models import Candle, Symbol
+from apps.datafeeds.services import store_candles
+from apps.datafeeds.synthetic import generate_frames, to_payloads
+from apps.execution.models import Fill, Position
 
+from .incremental import RollingHMA, RollingSMA, RollingWMA
+from .indicators import (
+    hma_multi,
+    hull_moving_average,
+    simple_moving_average,
+    sma_multi,
+    weighted_moving_average,
+    wma_multi,
+)
+from . import async_run, worker
+from .frames import FrameWindow, load_frames
+from .graph import IndicatorGraph
+from .intrabar import STOP_LOSS, TAKE_PROFIT, IntrabarResolver
 from .models import Strategy
-from .signals import evaluate_long_signal, evaluate_short_signal, latest_signal_direction
+from .views import HMASMAStrategyRunView
+from .registry import _REGISTRY, IndicatorSpec, StrategySpec, get_strategy, register_strategy
+from .rules import RuleError, compile_rules, rule_strategy_spec
+from .singleflight import SingleFlight, flight_key
+from .signals import (
+    evaluate_long_signal,
+    evaluate_short_signal,
+    evaluate_signal_from_values,
+    latest_signal_direction,
+)
 
 
-class StrategyAPITests(APITestCase):
+class StrategyAPITests(QueryBudgetAssertions, APITestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
             username="strategist", email="strategist@example.com", password="secret123"
@@ -33,6 +69,29 @@ class StrategyAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Strategy.objects.count(), 1)
 
+    def test_invalid_rules_are_rejected(self):
+        payload = {
+            "name": "broken-rules",
+            "version": "0.1.0",
+            "config": {"rules": {"entry": {"long": [{"op": "gt", "left": "missing", "right": 1}]}}},
+        }
+        response = self.client.post(reverse("strategy-list"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("entry.long[0].left", response.json()["config"][0])
+
+    def test_strategy_endpoint_query_counts(self):
+        Strategy.objects.create(owner=self.user, name="first", version="1")
+        Strategy.objects.create(owner=self.user, name="second", version="1")
+        strategy = Strategy.objects.create(owner=self.user, name="third", version="1")
+        with self.assertQueries(1):
+            self.assertEqual(len(self.client.get(reverse("strategy-list")).json()), 3)
+        with self.assertQueries(1):
+            self.client.get(reverse("strategy-detail", args=[strategy.pk]))
+        with self.assertQueries(1):
+            self.client.post(reverse("strategy-list"), {"name": "fourth", "version": "1", "config": {}}, format="json")
+        with self.assertQueries(0):
+            self.client.get(reverse("strategies-config"))
+
 
 class StrategySignalTests(TestCase):
     def setUp(self):
@@ -80,7 +139,50 @@ class StrategySignalTests(TestCase):
         self.assertEqual(latest_signal_direction(result), "short")
 
 
-class HMASMAStrategyRunAPITests(TestCase):
+class IncrementalIndicatorTests(TestCase):
+    def setUp(self):
+        self.series = pd.Series(100 + np.cumsum(np.random.default_rng(11).normal(0, 1, size=600)))
+
+    def _stream(self, indicator, values):
+        return [indicator.update(float(value)) for value in values]
+
+    def test_rolling_averages_match_batch_indicators(self):
+        for period in (1, 5, 20, 50):
+            cases = (
+                (RollingSMA(period), simple_moving_average(self.series, period)),
+                (RollingWMA(period), weighted_moving_average(self.series, period)),
+                (RollingHMA(period), hull_moving_average(self.series, period)),
+            )
+            for rolling, batch in cases:
+                streamed = np.array(self._stream(rolling, self.series), dtype=float)
+                np.testing.assert_allclose(streamed, batch.to_numpy(dtype=float), rtol=1e-9, equal_nan=True)
+
+    def test_hma_warmup_matches_first_value(self):
+        hma = RollingHMA(16)
+        streamed = self._stream(hma, self.series)
+        first = next(i for i, value in enumerate(streamed) if value is not None)
+        self.assertEqual(first + 1, hma.warmup)
+
+    def test_signal_from_values_matches_series_evaluation(self):
+        closes = {
+            "5m": pd.Series(100 + 0.5 * np.arange(240), dtype=float),
+            "1h": pd.Series(100 + 1.0 * np.arange(240), dtype=float),
+            "4h": pd.Series(100 + 1.5 * np.arange(240), dtype=float),
+        }
+        expected = evaluate_long_signal(closes)
+        values = {
+            "5m": RollingSMA(200).seed(closes["5m"]),
+            "1h": RollingHMA(200).seed(closes["1h"]),
+            "4h": RollingHMA(200).seed(closes["4h"]),
+        }
+        prices = {timeframe: float(series.iloc[-1]) for timeframe, series in closes.items()}
+        result = evaluate_signal_from_values(prices, values, "long")
+        self.assertEqual(result.should_enter, expected.should_enter)
+        for timeframe, item in expected.breakdown.items():
+            self.assertAlmostEqual(result.breakdown[timeframe].indicator_value, item.indicator_value)
+
+
+class HMASMAStrategyRunAPITests(QueryBudgetAssertions, TestCase):
     def setUp(self):
         self.symbol = Symbol.objects.create(
             code="BTCUSDT",
@@ -148,3 +250,713 @@ class HMASMAStrategyRunAPITests(TestCase):
         self.assertIn("indicators", data)
         self.assertIn("sma", data["indicators"])
         self.assertIn("hma", data["indicators"])
+
+    def test_max_points_decimates_candles_and_indicators(self):
+        url = reverse("hma-sma-run")
+        response = self.client.get(url, {"symbol": "BTCUSDT", "limit": 250, "max_points": 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data["candles"]), 50)
+        for series in data["indicators"]["hma"].values():
+            self.assertLessEqual(len(series), 50)
+
+    def test_max_points_aligns_entries_and_timeline_to_buckets(self):
+        symbol = Symbol.objects.create(code="SYNUSDT", base_asset="SYN", quote_asset="USDT")
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for timeframe, frame in generate_frames(start, start + timedelta(days=40), ["5m", "1h", "4h", "1d"], seed=2).items():
+            store_candles(symbol, timeframe, to_payloads(frame))
+
+        url = reverse("hma-sma-run")
+        for timeframe in ("5m", "1h"):
+            params = {"symbol": "SYNUSDT", "strategy": "1", "timeframe": timeframe, "limit": 600}
+            full = self.client.get(url, params).json()
+            data = self.client.get(url, {**params, "max_points": 60}).json()
+
+            bucket_times = [candle["time"] for candle in data["candles"]]
+            self.assertEqual(len(bucket_times), 60)
+            self.assertLessEqual(len(data["signal_timeline"]), 60)
+            visible = [entry for entry in full["entries"] if entry["source_time"] >= full["candles"][0]["time"]]
+            self.assertTrue(visible)
+            self.assertEqual(len(data["entries"]), len(visible))
+            for entry in data["entries"]:
+                self.assertIn(entry["time"], bucket_times)
+                self.assertLessEqual(entry["time"], entry["source_time"])
+            # Each bucket shows the evaluation the undecimated payload shows for its first candle.
+            by_time = {snapshot["time"]: snapshot for snapshot in full["signal_timeline"]}
+            for snapshot in data["signal_timeline"]:
+                self.assertEqual(snapshot, by_time[snapshot["time"]])
+
+    def test_start_loads_warmup_and_trims_to_visible_range(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=5 * 230)
+        response = self.client.get(
+            reverse("hma-sma-run"), {"symbol": "BTCUSDT", "strategy": "2", "start": start.isoformat()}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data["candles"]), 30)
+        self.assertEqual(data["candles"][0]["time"], start.isoformat())
+        # 230 earlier bars cover the SMA200 warmup, so the series starts on the first visible bar.
+        sma = data["indicators"]["sma"]["5m"]
+        self.assertEqual(len(sma), 30)
+        self.assertEqual(sma[0]["time"], start.isoformat())
+        self.assertEqual(len(data["signal_timeline"]), 30)
+        self.assertEqual(data["signal_timeline"][0]["time"], start.isoformat())
+
+    def test_run_loads_all_frames_with_one_candle_query(self):
+        # Symbol lookup plus a single candle query for the view, base, trend and plot frames.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("hma-sma-run"), {"symbol": "BTCUSDT", "strategy": "2", "limit": 250})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_run_endpoint_query_counts(self):
+        url = reverse("hma-sma-run")
+        for strategy in ("1", "2", "3", "4"):
+            with self.subTest(strategy=strategy), self.assertQueries(2):
+                self.client.get(url, {"symbol": "BTCUSDT", "strategy": strategy, "limit": 250})
+        with self.assertQueries(2):
+            self.client.get(url, {"symbol": "BTCUSDT", "timeframe": "1h", "start": "2024-01-01T10:00:00Z"})
+
+        user = get_user_model().objects.create_user(username="counter", password="secret123")
+        self.client.force_login(user)
+        # Session and user, symbol, candles, then the run and its equity curve inside a savepoint.
+        with self.assertQueries(8):
+            self.client.post(url + "?symbol=BTCUSDT&limit=250")
+
+    def test_run_computes_each_indicator_once(self):
+        computed = []
+        original = IndicatorGraph._compute
+
+        def compute(graph, key):
+            computed.append(key)
+            return original(graph, key)
+
+        with mock.patch.object(IndicatorGraph, "_compute", autospec=True, side_effect=compute):
+            response = self.client.get(reverse("hma-sma-run"), {"symbol": "BTCUSDT", "limit": 250})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(computed), len(set(computed)))
+        # SMA200 5m and HMA200 1h feed both strategy 1 and the plotted overlays.
+        self.assertIn(("5m", "sma", 200), computed)
+        self.assertIn(("1h", "hma", 200), computed)
+        self.assertTrue(response.json()["indicators"]["sma"]["5m"])
+
+    def test_post_persists_backtest_run(self):
+        user = get_user_model().objects.create_user(username="backtester", password="secret123")
+        self.client.force_login(user)
+        url = reverse("hma-sma-run")
+        response = self.client.post(url + "?symbol=BTCUSDT&limit=250")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        run_info = response.json()["backtest_run"]
+        run = BacktestRun.objects.get(pk=run_info["id"])
+        self.assertEqual(run.owner, user)
+        self.assertEqual(run.strategy_key, "1")
+        self.assertEqual(run.trade_count, run.trades.count())
+        self.assertIn("total_return_pct", run_info["metrics"])
+        self.assertEqual(run.equity_curve.point_count, 260)
+
+    def test_custom_registered_strategy_is_dispatched(self):
+        calls = []
+
+        def evaluate(view, merged, intrabar=None):
+            calls.append(list(merged.columns))
+            return [], []
+
+        register_strategy(
+            StrategySpec(key="test-sma", label="SMA only", indicators=(IndicatorSpec("sma", "5m", 20),), evaluate=evaluate)
+        )
+        self.addCleanup(_REGISTRY.pop, "test-sma")
+        response = self.client.get(reverse("hma-sma-run"), {"symbol": "BTCUSDT", "limit": 250, "strategy": "test-sma"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("sma20", calls[0])
+        self.assertFalse(any(column.endswith(("_1h", "_4h")) for column in calls[0]))
+        self.assertEqual(response.json()["entries"], [])
+
+    def test_rule_strategy_runs_by_slug(self):
+        user = get_user_model().objects.create_user(username="rules", password="secret123")
+        strategy = Strategy.objects.create(
+            owner=user,
+            name="breakout",
+            config={
+                "rules": {
+                    "indicators": {"fast": {"type": "sma", "period": 20}},
+                    "entry": {"long": [{"op": "cross_above", "left": "close", "right": 150}]},
+                    "filters": {"long": [{"op": "gt", "left": "close", "right": "fast"}]},
+                    "exit": {"long": [{"op": "gt", "left": "close", "right": 200}]},
+                }
+            },
+        )
+        url = reverse("hma-sma-run")
+        # Private strategies are only visible to their owner.
+        response = self.client.get(url, {"symbol": "BTCUSDT", "limit": 250, "strategy": strategy.slug})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("rule", [entry.get("reason") for entry in response.json()["entries"]])
+
+        self.client.force_login(user)
+        response = self.client.post(url + f"?symbol=BTCUSDT&limit=250&strategy={strategy.slug}")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entries = response.json()["entries"]
+        self.assertEqual([entry["direction"] for entry in entries], ["long", "long_exit"])
+        self.assertEqual(entries[0]["price"], 150.5)
+        self.assertEqual(entries[1]["price"], 200.5)
+        run = BacktestRun.objects.get(pk=response.json()["backtest_run"]["id"])
+        self.assertEqual(run.strategy, strategy)
+        self.assertEqual(run.strategy_key, strategy.slug)
+
+        # The stored trade is priced by the paper engine: next open plus slippage, not the signal close.
+        self.assertEqual(response.json()["backtest_run"]["fills"], 2)
+        fills = {fill.order.tag: fill for fill in Fill.objects.filter(order__run=run).select_related("order")}
+        self.assertEqual(set(fills), {"long", "long_exit"})
+        trade = run.trades.get()
+        self.assertAlmostEqual(float(trade.entry_price), float(fills["long"].price))
+        self.assertAlmostEqual(float(trade.exit_price), float(fills["long_exit"].price))
+        self.assertGreater(float(trade.entry_price), 150.5)
+        self.assertEqual(Position.objects.get(run=run).quantity, 0)
+
+
+class RuleDSLTests(TestCase):
+    RULES = {
+        "indicators": {"trend": {"type": "hma", "period": 20, "timeframe": "1h"}},
+        "entry": {
+            "long": [{"op": "cross_above", "left": "close", "right": 10}],
+            "short": [{"op": "cross_below", "left": "close", "right": 10}],
+        },
+        "exit": {"long": [{"any": [{"op": "lt", "left": "close", "right": 9}, {"op": "gte", "left": "close", "right": 14}]}]},
+        "risk": {"stop_loss_pct": 5},
+    }
+
+    def _columns(self, close, low=None, high=None):
+        close = np.asarray(close, dtype=float)
+        return {
+            "open": close,
+            "high": np.asarray(high, dtype=float) if high is not None else close,
+            "low": np.asarray(low, dtype=float) if low is not None else close,
+            "close": close,
+            "volume": np.ones_like(close),
+            "trend": np.full_like(close, np.nan),
+        }
+
+    def test_validation_reports_the_offending_path(self):
+        cases = [
+            ({"entry": {}}, "entry"),
+            ({"indicators": {"x": {"type": "ema"}}, "entry": {"long": []}}, "indicators.x.type"),
+            ({"indicators": {"x": {"type": "sma", "period": 0}}}, "indicators.x.period"),
+            ({"entry": {"long": [{"op": "near", "left": "close", "right": 1}]}}, "entry.long[0].op"),
+            ({"entry": {"long": [{"all": []}]}}, "entry.long[0].all"),
+            ({"entry": {"long": [{"op": "gt", "left": "close", "right": 1}]}, "risk": {"stop_loss_pct": 0}}, "risk.stop_loss_pct"),
+        ]
+        for rules, path in cases:
+            with self.assertRaises(RuleError) as ctx:
+                compile_rules(rules)
+            self.assertTrue(str(ctx.exception).startswith(path), str(ctx.exception))
+
+    def test_signals_are_vectorized_crossovers(self):
+        compiled = compile_rules(self.RULES)
+        columns = self._columns([9, 11, 12, 9.5, np.nan, 11])
+        signals = compiled.signals(columns)
+        self.assertEqual(signals.enter_long.tolist(), [False, True, False, False, False, False])
+        self.assertEqual(signals.enter_short.tolist(), [False, False, False, True, False, False])
+        self.assertFalse(signals.exit_short.any())
+
+    def test_walk_applies_stop_loss_rule_exits_and_flips(self):
+        compiled = compile_rules(self.RULES)
+        # Long at 11, stopped below 10.45 on bar 2; short at 9.5 never exits (no short exits).
+        columns = self._columns([9, 11, 10.5, 9.5, 9.6], low=[9, 11, 10.4, 9.5, 9.6])
+        events = compiled.walk(compiled.signals(columns), columns)
+        self.assertEqual(
+            [(event.index, event.direction, event.reason) for event in events],
+            [(1, "long", None), (2, "long_exit", "stop_loss"), (3, "short", None)],
+        )
+        self.assertAlmostEqual(events[1].price, 10.45)
+
+        # Rule exit on the bar where close reaches 14; a new entry can open on a later cross.
+        columns = self._columns([9, 11, 14, 9.8, 10.2])
+        events = compiled.walk(compiled.signals(columns), columns)
+        self.assertEqual(
+            [(event.index, event.direction, event.reason) for event in events],
+            [(1, "long", None), (2, "long_exit", "rule"), (3, "short", None)],
+        )
+
+    def test_compiled_spec_is_cached_per_version(self):
+        user = get_user_model().objects.create_user(username="cache", password="secret123")
+        strategy = Strategy.objects.create(owner=user, name="cached", config={"rules": self.RULES})
+        spec = rule_strategy_spec(strategy)
+        self.assertIs(rule_strategy_spec(Strategy.objects.get(pk=strategy.pk)), spec)
+        self.assertEqual(spec.timeframes, ("5m", "1h"))
+        strategy.version = "0.2.0"
+        self.assertIsNot(rule_strategy_spec(strategy), spec)
+
+    def test_model_save_validates_rules(self):
+        user = get_user_model().objects.create_user(username="model", password="secret123")
+        with self.assertRaises(DjangoValidationError):
+            Strategy.objects.create(owner=user, name="bad", config={"rules": {"entry": "long"}})
+        Strategy.objects.create(owner=user, name="free-form", config={"timeframe": "1h"})
+
+
+class AlignEntriesTests(TestCase):
+    @staticmethod
+    def _linear_alignment(entries, view_df, delta):
+        """The original per-entry scan over every view candle."""
+        timestamps = list(view_df["timestamp"])
+        window_end = timestamps[1:] + [timestamps[-1] + delta]
+        aligned = []
+        for entry in entries:
+            entry_ts = pd.Timestamp(entry["timestamp"])
+            entry_ts = entry_ts.tz_localize("UTC") if entry_ts.tz is None else entry_ts.tz_convert("UTC")
+            candle_ts = next((start for start, end in zip(timestamps, window_end) if start <= entry_ts < end), None)
+            if candle_ts is None:
+                if entry_ts < timestamps[-1]:
+                    continue
+                candle_ts = timestamps[-1]
+            aligned.append(
+                {
+                    "time": candle_ts.isoformat(),
+                    "source_time": entry_ts.isoformat(),
+                    "direction": entry["direction"],
+                    "price": entry.get("price"),
+                }
+            )
+        return aligned
+
+    def test_matches_linear_scan(self):
+        rng = np.random.default_rng(3)
+        start = pd.Timestamp("2024-01-01", tz="UTC")
+        # Hourly candles with a few missing hours.
+        hours = np.sort(rng.choice(np.arange(300), size=250, replace=False))
+        view_df = pd.DataFrame({"timestamp": start + pd.to_timedelta(hours, unit="h")})
+        minutes = np.sort(rng.integers(-120, 320 * 60, size=400))
+        entries = [
+            {"timestamp": (start + pd.Timedelta(minutes=int(m))).to_pydatetime(), "direction": "long", "price": float(i)}
+            for i, m in enumerate(minutes)
+        ]
+        entries.append({"timestamp": datetime(2024, 1, 2, 3, 0, 0, 500000), "direction": "short_exit", "price": None})
+
+        aligned = HMASMAStrategyRunView()._align_entries(entries, view_df, "1h")
+        self.assertEqual(aligned, self._linear_alignment(entries, view_df, pd.Timedelta(hours=1)))
+        self.assertLess(len(aligned), len(entries))
+
+
+class FrameLoaderTests(TestCase):
+    def setUp(self):
+        self.symbol = Symbol.objects.create(code="ETHUSDT", base_asset="ETH", quote_asset="USDT", exchange="binance")
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        candles = []
+        for timeframe, step, count in (("5m", timedelta(minutes=5), 120), ("1h", timedelta(hours=1), 40)):
+            for i in range(count):
+                candles.append(
+                    Candle(
+                        symbol=self.symbol,
+                        timeframe=timeframe,
+                        timestamp=self.start + step * i,
+                        open=i,
+                        high=i,
+                        low=i,
+                        close=i,
+                        volume=1,
+                    )
+                )
+        Candle.objects.bulk_create(candles)
+
+    def test_windows_are_bounded_and_loaded_in_one_query(self):
+        windows = {
+            "view": FrameWindow("5m", limit=10, warmup=5),
+            "base": FrameWindow("5m", limit=30),
+            "trend": FrameWindow("1h", warmup=3, anchor="base"),
+        }
+        with self.assertNumQueries(1):
+            frames = load_frames(self.symbol, windows)
+        self.assertEqual(frames["view"]["close"].tolist(), list(range(105, 120)))
+        self.assertEqual(frames["base"]["close"].tolist(), list(range(90, 120)))
+        # Base starts at 07:30: the 07:00 bar covering it is valid with the two hours before it.
+        self.assertEqual(frames["trend"]["close"].tolist(), list(range(5, 40)))
+
+    def test_start_adds_warmup_and_short_history_loads_fully(self):
+        start = self.start + timedelta(minutes=5 * 50)
+        end = self.start + timedelta(minutes=5 * 59)
+        frames = load_frames(
+            self.symbol,
+            {"base": FrameWindow("5m", warmup=20), "long": FrameWindow("5m", warmup=500), "daily": FrameWindow("1d")},
+            start,
+            end,
+        )
+        self.assertEqual(frames["base"]["close"].tolist(), list(range(30, 60)))
+        self.assertEqual(len(frames["long"]), 60)
+        self.assertTrue(frames["daily"].empty)
+
+
+class StrategyRegistryTests(TestCase):
+    def test_declared_timeframes_and_warmup(self):
+        spec = get_strategy("4")
+        self.assertEqual(spec.timeframes, ("5m", "1h", "1d"))
+        self.assertEqual(spec.warmup("5m"), 200)
+        # HMA needs period + sqrt(period) - 1 bars before its first value.
+        self.assertEqual(spec.warmup("1h"), 213)
+        self.assertEqual(get_strategy("1").timeframes, ("5m", "1h", "4h"))
+
+    def test_unknown_key_falls_back_to_default(self):
+        self.assertEqual(get_strategy("does-not-exist").key, "1")
+        self.assertEqual(get_strategy(None).key, "1")
+
+    def test_indicator_warmup_matches_first_value(self):
+        close = pd.Series(np.arange(300, dtype=float))
+        for kind in ("sma", "hma"):
+            indicator = IndicatorSpec(kind, "1h", 50)
+            self.assertEqual(int(indicator.compute(close).first_valid_index()), indicator.warmup - 1)
+        with self.assertRaises(ValueError):
+            IndicatorSpec("ema", "1h")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class IntrabarResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.symbol = Symbol.objects.create(code="ETHUSDT", base_asset="ETH", quote_asset="USDT")
+        self.bar_time = datetime(2024, 1, 1, 0, 10, tzinfo=timezone.utc)
+        # (open, high, low) per minute: take-profit at 120 is reached before the stop at 90.
+        minutes = [(100, 110, 98), (110, 121, 105), (115, 116, 85), (95, 99, 90), (96, 101, 95)]
+        for i, (open_, high, low) in enumerate(minutes):
+            Candle.objects.create(
+                symbol=self.symbol,
+                timeframe=Candle.Timeframe.M1,
+                timestamp=self.bar_time + timedelta(minutes=i),
+                open=open_,
+                high=high,
+                low=low,
+                close=open_,
+                volume=1,
+            )
+
+    def test_first_hit_uses_lower_timeframe_order(self):
+        resolver = IntrabarResolver(self.symbol)
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver.first_hit(self.bar_time, "long", 90.0, 120.0), TAKE_PROFIT)
+            self.assertEqual(resolver.first_hit(self.bar_time, "short", 115.0, 86.0), STOP_LOSS)
+            # Same day chunk, no data for this bar: pessimistic fallback without another query.
+            missing = self.bar_time + timedelta(hours=1)
+            self.assertEqual(resolver.first_hit(missing, "long", 90.0, 120.0), STOP_LOSS)
+        self.assertEqual(resolver.stats(), {"timeframe": "1m", "resolved": 2, "unresolved": 1, "queries": 1})
+
+        # Closed chunks are shared through the cache with later runs.
+        with self.assertNumQueries(0):
+            IntrabarResolver(self.symbol).first_hit(self.bar_time, "long", 90.0, 120.0)
+
+    def test_strategy2_exit_resolved_intrabar(self):
+        from .views import HMASMAStrategyRunView
+
+        times = pd.date_range("2024-01-01 00:00", periods=3, freq="5min", tz="UTC")
+        merged = pd.DataFrame(
+            {
+                "timestamp": times,
+                "open": [100.0, 100.0, 100.0],
+                "high": [100.0, 100.0, 125.0],
+                "low": [100.0, 100.0, 85.0],
+                "close": [100.0, 100.0, 100.0],
+                "sma200": [99.0, 101.0, 102.0],
+                "hma200_1h": [90.0, 90.0, 90.0],
+                "hma200_4h": [100.0, 100.0, 100.0],
+            }
+        )
+        view = HMASMAStrategyRunView()
+        with mock.patch("apps.strategies.views.TAKE_PROFIT_ENABLED", True):
+            _, pessimistic = view._evaluate_entries_strategy2(merged)
+            _, resolved = view._evaluate_entries_strategy2(merged, IntrabarResolver(self.symbol))
+
+        self.assertEqual(pessimistic[-1]["reason"], "stop_loss")
+        self.assertEqual(resolved[-1]["direction"], "long_exit")
+        self.assertEqual(resolved[-1]["reason"], "take_profit")
+        self.assertAlmostEqual(resolved[-1]["price"], 120.0)
+
+    def test_strategy4_exit_resolved_intrabar(self):
+        from .views import HMASMAStrategyRunView
+
+        times = pd.date_range("2024-01-01 00:00", periods=3, freq="5min", tz="UTC")
+        merged = pd.DataFrame(
+            {
+                "timestamp": times,
+                "open": [100.0, 100.0, 100.0],
+                "high": [100.0, 100.0, 125.0],
+                "low": [100.0, 100.0, 85.0],
+                "close": [100.0, 100.0, 100.0],
+                "sma200": [99.0, 101.0, 102.0],
+                "hma200_1h": [100.0, 100.0, 100.0],
+                "sma200_1h": [110.0, 110.0, 110.0],
+                "hma200_1d": [50.0, 50.0, 50.0],
+            }
+        )
+        view = HMASMAStrategyRunView()
+        with mock.patch("apps.strategies.views.TAKE_PROFIT_ENABLED", True):
+            _, pessimistic = view._evaluate_entries_strategy4(merged)
+            _, resolved = view._evaluate_entries_strategy4(merged, IntrabarResolver(self.symbol))
+
+        self.assertEqual(pessimistic[-1]["reason"], "stop_loss")
+        self.assertAlmostEqual(pessimistic[-1]["price"], 90.0)
+        self.assertEqual(resolved[-1]["direction"], "long_exit")
+        self.assertEqual(resolved[-1]["reason"], "take_profit")
+        self.assertAlmostEqual(resolved[-1]["price"], 120.0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    REQUESTS = 8
+    WORK_SECONDS = 0.2
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def _work(self, value="result"):
+        self.calls += 1
+        started = time.thread_time()
+        while time.thread_time() - started < self.WORK_SECONDS:  # CPU-bound, like the indicator work
+            pass
+        return {"value": value}
+
+    def _concurrently(self, fn):
+        barrier = threading.Barrier(self.REQUESTS)
+
+        def call(index):
+            barrier.wait()
+            return fn(index)
+
+        with ThreadPoolExecutor(self.REQUESTS) as pool:
+            return list(pool.map(call, range(self.REQUESTS)))
+
+    def test_identical_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight("test")
+        cpu_started = time.process_time()
+        results = self._concurrently(lambda _: flight.do("key", self._work))
+        cpu = time.process_time() - cpu_started
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats["leaders"] + flight.stats["shared"], self.REQUESTS)
+        # Flat CPU: one computation's worth, not REQUESTS of them.
+        self.assertLess(cpu, self.WORK_SECONDS * 3)
+
+        flight.do("key", self._work)  # a later call computes afresh
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight("test")
+
+        def fail():
+            self._work()
+            raise ValueError("boom")
+
+        def call(_):
+            try:
+                return flight.do("key", fail)
+            except ValueError as exc:
+                return exc
+
+        results = self._concurrently(call)
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_waits_for_a_flight_in_another_process(self):
+        lock_key, result_key = "singleflight:test:lock:key", "singleflight:test:result:key"
+        cache.add(lock_key, "other-process", timeout=30)
+        flight = SingleFlight("test", poll_interval=0.01)
+        with ThreadPoolExecutor(1) as pool:
+            waiting = pool.submit(flight.do, "key", self._work)
+            time.sleep(0.05)
+            self.assertFalse(waiting.done())
+            cache.set(result_key, {"value": "remote"}, timeout=5)
+            cache.delete(lock_key)
+            self.assertEqual(waiting.result(timeout=5), {"value": "remote"})
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(flight.stats["remote"], 1)
+        self.assertEqual(cache.get("singleflight:test:awaited:other-process"), 1)
+
+    def test_result_is_published_only_for_awaited_flights(self):
+        lock_key, result_key = "singleflight:test:lock:key", "singleflight:test:result:key"
+        flight = SingleFlight("test")
+        flight.do("key", self._work)
+        self.assertIsNone(cache.get(result_key))
+
+        def awaited():
+            cache.set(flight._awaited_key(cache.get(lock_key)), 1)  # as a waiting process does
+            return self._work()
+
+        flight.do("key", awaited)
+        self.assertEqual(cache.get(result_key), {"value": "result"})
+        self.assertIsNone(cache.get(lock_key))
+
+    def test_late_leader_keeps_its_successors_lock(self):
+        lock_key = "singleflight:test:lock:key"
+        flight = SingleFlight("test")
+
+        def outlives_lock():
+            cache.set(lock_key, "successor", timeout=30)  # our lock expired and another process took over
+            return self._work()
+
+        flight.do("key", outlives_lock)
+        self.assertEqual(cache.get(lock_key), "successor")
+
+    def test_run_view_coalesces_normalised_parameters(self):
+        factory = APIRequestFactory()
+        view = HMASMAStrategyRunView.as_view()
+        variants = [
+            {"symbol": "btcusdt", "limit": "250"},
+            {"limit": "250", "symbol": "BTCUSDT", "timeframe": "5m", "profile": "0"},
+        ]
+
+        def run(query_params):
+            return self._work(query_params.get("symbol")), None
+
+        with mock.patch.object(HMASMAStrategyRunView, "_run_strategy", side_effect=run):
+            responses = self._concurrently(
+                lambda index: view(factory.get("/api/strategies/hma-sma/run/", variants[index % 2]))
+            )
+            self.assertEqual(self.calls, 1)
+            self.assertTrue(all(response.status_code == 200 for response in responses))
+
+            view(factory.get("/api/strategies/hma-sma/run/", {"symbol": "ETHUSDT"}))
+            self.assertEqual(self.calls, 2)
+
+        self.assertEqual(flight_key({"b": 1, "a": None}), flight_key({"b": "1"}))
+
+
+@override_settings(STRATEGY_RUN_WORKERS=0)
+class AsyncStrategyRunTests(TestCase):
+    setUp = HMASMAStrategyRunAPITests.setUp
+    PARAMS = {"symbol": "BTCUSDT", "strategy": "4", "limit": "250"}
+
+    def tearDown(self):
+        async_run.shutdown_executor()
+
+    def _load(self):
+        view = HMASMAStrategyRunView()
+        view.request = mock.Mock(user=mock.Mock(is_authenticated=False))
+        return view._load_run(self.PARAMS)
+
+    async def test_async_view_matches_sync_view(self):
+        response = await self.async_client.get(reverse("hma-sma-run-async"), self.PARAMS)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = await self.async_client.get(reverse("hma-sma-run"), self.PARAMS)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+        invalid = await self.async_client.get(reverse("hma-sma-run-async"), {"symbol": "NOPE"})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("symbol", json.loads(invalid.content))
+
+    def test_compute_phase_runs_in_a_worker_process(self):
+        run = self._load()
+        with ProcessPoolExecutor(
+            1, mp_context=multiprocessing.get_context("spawn"), initializer=worker.init_worker
+        ) as pool:
+            payload = pool.submit(worker.compute_run, run).result(timeout=120)
+        self.assertEqual(payload, worker.compute_run(self._load()))
+        self.assertTrue(payload["candles"])
+
+    async def test_admission_queues_then_rejects(self):
+        admission = async_run.Admission(limit=1, max_queued=1, timeout=0.2)
+        async with admission.slot():
+            queued = asyncio.ensure_future(admission.slot().__aenter__())
+            await asyncio.sleep(0)
+            with self.assertRaises(async_run.Overloaded):  # queue full
+                async with admission.slot():
+                    pass
+            with self.assertRaises(async_run.Overloaded):  # queued one times out
+                await queued
+
+        with mock.patch.object(async_run, "admission", async_run.Admission(limit=1, max_queued=0, timeout=1)):
+            async with async_run.admission.slot():
+                response = await self.async_client.get(reverse("hma-sma-run-async"), self.PARAMS)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+
+    async def test_disconnect_cancels_queued_run(self):
+        run = mock.Mock()
+        release = threading.Event()
+        pool = ThreadPoolExecutor(1)
+        pool.submit(release.wait)  # occupies the only worker, so the run stays queued
+        disconnected = asyncio.Event()
+        try:
+            with mock.patch.object(async_run, "get_executor", return_value=pool), mock.patch.object(
+                async_run, "compute_run"
+            ) as compute:
+                computing = asyncio.ensure_future(async_run.AsyncStrategyRunView._compute(run, disconnected))
+                await asyncio.sleep(0.05)
+                self.assertFalse(computing.done())
+                disconnected.set()
+                self.assertIsNone(await asyncio.wait_for(computing, 1))
+                release.set()
+                pool.shutdown(wait=True)
+            compute.assert_not_called()
+        finally:
+            release.set()
+            pool.shutdown(wait=False)
+
+    async def test_disconnect_watch_middleware_reports_client_leaving(self):
+        messages = asyncio.Queue()
+        seen = {}
+
+        async def app(scope, receive, send):
+            await receive()  # the request body, as Django reads it
+            await asyncio.wait_for(scope["disconnected"].wait(), 1)
+            seen["disconnected"] = True
+
+        await messages.put({"type": "http.request", "body": b"", "more_body": False})
+        await messages.put({"type": "http.disconnect"})
+        await async_run.DisconnectWatchMiddleware(app)({"type": "http"}, messages.get, None)
+        self.assertTrue(seen["disconnected"])
+
+
+class IndicatorGraphTests(SimpleTestCase):
+    def setUp(self):
+        timestamps = pd.date_range("2024-01-01", periods=300, freq="5min", tz="UTC")
+        self.frame = pd.DataFrame({"timestamp": timestamps, "close": np.linspace(100.0, 130.0, 300)})
+
+    def test_series_are_memoised_without_touching_frames(self):
+        graph = IndicatorGraph({"5m": self.frame})
+        first = graph.series("5m", "sma", 20)
+        self.assertIs(graph.indicator(IndicatorSpec("sma", "5m", 20)), first)
+        self.assertEqual(graph.hits, 1)
+        self.assertEqual(graph.computed, (("5m", "sma", 20),))
+        pd.testing.assert_series_equal(first, simple_moving_average(self.frame["close"], 20))
+        self.assertEqual(list(self.frame.columns), ["timestamp", "close"])
+
+        graph.series("5m", "hma", 20)
+        self.assertEqual(len(graph.computed), 2)
+
+    def test_missing_or_empty_frames_give_empty_series(self):
+        graph = IndicatorGraph({"1h": pd.DataFrame()})
+        self.assertTrue(graph.series("1h", "sma", 20).empty)
+        self.assertTrue(graph.series("4h", "sma", 20).empty)
+        graph.add_frame("4h", self.frame)
+        self.assertEqual(graph.series("4h", "sma", 20).count(), 281)
+        with self.assertRaises(ValueError):
+            graph.add_frame("4h", self.frame)
+
+
+class MultiPeriodIndicatorTests(SimpleTestCase):
+    PERIODS = [1, 2, 3, 14, 20, 50, 200, 3000]
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        values = 20000 + np.cumsum(rng.normal(0, 25, 2500))
+        values[[400, 1500, 1501]] = np.nan
+        self.series = pd.Series(values)
+
+    def assert_rows_match(self, batch, single):
+        self.assertEqual(batch.shape, (len(self.PERIODS), len(self.series)))
+        for row, period in enumerate(self.PERIODS):
+            expected = single(self.series, period).to_numpy()
+            np.testing.assert_allclose(batch[row], expected, rtol=1e-9, equal_nan=True, err_msg=f"period {period}")
+
+    def test_sma_multi_matches_single_period(self):
+        self.assert_rows_match(sma_multi(self.series, self.PERIODS), simple_moving_average)
+
+    def test_wma_multi_matches_single_period(self):
+        self.assert_rows_match(wma_multi(self.series, self.PERIODS), weighted_moving_average)
+
+    def test_hma_multi_matches_single_period(self):
+        self.assert_rows_match(hma_multi(self.series, self.PERIODS), hull_moving_average)
+
+    def test_rejects_missing_or_invalid_periods(self):
+        with self.assertRaises(ValueError):
+            sma_multi(self.series, [])
+        with self.assertRaises(ValueError):
+            hma_multi(self.series, [20, 0])
+        with self.assertRaises(TypeError):
+            wma_multi(self.series.to_numpy(), [20])
+        self.assertEqual(sma_multi(pd.Series(dtype=float), [5]).shape, (1, 0))
@@ -2,6 +2,7 @@ from rest_framework.routers import DefaultRouter
 
 from django.urls import path
 
+from .async_run import AsyncStrategyRunView
 from .views import HMASMAStrategyRunView, StrategyViewSet, StrategyConfigView
 
 router = DefaultRouter()
@@ -9,6 +10,7 @@ router.register(r"", StrategyViewSet, basename="strategy")
 
 urlpatterns = [
     path("hma-sma/run/", HMASMAStrategyRunView.as_view(), name="hma-sma-run"),
+    path("hma-sma/run/async/", AsyncStrategyRunView.as_view(), name="hma-sma-run-async"),
     path("config/", StrategyConfigView.as_view(), name="strategies-config"),
 ]
 
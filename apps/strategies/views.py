@@ -1,14 +1,24 @@
-from datetime import timezone
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils.dateparse import parse_datetime
 from rest_framework import permissions, status, viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.datafeeds.models import Candle, Symbol
+from apps.analytics.decimation import LTTB, decimate, downsample_ohlcv
+from apps.analytics.services import record_backtest_run
+from apps.analytics.timing import span
+from apps.datafeeds.models import Symbol
+from apps.execution.paper import FillRecorder, MatchingEngine, replay_decisions
 
 from .config import (
     STRATEGY_INDICATORS,
@@ -18,14 +28,29 @@ from .config import (
     TAKE_PROFIT_ENABLED,
     TAKE_PROFIT_PERCENT,
 )
-from .indicators import hull_moving_average, simple_moving_average, average_true_range, volume_average
+from .indicators import average_true_range, volume_average
+from .frames import FrameWindow, load_frames
+from .graph import IndicatorGraph
+from .intrabar import TAKE_PROFIT, IntrabarResolver
+from .registry import (
+    BASE_TIMEFRAME,
+    DEFAULT_STRATEGY,
+    IndicatorSpec,
+    StrategySpec,
+    get_strategy,
+    is_registered,
+    register_strategy,
+)
 from .models import Strategy
+from .rules import has_rules, rule_strategy_spec
 from .serializers import StrategySerializer
+from .singleflight import SingleFlight, flight_key
 
 
 class StrategyViewSet(viewsets.ModelViewSet):
     serializer_class = StrategySerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get_queryset(self):
         if self.request.user.is_superuser:
@@ -36,6 +61,27 @@ class StrategyViewSet(viewsets.ModelViewSet):
         serializer.save(owner=self.request.user)
 
 
+@dataclass
+class RunInputs:
+    """Everything a run needs after its database reads; picklable, so it can cross to a worker process."""
+
+    symbol: Symbol
+    strategy_key: str
+    strategy: Optional[Strategy]
+    view_timeframe: str
+    limit: Optional[int]
+    max_points: Optional[int]
+    start_dt: Optional[datetime]
+    end_dt: Optional[datetime]
+    base_limit: int
+    frames: Dict[str, pd.DataFrame]  # load_frames() result, including the "view" window
+    intrabar: bool = False
+
+    @property
+    def spec(self) -> StrategySpec:
+        return rule_strategy_spec(self.strategy) if self.strategy is not None else get_strategy(self.strategy_key)
+
+
 class HMASMAStrategyRunView(APIView):
     """Evaluate SMA/HMA strategy, returning candles, indicators, and entry markers."""
 
@@ -44,20 +90,82 @@ class HMASMAStrategyRunView(APIView):
     TREND_TIMEFRAME_TWO = "4h"
     PERIOD = 200
     VIEW_TIMEFRAMES = {"5m", "30m", "1h", "4h", "1d"}
+    # Bars loaded before ``start`` so plotted SMA/HMA values are defined on the first visible bar
+    PLOT_WARMUP = IndicatorSpec("hma", BASE_TIMEFRAME, PERIOD).warmup
+    MAX_BASE_BARS = 100000
+    # Session, symbol, one candle query and the backtest-run writes; intrabar day loads come on top
+    query_budget = 10
+    # Parameters that determine a GET payload; concurrent GETs that agree on them share one run
+    RUN_PARAMS = ("symbol", "timeframe", "strategy", "limit", "start", "end", "max_points", "intrabar")
+    single_flight = SingleFlight("hma-sma-run")
 
     def get(self, request, *args, **kwargs):
-        symbol_code = request.query_params.get("symbol")
+        # The payload is shared between coalesced requests and must not be modified here.
+        payload = self.single_flight.do(
+            self._flight_key(request.query_params), lambda: self._run_strategy(request.query_params)[0]
+        )
+        return Response(payload, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        """Runs the strategy like GET and persists the result as a backtest run."""
+        params = request.query_params.copy()
+        for key, value in request.data.items():
+            params[key] = value
+        payload, context = self._run_strategy(params)
+        if context is None:
+            raise ValidationError({"symbol": "No candles available for the requested range."})
+
+        # The stored run is priced by the paper engine: decisions fill at the next open with
+        # slippage and fees, stops and take-profits through its bracket orders.
+        recorder = FillRecorder(batch_size=None)
+        engine = MatchingEngine(settings.PAPER_SLIPPAGE_BPS, settings.PAPER_FEE_BPS, sink=recorder)
+        fills = replay_decisions(
+            engine,
+            "run",
+            context["symbol"].code,
+            context["bar_timestamps"],
+            context["bars"],
+            context["entries"],
+            settings.PAPER_DEFAULT_NOTIONAL,
+        )
+        with transaction.atomic(savepoint=False):
+            run = record_backtest_run(
+                symbol=context["symbol"],
+                strategy_key=context["strategy_key"],
+                strategy=context["strategy"],
+                timeframe=context["timeframe"],
+                entries=fills,
+                owner=request.user if request.user.is_authenticated else None,
+                start_at=context["start_at"],
+                end_at=context["end_at"],
+                params={key: params.get(key) for key in params},
+                bar_timestamps=context["bar_timestamps"],
+                bar_closes=context["bar_closes"],
+            )
+            fill_count = FillRecorder(run=run).write(recorder.drain())
+        payload["backtest_run"] = {"id": run.pk, "metrics": run.metrics, "fills": fill_count}
+        return Response(payload, status=status.HTTP_201_CREATED)
+
+    def _run_strategy(self, query_params):
+        """Returns the response payload plus the raw evaluation context (None when no data)."""
+        return self._compute_run(self._load_run(query_params))
+
+    def _load_run(self, query_params) -> RunInputs:
+        """Validates the parameters and performs the run's database reads."""
+        symbol_code = query_params.get("symbol")
         if not symbol_code:
             raise ValidationError({"symbol": "This query parameter is required."})
 
-        limit_param = request.query_params.get("limit")
+        limit_param = query_params.get("limit")
         try:
             limit = int(limit_param) if limit_param else None
         except ValueError as exc:
             raise ValidationError({"limit": "Limit must be an integer."}) from exc
 
-        start_param = request.query_params.get("start")
-        end_param = request.query_params.get("end")
+        max_points = self._parse_max_points(query_params.get("max_points"))
+
+        start_param = query_params.get("start")
+        end_param = query_params.get("end")
         start_dt = self._parse_datetime(start_param) if start_param else None
         end_dt = self._parse_datetime(end_param) if end_param else None
 
@@ -66,132 +174,193 @@ class HMASMAStrategyRunView(APIView):
         except Symbol.DoesNotExist as exc:
             raise ValidationError({"symbol": f"Symbol '{symbol_code}' not found."}) from exc
 
-        view_timeframe = request.query_params.get("timeframe", self.BASE_TIMEFRAME)
+        view_timeframe = query_params.get("timeframe", self.BASE_TIMEFRAME)
         if view_timeframe not in self.VIEW_TIMEFRAMES:
             raise ValidationError({"timeframe": f"Unsupported timeframe '{view_timeframe}'."})
 
-        view_df = self._build_dataframe(symbol, view_timeframe, limit, start_dt, end_dt)
-        if view_df.empty:
-            return Response(
-                {
-                    "symbol": symbol.code,
-                    "timeframe": view_timeframe,
-                    "candles": [],
-                    "sma200": [],
-                    "hma200": {self.TREND_TIMEFRAME_ONE: [], self.TREND_TIMEFRAME_TWO: []},
-                    "entries": [],
-                    "signal_timeline": [],
-                    "latest_signal": None,
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        base_limit = self._calculate_base_limit(view_timeframe, limit)
-        base_df = self._build_dataframe(symbol, self.BASE_TIMEFRAME, base_limit, start_dt, end_dt)
-        if base_df.empty:
-            return Response(
-                {
-                    "symbol": symbol.code,
-                    "timeframe": view_timeframe,
-                    "candles": [],
-                    "sma200": [],
-                    "hma200": {self.TREND_TIMEFRAME_ONE: [], self.TREND_TIMEFRAME_TWO: []},
-                    "entries": [],
-                    "signal_timeline": [],
-                    "latest_signal": None,
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        trend_one_df = self._build_dataframe(symbol, self.TREND_TIMEFRAME_ONE, None, start_dt, end_dt)
-        trend_two_df = self._build_dataframe(symbol, self.TREND_TIMEFRAME_TWO, None, start_dt, end_dt)
-        trend_three_df = self._build_dataframe(symbol, "1d", None, start_dt, end_dt)
-
-        base_df["sma200"] = simple_moving_average(base_df["close"], self.PERIOD)
-        if not trend_one_df.empty:
-            trend_one_df["hma200"] = hull_moving_average(trend_one_df["close"], self.PERIOD)
-            # Needed for Strategy 4 conditions
-            trend_one_df["sma200"] = simple_moving_average(trend_one_df["close"], self.PERIOD)
-        if not trend_two_df.empty:
-            trend_two_df["hma200"] = hull_moving_average(trend_two_df["close"], self.PERIOD)
-        if not trend_three_df.empty:
-            # Daily bias filter for Strategy 4
-            trend_three_df["hma200"] = hull_moving_average(trend_three_df["close"], self.PERIOD)
-
-        view_df["sma200_view"] = simple_moving_average(view_df["close"], self.PERIOD)
-
-        merged = self._merge_trend_frames(base_df, trend_one_df, trend_two_df)
-        # Merge additional indicators required by Strategy 4
-        if not trend_one_df.empty and "sma200" in trend_one_df.columns:
-            merged = pd.merge_asof(
-                merged,
-                trend_one_df.sort_values("timestamp")[["timestamp", "sma200"]],
-                on="timestamp",
-                direction="backward",
-                tolerance=pd.Timedelta("6h"),
-            ).rename(columns={"sma200": "sma200_1h"})
-        else:
-            merged["sma200_1h"] = pd.NA
-
-        if not trend_three_df.empty and "hma200" in trend_three_df.columns:
-            merged = pd.merge_asof(
-                merged,
-                trend_three_df.sort_values("timestamp")[["timestamp", "hma200"]],
-                on="timestamp",
-                direction="backward",
-                tolerance=pd.Timedelta("5d"),
-            ).rename(columns={"hma200": "hma200_1d"})
-        else:
-            merged["hma200_1d"] = pd.NA
-
-        # Normalize column names if merge created suffixes
-        if "sma200_x" in merged.columns and "sma200" not in merged.columns:
-            merged = merged.rename(columns={"sma200_x": "sma200"})
-        if "sma200_y" in merged.columns and "sma200_1h" not in merged.columns:
-            merged = merged.rename(columns={"sma200_y": "sma200_1h"})
-
-        # Select strategy based on request parameter
-        strategy_param = request.query_params.get("strategy", "1")
-        if strategy_param == "2":
-            evaluations, entries = self._evaluate_entries_strategy2(merged)
-        elif strategy_param == "3":
-            # Calculate additional indicators for Strategy 3
-            merged = self._calculate_strategy3_indicators(merged)
-            evaluations, entries = self._evaluate_entries_strategy3(merged)
-        elif strategy_param == "4":
-            evaluations, entries = self._evaluate_entries_strategy4(merged)
-        else:
-            evaluations, entries = self._evaluate_entries(merged)
-
-        latest_signal = evaluations[-1] if evaluations else None
-        aligned_entries = self._align_entries(entries, view_df, view_timeframe)
+        spec, strategy = self._resolve_strategy(query_params.get("strategy", DEFAULT_STRATEGY))
+        base_limit = self._calculate_base_limit(
+            view_timeframe, limit, spec.warmup(self.BASE_TIMEFRAME), ranged=start_dt is not None
+        )
 
-        indicator_payload = self._build_indicator_payload(
+        # Every frame comes from one query, bounded to what its indicators need: warmup before
+        # ``start`` (the response is trimmed back to the visible candles afterwards) and, for the
+        # trend and plot-only frames, the span of the frame they are merged onto or plotted under.
+        windows = {
+            "view": FrameWindow(view_timeframe, limit=limit, warmup=self.PLOT_WARMUP),
+            self.BASE_TIMEFRAME: FrameWindow(
+                self.BASE_TIMEFRAME,
+                limit=base_limit,
+                warmup=spec.warmup(self.BASE_TIMEFRAME) if start_dt else 0,
+            ),
+        }
+        for timeframe in spec.timeframes[1:]:
+            windows[timeframe] = FrameWindow(timeframe, warmup=spec.warmup(timeframe), anchor=self.BASE_TIMEFRAME)
+        for timeframe in self._plotted_timeframes():
+            if timeframe not in windows and timeframe != view_timeframe:
+                windows[timeframe] = FrameWindow(timeframe, warmup=self.PLOT_WARMUP, anchor="view")
+        with span("run.load"):
+            loaded = load_frames(symbol, windows, start_dt, end_dt)
+
+        return RunInputs(
             symbol=symbol,
-            cached_frames={
-                self.BASE_TIMEFRAME: base_df,
-                view_timeframe: view_df,
-                self.TREND_TIMEFRAME_ONE: trend_one_df,
-                self.TREND_TIMEFRAME_TWO: trend_two_df,
-            },
+            strategy_key=spec.key,
+            strategy=strategy,
             view_timeframe=view_timeframe,
-            view_limit=limit,
-            base_limit=base_limit,
+            limit=limit,
+            max_points=max_points,
             start_dt=start_dt,
             end_dt=end_dt,
+            base_limit=base_limit,
+            frames=loaded,
+            intrabar=str(query_params.get("intrabar", "")).lower() in {"1", "true", "yes"},
         )
 
+    def _compute_run(self, run: RunInputs):
+        """
+        Indicators, evaluation and payload of a loaded run. Reads the database only for
+        intrabar resolution, so it can run in a worker process.
+        """
+        symbol, spec, view_timeframe, limit = run.symbol, run.spec, run.view_timeframe, run.limit
+        start_dt, end_dt, base_limit, max_points = run.start_dt, run.end_dt, run.base_limit, run.max_points
+        loaded = dict(run.frames)
+        strategy = run.strategy
+
+        view_df = loaded.pop("view")
+        visible_df = self._visible(view_df, start_dt)
+        if limit:
+            visible_df = visible_df.tail(limit).reset_index(drop=True)
+        if visible_df.empty:
+            return self._empty_payload(symbol, view_timeframe), None
+        visible_start = visible_df["timestamp"].iloc[0] if start_dt else None
+
+        base_df = loaded[self.BASE_TIMEFRAME]
+        if base_df.empty:
+            return self._empty_payload(symbol, view_timeframe), None
+
+        # Every series is computed once per request and shared by the strategy and the plots.
+        # Only the indicators the selected strategy declares are computed up front.
+        graph = IndicatorGraph({view_timeframe: view_df, **loaded})
+        with span("run.indicators"):
+            for indicator in spec.indicators:
+                graph.indicator(indicator)
+
+        with span("run.merge"):
+            merged = self._merge_indicator_frames(base_df, graph, spec)
+            if spec.prepare is not None:
+                merged = spec.prepare(merged)
+
+        # Optional lower-timeframe resolution of bars where both stop and take-profit trigger
+        intrabar = None
+        if run.intrabar:
+            intrabar = IntrabarResolver(symbol, base_timeframe=self.BASE_TIMEFRAME)
+
+        with span("run.evaluate"):
+            evaluations, entries = spec.evaluate(self, merged, intrabar)
+        visible_base = base_df
+        if visible_start is not None:
+            first = bisect_left(evaluations, visible_start, key=lambda evaluation: pd.Timestamp(evaluation["time"]))
+            evaluations = evaluations[first:]
+            entries = [entry for entry in entries if entry["timestamp"] >= visible_start]
+            visible_base = self._visible(base_df, visible_start)
+            if visible_base.empty:
+                return self._empty_payload(symbol, view_timeframe), None
+
+        latest_signal = evaluations[-1] if evaluations else None
+        # With ``max_points`` the candles become buckets; entries and the timeline follow them.
+        candle_df = self._downsample_candles(visible_df, max_points)
+        bucketed = len(candle_df) < len(visible_df)
+        aligned_entries = self._align_entries(entries, candle_df, view_timeframe, bucketed=bucketed)
+        if bucketed:
+            evaluations = self._timeline_at(evaluations, candle_df)
+
+        with span("run.plots"):
+            indicator_payload = self._build_indicator_payload(
+                symbol=symbol,
+                graph=graph,
+                view_timeframe=view_timeframe,
+                view_limit=limit,
+                base_limit=base_limit,
+                start_dt=start_dt,
+                end_dt=end_dt,
+                max_points=max_points,
+                since=visible_df["timestamp"].iloc[0],
+            )
+
+        with span("run.payload"):
+            candles = self._serialize_candles(candle_df)
         payload = {
             "symbol": symbol.code,
             "timeframe": view_timeframe,
-            "candles": self._serialize_candles(view_df),
+            "candles": candles,
             "indicators": indicator_payload,
             "entries": aligned_entries,
             "signal_timeline": evaluations,
             "latest_signal": latest_signal,
         }
+        if intrabar is not None:
+            payload["intrabar"] = intrabar.stats()
+        context = {
+            "symbol": symbol,
+            "strategy_key": spec.key,
+            "strategy": strategy,
+            "timeframe": view_timeframe,
+            "entries": entries,
+            "start_at": visible_base["timestamp"].iloc[0].to_pydatetime(),
+            "end_at": visible_base["timestamp"].iloc[-1].to_pydatetime(),
+            "bar_timestamps": visible_base["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64),
+            "bar_closes": visible_base["close"].to_numpy(dtype=float),
+            "bars": tuple(visible_base[column].to_numpy(dtype=float) for column in ("open", "high", "low", "close")),
+        }
+        return payload, context
+
+    def _flight_key(self, query_params) -> str:
+        params = {name: query_params.get(name) for name in self.RUN_PARAMS}
+        params["symbol"] = (params["symbol"] or "").upper()
+        params["timeframe"] = params["timeframe"] or self.BASE_TIMEFRAME
+        params["strategy"] = params["strategy"] or DEFAULT_STRATEGY
+        params["intrabar"] = str(params["intrabar"] or "").lower() in {"1", "true", "yes"}
+        if not is_registered(params["strategy"]):
+            # Rule-based strategies resolve per user (owned strategies are private)
+            params["user"] = self.request.user.pk
+        return flight_key(params)
+
+    def _resolve_strategy(self, key: str):
+        """
+        Registered strategy for ``key``; otherwise a rule-based ``Strategy`` (live or owned by
+        the caller) whose slug is ``key``. Returns the spec and the model instance, if any.
+        """
+        if is_registered(key):
+            return get_strategy(key), None
+        visible = Q(is_live=True)
+        if self.request.user.is_authenticated:
+            visible |= Q(owner=self.request.user)
+        strategy = Strategy.objects.filter(visible, slug=key).first()
+        if strategy is None or not has_rules(strategy.config):
+            return get_strategy(key), None
+        return rule_strategy_spec(strategy), strategy
 
-        return Response(payload, status=status.HTTP_200_OK)
+    @staticmethod
+    def _plotted_timeframes() -> List[str]:
+        timeframes = []
+        for timeframe_map in STRATEGY_INDICATORS.values():
+            for timeframe, cfg in timeframe_map.items():
+                plot = cfg if isinstance(cfg, bool) else isinstance(cfg, dict) and bool(cfg.get("plot", cfg.get("calc", False)))
+                if plot and timeframe not in timeframes:
+                    timeframes.append(timeframe)
+        return timeframes
+
+    def _empty_payload(self, symbol: Symbol, view_timeframe: str) -> Dict:
+        return {
+            "symbol": symbol.code,
+            "timeframe": view_timeframe,
+            "candles": [],
+            "sma200": [],
+            "hma200": {self.TREND_TIMEFRAME_ONE: [], self.TREND_TIMEFRAME_TWO: []},
+            "entries": [],
+            "signal_timeline": [],
+            "latest_signal": None,
+        }
 
     @staticmethod
     def _parse_datetime(value: str):
@@ -203,63 +372,38 @@ class HMASMAStrategyRunView(APIView):
         return dt
 
     @staticmethod
-    def _build_dataframe(symbol: Symbol, timeframe: str, limit: int, start_dt, end_dt):
-        qs = Candle.objects.filter(symbol=symbol, timeframe=timeframe)
-        if start_dt:
-            qs = qs.filter(timestamp__gte=start_dt)
-        if end_dt:
-            qs = qs.filter(timestamp__lte=end_dt)
-        qs = qs.order_by("-timestamp")
-        if limit:
-            qs = qs[:limit]
-        candles = list(qs)
-        candles.reverse()
-        if not candles:
-            return pd.DataFrame()
-        frame = pd.DataFrame(
-            {
-                "timestamp": [c.timestamp for c in candles],
-                "open": [float(c.open) for c in candles],
-                "high": [float(c.high) for c in candles],
-                "low": [float(c.low) for c in candles],
-                "close": [float(c.close) for c in candles],
-                "volume": [float(c.volume) for c in candles],
-            }
-        )
-        frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True)
-        return frame
+    def _visible(frame: pd.DataFrame, since) -> pd.DataFrame:
+        """Rows at or after ``since`` (the whole frame when it is None)."""
+        if since is None or frame.empty:
+            return frame
+        return frame[frame["timestamp"] >= pd.Timestamp(since)].reset_index(drop=True)
 
+    # How far back a higher-timeframe value may be carried onto the base timeframe
+    MERGE_TOLERANCE = {"30m": pd.Timedelta("2h"), "1h": pd.Timedelta("6h"), "4h": pd.Timedelta("1d"), "1d": pd.Timedelta("5d")}
 
- 
-
-    def _merge_trend_frames(self, base_df: pd.DataFrame, trend_one_df: pd.DataFrame, trend_two_df: pd.DataFrame) -> pd.DataFrame:
+    def _merge_indicator_frames(self, base_df: pd.DataFrame, graph: IndicatorGraph, spec) -> pd.DataFrame:
+        """Base-timeframe frame with every declared indicator as a column (higher timeframes as-of merged)."""
         merged = base_df.sort_values("timestamp").copy()
-
-        if not trend_one_df.empty:
-            merged = pd.merge_asof(
-                merged,
-                trend_one_df.sort_values("timestamp")[["timestamp", "hma200"]],
-                on="timestamp",
-                direction="backward",
-                tolerance=pd.Timedelta("6h"),
-            ).rename(columns={"hma200": "hma200_1h"})
-        else:
-            merged["hma200_1h"] = pd.NA
-
-        if not trend_two_df.empty:
+        for indicator in spec.indicators:
+            if indicator.timeframe == self.BASE_TIMEFRAME:
+                merged[indicator.column] = graph.indicator(indicator)
+                continue
+            frame = graph.frame(indicator.timeframe)
+            if frame is None or frame.empty:
+                merged[indicator.column] = pd.NA
+                continue
+            # Loaded frames are ordered by timestamp, as merge_asof requires.
             merged = pd.merge_asof(
                 merged,
-                trend_two_df.sort_values("timestamp")[["timestamp", "hma200"]],
+                pd.DataFrame({"timestamp": frame["timestamp"], indicator.name: graph.indicator(indicator)}),
                 on="timestamp",
                 direction="backward",
-                tolerance=pd.Timedelta("1d"),
-            ).rename(columns={"hma200": "hma200_4h"})
-        else:
-            merged["hma200_4h"] = pd.NA
-
+                tolerance=self.MERGE_TOLERANCE.get(indicator.timeframe),
+            )
         return merged
 
-    def _calculate_strategy3_indicators(self, merged: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _calculate_strategy3_indicators(merged: pd.DataFrame) -> pd.DataFrame:
         """
         Calculate additional indicators needed for Strategy 3 (Smart Crossover Hybrid).
         
@@ -366,14 +510,14 @@ class HMASMAStrategyRunView(APIView):
                         },
                         "1h": {
                             "price": price_5m,
-                            "indicator": hma_1h,
+                            "indicator": hma_1h_value,
                             "condition_met": cond_1h_long,
                             "condition_long": cond_1h_long,
                             "condition_short": cond_1h_short,
                         },
                         "4h": {
                             "price": price_5m,
-                            "indicator": hma_4h,
+                            "indicator": hma_4h_value,
                             "condition_met": cond_4h_long,
                             "condition_long": cond_4h_long,
                             "condition_short": cond_4h_short,
@@ -426,7 +570,20 @@ class HMASMAStrategyRunView(APIView):
 
         return evaluations, entries
 
-    def _evaluate_entries_strategy2(self, merged: pd.DataFrame):
+    @staticmethod
+    def _take_profit_first(
+        intrabar: Optional[IntrabarResolver],
+        row,
+        direction: str,
+        stop_price: float,
+        take_price: float,
+    ) -> bool:
+        """True when lower-timeframe data shows the take-profit was reached before the stop."""
+        if intrabar is None:
+            return False
+        return intrabar.first_hit(row.timestamp.to_pydatetime(), direction, stop_price, take_price) == TAKE_PROFIT
+
+    def _evaluate_entries_strategy2(self, merged: pd.DataFrame, intrabar: Optional[IntrabarResolver] = None):
         """Strategy 2: SMA 200 5m crossover strategy with HMA 200 1h/4h"""
         entries: List[Dict] = []
         evaluations: List[Dict] = []
@@ -559,10 +716,18 @@ class HMASMAStrategyRunView(APIView):
                 if short_take_price is not None:
                     take_short_trigger = low_5m <= short_take_price or open_5m <= short_take_price
 
+            # Both levels inside one bar: the stop wins unless intrabar data says otherwise
+            long_take_first = (stop_long_trigger and take_long_trigger) and self._take_profit_first(
+                intrabar, row, "long", long_stop_price, long_take_price
+            )
+            short_take_first = (stop_short_trigger and take_short_trigger) and self._take_profit_first(
+                intrabar, row, "short", short_stop_price, short_take_price
+            )
+
             exit_long_reason = None
             exit_long_price = price_5m
             if position_long_open:
-                if stop_long_trigger:
+                if stop_long_trigger and not long_take_first:
                     exit_long_reason = "stop_loss"
                     exit_long_price = long_stop_price
                 elif take_long_trigger:
@@ -576,7 +741,7 @@ class HMASMAStrategyRunView(APIView):
             exit_short_reason = None
             exit_short_price = price_5m
             if position_short_open:
-                if stop_short_trigger:
+                if stop_short_trigger and not short_take_first:
                     exit_short_reason = "stop_loss"
                     exit_short_price = short_stop_price
                 elif take_short_trigger:
@@ -710,6 +875,45 @@ class HMASMAStrategyRunView(APIView):
 
         return evaluations, entries
 
+    @staticmethod
+    def _parse_max_points(value: Optional[str]) -> Optional[int]:
+        if not value:
+            return None
+        try:
+            max_points = int(value)
+        except ValueError as exc:
+            raise ValidationError({"max_points": "max_points must be an integer."}) from exc
+        if max_points < 3:
+            raise ValidationError({"max_points": "max_points must be at least 3."})
+        return max_points
+
+    @staticmethod
+    def _downsample_candles(frame: pd.DataFrame, max_points: Optional[int] = None) -> pd.DataFrame:
+        """At most ``max_points`` OHLCV buckets, each stamped with its first candle's open time."""
+        if not max_points or len(frame) <= max_points:
+            return frame
+        return pd.DataFrame(
+            downsample_ohlcv(
+                frame["timestamp"].to_numpy(),
+                frame["open"].to_numpy(),
+                frame["high"].to_numpy(),
+                frame["low"].to_numpy(),
+                frame["close"].to_numpy(),
+                frame["volume"].to_numpy(),
+                max_points,
+            )
+        )
+
+    @staticmethod
+    def _timeline_at(evaluations: List[Dict], candle_df: pd.DataFrame) -> List[Dict]:
+        """The evaluation in effect at each candle's open, i.e. the one the dashboard shows for it."""
+        if not evaluations:
+            return evaluations
+        evaluation_ns = pd.to_datetime([evaluation["time"] for evaluation in evaluations], utc=True).asi8
+        candle_ns = candle_df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        picks = np.searchsorted(evaluation_ns, candle_ns, side="right") - 1
+        return [evaluations[index] for index in np.unique(picks[picks >= 0]).tolist()]
+
     @staticmethod
     def _serialize_candles(frame: pd.DataFrame) -> List[Dict]:
         return [
@@ -725,10 +929,18 @@ class HMASMAStrategyRunView(APIView):
         ]
 
     @staticmethod
-    def _serialize_indicator(frame: pd.DataFrame, column: str) -> List[Dict]:
+    def _serialize_indicator(frame: pd.DataFrame, column: str, max_points: Optional[int] = None) -> List[Dict]:
         if column not in frame.columns:
             return []
         indicator_series = frame[["timestamp", column]].dropna()
+        if max_points and len(indicator_series) > max_points:
+            keep = decimate(
+                indicator_series["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64),
+                indicator_series[column].to_numpy(dtype=float),
+                max_points,
+                LTTB,
+            )
+            indicator_series = indicator_series.iloc[keep]
         return [
             {
                 "time": row.timestamp.isoformat(),
@@ -737,12 +949,18 @@ class HMASMAStrategyRunView(APIView):
             for row in indicator_series.itertuples()
         ]
 
-    def _calculate_base_limit(self, view_timeframe: str, limit: int | None) -> int:
+    def _calculate_base_limit(
+        self, view_timeframe: str, limit: int | None, warmup: Optional[int] = None, ranged: bool = False
+    ) -> int:
+        if ranged and not limit:
+            # An explicit start already bounds the query (range plus warmup)
+            return self.MAX_BASE_BARS
         ratio = self._timeframe_ratio(view_timeframe)
-        base = max(self.PERIOD + 50, (limit * ratio + self.PERIOD) if limit else self.PERIOD * ratio * 2)
+        warmup = self.PERIOD if warmup is None else warmup
+        base = max(warmup + 50, (limit * ratio + warmup) if limit else self.PERIOD * ratio * 2)
         # Increased limit to allow for longer backtesting periods
         # 100k 5m candles = ~347 days of data
-        return min(base, 100000)
+        return min(base, self.MAX_BASE_BARS)
 
     @staticmethod
     def _timeframe_ratio(view_timeframe: str) -> int:
@@ -755,20 +973,13 @@ class HMASMAStrategyRunView(APIView):
         }
         return mapping.get(view_timeframe, 1)
 
-    def _timeframe_delta(self, timeframe: str) -> pd.Timedelta:
-        mapping = {
-            "5m": pd.Timedelta(minutes=5),
-            "30m": pd.Timedelta(minutes=30),
-            "1h": pd.Timedelta(hours=1),
-            "4h": pd.Timedelta(hours=4),
-            "1d": pd.Timedelta(days=1),
-        }
-        return mapping.get(timeframe, pd.Timedelta(minutes=5))
-
-    def _align_entries(self, entries: List[Dict], view_df: pd.DataFrame, view_timeframe: str) -> List[Dict]:
+    def _align_entries(
+        self, entries: List[Dict], view_df: pd.DataFrame, view_timeframe: str, bucketed: bool = False
+    ) -> List[Dict]:
+        """Places each entry on the view candle containing it; ``bucketed`` candles span several bars."""
         if not entries or view_df.empty:
             return []
-        if view_timeframe == self.BASE_TIMEFRAME:
+        if view_timeframe == self.BASE_TIMEFRAME and not bucketed:
             return [
                 {
                     "time": entry["timestamp"].isoformat(),
@@ -779,52 +990,45 @@ class HMASMAStrategyRunView(APIView):
                 for entry in entries
             ]
 
-        timestamps = list(view_df["timestamp"])
-        if not timestamps:
-            return []
-        delta = self._timeframe_delta(view_timeframe)
-        window_end = timestamps[1:] + [timestamps[-1] + delta]
-
-        aligned = []
-        for entry in entries:
-            raw_ts = entry["timestamp"]
-            entry_ts = pd.Timestamp(raw_ts)
-            if entry_ts.tz is None:
-                entry_ts = entry_ts.tz_localize("UTC")
-            else:
-                entry_ts = entry_ts.tz_convert("UTC")
-            candle_ts = None
-            for start_ts, end_ts in zip(timestamps, window_end):
-                if start_ts <= entry_ts < end_ts:
-                    candle_ts = start_ts
-                    break
-            if candle_ts is None:
-                if entry_ts >= timestamps[-1]:
-                    candle_ts = timestamps[-1]
-                else:
-                    continue
-            aligned.append(
-                {
-                    "time": candle_ts.isoformat(),
-                    "source_time": entry_ts.isoformat(),
-                    "direction": entry["direction"],
-                    "price": entry.get("price"),
-                }
-            )
-        return aligned
+        # View candles cover [open, next open); the last one is open-ended. One binary search per
+        # entry on int64 epochs replaces the scan over every candle.
+        candle_ns = view_df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        entry_ns = pd.to_datetime([entry["timestamp"] for entry in entries], utc=True).asi8
+        slots = np.searchsorted(candle_ns, entry_ns, side="right") - 1
+        keep = np.flatnonzero(slots >= 0)
+        candle_times = self._isoformat_utc(candle_ns[slots[keep]])
+        source_times = self._isoformat_utc(entry_ns[keep])
+        return [
+            {
+                "time": candle_time,
+                "source_time": source_time,
+                "direction": entries[index]["direction"],
+                "price": entries[index].get("price"),
+            }
+            for index, candle_time, source_time in zip(keep.tolist(), candle_times, source_times)
+        ]
+
+    @staticmethod
+    def _isoformat_utc(epoch_ns: np.ndarray) -> List[str]:
+        """``Timestamp.isoformat()`` of UTC epoch nanoseconds, formatted in bulk."""
+        strings = [f"{text}+00:00" for text in np.datetime_as_string(epoch_ns.astype("datetime64[ns]"), unit="s").tolist()]
+        for index in np.flatnonzero(epoch_ns % 1_000_000_000).tolist():
+            strings[index] = pd.Timestamp(int(epoch_ns[index]), tz="UTC").isoformat()
+        return strings
 
     def _build_indicator_payload(
         self,
         symbol: Symbol,
-        cached_frames: Dict[str, pd.DataFrame],
+        graph: IndicatorGraph,
         view_timeframe: str,
         view_limit: Optional[int],
         base_limit: int,
         start_dt,
         end_dt,
+        max_points: Optional[int] = None,
+        since: Optional[pd.Timestamp] = None,
     ) -> Dict[str, Dict[str, List[Dict]]]:
         payload: Dict[str, Dict[str, List[Dict]]] = {"sma": {}, "hma": {}}
-        frame_cache = dict(cached_frames)
 
         for indicator_type, timeframe_map in STRATEGY_INDICATORS.items():
             indicator_results: Dict[str, List[Dict]] = {}
@@ -844,14 +1048,17 @@ class HMASMAStrategyRunView(APIView):
                     continue
 
                 limit = base_limit if timeframe == self.BASE_TIMEFRAME else view_limit
-                df = self._get_dataframe_for_indicator(symbol, timeframe, frame_cache, limit, start_dt, end_dt)
+                if not plot:
+                    # Calculated-only series are already in the strategy frames when it needs them.
+                    continue
+                df = self._get_dataframe_for_indicator(symbol, timeframe, graph, limit, start_dt, end_dt)
                 if df is None or df.empty:
                     # If plotting was requested but no data, surface empty list
                     if plot:
                         indicator_results[timeframe] = []
                     continue
 
-                series = self._compute_indicator_series(df.copy(), indicator_type, timeframe)
+                series = self._compute_indicator_series(graph, indicator_type, timeframe, max_points, since)
                 if plot:
                     indicator_results[timeframe] = series
             payload[indicator_type] = indicator_results
@@ -862,27 +1069,35 @@ class HMASMAStrategyRunView(APIView):
         self,
         symbol: Symbol,
         timeframe: str,
-        cache: Dict[str, pd.DataFrame],
+        graph: IndicatorGraph,
         limit: Optional[int],
         start_dt,
         end_dt,
     ) -> pd.DataFrame:
-        df = cache.get(timeframe)
-        if df is not None and not df.empty:
-            return df
-        df = self._build_dataframe(symbol, timeframe, limit, start_dt, end_dt)
-        cache[timeframe] = df
+        if timeframe in graph:
+            return graph.frame(timeframe)
+        window = FrameWindow(timeframe, limit=limit, warmup=self.PLOT_WARMUP)
+        df = load_frames(symbol, {timeframe: window}, start_dt, end_dt)[timeframe]
+        graph.add_frame(timeframe, df)
         return df
 
-    def _compute_indicator_series(self, frame: pd.DataFrame, indicator_type: str, timeframe: str) -> List[Dict]:
-        if frame.empty:
+    def _compute_indicator_series(
+        self,
+        graph: IndicatorGraph,
+        indicator_type: str,
+        timeframe: str,
+        max_points: Optional[int] = None,
+        since: Optional[pd.Timestamp] = None,
+    ) -> List[Dict]:
+        frame = graph.frame(timeframe)
+        if frame is None or frame.empty:
             return []
-        column_name = f"{indicator_type}200_{timeframe}"
-        if indicator_type == "sma":
-            frame[column_name] = simple_moving_average(frame["close"], self.PERIOD)
-        else:
-            frame[column_name] = hull_moving_average(frame["close"], self.PERIOD)
-        return self._serialize_indicator(frame, column_name)
+        # Series the strategy already computed are reused as they are.
+        column_name = f"{indicator_type}{self.PERIOD}_{timeframe}"
+        plotted = pd.DataFrame(
+            {"timestamp": frame["timestamp"], column_name: graph.series(timeframe, indicator_type, self.PERIOD)}
+        )
+        return self._serialize_indicator(self._visible(plotted, since), column_name, max_points)
 
     def _evaluate_entries_strategy3(self, merged: pd.DataFrame):
         """Strategy 3: Smart Crossover Hybrid with Risk Management"""
@@ -1096,7 +1311,7 @@ class HMASMAStrategyRunView(APIView):
 # ####################################################################################################################################################################################
 # ####################################################################################################################################################################################
 
-    def _evaluate_entries_strategy4(self, merged: pd.DataFrame):
+    def _evaluate_entries_strategy4(self, merged: pd.DataFrame, intrabar: Optional[IntrabarResolver] = None):
         """Strategy 4: 5m SMA200 vs 1h HMA200 crossover with 1d bias.
 
         Long bias: price > HMA200 (1d)
@@ -1214,19 +1429,33 @@ class HMASMAStrategyRunView(APIView):
                 crossover_up or stop_short_trigger or take_short_trigger
             )
 
+            # Both levels inside one bar: the stop wins unless intrabar data says otherwise
+            long_take_first = (stop_long_trigger and take_long_trigger) and self._take_profit_first(
+                intrabar, row, "long", long_stop_price, long_take_price
+            )
+            short_take_first = (stop_short_trigger and take_short_trigger) and self._take_profit_first(
+                intrabar, row, "short", short_stop_price, short_take_price
+            )
+
+            exit_long_price = price_5m
             if position_long_open:
-                if stop_long_trigger:
+                if stop_long_trigger and not long_take_first:
                     exit_long_reason = "stop_loss"
+                    exit_long_price = long_stop_price
                 elif take_long_trigger:
                     exit_long_reason = "take_profit"
+                    exit_long_price = long_take_price
                 elif crossover_down:
                     exit_long_reason = "crossover"
 
+            exit_short_price = price_5m
             if position_short_open:
-                if stop_short_trigger:
+                if stop_short_trigger and not short_take_first:
                     exit_short_reason = "stop_loss"
+                    exit_short_price = short_stop_price
                 elif take_short_trigger:
                     exit_short_reason = "take_profit"
+                    exit_short_price = short_take_price
                 elif crossover_up:
                     exit_short_reason = "crossover"
 
@@ -1284,7 +1513,8 @@ class HMASMAStrategyRunView(APIView):
                     {
                         "timestamp": row.timestamp.to_pydatetime(),
                         "direction": "long_exit",
-                        "price": price_5m,
+                        "price": exit_long_price,
+                        "reason": exit_long_reason,
                     }
                 )
                 position_long_open = False
@@ -1296,7 +1526,8 @@ class HMASMAStrategyRunView(APIView):
                     {
                         "timestamp": row.timestamp.to_pydatetime(),
                         "direction": "short_exit",
-                        "price": price_5m,
+                        "price": exit_short_price,
+                        "reason": exit_short_reason,
                     }
                 )
                 position_short_open = False
@@ -1343,6 +1574,45 @@ class HMASMAStrategyRunView(APIView):
         return evaluations, entries
 
 
+_SMA_5M = IndicatorSpec("sma", BASE_TIMEFRAME)
+_HMA_1H = IndicatorSpec("hma", "1h")
+_HMA_4H = IndicatorSpec("hma", "4h")
+
+register_strategy(
+    StrategySpec(
+        key="1",
+        label="Multi-timeframe",
+        indicators=(_SMA_5M, _HMA_1H, _HMA_4H),
+        evaluate=lambda view, merged, intrabar=None: view._evaluate_entries(merged),
+    )
+)
+register_strategy(
+    StrategySpec(
+        key="2",
+        label="Crossover",
+        indicators=(_SMA_5M, _HMA_1H, _HMA_4H),
+        evaluate=lambda view, merged, intrabar=None: view._evaluate_entries_strategy2(merged, intrabar),
+    )
+)
+register_strategy(
+    StrategySpec(
+        key="3",
+        label="Smart Crossover Hybrid",
+        indicators=(_SMA_5M, _HMA_1H, _HMA_4H),
+        evaluate=lambda view, merged, intrabar=None: view._evaluate_entries_strategy3(merged),
+        prepare=HMASMAStrategyRunView._calculate_strategy3_indicators,
+    )
+)
+register_strategy(
+    StrategySpec(
+        key="4",
+        label="5m vs 1h",
+        indicators=(_SMA_5M, _HMA_1H, IndicatorSpec("sma", "1h"), IndicatorSpec("hma", "1d")),
+        evaluate=lambda view, merged, intrabar=None: view._evaluate_entries_strategy4(merged, intrabar),
+    )
+)
+
+
 class StrategyConfigView(APIView):
     """Expose strategy options and indicator plotting preferences to the frontend."""
 
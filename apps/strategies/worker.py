@@ -0,0 +1,23 @@
+"""
+Entry points of the strategy-run worker processes (see ``async_run``).
+
+Spawned workers unpickle their initializer before Django is set up, so this module must not
+import models at import time.
+"""
+
+import os
+
+
+def init_worker():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+def compute_run(run):
+    """The compute phase of a loaded run (``RunInputs``), returning only the payload."""
+    from .views import HMASMAStrategyRunView
+
+    payload, _ = HMASMAStrategyRunView()._compute_run(run)
+    return payload
@@ -0,0 +1,8 @@
+"""
+Performance benchmark suite.
+
+Cases live in ``benchmarks/cases.py`` and cover the indicator functions, divergence detection,
+the strategy evaluators, candle ingestion and the full strategy run endpoint at several input
+sizes. ``python manage.py run_benchmarks`` runs them, writes timings and peak memory to JSON
+and compares them with a stored baseline (see ``benchmarks/suite.py``).
+"""
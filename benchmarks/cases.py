@@ -0,0 +1,204 @@
+"""
+Benchmark cases. Sizes are numbers of 5m bars; higher timeframes are aggregated from them
+(``apps.datafeeds.synthetic``).
+
+Database cases (divergence detection, ingestion and the run endpoint) run against the test
+database created by ``run_benchmarks``, seeded once per size.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from apps.datafeeds.synthetic import generate, generate_frames, to_payloads
+from apps.strategies.graph import IndicatorGraph
+from apps.strategies.indicators import hma_multi, hull_moving_average, macd, rsi, simple_moving_average, sma_multi
+from apps.strategies.registry import get_strategy
+
+from .suite import benchmark
+
+SEED = 11
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+TIMEFRAMES = ("5m", "30m", "1h", "4h", "1d")
+# Per-bar Python loops; larger inputs take minutes per run.
+LOOP_MAX_SIZE = 100_000
+# The divergence scan is quadratic in the window (~16s at 10k bars).
+DIVERGENCE_MAX_SIZE = 10_000
+
+
+def timeframe_frames(size: int, timeframes=TIMEFRAMES) -> Dict[str, pd.DataFrame]:
+    """``size`` synthetic 5m bars plus the higher timeframes aggregated from them."""
+    return generate_frames(START, START + timedelta(minutes=5 * size), timeframes, seed=SEED)
+
+
+# ---------------------------------------------------------------------- indicators
+def _close(size: int) -> pd.Series:
+    return timeframe_frames(size, ("5m",))["5m"]["close"]
+
+
+@benchmark("indicators.sma")
+def sma_case(size):
+    close = _close(size)
+    return lambda: simple_moving_average(close, 200)
+
+
+@benchmark("indicators.hma")
+def hma_case(size):
+    close = _close(size)
+    return lambda: hull_moving_average(close, 200)
+
+
+# Multi-period batches: cost should grow far slower than the number of periods.
+MULTI_PERIOD_COUNTS = (1, 4, 16)
+
+
+def _periods(count: int):
+    return [int(period) for period in np.linspace(200, 20, count).round()]
+
+
+def _register_multi(count: int):
+    @benchmark(f"indicators.sma_multi_{count}")
+    def sma_multi_case(size):
+        close = _close(size)
+        return lambda: sma_multi(close, _periods(count))
+
+    @benchmark(f"indicators.hma_multi_{count}")
+    def hma_multi_case(size):
+        close = _close(size)
+        return lambda: hma_multi(close, _periods(count))
+
+
+for _count in MULTI_PERIOD_COUNTS:
+    _register_multi(_count)
+
+
+@benchmark("indicators.macd")
+def macd_case(size):
+    close = _close(size)
+    return lambda: macd(close)
+
+
+@benchmark("indicators.rsi")
+def rsi_case(size):
+    close = _close(size)
+    return lambda: rsi(close)
+
+
+# ---------------------------------------------------------------------- strategy evaluators
+def _merged_frame(key: str, size: int):
+    from apps.strategies.views import HMASMAStrategyRunView
+
+    view = HMASMAStrategyRunView()
+    spec = get_strategy(key)
+    frames = timeframe_frames(size)
+    merged = view._merge_indicator_frames(frames["5m"], IndicatorGraph(frames), spec)
+    if spec.prepare is not None:
+        merged = spec.prepare(merged)
+    return view, spec, merged
+
+
+def _register_evaluator(key: str):
+    @benchmark(f"strategies.evaluate_{key}", max_size=LOOP_MAX_SIZE)
+    def evaluator_case(size):
+        view, spec, merged = _merged_frame(key, size)
+        return lambda: spec.evaluate(view, merged, None)
+
+
+for _key in ("1", "2", "3", "4"):
+    _register_evaluator(_key)
+
+
+# ---------------------------------------------------------------------- database
+_SEEDED: Dict[int, object] = {}
+
+
+def seeded_symbol(size: int):
+    """A symbol holding ``size`` 5m candles plus their higher timeframes, stored chunk by chunk."""
+    from apps.datafeeds.models import Symbol
+    from apps.datafeeds.services import store_candles
+
+    if size in _SEEDED:
+        return _SEEDED[size]
+    symbol = Symbol.objects.create(code=f"BENCH{size}", base_asset="BENCH", quote_asset="USDT")
+    for frames in generate(START, START + timedelta(minutes=5 * size), TIMEFRAMES, seed=SEED):
+        for timeframe, frame in frames.items():
+            store_candles(symbol, timeframe, to_payloads(frame), source="synthetic")
+    _SEEDED[size] = symbol
+    return symbol
+
+
+@benchmark("datafeeds.detect_all_divergences", uses_db=True, max_size=DIVERGENCE_MAX_SIZE)
+def divergence_case(size):
+    from apps.datafeeds.divergence_detector import DivergenceDetector
+
+    symbol = seeded_symbol(size)
+    detector = DivergenceDetector()
+    return lambda: detector.detect_all_divergences(symbol, "5m")
+
+
+@benchmark("datafeeds.store_candles", uses_db=True)
+def store_candles_case(size):
+    from apps.datafeeds.models import Symbol
+    from apps.datafeeds.services import store_candles
+
+    payloads = to_payloads(timeframe_frames(size, ("5m",))["5m"])
+    runs = iter(range(1_000_000))
+
+    def target():
+        symbol = Symbol.objects.create(code=f"STORE{size}-{next(runs)}", base_asset="STORE", quote_asset="USDT")
+        return store_candles(symbol, "5m", payloads)
+
+    return target
+
+
+@benchmark("api.strategy_run", uses_db=True)
+def strategy_run_case(size):
+    from django.test import Client
+    from django.urls import reverse
+
+    symbol = seeded_symbol(size)
+    client = Client()
+    url = reverse("hma-sma-run")
+
+    def target():
+        response = client.get(url, {"symbol": symbol.code, "strategy": "4", "limit": size})
+        assert response.status_code == 200, response.content[:200]
+        return response
+
+    return target
+
+
+# Identical requests fired together; with single-flight coalescing their cost is close to one run.
+CONCURRENT_REQUESTS = 8
+
+
+@benchmark("api.strategy_run_concurrent", uses_db=True, max_size=LOOP_MAX_SIZE)
+def strategy_run_concurrent_case(size):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    symbol = seeded_symbol(size)
+    url = reverse("hma-sma-run")
+
+    def request(barrier):
+        barrier.wait()
+        try:
+            response = Client().get(url, {"symbol": symbol.code, "strategy": "4", "limit": size})
+            assert response.status_code == 200, response.content[:200]
+        finally:
+            connection.close()
+
+    def target():
+        barrier = threading.Barrier(CONCURRENT_REQUESTS)
+        with ThreadPoolExecutor(CONCURRENT_REQUESTS) as pool:
+            list(pool.map(lambda _: request(barrier), range(CONCURRENT_REQUESTS)))
+
+    return target
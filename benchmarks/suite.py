@@ -0,0 +1,155 @@
+"""
+Benchmark registry, measurement and baseline comparison.
+
+A case is registered with ``@benchmark(name)`` on a setup function that receives the input
+size and returns the callable to time, so data preparation never counts. Each case/size pair
+is timed ``repeat`` times (best run kept) and run once more under ``tracemalloc`` for its peak
+Python/NumPy allocation. Results are keyed ``"<case>@<size>"``.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.25
+# Timings below this are dominated by noise and never flagged.
+MIN_SECONDS = 0.005
+MIN_PEAK_MB = 1.0
+
+Setup = Callable[[int], Callable[[], object]]
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Setup
+    uses_db: bool = False
+    max_size: Optional[int] = None  # larger sizes are skipped (e.g. per-row loops)
+
+
+@dataclass(frozen=True)
+class Regression:
+    key: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float("inf")
+
+    def __str__(self) -> str:
+        return f"{self.key} {self.metric}: {self.baseline:.4g} -> {self.current:.4g} ({self.ratio:.2f}x)"
+
+
+_CASES: Dict[str, Case] = {}
+
+
+def benchmark(name: str, uses_db: bool = False, max_size: Optional[int] = None):
+    def register(setup: Setup) -> Setup:
+        _CASES[name] = Case(name=name, setup=setup, uses_db=uses_db, max_size=max_size)
+        return setup
+
+    return register
+
+
+def registered_cases(only: Iterable[str] = ()) -> List[Case]:
+    """Registered cases, filtered to names containing any of ``only`` when given."""
+    from . import cases  # noqa: F401  (registers the cases)
+
+    patterns = list(only)
+    return [case for name, case in _CASES.items() if not patterns or any(p in name for p in patterns)]
+
+
+def measure(target: Callable[[], object], repeat: int = 3) -> Dict[str, float]:
+    """Best wall time over ``repeat`` runs plus the peak traced allocation of one extra run."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        target()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        target()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "mean_seconds": sum(timings) / len(timings), "peak_mb": peak / 2**20}
+
+
+def run_cases(cases: Iterable[Case], sizes: Iterable[int], repeat: int = 3, report=None) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for case in cases:
+        for size in sizes:
+            if case.max_size is not None and size > case.max_size:
+                continue
+            target = case.setup(size)
+            key = f"{case.name}@{size}"
+            results[key] = measure(target, repeat)
+            if report is not None:
+                report(key, results[key])
+    return results
+
+
+def build_report(results: Dict[str, Dict[str, float]], sizes: Iterable[int], repeat: int) -> Dict:
+    from django.db import connection
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "database": connection.vendor,
+            "sizes": list(sizes),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Regression]:
+    """Cases present in both runs whose time or peak memory grew by more than ``threshold``."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+            before, after = previous.get(metric), current.get(metric)
+            if before is None or after is None or max(before, after) < floor:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append(Regression(key=key, metric=metric, baseline=before, current=after))
+    return regressions
+
+
+def load_report(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def write_report(path: Path, report: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, sort_keys=True))
@@ -1,7 +1,9 @@
 from django.urls import path
 
+from apps.datafeeds import routing as datafeeds_routing
 from apps.execution import routing as execution_routing
 
 websocket_urlpatterns = [
+    *datafeeds_routing.websocket_urlpatterns,
     *execution_routing.websocket_urlpatterns,
 ]
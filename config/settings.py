@@ -57,6 +57,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.analytics.querybudget.QueryBudgetMiddleware",
+    "apps.analytics.middleware.ServerTimingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -158,12 +160,68 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Cache compartida: heartbeats y estado en memoria de los bots (Redis en prod, locmem en dev).
+if os.getenv("CACHE_BACKEND", "redis").lower() == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv(
+                "CACHE_REDIS_URL",
+                f"redis://{os.getenv('REDIS_HOST', '127.0.0.1')}:{os.getenv('REDIS_PORT', '6379')}/1",
+            ),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+BOT_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("BOT_HEARTBEAT_INTERVAL_SECONDS", "5"))
+BOT_HEARTBEAT_STALE_SECONDS = float(os.getenv("BOT_HEARTBEAT_STALE_SECONDS", "60"))
+BOT_STATE_FLUSH_SECONDS = float(os.getenv("BOT_STATE_FLUSH_SECONDS", "30"))
+# Ventana de agregación de actualizaciones de bots hacia los websockets.
+BOT_UPDATE_WINDOW_SECONDS = float(os.getenv("BOT_UPDATE_WINDOW_SECONDS", "0.25"))
+
+# Paper trading: deslizamiento y comisión en puntos básicos, nocional por defecto sin capital.
+PAPER_SLIPPAGE_BPS = float(os.getenv("PAPER_SLIPPAGE_BPS", "2"))
+PAPER_FEE_BPS = float(os.getenv("PAPER_FEE_BPS", "10"))
+PAPER_DEFAULT_NOTIONAL = float(os.getenv("PAPER_DEFAULT_NOTIONAL", "1000"))
+
+# Ventana (segundos) de los histogramas de tiempos servidos en /api/analytics/metrics/.
+METRICS_WINDOW_SECONDS = float(os.getenv("METRICS_WINDOW_SECONDS", "300"))
+# Presupuesto de consultas SQL por petición (las vistas pueden fijar ``query_budget``) y
+# número de repeticiones de la misma consulta que se registra como posible N+1.
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "20"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "10"))
+# Ejecuciones idénticas y concurrentes de estrategias comparten un solo cálculo: espera máxima
+# (y caducidad del lock entre procesos) y segundos que el resultado queda en caché para los demás.
+# El resultado solo se publica si otro proceso lo espera; conviene mantener el TTL en pocos segundos.
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "30"))
+SINGLE_FLIGHT_RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "5"))
+# Vista asíncrona de estrategias: procesos de cálculo (0 = un hilo, para desarrollo), peticiones
+# que pueden esperar turno y segundos máximos de espera antes de responder 503.
+STRATEGY_RUN_WORKERS = int(os.getenv("STRATEGY_RUN_WORKERS", "2"))
+STRATEGY_RUN_MAX_QUEUED = int(os.getenv("STRATEGY_RUN_MAX_QUEUED", "16"))
+STRATEGY_RUN_QUEUE_TIMEOUT = float(os.getenv("STRATEGY_RUN_QUEUE_TIMEOUT", "30"))
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "flush-bot-state": {
+        "task": "execution.flush_bot_state",
+        "schedule": BOT_STATE_FLUSH_SECONDS,
+    },
+    "monitor-bot-heartbeats": {
+        "task": "execution.monitor_heartbeats",
+        "schedule": BOT_HEARTBEAT_STALE_SECONDS / 2,
+    },
+}
 
 
 
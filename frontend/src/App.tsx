@@ -6,9 +6,10 @@ import './App.css';
 import { fetchSymbols } from './api/datafeeds';
 import type { SymbolDTO, Timeframe } from './api/types';
 import { fetchHMASMAStrategy, fetchStrategyConfig } from './api/strategy';
-import type { StrategyEntry, StrategyOption } from './api/strategy';
+import type { SignalSnapshot, StrategyEntry, StrategyOption } from './api/strategy';
 import { CandlestickChart } from './components/CandlestickChart';
 import type { IndicatorSeries } from './components/CandlestickChart';
+import { useMarketStream } from './hooks/useMarketStream';
 import { usePlayback } from './hooks/usePlayback';
 
 const TIMEFRAMES: Timeframe[] = ['5m', '30m', '1h', '4h', '1d'];
@@ -87,8 +88,9 @@ function App() {
     }
   }, [symbolsQuery.data, selectedSymbol]);
 
+  const strategyQueryKey = ['hma-sma', selectedSymbol, timeframe, limit, start, end, strategy];
   const strategyQuery = useQuery({
-    queryKey: ['hma-sma', selectedSymbol, timeframe, limit, start, end, strategy],
+    queryKey: strategyQueryKey,
     queryFn: () =>
       fetchHMASMAStrategy({
         symbol: selectedSymbol,
@@ -107,6 +109,18 @@ function App() {
   const signalTimeline = strategyQuery.data?.signal_timeline ?? [];
   const effectiveTimeframe = strategyQuery.data?.timeframe ?? timeframe;
   const indicators = strategyQuery.data?.indicators ?? { sma: {}, hma: {} };
+  const overlayTimeframes = Array.from(new Set([...Object.keys(indicators.sma), ...Object.keys(indicators.hma)]));
+
+  // Live deltas only make sense when the range is open-ended.
+  const { signals: liveSignals } = useMarketStream(
+    selectedSymbol,
+    timeframe,
+    strategyQueryKey,
+    Boolean(strategyQuery.data) && !end,
+    overlayTimeframes,
+  );
+  // Streamed signals are Strategy 1 entries; they extend that strategy's timeline.
+  const liveSignal = strategy === '1' ? liveSignals[liveSignals.length - 1] ?? null : null;
 
   const indicatorSeries = useMemo<IndicatorSeries[]>(() => {
     const colorMap: Record<string, Record<string, string>> = {
@@ -161,12 +175,23 @@ function App() {
   } = usePlayback(candles.length, 500);
 
   const currentCandle = candles[index] ?? null;
-  const currentSignal = useMemo(() => {
-    if (!currentCandle || !signalTimeline.length) return null;
+  const currentSignal = useMemo<SignalSnapshot | null>(() => {
+    if (!currentCandle) return null;
     const targetTime = currentCandle.time;
     const reversed = [...signalTimeline].reverse();
-    return reversed.find((snapshot) => snapshot.time <= targetTime) ?? signalTimeline[0];
-  }, [signalTimeline, currentCandle]);
+    const snapshot = reversed.find((item) => item.time <= targetTime) ?? signalTimeline[0] ?? null;
+    if (liveSignal && liveSignal.time <= targetTime && (!snapshot || liveSignal.time > snapshot.time)) {
+      return {
+        time: liveSignal.time,
+        should_enter: true,
+        should_enter_long: liveSignal.direction === 'long',
+        should_enter_short: liveSignal.direction === 'short',
+        should_exit_long: false,
+        should_exit_short: false,
+      };
+    }
+    return snapshot;
+  }, [signalTimeline, currentCandle, liveSignal]);
 
   // Use the time of the next candle (or end of current candle) for filtering entries
   // This ensures all entries within the current visible candle are included
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import type { CursorPage } from './types';
 
 const apiBase = import.meta.env.VITE_API_BASE_URL ?? 'http://127.0.0.1:8000';
 
@@ -7,6 +8,22 @@ export const apiClient = axios.create({
   timeout: 15000,
 });
 
+/** Follows `next` links of a cursor-paginated endpoint until `max` rows (or the end). */
+export async function fetchAllPages<T>(
+  url: string,
+  params: Record<string, unknown>,
+  max = Infinity,
+): Promise<T[]> {
+  const rows: T[] = [];
+  let response = await apiClient.get<CursorPage<T>>(url, { params });
+  for (;;) {
+    rows.push(...response.data.results);
+    if (!response.data.next || rows.length >= max) break;
+    response = await apiClient.get<CursorPage<T>>(response.data.next);
+  }
+  return rows.slice(0, max);
+}
+
 export function toNumber(value: string | number): number {
   if (typeof value === 'number') return value;
   return Number(value);
@@ -1,4 +1,4 @@
-import { apiClient, toNumber } from './client';
+import { apiClient, fetchAllPages, toNumber } from './client';
 import type { Candle, CandleDTO, SymbolDTO, Timeframe } from './types';
 import type { UTCTimestamp } from 'lightweight-charts';
 
@@ -15,10 +15,14 @@ export interface FetchCandlesParams {
   end?: string;
 }
 
+const MAX_PAGE_SIZE = 5000;
+
 export async function fetchCandles(params: FetchCandlesParams): Promise<Candle[]> {
-  const { data } = await apiClient.get<CandleDTO[]>(
+  const { limit, ...filters } = params;
+  const data = await fetchAllPages<CandleDTO>(
     '/api/datafeeds/candles/',
-    { params: { ...params } },
+    { ...filters, compact: 1, page_size: Math.min(limit ?? MAX_PAGE_SIZE, MAX_PAGE_SIZE) },
+    limit,
   );
 
   return data.map((candle) => ({
@@ -1,5 +1,5 @@
 import type { DivergenceDTO, Divergence, Timeframe } from './types';
-import { apiClient } from './client';
+import { fetchAllPages } from './client';
 
 export async function fetchDivergences(
   symbol: string,
@@ -21,9 +21,10 @@ export async function fetchDivergences(
     params.append('end', endTime);
   }
 
-  const response = await apiClient.get<DivergenceDTO[]>(`/api/datafeeds/divergences/?${params}`);
-  
-  return response.data.map(transformDivergenceDTO);
+  params.append('compact', '1');
+  const rows = await fetchAllPages<DivergenceDTO>(`/api/datafeeds/divergences/?${params}`, {});
+
+  return rows.map(transformDivergenceDTO);
 }
 
 function transformDivergenceDTO(dto: DivergenceDTO): Divergence {
@@ -12,9 +12,16 @@ export interface SymbolDTO {
   updated_at: string;
 }
 
+export interface CursorPage<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+  symbols?: Record<string, SymbolDTO>;
+}
+
 export interface CandleDTO {
   id: number;
-  symbol: SymbolDTO;
+  symbol: SymbolDTO | string;
   timeframe: string;
   timestamp: string;
   open: string;
@@ -0,0 +1,108 @@
+import { useEffect, useState } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import type { QueryKey } from '@tanstack/react-query';
+import type { UTCTimestamp } from 'lightweight-charts';
+
+import type { HMASMAStrategyResponse } from '../api/strategy';
+import type { Candle, IndicatorPoint, Timeframe } from '../api/types';
+
+export interface MarketSignal {
+  strategy: string;
+  direction: 'long' | 'short';
+  time: UTCTimestamp;
+  price: number;
+}
+
+interface MarketDelta {
+  type: 'candle';
+  closed: boolean;
+  candle: Candle;
+  indicators?: Partial<Record<'sma' | 'hma', number | null>>;
+  signals?: MarketSignal[];
+}
+
+const apiBase = import.meta.env.VITE_API_BASE_URL ?? 'http://127.0.0.1:8000';
+const wsBase = apiBase.replace(/\/$/, '').replace(/^http/, 'ws');
+
+function upsertByTime<T extends { time: UTCTimestamp }>(points: T[], point: T): T[] {
+  const last = points[points.length - 1];
+  if (last && last.time === point.time) {
+    return [...points.slice(0, -1), point];
+  }
+  if (last && last.time > point.time) {
+    return points;
+  }
+  return [...points, point];
+}
+
+// Strategy 1 signals are only published on the 5m stream.
+const SIGNAL_TIMEFRAME = '5m';
+
+function applyDelta(
+  data: HMASMAStrategyResponse,
+  delta: MarketDelta,
+  streamTimeframe: string,
+  viewTimeframe: Timeframe,
+): HMASMAStrategyResponse {
+  const indicators = { sma: { ...data.indicators.sma }, hma: { ...data.indicators.hma } };
+  (['sma', 'hma'] as const).forEach((type) => {
+    const value = delta.indicators?.[type];
+    const series = indicators[type][streamTimeframe];
+    if (value == null || !series) return;
+    const point: IndicatorPoint = { time: delta.candle.time, value };
+    indicators[type][streamTimeframe] = upsertByTime(series, point);
+  });
+  // Other timeframes only feed their overlays; the chart's candles come from the view timeframe.
+  const candles = streamTimeframe === viewTimeframe ? upsertByTime(data.candles, delta.candle) : data.candles;
+  return { ...data, candles, indicators };
+}
+
+/**
+ * Subscribes to `ws/market/<symbol>/<timeframe>/` for the chart's timeframe, every overlay
+ * timeframe and the 5m signal stream, and patches the cached strategy payload with each
+ * candle/indicator delta instead of refetching the whole run. Returns the Strategy 1 signals
+ * streamed since the subscription started.
+ */
+export function useMarketStream(
+  symbol: string,
+  timeframe: Timeframe,
+  queryKey: QueryKey,
+  enabled = true,
+  overlayTimeframes: string[] = [],
+) {
+  const queryClient = useQueryClient();
+  const [signals, setSignals] = useState<MarketSignal[]>([]);
+  const [connected, setConnected] = useState(false);
+  const streamTimeframes = Array.from(new Set([timeframe, ...overlayTimeframes, SIGNAL_TIMEFRAME])).sort();
+
+  useEffect(() => {
+    setSignals([]);
+    if (!enabled || !symbol) return;
+
+    const sockets = streamTimeframes.map((streamTimeframe) => {
+      const socket = new WebSocket(`${wsBase}/ws/market/${symbol}/${streamTimeframe}/`);
+      if (streamTimeframe === timeframe) {
+        socket.onopen = () => setConnected(true);
+        socket.onclose = () => setConnected(false);
+      }
+      socket.onmessage = (message) => {
+        const delta = JSON.parse(message.data) as MarketDelta;
+        if (delta.type !== 'candle') return;
+        queryClient.setQueryData<HMASMAStrategyResponse>(queryKey, (data) =>
+          data ? applyDelta(data, delta, streamTimeframe, timeframe) : data,
+        );
+        if (delta.signals?.length) {
+          setSignals((previous) => [...previous, ...delta.signals!]);
+        }
+      };
+      return socket;
+    });
+
+    return () => {
+      sockets.forEach((socket) => socket.close());
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [symbol, timeframe, enabled, queryClient, JSON.stringify(queryKey), streamTimeframes.join(',')]);
+
+  return { signals, connected };
+}